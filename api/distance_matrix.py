@@ -5,12 +5,18 @@ Calcula distâncias e tempos entre múltiplos pontos
 
 from typing import List, Tuple, Dict, Optional
 from datetime import datetime
+import numpy as np
 from api.google_maps import get_client
 
 
 class DistanceMatrixAPI:
     """Cliente para Distance Matrix API"""
     
+    # Limites por requisição da Distance Matrix API
+    MAX_ORIGENS = 25
+    MAX_DESTINOS = 25
+    MAX_ELEMENTOS = 100
+    
     def __init__(self):
         self.client = get_client()
     
@@ -84,6 +90,58 @@ class DistanceMatrixAPI:
             'total_pares': len(matriz)
         }
     
+    @classmethod
+    def blocos(cls, n_origens: int, n_destinos: int) -> List[Tuple[slice, slice]]:
+        """
+        Divide uma matriz origens x destinos em blocos dentro dos limites por requisição
+        
+        Returns:
+            Lista de (fatia de origens, fatia de destinos)
+        """
+        if n_origens == 0 or n_destinos == 0:
+            return []
+        bloco_origens = min(cls.MAX_ORIGENS, n_origens)
+        bloco_destinos = min(cls.MAX_DESTINOS, cls.MAX_ELEMENTOS // bloco_origens, n_destinos)
+        return [
+            (slice(i0, min(i0 + bloco_origens, n_origens)), slice(j0, min(j0 + bloco_destinos, n_destinos)))
+            for i0 in range(0, n_origens, bloco_origens)
+            for j0 in range(0, n_destinos, bloco_destinos)
+        ]
+    
+    def matriz_custos(
+        self,
+        origens: List[Tuple[float, float]],
+        destinos: List[Tuple[float, float]],
+        modo: str = "driving",
+        campo: str = "duracao_segundos"
+    ) -> np.ndarray:
+        """
+        Matriz numérica de custos, dividida em blocos dentro dos limites da API
+        
+        Cada bloco é uma requisição independente (e entra no cache do cliente),
+        então recalcular a mesma matriz não gera novas chamadas.
+        
+        Args:
+            origens: Lista de (lat, lng) pontos de origem
+            destinos: Lista de (lat, lng) pontos de destino
+            modo: 'driving', 'walking', 'bicycling', 'transit'
+            campo: 'duracao_segundos' ou 'distancia_metros'
+        
+        Returns:
+            Array (len(origens), len(destinos)); NaN onde não há rota
+        """
+        custos = np.full((len(origens), len(destinos)), np.nan)
+        for bloco_o, bloco_d in self.blocos(len(origens), len(destinos)):
+            resultado = self.calcular_matriz(
+                origens=list(origens[bloco_o]),
+                destinos=list(destinos[bloco_d]),
+                modo=modo
+            )
+            for item in resultado.get('matriz', []):
+                custos[bloco_o.start + item['origem_idx'], bloco_d.start + item['destino_idx']] = item[campo]
+        
+        return custos
+    
     def calcular_cobertura(
         self,
         ponto_central: Tuple[float, float],
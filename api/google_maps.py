@@ -235,7 +235,7 @@ class GoogleMapsClient:
         
         return params_limpos
     
-    def _carregar_cache(self, cache_key: str) -> Optional[Any]:
+    def _carregar_cache(self, cache_key: str, ttl_dias: Optional[float] = None) -> Optional[Any]:
         """Carrega dados do cache se existir e não estiver expirado"""
         if not CACHE_ENABLED:
             return None
@@ -245,9 +245,11 @@ class GoogleMapsClient:
         if not cache_path.exists():
             return None
         
-        # Verificar se cache expirou
+        # Verificar se cache expirou (cada API pode ter seu próprio TTL)
+        if ttl_dias is None:
+            ttl_dias = CACHE_TTL_DAYS
         file_time = datetime.fromtimestamp(cache_path.stat().st_mtime)
-        if datetime.now() - file_time > timedelta(days=CACHE_TTL_DAYS):
+        if datetime.now() - file_time > timedelta(days=ttl_dias):
             cache_path.unlink()  # Deletar cache expirado
             return None
         
@@ -269,7 +271,8 @@ class GoogleMapsClient:
         api_name: str,
         api_method,
         params: Dict,
-        usar_cache: bool = True
+        usar_cache: bool = True,
+        ttl_dias: Optional[float] = None
     ) -> Any:
         """
         Método genérico para fazer requisições com cache
@@ -279,6 +282,7 @@ class GoogleMapsClient:
             api_method: Método da API a chamar
             params: Parâmetros da requisição
             usar_cache: Se deve usar cache
+            ttl_dias: Tempo de vida do cache (padrão: CACHE_TTL_DAYS)
         
         Returns:
             Resposta da API
@@ -286,7 +290,7 @@ class GoogleMapsClient:
         # Tentar carregar do cache
         if usar_cache:
             cache_key = self._gerar_cache_key(api_name, params)
-            cached_data = self._carregar_cache(cache_key)
+            cached_data = self._carregar_cache(cache_key, ttl_dias)
             
             if cached_data is not None:
                 print(f"✓ Cache hit: {api_name}")
@@ -257,124 +257,276 @@ Suporta busca de POIs com MÁXIMA extração de informações
 """
 
 import requests
-import math
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Tuple
-from config.settings import GOOGLE_MAPS_API_KEY
+from api.google_maps import get_client
+from api.repositorio_places import get_repositorio_places
+from api.tabela_places import TabelaPlaces
+from config.settings import (
+    GOOGLE_MAPS_API_KEY,
+    PLACES_CACHE_TTL_DAYS,
+    PLACES_CACHE_PRECISAO
+)
+
+class ErroColetaCategorias(Exception):
+    """Falha em alguma categoria de POIs; `parcial` tem as categorias que deram certo"""
+
+    def __init__(self, erros: List[str], parcial: TabelaPlaces):
+        super().__init__("; ".join(erros))
+        self.erros = erros
+        self.parcial = parcial
+
 
 class PlacesAPINew:
     """Cliente para Places API (New)"""
     
     BASE_URL = "https://places.googleapis.com/v1/places"
+    FIELD_MASK = 'places.id,places.displayName,places.formattedAddress,places.location,places.types,places.evChargeOptions,places.rating,places.userRatingCount,places.websiteUri,places.nationalPhoneNumber,places.regularOpeningHours'
+    # Fase 1 (descoberta): só o necessário para deduplicar e filtrar pelo raio
+    FIELD_MASK_DESCOBERTA = 'places.id,places.location'
+    # Fase 2 (detalhes): campos de SKU mais caro, pedidos uma vez por lugar único
+    FIELD_MASK_DETALHES = 'id,displayName,formattedAddress,location,types,evChargeOptions,rating,userRatingCount,websiteUri,nationalPhoneNumber,regularOpeningHours'
+    # POIs: campos usados na análise de atratividade
+    FIELD_MASK_POIS = 'places.id,places.displayName,places.location,places.primaryType'
+    MAX_WORKERS_DETALHES = 8
     
     def __init__(self):
         self.api_key = GOOGLE_MAPS_API_KEY
+        self.client = get_client()
         self.headers = {
             'Content-Type': 'application/json',
             'X-Goog-Api-Key': self.api_key,
-            'X-Goog-FieldMask': 'places.id,places.displayName,places.formattedAddress,places.location,places.types,places.evChargeOptions,places.rating,places.userRatingCount,places.websiteUri,places.nationalPhoneNumber,places.regularOpeningHours'
+            'X-Goog-FieldMask': self.FIELD_MASK
         }
 
     @staticmethod
-    def _calcular_distancia_haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-        """Calcula la distancia en metros entre dos coordenadas usando la fórmula de Haversine"""
-        R = 6371000  # Radio medio de la Tierra en metros
-        phi1, phi2 = math.radians(lat1), math.radians(lat2)
-        delta_phi = math.radians(lat2 - lat1)
-        delta_lambda = math.radians(lon2 - lon1)
-        
-        a = math.sin(delta_phi/2.0)**2 + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda/2.0)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        return R * c
+    def _quantizar_circulo(location: Tuple[float, float], radius_meters: float) -> Tuple[Tuple[float, float], int]:
+        """Arredonda centro e raio para que buscas equivalentes compartilhem o cache"""
+        lat = round(location[0], PLACES_CACHE_PRECISAO)
+        lng = round(location[1], PLACES_CACHE_PRECISAO)
+        return (lat, lng), int(round(radius_meters))
+
+    def _post_search_nearby(self, payload: Dict, field_mask: str) -> List[Dict]:
+        """Executa a chamada HTTP do searchNearby (levanta exceção em caso de erro)"""
+        url = f"{self.BASE_URL}:searchNearby"
+        headers = {**self.headers, 'X-Goog-FieldMask': field_mask}
+        response = requests.post(url, json=payload, headers=headers)
+        response.raise_for_status()
+        return response.json().get('places', [])
     
     def nearby_search(
         self,
         location: Tuple[float, float],
         radius_meters: int = 5000,
-        included_types: Optional[List[str]] = None
+        included_types: Optional[List[str]] = None,
+        field_mask: Optional[str] = None,
+        max_result_count: Optional[int] = None,
+        usar_cache: bool = True,
+        levantar_erros: bool = False
     ) -> List[Dict]:
-        """Busca lugares próximos a una localización (Llamada base)"""
-        url = f"{self.BASE_URL}:searchNearby"
+        """
+        Busca lugares próximos a uma localização (chamada base)
+        
+        A resposta é guardada no cache comum do GoogleMapsClient. A chave é
+        formada pelo círculo quantizado, pelos includedTypes e pelo FieldMask,
+        com TTL próprio (PLACES_CACHE_TTL_DAYS).
+        
+        Com levantar_erros=True a falha é propagada em vez de virar lista vazia
+        (necessário no repositório, para não marcar um tile como atualizado).
+        """
+        centro, raio = self._quantizar_circulo(location, radius_meters)
         payload = {
             "locationRestriction": {
                 "circle": {
-                    "center": {"latitude": location[0], "longitude": location[1]},
-                    "radius": radius_meters
+                    "center": {"latitude": centro[0], "longitude": centro[1]},
+                    "radius": raio
                 }
             }
         }
         if included_types:
-            payload["includedTypes"] = included_types
+            payload["includedTypes"] = sorted(included_types)
+        if max_result_count:
+            payload["maxResultCount"] = max_result_count
+        
+        params = {
+            'payload': payload,
+            'field_mask': field_mask or self.FIELD_MASK
+        }
         
         try:
-            response = requests.post(url, json=payload, headers=self.headers)
-            response.raise_for_status()
-            return response.json().get('places', [])
+            return self.client._fazer_requisicao(
+                api_name='places_nearby',
+                api_method=self._post_search_nearby,
+                params=params,
+                usar_cache=usar_cache,
+                ttl_dias=PLACES_CACHE_TTL_DAYS
+            )
         except requests.exceptions.RequestException as e:
             print(f"✗ Erro na Places API (New): {e}")
+            if levantar_erros:
+                raise
             return []
     
+    def _get_detalhes(self, place_id: str, field_mask: str) -> Dict:
+        """Executa a chamada HTTP de Place Details (levanta exceção em caso de erro)"""
+        url = f"{self.BASE_URL}/{place_id}"
+        headers = {**self.headers, 'X-Goog-FieldMask': field_mask}
+        response = requests.get(url, headers=headers)
+        response.raise_for_status()
+        return response.json()
+
+    def obter_detalhes(self, place_id: str, usar_cache: bool = True) -> Dict:
+        """
+        Busca os detalhes de um lugar (fase 2), com cache por place id
+        
+        Pode ser chamado sob demanda, por exemplo quando um popup ou uma
+        linha da tabela precisa das informações completas.
+        """
+        try:
+            return self.client._fazer_requisicao(
+                api_name='places_detalhes',
+                api_method=self._get_detalhes,
+                params={'place_id': place_id, 'field_mask': self.FIELD_MASK_DETALHES},
+                usar_cache=usar_cache,
+                ttl_dias=PLACES_CACHE_TTL_DAYS
+            )
+        except requests.exceptions.RequestException as e:
+            print(f"✗ Erro na Places API (New) - detalhes de {place_id}: {e}")
+            return {}
+
+    def hidratar_detalhes(self, lugares: List[Dict]) -> List[Dict]:
+        """
+        Completa em lote os lugares descobertos com seus detalhes
+        
+        Cada id único é consultado uma única vez (em paralelo); os campos
+        já presentes na descoberta são preservados.
+        """
+        ids_unicos = list({lugar['id'] for lugar in lugares if 'id' in lugar})
+        if not ids_unicos:
+            return lugares
+        
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS_DETALHES) as executor:
+            detalhes = dict(zip(ids_unicos, executor.map(self.obter_detalhes, ids_unicos)))
+        
+        return [{**detalhes.get(lugar.get('id'), {}), **lugar} for lugar in lugares]
+
+    def buscar_tile_eletropostos(self, lat: float, lng: float, raio: int) -> List[Dict]:
+        """Busca de um tile do repositório (eletropostos, fase de descoberta)"""
+        return self.nearby_search(
+            location=(lat, lng),
+            radius_meters=raio,
+            included_types=['electric_vehicle_charging_station'],
+            field_mask=self.FIELD_MASK_DESCOBERTA,
+            levantar_erros=True
+        )
+
+    @staticmethod
+    def camada_pois(included_types: List[str]) -> str:
+        """Nome da camada do repositório para um conjunto de tipos de POI"""
+        return f"pois:{','.join(sorted(included_types))}"
+
+    def busca_tile_pois(self, included_types: List[str]):
+        """Retorna a função de busca de um tile do repositório para os tipos de POI"""
+        def buscar(lat: float, lng: float, raio: int) -> List[Dict]:
+            return self.nearby_search(
+                location=(lat, lng),
+                radius_meters=raio,
+                included_types=included_types,
+                field_mask=self.FIELD_MASK_POIS,
+                max_result_count=20,
+                levantar_erros=True
+            )
+        return buscar
+
     def buscar_eletropostos(
         self,
         location: Tuple[float, float],
-        radius_meters: int = 5000
-    ) -> List[Dict]:
-        """
-        Busca estações de carregamento usando malha de 9 pontos 
-        e filtro estrito de distância.
+        radius_meters: int = 5000,
+        hidratar: bool = True
+    ) -> TabelaPlaces:
         """
-        lat, lng = location
-        R = 6378137 # Raio equatorial da Terra em metros
-        
-        # Deslocamento ajustado para criar uma malha 3x3 que cubra a área
-        offset = radius_meters * 0.6 
+        Busca estações de carregamento em duas fases.
         
-        dLat = (offset / R) * (180 / math.pi)
-        dLng = (offset / (R * math.cos(math.pi * lat / 180))) * (180 / math.pi)
+        1. Descoberta: o repositório local responde ao círculo e só os tiles
+           expirados ou nunca buscados geram chamadas, pedindo apenas id e
+           location; os lugares são deduplicados e filtrados pelo raio (Haversine).
+        2. Detalhes: apenas os lugares únicos sobreviventes são completados
+           (hidratar=True) ou ficam para obter_detalhes() sob demanda.
         
-        # Malha de 9 pontos para evitar saturar o limite de 20 resultados em áreas densas
-        pontos_busca = [
-            (lat, lng),                  # Centro
-            (lat + dLat, lng),           # Norte
-            (lat - dLat, lng),           # Sul
-            (lat, lng + dLng),           # Leste
-            (lat, lng - dLng),           # Oeste
-            (lat + dLat, lng + dLng),    # Nordeste
-            (lat + dLat, lng - dLng),    # Noroeste
-            (lat - dLat, lng + dLng),    # Sudeste
-            (lat - dLat, lng - dLng)     # Sudoeste
-        ]
+        O resultado é convertido uma única vez em TabelaPlaces (colunar), já
+        com a distância ao centro calculada. Se algum tile do círculo não puder
+        ser buscado, levanta FalhaAtualizacaoTiles em vez de devolver a área
+        dele vazia.
+        """
+        repositorio = get_repositorio_places()
+        resultados_filtrados = repositorio.consultar_circulo(
+            camada='eletropostos',
+            location=location,
+            radius_meters=radius_meters,
+            buscar_fn=self.buscar_tile_eletropostos
+        )
         
-        todos_lugares = {}
-        # O raio de cada sub-busca deve ser suficiente para sobrepor, mas não tão grande que sature
-        raio_busca = int(radius_meters * 0.55)
+        if hidratar:
+            resultados_filtrados = self.hidratar_detalhes(resultados_filtrados)
         
-        # Fazer as buscas
-        for ponto in pontos_busca:
-            lugares = self.nearby_search(
-                location=ponto,
-                radius_meters=raio_busca,
-                included_types=['electric_vehicle_charging_station']
-            )
-            for lugar in lugares:
-                if 'id' in lugar:
-                    todos_lugares[lugar['id']] = lugar
-                    
-        # FILTRO ESTRITO DE DISTÂNCIA (Garante que nenhum ponto saia do círculo do mapa)
-        resultados_filtrados = []
-        for lugar in todos_lugares.values():
-            if 'location' in lugar:
-                lugar_lat = lugar['location']['latitude']
-                lugar_lng = lugar['location']['longitude']
-                distancia_real = self._calcular_distancia_haversine(lat, lng, lugar_lat, lugar_lng)
-                
-                if distancia_real <= radius_meters:
-                    # Guardamos a distância exata para exibir na interface/tabela
-                    lugar['distancia_centro_m'] = round(distancia_real)
-                    resultados_filtrados.append(lugar)
-                    
-        print(f"✓ Places API: {len(resultados_filtrados)} eletropostos validados dentro do raio estrito.")
-        return resultados_filtrados
+        tabela = TabelaPlaces.de_respostas(resultados_filtrados, categoria='eletropostos', centro=location)
+        print(f"✓ Places API: {len(tabela)} eletropostos validados dentro do raio estrito.")
+        return tabela
+    
+    def buscar_pois(
+        self,
+        location: Tuple[float, float],
+        radius_meters: int,
+        included_types: List[str],
+        categoria: str = ''
+    ) -> TabelaPlaces:
+        """Busca POIs dos tipos indicados a partir do repositório local (FalhaAtualizacaoTiles se algum tile falhar)"""
+        repositorio = get_repositorio_places()
+        lugares = repositorio.consultar_circulo(
+            camada=self.camada_pois(included_types),
+            location=location,
+            radius_meters=radius_meters,
+            buscar_fn=self.busca_tile_pois(included_types)
+        )
+        return TabelaPlaces.de_respostas(lugares, categoria=categoria, centro=location)
     
+    def buscar_categorias(
+        self,
+        location: Tuple[float, float],
+        radius_meters: int,
+        categorias: List[Tuple[str, Tuple[str, ...]]]
+    ) -> TabelaPlaces:
+        """
+        POIs de várias categorias ((nome, tipos), ...) em paralelo, numa única tabela
+
+        Raises:
+            ErroColetaCategorias: alguma categoria falhou (ex: FalhaAtualizacaoTiles);
+                o resultado parcial vai na exceção, nunca como retorno normal
+        """
+        with ThreadPoolExecutor(max_workers=len(categorias) or 1) as executor:
+            futuros = {
+                nome: executor.submit(
+                    self.buscar_pois,
+                    location=location,
+                    radius_meters=radius_meters,
+                    included_types=list(tipos),
+                    categoria=nome
+                )
+                for nome, tipos in categorias
+            }
+
+        tabelas, erros = [], []
+        for nome, futuro in futuros.items():
+            try:
+                tabelas.append(futuro.result())
+            except Exception as e:
+                erros.append(f"Erro ao buscar {nome}: {e}")
+
+        tabela = TabelaPlaces.concatenar(tabelas)
+        if erros:
+            raise ErroColetaCategorias(erros, tabela)
+        return tabela
+
     def testar_conexao(self) -> bool:
         try:
             resultado = self.buscar_eletropostos(location=(-22.9056, -47.0608), radius_meters=5000)
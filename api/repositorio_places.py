@@ -0,0 +1,423 @@
+"""
+Repositório local de lugares (eletropostos e POIs)
+Armazena resultados da Places API indexados por geohash, com atualização incremental por tile
+"""
+
+import json
+import math
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from processamento.geodesia import bbox_circulo, haversine, haversine_um_para_muitos, mascara_raio
+from config.settings import (
+    DADOS_DIR,
+    REPOSITORIO_PLACES_TTL_DAYS,
+    REPOSITORIO_GEOHASH_PRECISAO,
+    REPOSITORIO_GEOHASH_PRECISAO_MAX
+)
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_BASE32_IDX = {c: i for i, c in enumerate(_BASE32)}
+
+# A Places API devolve no máximo 20 lugares por busca; um tile com 20 resultados
+# provavelmente foi truncado e precisa ser subdividido
+LIMITE_RESULTADOS_BUSCA = 20
+
+# Função de busca usada para preencher um tile: (lat, lng, raio_m) -> lugares.
+# Uma lista vazia é tratada como tile realmente vazio (apaga o que havia nele),
+# então falhas da API devem levantar exceção, nunca virar [].
+BuscaTile = Callable[[float, float, int], List[Dict]]
+
+
+class FalhaAtualizacaoTiles(Exception):
+    """Algum tile da consulta não pôde ser buscado; `resumo` é o resumo de atualizar_tiles"""
+
+    def __init__(self, camada: str, resumo: Dict):
+        super().__init__(
+            f"{resumo['tiles_com_falha']} de {resumo['tiles_total']} tiles de '{camada}' "
+            f"não puderam ser atualizados"
+        )
+        self.camada = camada
+        self.resumo = resumo
+
+
+# --- GEOHASH ---
+def geohash_encode(lat: float, lng: float, precisao: int) -> str:
+    """Codifica uma coordenada em geohash com a precisão (nº de caracteres) indicada"""
+    lat_int, lng_int = [-90.0, 90.0], [-180.0, 180.0]
+    geohash = []
+    bits, bit, par = 0, 0, True
+    while len(geohash) < precisao:
+        intervalo, valor = (lng_int, lng) if par else (lat_int, lat)
+        meio = (intervalo[0] + intervalo[1]) / 2
+        if valor >= meio:
+            bits = (bits << 1) | 1
+            intervalo[0] = meio
+        else:
+            bits = bits << 1
+            intervalo[1] = meio
+        par = not par
+        bit += 1
+        if bit == 5:
+            geohash.append(_BASE32[bits])
+            bits, bit = 0, 0
+    return ''.join(geohash)
+
+
+def geohash_bbox(geohash: str) -> Tuple[float, float, float, float]:
+    """Retorna (lat_min, lat_max, lng_min, lng_max) da célula do geohash"""
+    lat_int, lng_int = [-90.0, 90.0], [-180.0, 180.0]
+    par = True
+    for c in geohash:
+        valor = _BASE32_IDX[c]
+        for desloc in range(4, -1, -1):
+            intervalo = lng_int if par else lat_int
+            meio = (intervalo[0] + intervalo[1]) / 2
+            if (valor >> desloc) & 1:
+                intervalo[0] = meio
+            else:
+                intervalo[1] = meio
+            par = not par
+    return lat_int[0], lat_int[1], lng_int[0], lng_int[1]
+
+
+def geohash_dimensoes(precisao: int) -> Tuple[float, float]:
+    """Altura e largura (em graus) de uma célula geohash"""
+    bits = 5 * precisao
+    bits_lng = (bits + 1) // 2
+    bits_lat = bits // 2
+    return 180.0 / (2 ** bits_lat), 360.0 / (2 ** bits_lng)
+
+
+def geohash_filhos(geohash: str) -> List[str]:
+    """Os 32 geohashes do nível seguinte contidos na célula"""
+    return [geohash + c for c in _BASE32]
+
+
+def geohashes_bbox(
+    lat_min: float,
+    lat_max: float,
+    lng_min: float,
+    lng_max: float,
+    precisao: int
+) -> List[str]:
+    """Lista os geohashes que intersectam a caixa delimitadora"""
+    altura, largura = geohash_dimensoes(precisao)
+    i_min = math.floor((lat_min + 90.0) / altura)
+    i_max = math.floor((lat_max + 90.0) / altura)
+    j_min = math.floor((lng_min + 180.0) / largura)
+    j_max = math.floor((lng_max + 180.0) / largura)
+
+    tiles = []
+    for i in range(i_min, i_max + 1):
+        lat_c = -90.0 + (i + 0.5) * altura
+        for j in range(j_min, j_max + 1):
+            lng_c = -180.0 + (j + 0.5) * largura
+            tiles.append(geohash_encode(lat_c, lng_c, precisao))
+    return tiles
+
+
+class RepositorioPlaces:
+    """
+    Armazenamento persistente (SQLite) de lugares por camada
+
+    Cada lugar é guardado pelo seu `id` da Places API e indexado pelo geohash
+    da sua localização. Para cada tile geohash registra-se quando foi
+    atualizado; consultas por círculo só disparam buscas nos tiles
+    inexistentes ou expirados.
+    """
+
+    def __init__(self, caminho: Optional[Path] = None):
+        self.caminho = Path(caminho) if caminho else DADOS_DIR / 'places.sqlite'
+        self._criar_tabelas()
+
+    def _conectar(self) -> sqlite3.Connection:
+        """Abre uma conexão (uma por operação, seguro entre threads do Streamlit)"""
+        conn = sqlite3.connect(str(self.caminho), timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _criar_tabelas(self):
+        """Cria as tabelas e índices caso ainda não existam"""
+        with closing(self._conectar()) as conn, conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS lugares (
+                    camada TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    lat REAL NOT NULL,
+                    lng REAL NOT NULL,
+                    geohash TEXT NOT NULL,
+                    dados TEXT NOT NULL,
+                    atualizado_em REAL NOT NULL,
+                    PRIMARY KEY (camada, id)
+                );
+                CREATE INDEX IF NOT EXISTS idx_lugares_geohash ON lugares (camada, geohash);
+                CREATE INDEX IF NOT EXISTS idx_lugares_lat ON lugares (camada, lat);
+
+                CREATE TABLE IF NOT EXISTS tiles (
+                    camada TEXT NOT NULL,
+                    geohash TEXT NOT NULL,
+                    atualizado_em REAL NOT NULL,
+                    total INTEGER NOT NULL,
+                    saturado INTEGER NOT NULL,
+                    PRIMARY KEY (camada, geohash)
+                );
+            """)
+
+    # --- TILES ---
+    def tiles_circulo(
+        self,
+        location: Tuple[float, float],
+        radius_meters: float,
+        precisao: int = REPOSITORIO_GEOHASH_PRECISAO
+    ) -> List[str]:
+        """Geohashes que intersectam o círculo"""
+        lat, lng = location
+        candidatos = geohashes_bbox(*bbox_circulo(lat, lng, radius_meters), precisao)
+        if not candidatos:
+            return []
+
+        caixas = np.array([geohash_bbox(gh) for gh in candidatos])
+        # Ponto de cada tile mais próximo do centro
+        p_lat = np.clip(lat, caixas[:, 0], caixas[:, 1])
+        p_lng = np.clip(lng, caixas[:, 2], caixas[:, 3])
+        dentro = haversine_um_para_muitos(lat, lng, p_lat, p_lng) <= radius_meters
+        return [gh for gh, ok in zip(candidatos, dentro) if ok]
+
+    def tiles_expirados(
+        self,
+        camada: str,
+        tiles: Iterable[str],
+        ttl_dias: float = REPOSITORIO_PLACES_TTL_DAYS
+    ) -> List[str]:
+        """Filtra os tiles nunca buscados ou com atualização mais antiga que o TTL"""
+        tiles = list(tiles)
+        if not tiles:
+            return []
+
+        limite = time.time() - ttl_dias * 86400
+        with closing(self._conectar()) as conn:
+            frescos = set()
+            # SQLite limita o número de parâmetros por consulta
+            for inicio in range(0, len(tiles), 500):
+                lote = tiles[inicio:inicio + 500]
+                marcadores = ','.join('?' * len(lote))
+                linhas = conn.execute(
+                    f"SELECT geohash FROM tiles WHERE camada = ? AND atualizado_em >= ? "
+                    f"AND geohash IN ({marcadores})",
+                    [camada, limite, *lote]
+                ).fetchall()
+                frescos.update(linha['geohash'] for linha in linhas)
+        return [gh for gh in tiles if gh not in frescos]
+
+    def atualizar_tile(
+        self,
+        camada: str,
+        geohash: str,
+        buscar_fn: BuscaTile,
+        ttl_dias: float = REPOSITORIO_PLACES_TTL_DAYS
+    ) -> int:
+        """
+        Busca os lugares de um tile e grava no repositório
+
+        Se a busca vier saturada (limite de 20 resultados da API), o tile é
+        subdividido nos 32 filhos do nível seguinte, até
+        REPOSITORIO_GEOHASH_PRECISAO_MAX.
+
+        Se buscar_fn levantar exceção, nada é apagado e o tile continua
+        expirado (a exceção é propagada).
+
+        Returns:
+            Número de chamadas à API realizadas
+        """
+        inicio = time.time()
+        lat_min, lat_max, lng_min, lng_max = geohash_bbox(geohash)
+        lat_c, lng_c = (lat_min + lat_max) / 2, (lng_min + lng_max) / 2
+        # Círculo circunscrito ao tile (com pequena folga)
+        raio = int(math.ceil(float(haversine(lat_c, lng_c, lat_max, lng_max)) * 1.02))
+
+        lugares = buscar_fn(lat_c, lng_c, raio)
+        if lugares is None:
+            raise ValueError(f"Busca do tile {geohash} não retornou resultados (falha da API?)")
+        self.salvar_lugares(camada, lugares, atualizado_em=inicio)
+        chamadas = 1
+
+        saturado = len(lugares) >= LIMITE_RESULTADOS_BUSCA
+        subdividido = saturado and len(geohash) < REPOSITORIO_GEOHASH_PRECISAO_MAX
+        if subdividido:
+            # Cada filho cuida da remoção dos seus próprios lugares obsoletos
+            for filho in self.tiles_expirados(camada, geohash_filhos(geohash), ttl_dias):
+                chamadas += self.atualizar_tile(camada, filho, buscar_fn, ttl_dias)
+
+        with closing(self._conectar()) as conn, conn:
+            # Lugares do tile que não apareceram nesta atualização deixaram de existir
+            if not saturado:
+                conn.execute(
+                    "DELETE FROM lugares WHERE camada = ? AND geohash LIKE ? AND atualizado_em < ?",
+                    (camada, geohash + '%', inicio)
+                )
+            conn.execute(
+                "INSERT OR REPLACE INTO tiles (camada, geohash, atualizado_em, total, saturado) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (camada, geohash, time.time(), len(lugares), int(saturado and not subdividido))
+            )
+        return chamadas
+
+    def atualizar_tiles(
+        self,
+        camada: str,
+        tiles: Iterable[str],
+        buscar_fn: BuscaTile,
+        ttl_dias: float = REPOSITORIO_PLACES_TTL_DAYS,
+        tolerar_falhas: bool = False
+    ) -> Dict:
+        """
+        Atualiza apenas os tiles expirados ou nunca buscados
+
+        Todos os tiles pendentes são tentados; os que falham continuam
+        expirados. Sem `tolerar_falhas`, qualquer falha levanta
+        FalhaAtualizacaoTiles com o resumo depois das tentativas (consultas
+        não devem responder com a área de um tile que não foi buscado).
+
+        Raises:
+            FalhaAtualizacaoTiles: algum tile falhou e tolerar_falhas é False
+        """
+        tiles = list(tiles)
+        pendentes = self.tiles_expirados(camada, tiles, ttl_dias)
+        chamadas = 0
+        falhas = 0
+        for gh in pendentes:
+            try:
+                chamadas += self.atualizar_tile(camada, gh, buscar_fn, ttl_dias)
+            except Exception as e:
+                # O tile continua expirado e será tentado na próxima consulta
+                print(f"✗ Repositório ({camada}): falha ao atualizar tile {gh}: {e}")
+                falhas += 1
+
+        if pendentes:
+            print(f"→ Repositório ({camada}): {len(pendentes)}/{len(tiles)} tiles atualizados, {chamadas} chamadas")
+        else:
+            print(f"✓ Repositório ({camada}): {len(tiles)} tiles em dia")
+
+        resumo = {
+            'tiles_total': len(tiles),
+            'tiles_atualizados': len(pendentes) - falhas,
+            'tiles_com_falha': falhas,
+            'chamadas_api': chamadas
+        }
+        if falhas and not tolerar_falhas:
+            raise FalhaAtualizacaoTiles(camada, resumo)
+        return resumo
+
+    def atualizar_regiao(
+        self,
+        camada: str,
+        bbox: Tuple[float, float, float, float],
+        buscar_fn: BuscaTile,
+        ttl_dias: float = REPOSITORIO_PLACES_TTL_DAYS,
+        tolerar_falhas: bool = False
+    ) -> Dict:
+        """
+        Atualização incremental de uma região inteira
+
+        Args:
+            camada: Nome da camada (ex: 'eletropostos')
+            bbox: (lat_min, lat_max, lng_min, lng_max)
+            buscar_fn: Função de busca de um tile
+            ttl_dias: Idade máxima de um tile para não ser rebuscado
+            tolerar_falhas: Devolve o resumo com as falhas em vez de levantar
+                FalhaAtualizacaoTiles (varreduras retomáveis)
+        """
+        tiles = geohashes_bbox(*bbox, REPOSITORIO_GEOHASH_PRECISAO)
+        return self.atualizar_tiles(camada, tiles, buscar_fn, ttl_dias, tolerar_falhas)
+
+    # --- LUGARES ---
+    def salvar_lugares(self, camada: str, lugares: List[Dict], atualizado_em: Optional[float] = None):
+        """Insere ou atualiza lugares (chave: id da Places API)"""
+        atualizado_em = atualizado_em or time.time()
+        linhas = []
+        for lugar in lugares:
+            if 'id' not in lugar or 'location' not in lugar:
+                continue
+            lat = lugar['location']['latitude']
+            lng = lugar['location']['longitude']
+            linhas.append((
+                camada, lugar['id'], lat, lng,
+                geohash_encode(lat, lng, REPOSITORIO_GEOHASH_PRECISAO_MAX),
+                json.dumps(lugar, ensure_ascii=False),
+                atualizado_em
+            ))
+
+        with closing(self._conectar()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO lugares (camada, id, lat, lng, geohash, dados, atualizado_em) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                linhas
+            )
+
+    def lugares_circulo(
+        self,
+        camada: str,
+        location: Tuple[float, float],
+        radius_meters: float
+    ) -> List[Dict]:
+        """Lugares armazenados dentro do círculo (filtro estrito Haversine)"""
+        lat, lng = location
+        lat_min, lat_max, lng_min, lng_max = bbox_circulo(lat, lng, radius_meters)
+
+        with closing(self._conectar()) as conn:
+            linhas = conn.execute(
+                "SELECT lat, lng, dados FROM lugares WHERE camada = ? "
+                "AND lat BETWEEN ? AND ? AND lng BETWEEN ? AND ?",
+                (camada, lat_min, lat_max, lng_min, lng_max)
+            ).fetchall()
+        if not linhas:
+            return []
+
+        coords = np.array([(linha['lat'], linha['lng']) for linha in linhas])
+        dentro, _ = mascara_raio(lat, lng, coords[:, 0], coords[:, 1], radius_meters)
+        return [json.loads(linhas[k]['dados']) for k in np.flatnonzero(dentro)]
+
+    def lugares_camada(self, camada: str) -> List[Dict]:
+        """Todos os lugares armazenados de uma camada (exportações regionais)"""
+        with closing(self._conectar()) as conn:
+            linhas = conn.execute(
+                "SELECT dados FROM lugares WHERE camada = ?", (camada,)
+            ).fetchall()
+        return [json.loads(linha['dados']) for linha in linhas]
+
+    def consultar_circulo(
+        self,
+        camada: str,
+        location: Tuple[float, float],
+        radius_meters: float,
+        buscar_fn: BuscaTile,
+        ttl_dias: float = REPOSITORIO_PLACES_TTL_DAYS
+    ) -> List[Dict]:
+        """
+        Responde a uma consulta por círculo a partir do repositório
+
+        Apenas os tiles do círculo expirados ou nunca buscados geram
+        chamadas à Places API.
+
+        Raises:
+            FalhaAtualizacaoTiles: algum tile não pôde ser buscado (a área dele
+                ficaria vazia ou desatualizada na resposta)
+        """
+        tiles = self.tiles_circulo(location, radius_meters)
+        self.atualizar_tiles(camada, tiles, buscar_fn, ttl_dias)
+        return self.lugares_circulo(camada, location, radius_meters)
+
+
+# Instância global
+_repositorio = None
+
+def get_repositorio_places() -> RepositorioPlaces:
+    """Retorna instância única do repositório de lugares"""
+    global _repositorio
+    if _repositorio is None:
+        _repositorio = RepositorioPlaces()
+    return _repositorio
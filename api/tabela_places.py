@@ -0,0 +1,245 @@
+"""
+Representação colunar compacta de lugares da Places API
+Struct-of-arrays construído uma única vez a partir das respostas JSON
+"""
+
+import hashlib
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from processamento.geodesia import haversine_um_para_muitos
+
+
+def _internar(valores: Iterable[Optional[str]], vocabulario: Dict[str, int]) -> np.ndarray:
+    """Converte strings em códigos inteiros, estendendo o vocabulário (-1 = ausente)"""
+    codigos = []
+    for valor in valores:
+        if valor is None:
+            codigos.append(-1)
+        else:
+            codigos.append(vocabulario.setdefault(valor, len(vocabulario)))
+    return np.array(codigos, dtype=np.int32)
+
+
+def _recodificar(codigos: np.ndarray, origem: Sequence[str], destino: Dict[str, int]) -> np.ndarray:
+    """Traduz códigos de um vocabulário para outro (mantendo -1)"""
+    mapa = np.array([destino.setdefault(v, len(destino)) for v in origem] + [-1], dtype=np.int32)
+    return mapa[codigos]
+
+
+@dataclass
+class TabelaPlaces:
+    """
+    Lugares em colunas (um array por atributo)
+
+    Strings repetidas (categoria, tipo principal, tipo de conector) são
+    internadas em vocabulários e guardadas como códigos inteiros. As
+    informações de conectores ficam em matrizes (lugar x tipo de conector).
+    """
+
+    ids: np.ndarray                      # object (str)
+    lat: np.ndarray                      # float64
+    lng: np.ndarray                      # float64
+    distancia_m: np.ndarray              # float32 (NaN sem centro de referência)
+    categoria: np.ndarray                # int32 -> categorias
+    tipo: np.ndarray                     # int32 -> tipos (primaryType ou 1º de types)
+    conectores_total: np.ndarray         # int32
+    conectores_por_tipo: np.ndarray      # int16 (n, len(tipos_conector))
+    kw_por_tipo: np.ndarray              # float32 (n, len(tipos_conector)), NaN sem dado
+    max_kw: np.ndarray                   # float32, NaN sem dado
+    rating: np.ndarray                   # float32, NaN sem avaliação
+    total_avaliacoes: np.ndarray         # int32
+    nome: np.ndarray                     # object (str ou None)
+    endereco: np.ndarray                 # object (str ou None)
+    telefone: np.ndarray                 # object (str ou None)
+    website: np.ndarray                  # object (str ou None)
+    categorias: List[str] = field(default_factory=list)
+    tipos: List[str] = field(default_factory=list)
+    tipos_conector: List[str] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def assinatura(self) -> str:
+        """Hash do conteúdo (versão dos dados para caches entre reruns)"""
+        h = hashlib.sha1()
+        for nome in self.__dataclass_fields__:
+            valor = getattr(self, nome)
+            if isinstance(valor, np.ndarray) and valor.dtype != object:
+                h.update(np.ascontiguousarray(valor).tobytes())
+            else:
+                h.update(repr(valor.tolist() if isinstance(valor, np.ndarray) else valor).encode('utf-8'))
+        return h.hexdigest()
+
+    @classmethod
+    def vazia(cls) -> 'TabelaPlaces':
+        """Tabela sem lugares"""
+        return cls.de_respostas([])
+
+    @classmethod
+    def de_respostas(
+        cls,
+        lugares: List[Dict],
+        categoria: str = '',
+        centro: Optional[Tuple[float, float]] = None
+    ) -> 'TabelaPlaces':
+        """
+        Constrói a tabela a partir dos dicts retornados pela Places API
+
+        Args:
+            lugares: Respostas (com 'id' e 'location')
+            categoria: Rótulo atribuído a todos os lugares (ex: categoria de POI)
+            centro: (lat, lng) para calcular a coluna distancia_m
+        """
+        lugares = [l for l in lugares if 'id' in l and 'location' in l]
+        n = len(lugares)
+
+        vocab_tipos: Dict[str, int] = {}
+        vocab_conectores: Dict[str, int] = {}
+        agregacoes = []
+        tipos_lugar = []
+        for lugar in lugares:
+            tipos_lugar.append(lugar.get('primaryType') or next(iter(lugar.get('types', [])), None))
+            ev_options = lugar.get('evChargeOptions', {})
+            conectores = []
+            for conn in ev_options.get('connectorAggregation', []):
+                tipo_conn = conn.get('type', 'Desconhecido').replace('EV_CONNECTOR_TYPE_', '')
+                conectores.append((
+                    vocab_conectores.setdefault(tipo_conn, len(vocab_conectores)),
+                    conn.get('count', 0),
+                    conn.get('maxChargeRateKw', np.nan)
+                ))
+            agregacoes.append((ev_options.get('connectorCount', 0), conectores))
+
+        conectores_por_tipo = np.zeros((n, len(vocab_conectores)), dtype=np.int16)
+        kw_por_tipo = np.full((n, len(vocab_conectores)), np.nan, dtype=np.float32)
+        conectores_total = np.zeros(n, dtype=np.int32)
+        for k, (total, conectores) in enumerate(agregacoes):
+            conectores_total[k] = total
+            for codigo, quantidade, kw in conectores:
+                conectores_por_tipo[k, codigo] += quantidade
+                kw_por_tipo[k, codigo] = np.fmax(kw_por_tipo[k, codigo], kw)
+
+        if n and len(vocab_conectores):
+            max_kw = np.max(np.nan_to_num(kw_por_tipo, nan=-np.inf), axis=1).astype(np.float32)
+            max_kw[~np.isfinite(max_kw) | (max_kw <= 0)] = np.nan
+        else:
+            max_kw = np.full(n, np.nan, dtype=np.float32)
+
+        lat = np.array([l['location']['latitude'] for l in lugares], dtype=np.float64)
+        lng = np.array([l['location']['longitude'] for l in lugares], dtype=np.float64)
+        if centro is not None and n:
+            distancia_m = haversine_um_para_muitos(centro[0], centro[1], lat, lng).astype(np.float32)
+        else:
+            distancia_m = np.full(n, np.nan, dtype=np.float32)
+
+        def texto(chave, sub=None):
+            valores = [l.get(chave) for l in lugares]
+            if sub:
+                valores = [v.get(sub) if isinstance(v, dict) else None for v in valores]
+            return np.array(valores, dtype=object)
+
+        return cls(
+            ids=np.array([l['id'] for l in lugares], dtype=object),
+            lat=lat,
+            lng=lng,
+            distancia_m=distancia_m,
+            categoria=np.zeros(n, dtype=np.int32),
+            tipo=_internar(tipos_lugar, vocab_tipos),
+            conectores_total=conectores_total,
+            conectores_por_tipo=conectores_por_tipo,
+            kw_por_tipo=kw_por_tipo,
+            max_kw=max_kw,
+            rating=np.array([l.get('rating', np.nan) for l in lugares], dtype=np.float32),
+            total_avaliacoes=np.array([l.get('userRatingCount', 0) for l in lugares], dtype=np.int32),
+            nome=texto('displayName', 'text'),
+            endereco=texto('formattedAddress'),
+            telefone=texto('nationalPhoneNumber'),
+            website=texto('websiteUri'),
+            categorias=[categoria],
+            tipos=list(vocab_tipos),
+            tipos_conector=list(vocab_conectores)
+        )
+
+    @classmethod
+    def concatenar(cls, tabelas: List['TabelaPlaces']) -> 'TabelaPlaces':
+        """Une várias tabelas, unificando os vocabulários"""
+        tabelas = [t for t in tabelas if t is not None]
+        if not tabelas:
+            return cls.vazia()
+
+        vocab_cat: Dict[str, int] = {}
+        vocab_tipos: Dict[str, int] = {}
+        vocab_conn: Dict[str, int] = {}
+        categorias, tipos, mapas_conn = [], [], []
+        for t in tabelas:
+            categorias.append(_recodificar(t.categoria, t.categorias, vocab_cat))
+            tipos.append(_recodificar(t.tipo, t.tipos, vocab_tipos))
+            mapas_conn.append([vocab_conn.setdefault(c, len(vocab_conn)) for c in t.tipos_conector])
+
+        n_conn = len(vocab_conn)
+        conectores_por_tipo, kw_por_tipo = [], []
+        for t, mapa in zip(tabelas, mapas_conn):
+            contagem = np.zeros((len(t), n_conn), dtype=np.int16)
+            kw = np.full((len(t), n_conn), np.nan, dtype=np.float32)
+            if mapa:
+                contagem[:, mapa] = t.conectores_por_tipo
+                kw[:, mapa] = t.kw_por_tipo
+            conectores_por_tipo.append(contagem)
+            kw_por_tipo.append(kw)
+
+        def juntar(atributo):
+            return np.concatenate([getattr(t, atributo) for t in tabelas])
+
+        return cls(
+            ids=juntar('ids'),
+            lat=juntar('lat'),
+            lng=juntar('lng'),
+            distancia_m=juntar('distancia_m'),
+            categoria=np.concatenate(categorias),
+            tipo=np.concatenate(tipos),
+            conectores_total=juntar('conectores_total'),
+            conectores_por_tipo=np.concatenate(conectores_por_tipo),
+            kw_por_tipo=np.concatenate(kw_por_tipo),
+            max_kw=juntar('max_kw'),
+            rating=juntar('rating'),
+            total_avaliacoes=juntar('total_avaliacoes'),
+            nome=juntar('nome'),
+            endereco=juntar('endereco'),
+            telefone=juntar('telefone'),
+            website=juntar('website'),
+            categorias=list(vocab_cat),
+            tipos=list(vocab_tipos),
+            tipos_conector=list(vocab_conn)
+        )
+
+    def subconjunto(self, indices: np.ndarray) -> 'TabelaPlaces':
+        """Seleciona linhas por máscara booleana ou índices (vocabulários preservados)"""
+        colunas = {
+            nome: getattr(self, nome)[indices]
+            for nome in self.__dataclass_fields__
+            if isinstance(getattr(self, nome), np.ndarray)
+        }
+        return TabelaPlaces(
+            **colunas,
+            categorias=self.categorias,
+            tipos=self.tipos,
+            tipos_conector=self.tipos_conector
+        )
+
+    def ordenar_por_distancia(self) -> 'TabelaPlaces':
+        """Tabela ordenada do lugar mais próximo ao mais distante"""
+        return self.subconjunto(np.argsort(self.distancia_m, kind='stable'))
+
+    def rotulos(self, codigos: np.ndarray, vocabulario: List[str], padrao: str = 'Desconhecido') -> np.ndarray:
+        """Converte códigos em strings (vetorizado)"""
+        tabela = np.array(list(vocabulario) + [padrao], dtype=object)
+        return tabela[codigos]
+
+    def conectores(self, k: int) -> List[Tuple[str, int, float]]:
+        """Lista (tipo, quantidade, kW máx.) dos conectores do lugar k"""
+        presentes = np.flatnonzero(self.conectores_por_tipo[k])
+        return [
+            (self.tipos_conector[c], int(self.conectores_por_tipo[k, c]), float(self.kw_por_tipo[k, c]))
+            for c in presentes
+        ]
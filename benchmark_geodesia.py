@@ -0,0 +1,82 @@
+"""Benchmark: Haversine escalar (math, laço Python) x vetorizado (processamento.geodesia) e grade esparsa"""
+
+import math
+import time
+import numpy as np
+from processamento.geodesia import (
+    haversine_um_para_muitos,
+    haversine_em_blocos,
+    mascara_raio
+)
+from processamento.grade import agregar_pois, grade_candidatos
+
+
+def haversine_escalar(lat1, lon1, lat2, lon2):
+    """Versão escalar equivalente à usada antes em PlacesAPINew"""
+    R = 6371000
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    delta_phi = math.radians(lat2 - lat1)
+    delta_lambda = math.radians(lon2 - lon1)
+    a = math.sin(delta_phi / 2.0) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2.0) ** 2
+    return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def cronometrar(funcao, repeticoes=3):
+    """Menor tempo (s) entre algumas repetições"""
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+# Pontos aleatórios em torno de Campinas
+rng = np.random.default_rng(42)
+centro = (-22.9056, -47.0608)
+
+print("Haversine um-para-muitos + filtro de raio (5 km)")
+print(f"{'N':>10} {'escalar (s)':>12} {'vetorizado (s)':>15} {'speedup':>9}")
+for n in (10_000, 100_000, 1_000_000):
+    lats = centro[0] + rng.uniform(-0.2, 0.2, n)
+    lngs = centro[1] + rng.uniform(-0.2, 0.2, n)
+    lats_lista, lngs_lista = lats.tolist(), lngs.tolist()
+
+    t_escalar = cronometrar(
+        lambda: [haversine_escalar(centro[0], centro[1], la, ln) <= 5000 for la, ln in zip(lats_lista, lngs_lista)],
+        repeticoes=1
+    )
+    t_vetor = cronometrar(lambda: mascara_raio(centro[0], centro[1], lats, lngs, 5000))
+
+    # Conferência numérica
+    d_ref = np.array([haversine_escalar(centro[0], centro[1], la, ln) for la, ln in zip(lats_lista[:1000], lngs_lista[:1000])])
+    assert np.allclose(d_ref, haversine_um_para_muitos(centro[0], centro[1], lats[:1000], lngs[:1000]))
+
+    print(f"{n:>10,} {t_escalar:>12.4f} {t_vetor:>15.4f} {t_escalar / t_vetor:>8.1f}x")
+
+print("\nHaversine muitos-para-muitos em blocos (limite de 64 MB)")
+for n, m in ((10_000, 1_000), (100_000, 1_000), (1_000_000, 100)):
+    lats1 = centro[0] + rng.uniform(-0.2, 0.2, n)
+    lngs1 = centro[1] + rng.uniform(-0.2, 0.2, n)
+    lats2 = centro[0] + rng.uniform(-0.2, 0.2, m)
+    lngs2 = centro[1] + rng.uniform(-0.2, 0.2, m)
+
+    def mais_proximo():
+        minimos = np.empty(n)
+        for fatia, bloco in haversine_em_blocos(lats1, lngs1, lats2, lngs2, memoria_max_mb=64):
+            minimos[fatia] = bloco.min(axis=1)
+        return minimos
+
+    t = cronometrar(mais_proximo, repeticoes=1)
+    print(f"{n:>10,} x {m:<6,} {t:>8.3f} s ({n * m / t / 1e6:.1f} M pares/s)")
+
+print("\nGrade esparsa UTM (células de 50 m, POIs espalhados pelo estado de SP)")
+for n in (100_000, 1_000_000):
+    lats = rng.uniform(-25.3, -19.8, n)
+    lngs = rng.uniform(-53.1, -44.2, n)
+    pesos = rng.choice([1.5, 2.0, 3.0], n)
+
+    t = cronometrar(lambda: grade_candidatos(lats, lngs, pesos, tamanho_m=50), repeticoes=1)
+    grade = agregar_pois(lats, lngs, pesos, tamanho_m=50)
+    assert grade.contagem.sum() == n and np.isclose(grade.somas['peso'].sum(), pesos.sum())
+    print(f"{n:>10,} POIs {t:>8.3f} s ({len(grade):,} células ocupadas)")
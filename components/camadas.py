@@ -0,0 +1,196 @@
+"""
+Componente: Camadas em lote para o mapa (GeoJSON e clusters no cliente)
+Cada camada é um único objeto folium, montado a partir de arrays (sem um objeto por linha).
+
+Os dados das camadas (FeatureCollections e linhas de cluster) são objetos
+serializáveis, que os painéis guardam com st.cache_data; os objetos folium
+são criados de novo a cada execução e nunca são compartilhados entre sessões.
+"""
+
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import folium
+from folium.plugins import FastMarkerCluster, VectorGridProtobuf
+from config.settings import TILES_VETORIAIS_URL, TILES_ZOOM_MAX
+
+# Paleta sequencial (amarelo -> vermelho) para estilos guiados por dados
+PALETA_SEQUENCIAL = ['#ffffb2', '#fecc5c', '#fd8d3c', '#f03b20', '#bd0026']
+
+# Estilo de cada camada da pirâmide de tiles vetoriais (processamento/tiles_vetoriais.py)
+ESTILOS_TILES_VETORIAIS = {
+    'eletropostos': {'radius': 4, 'fill': True, 'fillColor': '#2ca02c', 'fillOpacity': 0.9, 'color': '#1a661a', 'weight': 1},
+    'pois': {'radius': 3, 'fill': True, 'fillColor': '#1f77b4', 'fillOpacity': 0.7, 'color': '#1f77b4', 'weight': 0},
+    'celulas': {'fill': True, 'fillColor': '#fd8d3c', 'fillOpacity': 0.25, 'color': '#f03b20', 'weight': 0.5}
+}
+
+
+def cores_por_valor(valores: np.ndarray, paleta: Sequence[str] = PALETA_SEQUENCIAL) -> np.ndarray:
+    """Cor de cada valor pelo quantil (classes de mesma contagem)"""
+    valores = np.asarray(valores, dtype=float)
+    if len(valores) == 0:
+        return np.array([], dtype=object)
+    limites = np.nanquantile(valores, np.linspace(0, 1, len(paleta) + 1)[1:-1])
+    return np.array(paleta, dtype=object)[np.searchsorted(limites, valores, side='right')]
+
+
+def _propriedades(propriedades: Dict[str, np.ndarray], n: int) -> List[Dict]:
+    """Colunas -> lista de dicts (um por feição), com tipos nativos do Python"""
+    colunas = {nome: np.asarray(valores).tolist() for nome, valores in propriedades.items()}
+    return [dict(zip(colunas, linha)) for linha in zip(*colunas.values())] if colunas else [{}] * n
+
+
+def geojson_pontos(
+    lats: np.ndarray,
+    lngs: np.ndarray,
+    propriedades: Dict[str, np.ndarray],
+    cores: Optional[np.ndarray] = None
+) -> Dict:
+    """FeatureCollection de pontos a partir de colunas (cores opcionais na propriedade '_cor')"""
+    if cores is not None:
+        propriedades = {**propriedades, '_cor': cores}
+    coords = np.round(np.column_stack([lngs, lats]).astype(float), 6).tolist()
+    return {
+        'type': 'FeatureCollection',
+        'features': [
+            {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': c}, 'properties': p}
+            for c, p in zip(coords, _propriedades(propriedades, len(coords)))
+        ]
+    }
+
+
+def geojson_poligonos(
+    aneis: np.ndarray,
+    propriedades: Dict[str, np.ndarray],
+    cores: Optional[np.ndarray] = None
+) -> Dict:
+    """
+    FeatureCollection de polígonos
+
+    Args:
+        aneis: Array (n, k, 2) de vértices [lat, lng] (anel aberto)
+        propriedades: Colunas com n valores
+        cores: Cor de cada feição (propriedade '_cor'), opcional
+    """
+    aneis = np.asarray(aneis, dtype=float)
+    if aneis.size == 0:
+        return {'type': 'FeatureCollection', 'features': []}
+    if cores is not None:
+        propriedades = {**propriedades, '_cor': cores}
+    # GeoJSON usa [lng, lat] e anéis fechados
+    fechados = np.concatenate([aneis, aneis[:, :1]], axis=1)[..., ::-1]
+    coords = np.round(fechados, 6).tolist()
+    return {
+        'type': 'FeatureCollection',
+        'features': [
+            {'type': 'Feature', 'geometry': {'type': 'Polygon', 'coordinates': [c]}, 'properties': p}
+            for c, p in zip(coords, _propriedades(propriedades, len(coords)))
+        ]
+    }
+
+
+def camada_poligonos(
+    dados: Dict,
+    nome: str,
+    tooltip: Optional[Dict[str, str]] = None,
+    opacidade: float = 0.35
+) -> folium.GeoJson:
+    """
+    Polígonos numa única camada GeoJSON, com a cor de cada feição na propriedade '_cor'
+
+    Args:
+        dados: FeatureCollection de geojson_poligonos (pode vir do cache)
+        tooltip: {propriedade: rótulo} exibidos ao passar o mouse
+    """
+    return folium.GeoJson(
+        dados,
+        name=nome,
+        style_function=lambda f: {
+            'color': f['properties']['_cor'],
+            'weight': 1,
+            'fillColor': f['properties']['_cor'],
+            'fillOpacity': opacidade
+        },
+        tooltip=folium.GeoJsonTooltip(
+            fields=list(tooltip), aliases=list(tooltip.values())
+        ) if tooltip else None
+    )
+
+
+def camada_pontos(
+    dados: Dict,
+    nome: str,
+    tooltip: Optional[Dict[str, str]] = None,
+    raio: int = 4
+) -> folium.GeoJson:
+    """Pontos de geojson_pontos como círculos numa única camada GeoJSON (cor na propriedade '_cor')"""
+    return folium.GeoJson(
+        dados,
+        name=nome,
+        marker=folium.CircleMarker(radius=raio, fill=True, fill_opacity=0.8, weight=1),
+        style_function=lambda f: {'color': f['properties']['_cor'], 'fillColor': f['properties']['_cor']},
+        tooltip=folium.GeoJsonTooltip(
+            fields=list(tooltip), aliases=list(tooltip.values())
+        ) if tooltip else None
+    )
+
+
+def imagem_superficie(valores: np.ndarray) -> np.ndarray:
+    """Raster (densidade, atraso) -> imagem RGBA (laranja, transparência pelo valor)"""
+    norm = valores / valores.max() if valores.max() > 0 else valores
+    imagem = np.zeros(valores.shape + (4,), dtype=np.uint8)
+    imagem[..., 0] = 255
+    imagem[..., 1] = (140 * (1 - norm)).astype(np.uint8)
+    imagem[..., 3] = (200 * np.sqrt(norm)).astype(np.uint8)
+    return imagem
+
+
+def linhas_cluster(lats: np.ndarray, lngs: np.ndarray, colunas: Sequence[np.ndarray]) -> List[List]:
+    """Linhas [lat, lng, *colunas] dos marcadores agrupados (serializáveis, podem ir para o cache)"""
+    return [
+        list(linha) for linha in zip(
+            np.round(np.asarray(lats, dtype=float), 6).tolist(),
+            np.round(np.asarray(lngs, dtype=float), 6).tolist(),
+            *(np.asarray(c).tolist() for c in colunas)
+        )
+    ]
+
+
+def camada_cluster(linhas: List[List], callback: str, nome: str) -> FastMarkerCluster:
+    """
+    Marcadores agrupados no cliente (Leaflet.markercluster)
+
+    Os dados vão como uma única lista de linhas (linhas_cluster); o
+    `callback` JavaScript recebe cada linha e devolve o marcador.
+    """
+    return FastMarkerCluster(linhas, callback=callback, name=nome)
+
+
+def camada_tiles_vetoriais(
+    url: str = TILES_VETORIAIS_URL,
+    nome: str = "Camada regional (tiles vetoriais)",
+    estilos: Optional[Dict[str, Dict]] = None
+) -> VectorGridProtobuf:
+    """
+    Camadas regionais lidas do endpoint local de tiles vetoriais
+
+    O navegador baixa só os tiles visíveis; acima do zoom máximo exportado
+    os tiles são ampliados (maxNativeZoom).
+    """
+    return VectorGridProtobuf(
+        url.rstrip('/') + '/tiles/{z}/{x}/{y}.pbf',
+        name=nome,
+        options={
+            'vectorTileLayerStyles': estilos or ESTILOS_TILES_VETORIAIS,
+            'maxNativeZoom': TILES_ZOOM_MAX,
+            'interactive': True
+        },
+        show=True
+    )
+
+
+def medir_mapa(mapa: folium.Map) -> Tuple[float, int]:
+    """Tempo (s) de geração do HTML do mapa e tamanho da página (bytes)"""
+    inicio = time.perf_counter()
+    html = mapa.get_root().render()
+    return time.perf_counter() - inicio, len(html.encode('utf-8'))
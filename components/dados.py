@@ -3,70 +3,180 @@ Componente: Visualización de datos con TODA información
 """
 
 import streamlit as st
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from components.camadas import imagem_superficie
+
+# Acima deste número de linhas a tabela é exibida em páginas
+LIMITE_SEM_PAGINACAO = 1000
+TAMANHOS_PAGINA = [100, 500, 1000]
+
+FORMATOS_DOWNLOAD = {
+    'csv': ("CSV", "text/csv"),
+    'parquet': ("Parquet", "application/vnd.apache.parquet")
+}
+
+
+def _coluna_arrow(valores, tipo: pa.DataType, nulos=None) -> pd.arrays.ArrowExtensionArray:
+    """Coluna Arrow anulável (None/NaN ou a máscara `nulos` viram nulos)"""
+    valores = np.asarray(valores)
+    if valores.dtype == object:
+        return pd.arrays.ArrowExtensionArray(pa.array(valores, type=tipo, from_pandas=True))
+    return pd.arrays.ArrowExtensionArray(pa.array(valores, type=tipo, mask=nulos))
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def tabela_eletropostos(versao_dados, _eletropostos) -> pd.DataFrame:
+    """
+    Tabela de exibição com colunas tipadas e anuláveis (Arrow), ordenada pela distância
+
+    A chave do cache é versao_dados (assinatura da TabelaPlaces).
+    """
+    tabela = _eletropostos.ordenar_por_distancia()
+    distancia_km = np.round(tabela.distancia_m / 1000, 2)
+    return pd.DataFrame({
+        'Nome': _coluna_arrow(tabela.nome, pa.string()),
+        'Distância (km)': _coluna_arrow(distancia_km, pa.float32(), np.isnan(distancia_km)),
+        'Endereço': _coluna_arrow(tabela.endereco, pa.string()),
+        'Conectores': _coluna_arrow(tabela.conectores_total, pa.int32()),
+        'Potência Máx (kW)': _coluna_arrow(tabela.max_kw, pa.float32(), np.isnan(tabela.max_kw)),
+        'Avaliação': _coluna_arrow(tabela.rating, pa.float32(), np.isnan(tabela.rating)),
+        'Latitude': _coluna_arrow(tabela.lat, pa.float64()),
+        'Longitude': _coluna_arrow(tabela.lng, pa.float64())
+    })
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def exportar_tabela(versao_dados, formato, _df) -> bytes:
+    """
+    Arquivo de download gerado uma vez por (versao_dados, formato)
+
+    A codificação é feita pelo Arrow em lotes, sem montar uma string Python
+    com o CSV inteiro.
+    """
+    tabela = pa.Table.from_pandas(_df, preserve_index=False)
+    destino = pa.BufferOutputStream()
+    if formato == 'parquet':
+        pq.write_table(tabela, destino, compression='zstd')
+    else:
+        pa_csv.write_csv(tabela, destino)
+    return destino.getvalue().to_pybytes()
+
+
+def _pagina(df: pd.DataFrame, chave: str) -> pd.DataFrame:
+    """Fatia exibida da tabela (paginação só para tabelas grandes)"""
+    total = len(df)
+    if total <= LIMITE_SEM_PAGINACAO:
+        return df
+
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        tamanho = st.selectbox("Linhas por página", TAMANHOS_PAGINA, key=f"{chave}_tamanho")
+    paginas = -(-total // tamanho)
+    with col2:
+        pagina = st.number_input("Página", min_value=1, max_value=paginas, value=1, key=f"{chave}_pagina")
+
+    inicio = (pagina - 1) * tamanho
+    st.caption(f"Linhas {inicio + 1}–{min(inicio + tamanho, total)} de {total}")
+    return df.iloc[inicio:inicio + tamanho]
+
 
 def render_dados_eletropostos(eletropostos):
-    """Renderiza tabela de eletropostos"""
-    
+    """Renderiza tabela de eletropostos (a partir da TabelaPlaces)"""
+
     if not eletropostos:
         st.warning("Nenhum eletroposto encontrado na área.")
         return
-    
-    # Processar dados mais ricos para a tabela
-    dados = []
-    for posto in eletropostos:
-        ev_options = posto.get('evChargeOptions', {})
-        total_conectores = ev_options.get('connectorCount', 0)
-        
-        max_kw = 0
-        for conn in ev_options.get('connectorAggregation', []):
-            kw = conn.get('maxChargeRateKw', 0)
-            if kw > max_kw:
-                max_kw = kw
-                
-        # Converter distância de metros para km
-        distancia_km = posto.get('distancia_centro_m', 0) / 1000
-                
-        dados.append({
-            'Nome': posto.get('displayName', {}).get('text', 'N/A'),
-            'Distância (km)': round(distancia_km, 2),
-            'Endereço': posto.get('formattedAddress', 'N/A'),
-            'Conectores': total_conectores,
-            'Potência Máx (kW)': max_kw if max_kw > 0 else 'N/A',
-            'Avaliação': posto.get('rating', 'N/A'),
-            'Latitude': posto.get('location', {}).get('latitude', 'N/A'),
-            'Longitude': posto.get('location', {}).get('longitude', 'N/A')
-        })
-    
-    # Criar DataFrame e ordenar pela distância (do mais próximo ao mais distante)
-    df = pd.DataFrame(dados)
-    if 'Distância (km)' in df.columns:
-        df = df.sort_values('Distância (km)')
-    
+
+    versao_dados = eletropostos.assinatura()
+    df = tabela_eletropostos(versao_dados, eletropostos)
+
     # Métricas atualizadas
     col1, col2, col3 = st.columns(3)
     with col1:
         st.metric("Total de Postos", len(df))
     with col2:
-        st.metric("Total de Conectores", df[df['Conectores'] != 'N/A']['Conectores'].sum())
+        st.metric("Total de Conectores", int(eletropostos.conectores_total.sum()))
     with col3:
-        postos_rapidos = len(df[pd.to_numeric(df['Potência Máx (kW)'], errors='coerce') >= 50])
+        postos_rapidos = int(np.count_nonzero(np.nan_to_num(eletropostos.max_kw) >= 50))
         st.metric("Postos Rápidos (≥50kW)", postos_rapidos)
-    
+
     st.divider()
-    
+
     # Tabela
     st.dataframe(
-        df,
+        _pagina(df, "tabela_eletropostos"),
+        width='stretch',
+        hide_index=True
+    )
+
+    # Downloads: os arquivos só são gerados quando pedidos (e ficam em cache)
+    if st.toggle("Preparar arquivos para download", key="download_eletropostos"):
+        colunas = st.columns(len(FORMATOS_DOWNLOAD))
+        for coluna, (formato, (rotulo, mime)) in zip(colunas, FORMATOS_DOWNLOAD.items()):
+            with coluna:
+                st.download_button(
+                    label=f"Download {rotulo} Completo",
+                    data=exportar_tabela(versao_dados, formato, df),
+                    file_name=f"eletropostos_detalhados.{formato}",
+                    mime=mime
+                )
+
+
+def render_congestionamento(congestionamento):
+    """Resumo por horário e raster do índice de congestionamento (tráfego / fluxo livre)"""
+
+    if not congestionamento:
+        st.info("Congestionamento ainda não calculado.")
+        return
+
+    resultado, raster = congestionamento
+    resumo = raster.resumo()
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Corredores analisados", len(resultado['origens']))
+    if resumo['Índice médio'].notna().any():
+        pico = resumo.loc[resumo['Índice médio'].idxmax()]
+        with col2:
+            st.metric("Horário mais congestionado", f"{int(pico['Hora'])}h")
+        with col3:
+            st.metric("Índice médio no pico", f"{pico['Índice médio']:.2f}")
+
+    st.dataframe(resumo.round(2), width='stretch', hide_index=True)
+
+    # Atraso relativo por célula (linha 0 do raster é o sul: inverter para a imagem)
+    hora = st.select_slider("Horário", options=raster.horas, key="hora_congestionamento")
+    st.image(
+        np.flipud(imagem_superficie(raster.superficie(hora).valores)),
+        caption=f"Atraso relativo às {hora}h (células de {raster.tamanho_celula_m:.0f} m)",
+        width='stretch'
+    )
+
+
+def render_conectividade(analise, eletropostos):
+    """Componentes e métricas de rede entre os eletropostos"""
+
+    if analise is None or not eletropostos:
+        st.info("Conectividade ainda não calculada (requer o módulo de eletropostos).")
+        return
+
+    tabela = analise.tabela()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Componentes", int(tabela['Componente'].nunique()))
+    with col2:
+        st.metric("Maior componente", int(tabela['Tamanho_Componente'].max()))
+    with col3:
+        tempo = tabela['Tempo_Medio_Vizinhos_s'].median()
+        st.metric("Tempo até os vizinhos (mediana)", f"{tempo / 60:.1f} min" if np.isfinite(tempo) else "—")
+
+    tabela.insert(0, 'Nome', eletropostos.nome)
+    st.dataframe(
+        tabela.sort_values('Acessibilidade', ascending=False).round(4),
         width='stretch',
         hide_index=True
     )
-    
-    # Botão de download
-    csv = df.to_csv(index=False).encode('utf-8')
-    st.download_button(
-        label="Download CSV Completo",
-        data=csv,
-        file_name="eletropostos_detalhados.csv",
-        mime="text/csv"
-    )
\ No newline at end of file
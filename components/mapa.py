@@ -236,12 +236,22 @@
 Componente: Mapa interativo fullscreen con popup enriquecido
 """
 
+import json
+import numpy as np
 import streamlit as st
 import folium
 from streamlit_folium import st_folium
 from config.settings import DEFAULT_ZOOM
+from components.camadas import camada_cluster, camada_tiles_vetoriais, linhas_cluster, medir_mapa
 
-def render_mapa(lat_centro, lng_centro, raio_km, eletropostos=None, tema='claro'):
+def construir_mapa(lat_centro, lng_centro, raio_km, tema, camada_eletropostos=None, tiles_regionais=False):
+    """
+    Monta um mapa novo (círculo, marcadores e camadas)
+    
+    O objeto folium é criado a cada execução e nunca vai para o cache (é
+    mutável e seria compartilhado entre sessões); o trabalho caro, a camada
+    de eletropostos serializada, vem de dados_camada_eletropostos.
+    """
     tiles_config = {
         'claro': 'CartoDB positron',
         'escuro': 'CartoDB dark_matter'
@@ -269,79 +279,146 @@ def render_mapa(lat_centro, lng_centro, raio_km, eletropostos=None, tema='claro'
         popup=f"Raio: {raio_km} km"
     ).add_to(mapa)
     
+    if camada_eletropostos:
+        mapa = adicionar_eletropostos_ao_mapa(mapa, camada_eletropostos)
+    
+    if tiles_regionais:
+        camada_tiles_vetoriais().add_to(mapa)
+        folium.LayerControl(collapsed=True).add_to(mapa)
+    
+    return mapa
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def medicao_mapa(lat_centro, lng_centro, raio_km, tema, versao_dados, tiles_regionais, _mapa):
+    """Tempo de geração e tamanho do HTML, medidos uma vez por conteúdo do mapa"""
+    return medir_mapa(_mapa)
+
+def render_mapa(lat_centro, lng_centro, raio_km, eletropostos=None, tema='claro', tiles_regionais=False):
+    versao_dados = eletropostos.assinatura() if eletropostos else None
+    camada = dados_camada_eletropostos(versao_dados, eletropostos) if eletropostos else None
+    mapa = construir_mapa(
+        lat_centro, lng_centro, raio_km, tema,
+        camada_eletropostos=camada, tiles_regionais=tiles_regionais
+    )
+    
     if eletropostos:
-        mapa = adicionar_eletropostos_ao_mapa(mapa, eletropostos)
+        tempo_render, tamanho_html = medicao_mapa(
+            lat_centro, lng_centro, raio_km, tema, versao_dados, tiles_regionais, mapa
+        )
+        st.caption(
+            f"Mapa: {len(eletropostos)} eletropostos · HTML {tamanho_html / 1024:.0f} KB gerado em {tempo_render:.2f} s"
+        )
     
+    # A chave fixa mantém o mesmo componente entre reruns (sem recriar o iframe)
     map_data = st_folium(
         mapa,
         width=None,
         height=700,
-        returned_objects=["last_clicked"]
+        returned_objects=["last_clicked"],
+        key="mapa_eletropostos"
     )
     return map_data
 
-def adicionar_eletropostos_ao_mapa(mapa, eletropostos):
-    for i, posto in enumerate(eletropostos, 1):
-        if 'location' in posto:
-            lat = posto['location']['latitude']
-            lng = posto['location']['longitude']
-            nome = posto.get('displayName', {}).get('text', f'Eletroposto {i}')
-            endereco = posto.get('formattedAddress', 'Endereço não disponível')
-            distancia = posto.get('distancia_centro_m', 0) / 1000 # Converter a km
-            
-            rating = posto.get('rating', 'N/A')
-            user_ratings = posto.get('userRatingCount', 0)
-            telefone = posto.get('nationalPhoneNumber', 'N/A')
-            website = posto.get('websiteUri', '#')
-            
-            ev_info = ""
-            ev_options = posto.get('evChargeOptions', {})
-            conector_total = ev_options.get('connectorCount', 0)
-            conectores_detalhes = ev_options.get('connectorAggregation', [])
-            
-            if conector_total > 0:
-                ev_info += f"<p style='margin: 5px 0; font-size: 12px;'><b>🔌 Conectores ({conector_total}):</b><br>"
-                for conn in conectores_detalhes:
-                    tipo = conn.get('type', 'Desconhecido').replace('EV_CONNECTOR_TYPE_', '')
-                    count = conn.get('count', 0)
-                    kw = conn.get('maxChargeRateKw', 'N/A')
-                    ev_info += f"- {count}x {tipo} (Max: {kw}kW)<br>"
-                ev_info += "</p>"
-            else:
-                ev_info += "<p style='margin: 5px 0; font-size: 12px; color: #d32f2f;'>Sem detalhes de conectores.</p>"
-
-            estrelas = f"⭐ {rating} ({user_ratings} avaliações)" if rating != 'N/A' else "Sem avaliações"
-
-            popup_html = f"""
-            <div style="font-family: Arial, sans-serif; width: 280px;">
-                <h4 style="margin: 0 0 8px 0; color: #1565c0; border-bottom: 1px solid #ccc; padding-bottom: 5px;">{nome}</h4>
-                <p style="margin: 0 0 10px 0; font-size: 13px; font-weight: bold; color: #e65100;">
-                    {estrelas}
-                </p>
-                <p style="margin: 5px 0; font-size: 12px;">
-                    <b>📍 Endereço:</b><br>{endereco}
-                </p>                
-                <p style="margin: 5px 0; font-size: 12px;">
-                    <b>📞 Contato:</b> {telefone}
-                </p>
-                <div style="background-color: #f1f8e9; padding: 8px; border-radius: 5px; margin: 10px 0;">
-                    {ev_info}
-                </div>
-                <p style="margin: 5px 0; font-size: 12px; color: #d84315;">
-                    <b>Distância do centro:</b> {distancia:.2f} km
-                </p>
-                <div style="display: flex; justify-content: space-between; align-items: center;">
-                    <span style="font-size: 10px; color: #666;">{lat:.5f}, {lng:.5f}</span>
-                    <a href="{website}" target="_blank" style="font-size: 12px; color: #fff; background-color: #1565c0; padding: 4px 8px; text-decoration: none; border-radius: 4px;">Web</a>
-                </div>
-            </div>
-            """
-            
-            folium.Marker(
-                [lat, lng],
-                popup=folium.Popup(popup_html, max_width=300),
-                tooltip=nome,
-                icon=folium.Icon(color='green', icon='bolt', prefix='fa')
-            ).add_to(mapa)
-            
-    return mapa
\ No newline at end of file
+_JS_CALLBACK_ELETROPOSTOS = """
+(function () {
+    var t = %TABELA%;
+    var ESCAPES = {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'};
+    function esc(v) { return String(v).replace(/[&<>"']/g, function (c) { return ESCAPES[c]; }); }
+    function nome(k) { return t.nome[k] || ('Eletroposto ' + (k + 1)); }
+
+    function popup(k) {
+        var ev_info;
+        if (t.conectores_total[k] > 0) {
+            ev_info = "<p style='margin: 5px 0; font-size: 12px;'><b>🔌 Conectores (" + t.conectores_total[k] + "):</b><br>";
+            t.conectores[k].forEach(function (qtd, c) {
+                if (qtd > 0) {
+                    var kw = t.kw[k][c] === null ? 'N/A' : t.kw[k][c];
+                    ev_info += "- " + qtd + "x " + esc(t.tipos_conector[c]) + " (Max: " + kw + "kW)<br>";
+                }
+            });
+            ev_info += "</p>";
+        } else {
+            ev_info = "<p style='margin: 5px 0; font-size: 12px; color: #d32f2f;'>Sem detalhes de conectores.</p>";
+        }
+        var estrelas = t.rating[k] === null ? 'Sem avaliações'
+            : '⭐ ' + t.rating[k] + ' (' + t.total_avaliacoes[k] + ' avaliações)';
+
+        return '<div style="font-family: Arial, sans-serif; width: 280px;">' +
+            '<h4 style="margin: 0 0 8px 0; color: #1565c0; border-bottom: 1px solid #ccc; padding-bottom: 5px;">' + esc(nome(k)) + '</h4>' +
+            '<p style="margin: 0 0 10px 0; font-size: 13px; font-weight: bold; color: #e65100;">' + estrelas + '</p>' +
+            '<p style="margin: 5px 0; font-size: 12px;"><b>📍 Endereço:</b><br>' + esc(t.endereco[k] || 'Endereço não disponível') + '</p>' +
+            '<p style="margin: 5px 0; font-size: 12px;"><b>📞 Contato:</b> ' + esc(t.telefone[k] || 'N/A') + '</p>' +
+            '<div style="background-color: #f1f8e9; padding: 8px; border-radius: 5px; margin: 10px 0;">' + ev_info + '</div>' +
+            '<p style="margin: 5px 0; font-size: 12px; color: #d84315;"><b>Distância do centro:</b> ' +
+                (t.distancia_km[k] === null ? 'N/A' : t.distancia_km[k].toFixed(2) + ' km') + '</p>' +
+            '<div style="display: flex; justify-content: space-between; align-items: center;">' +
+                '<span style="font-size: 10px; color: #666;">' + t.lat[k].toFixed(5) + ', ' + t.lng[k].toFixed(5) + '</span>' +
+                '<a href="' + esc(t.website[k] || '#') + '" target="_blank" style="font-size: 12px; color: #fff; background-color: #1565c0; padding: 4px 8px; text-decoration: none; border-radius: 4px;">Web</a>' +
+            '</div>' +
+        '</div>';
+    }
+
+    return function (row) {
+        var k = row[2];
+        var icone = L.AwesomeMarkers.icon({icon: 'bolt', prefix: 'fa', markerColor: 'green'});
+        var marcador = L.marker(new L.LatLng(row[0], row[1]), {icon: icone});
+        marcador.bindTooltip(esc(nome(k)));
+        marcador.bindPopup(function () { return popup(k); }, {maxWidth: 300});
+        return marcador;
+    };
+})()
+"""
+
+def _sem_nan(valores, casas=None):
+    """Array numérico -> lista JSON (NaN vira null)"""
+    valores = np.asarray(valores, dtype=float)
+    if casas is not None:
+        valores = np.round(valores, casas)
+    return np.where(np.isnan(valores), None, valores).tolist()
+
+def tabela_popup_eletropostos(eletropostos):
+    """Atributos dos popups em colunas (um array JSON por campo, não um HTML por posto)"""
+    return {
+        'lat': np.round(eletropostos.lat, 6).tolist(),
+        'lng': np.round(eletropostos.lng, 6).tolist(),
+        'nome': eletropostos.nome.tolist(),
+        'endereco': eletropostos.endereco.tolist(),
+        'telefone': eletropostos.telefone.tolist(),
+        'website': eletropostos.website.tolist(),
+        'distancia_km': _sem_nan(eletropostos.distancia_m / 1000, 2),
+        'rating': _sem_nan(eletropostos.rating, 1),
+        'total_avaliacoes': eletropostos.total_avaliacoes.tolist(),
+        'conectores_total': eletropostos.conectores_total.tolist(),
+        'conectores': eletropostos.conectores_por_tipo.tolist(),
+        'kw': _sem_nan(eletropostos.kw_por_tipo, 1),
+        'tipos_conector': list(eletropostos.tipos_conector)
+    }
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def dados_camada_eletropostos(versao_dados, _eletropostos):
+    """
+    Camada de eletropostos serializada (linhas do cluster e callback com a tabela dos popups)
+    
+    Calculada uma vez por conteúdo (chave: versao_dados, a assinatura da
+    TabelaPlaces); st.cache_data devolve uma cópia a cada sessão.
+    """
+    tabela = json.dumps(tabela_popup_eletropostos(_eletropostos), ensure_ascii=False).replace('</', '<\\/')
+    return {
+        'linhas': linhas_cluster(_eletropostos.lat, _eletropostos.lng, [np.arange(len(_eletropostos))]),
+        'callback': _JS_CALLBACK_ELETROPOSTOS.replace('%TABELA%', tabela)
+    }
+
+def adicionar_eletropostos_ao_mapa(mapa, camada_eletropostos):
+    """
+    Adiciona os eletropostos (dados_camada_eletropostos) ao mapa numa única camada agrupada
+    
+    A página leva só a tabela compacta de atributos; o HTML de cada popup é
+    montado no navegador quando o marcador é clicado.
+    """
+    camada_cluster(
+        camada_eletropostos['linhas'],
+        callback=camada_eletropostos['callback'],
+        nome="Eletropostos"
+    ).add_to(mapa)
+    
+    return mapa
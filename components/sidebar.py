@@ -50,6 +50,14 @@ def render_sidebar():
             'conectividade': st.checkbox("Conectividade", value=False)
         }
         
+        # Pirâmide exportada por processamento/tiles_vetoriais.py
+        st.subheader("Camadas")
+        tiles_regionais = st.checkbox(
+            "Camada regional (tiles vetoriais)",
+            value=False,
+            help="Requer `python -m processamento.tiles_vetoriais servir` em execução"
+        )
+        
         # Botão de coleta
         st.divider()
         btn_coletar = st.button("Coletar dados", type="primary", use_container_width=True)
@@ -59,5 +67,6 @@ def render_sidebar():
             'lng_centro': lng_centro,
             'raio_km': raio_km,
             'modulos': modulos,
+            'tiles_regionais': tiles_regionais,
             'btn_coletar': btn_coletar
         }
\ No newline at end of file
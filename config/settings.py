@@ -30,6 +30,15 @@ if not GOOGLE_MAPS_API_KEY:
 CACHE_ENABLED = True
 CACHE_TTL_DAYS = 7  # Tempo de vida do cache em dias
 
+# Cache da Places API (New): lugares mudam pouco, então o TTL é mais longo
+PLACES_CACHE_TTL_DAYS = 30
+PLACES_CACHE_PRECISAO = 4  # Casas decimais do centro da busca (~11 m)
+
+# Repositório local de lugares (tiles geohash em dados/places.sqlite)
+REPOSITORIO_PLACES_TTL_DAYS = 30     # Idade máxima de um tile antes de ser rebuscado
+REPOSITORIO_GEOHASH_PRECISAO = 5     # Tiles de ~4,9 x 4,9 km
+REPOSITORIO_GEOHASH_PRECISAO_MAX = 6 # Subdivisão de tiles saturados (~1,2 x 0,6 km)
+
 # Configurações de área padrão (Campinas, SP)
 DEFAULT_CENTER = {
     'lat': -22.9056,
@@ -57,12 +66,132 @@ POI_TYPES = [
     'store'
 ]
 
+# Categorias de POIs geradores de viagem (Google Places API Types) e seus pesos
+CATEGORIAS_POIS = {
+    "Varejo & Lazer": {
+        "types": ["shopping_mall", "supermarket", "restaurant", "cafe"],
+        "color": "blue",
+        "icon": "shopping-cart",
+        "peso": 3
+    },
+    "Transporte": {
+        "types": ["bus_station", "subway_station", "transit_station"],
+        "color": "red",
+        "icon": "bus",
+        "peso": 2
+    },
+    "Serviços & Saúde": {
+        "types": ["hospital", "bank", "university"],
+        "color": "purple",
+        "icon": "heart", 
+        "peso": 1.5
+    }
+}
+
+# Região Metropolitana de Campinas (polígono aproximado, vértices em (lat, lng))
+REGIAO_CAMPINAS_POLIGONO = [
+    (-22.45, -47.35),
+    (-22.50, -46.95),
+    (-22.70, -46.75),
+    (-22.98, -46.78),
+    (-23.20, -46.92),
+    (-23.25, -47.25),
+    (-23.05, -47.50),
+    (-22.75, -47.55)
+]
+
+# Varredura regional (processamento/varredura.py)
+VARREDURA_MAX_WORKERS = 4               # Tiles processados em paralelo
+VARREDURA_REQUISICOES_POR_SEGUNDO = 5.0 # Limite de chamadas à Places API
+
+# Modelo gravitacional de demanda (processamento/gravidade.py)
+GRAVIDADE_MODELO_DECAIMENTO = 'potencia'  # 'potencia', 'exponencial' ou 'corte'
+GRAVIDADE_BETA = 2.0                      # Expoente do decaimento potência
+GRAVIDADE_CUSTO_MIN_M = 100.0             # Distância mínima (evita singularidade em d=0)
+GRAVIDADE_ESCALA_M = 1000.0               # Distância característica do decaimento exponencial
+GRAVIDADE_RAIO_CORTE_M = 5000.0           # POIs além disso não contribuem
+GRAVIDADE_VELOCIDADE_REF_KMH = 30.0       # Converte tempo de viagem em distância equivalente
+GRAVIDADE_MAX_ELEMENTOS_REDE = 2500       # Limite de pares origem-destino na Distance Matrix
+
+# Superfície de densidade (processamento/densidade.py)
+DENSIDADE_TAMANHO_CELULA_M = 25.0         # Resolução do raster
+DENSIDADE_LARGURA_M = 300.0               # Largura de banda do kernel
+DENSIDADE_TOP_K = 20                      # Máximos locais usados como candidatos
+
+# Agregação espacial (processamento/agregacao.py)
+AGREGACAO_TAMANHO_BASE_M = 100.0          # Lado da célula do nível 0 (nível k: base * 2^k)
+
+# Tiles vetoriais das camadas regionais (processamento/tiles_vetoriais.py)
+TILES_VETORIAIS_ARQUIVO = DADOS_DIR / 'regiao.mbtiles'
+TILES_VETORIAIS_PORTA = 8765
+TILES_VETORIAIS_URL = os.getenv('TILES_VETORIAIS_URL', f'http://127.0.0.1:{TILES_VETORIAIS_PORTA}')
+TILES_CAMADAS_DIR = DADOS_DIR / 'camadas'  # GeoJSON das camadas 3D, servido em /camadas/{arquivo}
+TILES_ZOOM_MIN = 8
+TILES_ZOOM_MAX = 16
+
 # Configurações de tráfego
 TRAFFIC_PERIODS = [7, 9, 12, 14, 18, 20, 22]  # Horas do dia para análise
 
+# Índice de congestionamento (processamento/congestionamento.py)
+CONGESTIONAMENTO_DIA_SEMANA = 1            # Partidas na próxima terça-feira (0 = segunda)
+CONGESTIONAMENTO_ESPACAMENTO_M = 1000.0    # Distância entre nós dos corredores da grade
+CONGESTIONAMENTO_TAMANHO_CELULA_M = 250.0  # Lado da célula do raster
+CONGESTIONAMENTO_MAX_PARES = 60            # Corredores por análise (cada um custa 1 elemento por horário)
+CONGESTIONAMENTO_USD_POR_MIL = 10.0        # Preço de tabela da Distance Matrix com tráfego (1000 elementos)
+CONGESTIONAMENTO_MAX_WORKERS = 4           # Requisições simultâneas à Distance Matrix API
+
+# Atribuição de fluxos de veículos (processamento/fluxo_veiculos.py)
+FLUXO_TAMANHO_LOTE = 500_000              # Viagens lidas por lote da tabela O-D
+FLUXO_INCREMENTOS = (0.4, 0.3, 0.2, 0.1)  # Frações da demanda na atribuição incremental
+FLUXO_BPR_ALFA = 0.15                     # Função de atraso BPR: t0 * (1 + alfa * (v/c)^beta)
+FLUXO_BPR_BETA = 4.0
+FLUXO_DIST_MAX_NO_M = 500.0               # Origem/destino mais longe que isso de um nó não é atribuído
+FLUXO_PRECISAO_DIRECTIONS = 3             # Casas decimais que agrupam O-D numa mesma rota (~110 m)
+FLUXO_MAX_ROTAS_DIRECTIONS = 500          # Rotas buscadas na Directions API (pares com mais viagens)
+FLUXO_RAIO_PASSAGEM_M = 150.0             # Vias consideradas "em frente" ao candidato
+
+# Métricas de rede dos candidatos (processamento/conectividade.py)
+CONECTIVIDADE_TEMPO_MAX_S = 1800.0        # Alcance das métricas (nós além disso não contam)
+CONECTIVIDADE_K_VIZINHOS = 5              # Vizinhos alcançáveis usados no tempo médio
+CONECTIVIDADE_K_ARESTAS = 8               # Arestas por nó no grafo em linha reta
+CONECTIVIDADE_FATOR_DESVIO = 1.3          # Distância de rede / distância em linha reta
+CONECTIVIDADE_ESCALA_S = 600.0            # Decaimento exponencial da acessibilidade
+CONECTIVIDADE_AMOSTRAS = 256              # Origens sorteadas na intermediação aproximada
+CONECTIVIDADE_PESO_RANKING = 0.3          # Peso da acessibilidade no score final dos candidatos
+
+# Localização de eletropostos (processamento/otimizacao.py)
+OTIMIZACAO_TEMPO_COBERTURA_S = 600.0      # Demanda coberta: a até 10 min de um eletroposto
+OTIMIZACAO_TEMPO_MAX_S = 1200.0           # Pares além disso não são guardados (custo = este tempo)
+OTIMIZACAO_MAX_TROCAS = 200               # Limite de trocas da busca local
+
+# Isócronas (processamento/isocronas.py)
+ISOCRONAS_TEMPOS_S = (300, 600, 900)      # Limites das isócronas (5/10/15 min)
+ISOCRONAS_RAIOS = 16                      # Direções amostradas por local (vértices dos polígonos)
+ISOCRONAS_MAX_ELEMENTOS = 160             # Elementos da Distance Matrix por local (a 1ª rodada usa raios x (limites + 1))
+ISOCRONAS_TOLERANCIA_M = 150.0            # Intervalos de cruzamento mais estreitos não são refinados
+ISOCRONAS_MAX_RODADAS = 8                 # Rodadas de consultas (1 de anéis + refinamentos)
+ISOCRONAS_MAX_WORKERS = 4                 # Requisições simultâneas à Distance Matrix API
+
+# Varredura de cenários (processamento/cenarios.py)
+CENARIOS_ESTACOES = 20                    # Novas estações por cenário (orçamento)
+CENARIOS_MAX_ESTACOES = 200               # Limite do guloso ao buscar a meta de cobertura
+CENARIOS_META_COBERTURA = 0.8             # Fração das sessões a cobrir no custo da meta
+CENARIOS_CUSTO_ESTACAO = 250_000.0        # Custo de implantação de um eletroposto (R$)
+CENARIOS_MAX_PROCESSOS = 4                # Processos da varredura (1 = sem pool)
+CENARIOS_POR_TAREFA = 32                  # Cenários avaliados juntos (broadcast) em cada tarefa
+
 # Parâmetros para estimativa de VEs
 EV_ADOPTION_RATE = 0.02  # 2% do parque vehicular (ajustável)
 
+# Demanda de recarga por célula (processamento/demanda.py)
+DEMANDA_VEICULOS_POR_HABITANTE = 0.6      # Frota estimada quando só há população
+DEMANDA_VIAGENS_POR_VEICULO_DIA = 2.0     # Viagens diárias rateadas entre as células pela atratividade
+DEMANDA_PROB_RECARGA = {                  # Sessões de recarga por VE exposto por dia, por fonte
+    'residente': 0.08,
+    'destino': 0.02,
+    'passagem': 0.004
+}
+
 # Configurações do Streamlit
 STREAMLIT_CONFIG = {
     'page_title': 'Exploração APIs Google',
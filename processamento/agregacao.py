@@ -0,0 +1,417 @@
+"""
+Agregação espacial de pontos por células hierárquicas
+Serve para qualquer conjunto de pontos (POIs, eletropostos, pontos de GPS
+ajustados às vias, demanda): os pontos são projetados em UTM, a célula base
+recebe um código Z-order (Morton) e o pai de uma célula é o código deslocado
+2 bits (lado dobrado). As reduções (contagem, somas, médias e centroide
+ponderado) são feitas com np.bincount sobre arrays alinhados por célula.
+
+Agregados parciais (de lotes ou de processos) são somados com `combinar`,
+e agregados de conjuntos diferentes são unidos pelo ID da célula com `juntar`.
+
+É o único motor de células do projeto: a grade de candidatos
+(processamento/grade.py), o índice de vizinhança da gravidade e a demanda
+por célula usam os mesmos IDs.
+"""
+
+from dataclasses import dataclass, field, replace
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+from processamento.geodesia import desprojetar_utm, projetar_utm, zona_utm
+from config.settings import AGREGACAO_TAMANHO_BASE_M, DEFAULT_CENTER
+
+_MASCARAS_MORTON = (
+    (16, 0x0000FFFF0000FFFF),
+    (8, 0x00FF00FF00FF00FF),
+    (4, 0x0F0F0F0F0F0F0F0F),
+    (2, 0x3333333333333333),
+    (1, 0x5555555555555555),
+)
+
+
+def _espalhar_bits(x: np.ndarray) -> np.ndarray:
+    """Intercala zeros entre os bits de inteiros de até 31 bits"""
+    x = np.asarray(x, dtype=np.uint64) & np.uint64(0xFFFFFFFF)
+    for desloc, mascara in _MASCARAS_MORTON:
+        x = (x | (x << np.uint64(desloc))) & np.uint64(mascara)
+    return x
+
+
+def morton_codificar(i: np.ndarray, j: np.ndarray) -> np.ndarray:
+    """Código Z-order (int64) das células (i = linha, j = coluna), i e j >= 0"""
+    return ((_espalhar_bits(i) << np.uint64(1)) | _espalhar_bits(j)).astype(np.int64)
+
+
+def morton_decodificar(codigos: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Recupera (i, j) a partir dos códigos Z-order"""
+    codigos = np.asarray(codigos, dtype=np.int64).astype(np.uint64)
+    return (
+        _juntar_bits(codigos >> np.uint64(1)).astype(np.int64),
+        _juntar_bits(codigos).astype(np.int64)
+    )
+
+
+def _juntar_bits(x: np.ndarray) -> np.ndarray:
+    """Extrai os bits de posição par (inverso de _espalhar_bits)"""
+    x = x & np.uint64(0x5555555555555555)
+    x = (x | (x >> np.uint64(1))) & np.uint64(0x3333333333333333)
+    x = (x | (x >> np.uint64(2))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    x = (x | (x >> np.uint64(4))) & np.uint64(0x00FF00FF00FF00FF)
+    x = (x | (x >> np.uint64(8))) & np.uint64(0x0000FFFF0000FFFF)
+    x = (x | (x >> np.uint64(16))) & np.uint64(0x00000000FFFFFFFF)
+    return x
+
+
+def _agrupar(ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    IDs únicos ordenados e a posição de cada entrada entre eles
+
+    Equivale a np.unique(return_inverse=True), mas agrupa por hash
+    (pd.factorize) e só ordena os IDs únicos.
+    """
+    inverso, unicos = pd.factorize(ids, sort=False)
+    ordem = np.argsort(unicos, kind='stable')
+    posicao = np.empty(len(ordem), dtype=np.int64)
+    posicao[ordem] = np.arange(len(ordem))
+    return np.asarray(unicos, dtype=np.int64)[ordem], posicao[inverso]
+
+
+def cantos_celulas(
+    ids: np.ndarray,
+    tamanho_m: Union[float, np.ndarray],
+    zona: int,
+    sul: bool
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vértices (lats, lngs), cada um (n, 4), das células no sentido anti-horário
+
+    `tamanho_m` é o lado das células: um valor para todas ou um por célula
+    (grades de resolução mista).
+    """
+    i, j = morton_decodificar(ids)
+    tamanho = np.broadcast_to(np.asarray(tamanho_m, dtype=float), i.shape)[:, None]
+    x = (j[:, None] + np.array([0, 1, 1, 0])) * tamanho
+    y = (i[:, None] + np.array([0, 0, 1, 1])) * tamanho
+    return desprojetar_utm(x, y, zona, sul)
+
+
+@dataclass(frozen=True)
+class IndiceCelulas:
+    """
+    Índice hierárquico de células quadradas no plano UTM
+
+    O nível k tem células de tamanho_base_m * 2^k. O ID de uma célula é o
+    código Morton dos seus índices (linha, coluna) naquele nível; o mesmo ID
+    em níveis diferentes designa células diferentes, por isso os agregados
+    guardam o nível junto dos IDs.
+    """
+    tamanho_base_m: float = AGREGACAO_TAMANHO_BASE_M
+    zona: int = zona_utm(DEFAULT_CENTER['lng'])
+    sul: bool = DEFAULT_CENTER['lat'] < 0
+
+    @classmethod
+    def para_pontos(cls, lats: np.ndarray, lngs: np.ndarray, tamanho_base_m: float = AGREGACAO_TAMANHO_BASE_M):
+        """Índice na zona UTM da longitude média dos pontos"""
+        lats = np.asarray(lats, dtype=float)
+        lngs = np.asarray(lngs, dtype=float)
+        if len(lats) == 0:
+            return cls(tamanho_base_m=tamanho_base_m)
+        return cls(tamanho_base_m=tamanho_base_m, zona=zona_utm(float(lngs.mean())), sul=bool(lats.mean() < 0))
+
+    def tamanho_m(self, nivel: int = 0) -> float:
+        """Lado da célula no nível"""
+        return self.tamanho_base_m * (1 << nivel)
+
+    def projetar(self, lats: np.ndarray, lngs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Coordenadas UTM (x, y) dos pontos"""
+        return projetar_utm(np.asarray(lats, dtype=float), np.asarray(lngs, dtype=float), self.zona, self.sul)
+
+    def celulas_xy(self, x: np.ndarray, y: np.ndarray, nivel: int = 0) -> np.ndarray:
+        """IDs (int64) das células de pontos já projetados"""
+        tamanho = self.tamanho_m(nivel)
+        # Coordenadas UTM são positivas na zona (falso leste e falso norte)
+        return morton_codificar(
+            np.floor(np.asarray(y) / tamanho).astype(np.int64),
+            np.floor(np.asarray(x) / tamanho).astype(np.int64)
+        )
+
+    def celulas(self, lats: np.ndarray, lngs: np.ndarray, nivel: int = 0) -> np.ndarray:
+        """IDs (int64) das células que contêm os pontos"""
+        return self.celulas_xy(*self.projetar(lats, lngs), nivel=nivel)
+
+    @staticmethod
+    def pais(ids: np.ndarray, niveis: int = 1) -> np.ndarray:
+        """IDs das células `niveis` acima"""
+        return np.asarray(ids, dtype=np.int64) >> (2 * niveis)
+
+    def centros(self, ids: np.ndarray, nivel: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+        """Centros (lats, lngs) das células"""
+        i, j = morton_decodificar(ids)
+        tamanho = self.tamanho_m(nivel)
+        return desprojetar_utm((j + 0.5) * tamanho, (i + 0.5) * tamanho, self.zona, self.sul)
+
+    def cantos(self, ids: np.ndarray, nivel: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+        """Vértices (lats, lngs), cada um (n, 4), das células no sentido anti-horário"""
+        return cantos_celulas(ids, self.tamanho_m(nivel), self.zona, self.sul)
+
+
+@dataclass
+class Agregado:
+    """
+    Agregados das células ocupadas de um conjunto de pontos (arrays alinhados por célula)
+
+    Só guarda somas, de modo que agregados parciais se combinam somando e as
+    médias e centroides saem no final. O centroide é ponderado por `peso`
+    (sem pesos, todos valem 1).
+    """
+    indice: IndiceCelulas
+    nivel: int
+    ids: np.ndarray                      # int64, ordenados
+    contagem: np.ndarray                 # int64
+    soma_peso: np.ndarray                # float64
+    soma_x: np.ndarray                   # Σ peso · x (UTM)
+    soma_y: np.ndarray                   # Σ peso · y (UTM)
+    somas: Dict[str, np.ndarray] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def vazio(cls, indice: IndiceCelulas, nivel: int = 0, campos: Iterable[str] = ()) -> 'Agregado':
+        zeros = np.zeros(0)
+        return cls(
+            indice, nivel, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64),
+            zeros, zeros, zeros, {campo: zeros for campo in campos}
+        )
+
+    @classmethod
+    def de_pontos(
+        cls,
+        indice: IndiceCelulas,
+        lats: np.ndarray,
+        lngs: np.ndarray,
+        valores: Optional[Mapping[str, np.ndarray]] = None,
+        pesos: Optional[np.ndarray] = None,
+        nivel: int = 0
+    ) -> 'Agregado':
+        """
+        Agrega os pontos nas células do nível
+
+        Args:
+            indice: Índice de células (zona UTM e tamanho base)
+            lats, lngs: Coordenadas dos pontos
+            valores: {campo: array} somados por célula (NaN conta como 0)
+            pesos: Peso de cada ponto no centroide (padrão: 1)
+            nivel: Nível das células
+        """
+        lats = np.asarray(lats, dtype=float)
+        valores = dict(valores or {})
+        if len(lats) == 0:
+            return cls.vazio(indice, nivel, valores)
+
+        pesos = np.ones(len(lats)) if pesos is None else np.asarray(pesos, dtype=float)
+        x, y = indice.projetar(lats, lngs)
+        ids, inverso = _agrupar(indice.celulas_xy(x, y, nivel))
+        n = len(ids)
+        return cls(
+            indice=indice,
+            nivel=nivel,
+            ids=ids,
+            contagem=np.bincount(inverso, minlength=n).astype(np.int64),
+            soma_peso=np.bincount(inverso, weights=pesos, minlength=n),
+            soma_x=np.bincount(inverso, weights=pesos * x, minlength=n),
+            soma_y=np.bincount(inverso, weights=pesos * y, minlength=n),
+            somas={
+                campo: np.bincount(inverso, weights=np.nan_to_num(np.asarray(v, dtype=float)), minlength=n)
+                for campo, v in valores.items()
+            }
+        )
+
+    @classmethod
+    def combinar(cls, partes: Iterable['Agregado']) -> 'Agregado':
+        """
+        Soma agregados parciais do mesmo índice, nível e campos
+
+        Uma única passada de np.unique + np.bincount sobre as partes
+        concatenadas; a ordem das partes não altera o resultado.
+        """
+        partes = list(partes)
+        if not partes:
+            raise ValueError("Nenhum agregado para combinar")
+        primeiro = partes[0]
+        for parte in partes[1:]:
+            if parte.indice != primeiro.indice or parte.nivel != primeiro.nivel:
+                raise ValueError("Agregados com índices ou níveis diferentes")
+            if parte.somas.keys() != primeiro.somas.keys():
+                raise ValueError("Agregados com campos diferentes")
+        if len(partes) == 1:
+            return primeiro
+
+        ids, inverso = _agrupar(np.concatenate([p.ids for p in partes]))
+        n = len(ids)
+
+        def somar(arrays: List[np.ndarray]) -> np.ndarray:
+            return np.bincount(inverso, weights=np.concatenate(arrays), minlength=n)
+
+        return cls(
+            indice=primeiro.indice,
+            nivel=primeiro.nivel,
+            ids=ids,
+            contagem=somar([p.contagem for p in partes]).astype(np.int64),
+            soma_peso=somar([p.soma_peso for p in partes]),
+            soma_x=somar([p.soma_x for p in partes]),
+            soma_y=somar([p.soma_y for p in partes]),
+            somas={campo: somar([p.somas[campo] for p in partes]) for campo in primeiro.somas}
+        )
+
+    def __add__(self, outro: 'Agregado') -> 'Agregado':
+        return Agregado.combinar([self, outro])
+
+    def _reagrupar(self, ids: np.ndarray, indice: IndiceCelulas, nivel: int) -> 'Agregado':
+        """Soma os agregados das células que passam a ter o mesmo ID"""
+        ids, inverso = _agrupar(ids)
+        n = len(ids)
+        return Agregado(
+            indice, nivel, ids,
+            np.bincount(inverso, weights=self.contagem, minlength=n).astype(np.int64),
+            np.bincount(inverso, weights=self.soma_peso, minlength=n),
+            np.bincount(inverso, weights=self.soma_x, minlength=n),
+            np.bincount(inverso, weights=self.soma_y, minlength=n),
+            {campo: np.bincount(inverso, weights=v, minlength=n) for campo, v in self.somas.items()}
+        )
+
+    def subir(self, niveis: int = 1) -> 'Agregado':
+        """Agregado no nível `niveis` acima (células de lado 2^niveis vezes maior)"""
+        if niveis == 0:
+            return self
+        # Os 4 filhos de uma célula têm o mesmo código deslocado: somá-los dá o pai
+        return self._reagrupar(IndiceCelulas.pais(self.ids, niveis), self.indice, self.nivel + niveis)
+
+    def ampliar(self, fator: int) -> 'Agregado':
+        """
+        Agregado em células `fator` vezes maiores, para qualquer fator inteiro
+
+        Divide os índices (linha, coluna) pelo fator. O resultado fica no
+        nível 0 de um índice com célula base tamanho_m(nivel) * fator.
+        Potências de 2 dão as mesmas células de subir(), com outra numeração de nível.
+        """
+        i, j = morton_decodificar(self.ids)
+        indice = replace(self.indice, tamanho_base_m=self.indice.tamanho_m(self.nivel) * fator)
+        return self._reagrupar(morton_codificar(i // fator, j // fator), indice, 0)
+
+    def selecionar(self, mascara: np.ndarray) -> 'Agregado':
+        """Subconjunto das células (máscara booleana ou posições)"""
+        return Agregado(
+            self.indice, self.nivel, self.ids[mascara], self.contagem[mascara],
+            self.soma_peso[mascara], self.soma_x[mascara], self.soma_y[mascara],
+            {campo: v[mascara] for campo, v in self.somas.items()}
+        )
+
+    def media(self, campo: str) -> np.ndarray:
+        """Média do campo por ponto da célula"""
+        return self.somas[campo] / self.contagem
+
+    def centroides(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Centroide ponderado (lats, lngs) de cada célula (centro da célula se o peso total é 0)"""
+        cx, cy = self.indice.centros(self.ids, self.nivel)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            x = self.soma_x / self.soma_peso
+            y = self.soma_y / self.soma_peso
+        lat, lng = desprojetar_utm(np.nan_to_num(x), np.nan_to_num(y), self.indice.zona, self.indice.sul)
+        vazio = self.soma_peso == 0
+        return np.where(vazio, cx, lat), np.where(vazio, cy, lng)
+
+    def tabela(self) -> pd.DataFrame:
+        """Uma linha por célula: ID, centroide, contagem, peso, somas e médias"""
+        lat_c, lng_c = self.centroides() if len(self) else (np.zeros(0), np.zeros(0))
+        colunas = {
+            'cell_id': self.ids,
+            'Nivel': self.nivel,
+            'Lat_Centroide': lat_c,
+            'Lng_Centroide': lng_c,
+            'Qtd': self.contagem,
+            'Peso': self.soma_peso
+        }
+        for campo, soma in self.somas.items():
+            colunas[f'{campo}_soma'] = soma
+            colunas[f'{campo}_media'] = soma / np.maximum(self.contagem, 1)
+        return pd.DataFrame(colunas)
+
+
+def agregar_lotes(
+    indice: IndiceCelulas,
+    lotes: Iterable[pd.DataFrame],
+    coluna_lat: str = 'Lat',
+    coluna_lng: str = 'Lng',
+    campos: Iterable[str] = (),
+    coluna_peso: Optional[str] = None,
+    nivel: int = 0,
+    combinar_a_cada: int = 16
+) -> Agregado:
+    """
+    Agrega uma tabela lida em lotes (ex.: pd.read_csv com chunksize)
+
+    As partes são combinadas a cada `combinar_a_cada` lotes, então a memória
+    fica limitada ao número de células ocupadas, não ao de pontos.
+    """
+    campos = list(campos)
+    partes: List[Agregado] = []
+    for lote in lotes:
+        partes.append(Agregado.de_pontos(
+            indice,
+            lote[coluna_lat].to_numpy(), lote[coluna_lng].to_numpy(),
+            valores={campo: lote[campo].to_numpy() for campo in campos},
+            pesos=lote[coluna_peso].to_numpy() if coluna_peso else None,
+            nivel=nivel
+        ))
+        if len(partes) >= combinar_a_cada:
+            partes = [Agregado.combinar(partes)]
+    if not partes:
+        return Agregado.vazio(indice, nivel, campos)
+    return Agregado.combinar(partes)
+
+
+def juntar(agregados: Mapping[str, Agregado], como: str = 'outer') -> pd.DataFrame:
+    """
+    Une agregados de conjuntos diferentes pelo ID da célula
+
+    Args:
+        agregados: {nome: Agregado}, todos no mesmo índice e nível
+        como: 'outer' (qualquer célula ocupada) ou 'inner' (células ocupadas em todos)
+
+    Returns:
+        DataFrame com cell_id, centro da célula e, por conjunto, colunas
+        `{nome}_qtd`, `{nome}_peso` e `{nome}_{campo}` (somas; 0 onde o conjunto não tem pontos)
+    """
+    if not agregados:
+        return pd.DataFrame()
+    lista = list(agregados.values())
+    indice, nivel = lista[0].indice, lista[0].nivel
+    if any(a.indice != indice or a.nivel != nivel for a in lista):
+        raise ValueError("Agregados com índices ou níveis diferentes")
+
+    if como == 'inner':
+        ids = lista[0].ids
+        for a in lista[1:]:
+            ids = np.intersect1d(ids, a.ids, assume_unique=True)
+    elif como == 'outer':
+        ids = np.unique(np.concatenate([a.ids for a in lista]))
+    else:
+        raise ValueError(f"Junção desconhecida: {como}")
+
+    lat_c, lng_c = indice.centros(ids, nivel)
+    colunas = {'cell_id': ids, 'Lat_Centro': lat_c, 'Lng_Centro': lng_c}
+    for nome, a in agregados.items():
+        # IDs ordenados: posição de cada célula no agregado por busca binária
+        pos = np.minimum(np.searchsorted(a.ids, ids), max(len(a.ids) - 1, 0))
+        presente = a.ids[pos] == ids if len(a.ids) else np.zeros(len(ids), dtype=bool)
+
+        def alinhar(valores: np.ndarray) -> np.ndarray:
+            return np.where(presente, valores[pos], 0) if len(valores) else np.zeros(len(ids))
+
+        colunas[f'{nome}_qtd'] = alinhar(a.contagem).astype(np.int64)
+        colunas[f'{nome}_peso'] = alinhar(a.soma_peso)
+        for campo, soma in a.somas.items():
+            colunas[f'{nome}_{campo}'] = alinhar(soma)
+    return pd.DataFrame(colunas)
@@ -0,0 +1,420 @@
+"""
+Varredura de cenários de implantação
+Combina taxas de adoção (EV_ADOPTION_RATE), raios de cobertura, pesos das
+categorias de CATEGORIAS_POIS e tamanhos de grade, e compara cobertura e custo.
+
+Por tamanho de grade, as células de demanda, os candidatos e os pares
+demanda-candidato (tempos até o maior raio) são calculados uma única vez e
+ficam em cache. Os cenários de uma grade são avaliados juntos: a demanda sai
+de estimar_demanda com um eixo de cenários e o guloso de máxima cobertura
+escolhe, a cada passo, uma estação por cenário com arrays (cenário, candidato).
+Lotes de cenários podem ser distribuídos num pool de processos.
+
+Execução (fora do Streamlit):
+    python -m processamento.cenarios --pois pois.csv --taxas 0.01 0.02 0.05 \\
+        --raios 300 600 900 --grades 200 400 --saida cenarios.csv
+"""
+
+import argparse
+import json
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from processamento.agregacao import Agregado, IndiceCelulas
+from processamento.demanda import celulas_demanda, estimar_demanda
+from processamento.fluxo_veiculos import FluxosSegmentos
+from processamento.otimizacao import ProblemaLocalizacao, incluir_existentes
+from config.settings import (
+    CATEGORIAS_POIS,
+    CENARIOS_CUSTO_ESTACAO,
+    CENARIOS_ESTACOES,
+    CENARIOS_MAX_ESTACOES,
+    CENARIOS_MAX_PROCESSOS,
+    CENARIOS_META_COBERTURA,
+    CENARIOS_POR_TAREFA,
+    EV_ADOPTION_RATE,
+    OTIMIZACAO_TEMPO_COBERTURA_S
+)
+
+COLUNAS_PARAMETROS = ['Taxa_Adocao', 'Raio_Cobertura_s', 'Pesos', 'Tamanho_Grid_m']
+
+
+def pesos_padrao(categorias=CATEGORIAS_POIS) -> Dict[str, float]:
+    """Peso atual de cada categoria de POI ({categoria: peso})"""
+    return {nome: float(dados['peso']) for nome, dados in categorias.items()}
+
+
+def grade_cenarios(
+    taxas_adocao: Sequence[float] = (EV_ADOPTION_RATE,),
+    raios_cobertura_s: Sequence[float] = (OTIMIZACAO_TEMPO_COBERTURA_S,),
+    pesos_categorias: Optional[Mapping[str, Mapping[str, float]]] = None,
+    tamanhos_grid_m: Sequence[float] = (200.0,)
+) -> pd.DataFrame:
+    """
+    Todas as combinações dos parâmetros, uma linha por cenário
+
+    Args:
+        pesos_categorias: {nome do conjunto: {categoria: peso}}; categorias
+            ausentes mantêm o peso de CATEGORIAS_POIS (padrão: só os pesos atuais)
+    """
+    pesos_categorias = pesos_categorias or {'padrão': pesos_padrao()}
+    return pd.MultiIndex.from_product(
+        [list(taxas_adocao), list(raios_cobertura_s), list(pesos_categorias), list(tamanhos_grid_m)],
+        names=COLUNAS_PARAMETROS
+    ).to_frame(index=False)
+
+
+# --- DADOS POR GRADE ---
+@dataclass
+class GradeCenarios:
+    """Dados de um tamanho de grade compartilhados por todos os cenários"""
+
+    tamanho_grid_m: float
+    celulas: pd.DataFrame               # Células de demanda (saída de celulas_demanda)
+    pois_categoria: np.ndarray          # (n_celulas, n_categorias) POIs de cada categoria
+    categorias: List[str]
+    candidatos: pd.DataFrame            # Centroides das células com POIs + existentes no final
+    fixas: np.ndarray                   # Índices dos existentes em candidatos
+    problema: ProblemaLocalizacao       # Pares até tempo_max_s (pesos = 1), ordenados por candidato
+    # Cópia contígua dos pares ordenados por (demanda, tempo): os pares da demanda d
+    # a até r segundos são [inicio_demanda[d], searchsorted(chave_demanda, d + r / escala))
+    candidato_demanda: np.ndarray
+    chave_demanda: np.ndarray           # demanda + tempo / escala_tempo
+    inicio_demanda: np.ndarray
+    escala_tempo: float
+
+    def fim_demanda(self, demandas: np.ndarray, raios_s: np.ndarray) -> np.ndarray:
+        """Fim dos pares de cada demanda com tempo <= raio"""
+        return np.searchsorted(self.chave_demanda, demandas + raios_s / self.escala_tempo, side='right')
+
+    @classmethod
+    def preparar(
+        cls,
+        pois: pd.DataFrame,
+        tamanho_grid_m: float,
+        tempo_max_s: float,
+        populacao: Optional[pd.DataFrame] = None,
+        fluxos: Optional[FluxosSegmentos] = None,
+        eletropostos=None,
+        categorias: Sequence[str] = tuple(CATEGORIAS_POIS)
+    ) -> 'GradeCenarios':
+        lats, lngs = pois['Lat'].to_numpy(dtype=float), pois['Lng'].to_numpy(dtype=float)
+        indice = IndiceCelulas.para_pontos(lats, lngs, tamanho_base_m=tamanho_grid_m)
+        celulas = celulas_demanda(indice, pois, populacao, fluxos)
+
+        categorias = list(categorias)
+        categoria_poi = pois['Categoria'].astype(str).to_numpy()
+        agregado = Agregado.de_pontos(
+            indice, lats, lngs,
+            valores={nome: (categoria_poi == nome).astype(float) for nome in categorias},
+            pesos=pois['Peso'].to_numpy(dtype=float)
+        )
+        pois_categoria = np.zeros((len(celulas), len(categorias)))
+        posicao = np.searchsorted(celulas['cell_id'].to_numpy(), agregado.ids)
+        for c, nome in enumerate(categorias):
+            pois_categoria[posicao, c] = agregado.somas[nome]
+
+        lat_c, lng_c = agregado.centroides()
+        candidatos, fixas = incluir_existentes(
+            pd.DataFrame({'cell_id': agregado.ids, 'Lat_Centroide': lat_c, 'Lng_Centroide': lng_c}),
+            eletropostos
+        )
+        problema = ProblemaLocalizacao.de_coordenadas(
+            celulas['Lat_Centro'].to_numpy(), celulas['Lng_Centro'].to_numpy(), np.ones(len(celulas)),
+            candidatos['Lat_Centroide'].to_numpy(), candidatos['Lng_Centroide'].to_numpy(),
+            tempo_max_s=tempo_max_s
+        )
+        escala_tempo = float(problema.tempo_max_s) * (1 + 1e-9) + 1e-9
+        chave = problema.demanda + problema.tempo / escala_tempo
+        ordem = np.argsort(chave)
+        chave = chave[ordem]
+        return cls(
+            tamanho_grid_m, celulas, pois_categoria, categorias, candidatos, fixas, problema,
+            candidato_demanda=problema.candidato[ordem],
+            chave_demanda=chave,
+            inicio_demanda=np.searchsorted(chave, np.arange(len(celulas) + 1)),
+            escala_tempo=escala_tempo
+        )
+
+
+def _expandir(inicio: np.ndarray, fim: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Índices de todos os intervalos [inicio, fim) concatenados e o intervalo de cada um"""
+    n = fim - inicio
+    intervalo = np.repeat(np.arange(len(n)), n)
+    return np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n) + inicio[intervalo], intervalo
+
+
+def cobertura_gulosa(
+    grade: GradeCenarios,
+    pesos: np.ndarray,
+    raios_s: np.ndarray,
+    max_estacoes: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Guloso de máxima cobertura para vários cenários ao mesmo tempo
+
+    Cada cenário tem seus pesos de demanda e seu raio (em segundos) sobre os
+    mesmos pares. Os existentes entram abertos; depois, a cada passo, cada
+    cenário abre o candidato de maior demanda ainda descoberta, e a demanda
+    recém-coberta é descontada do ganho de todos os candidatos que a alcançam
+    (cada demanda é descontada uma vez por cenário).
+
+    Args:
+        pesos: (n_cenarios, n_celulas)
+        raios_s: (n_cenarios,)
+
+    Returns:
+        (cobertura acumulada (n_cenarios, max_estacoes + 1), com a coluna 0 só
+        com os existentes; candidatos abertos em cada passo (n_cenarios, max_estacoes))
+    """
+    p = grade.problema
+    n_cenarios, n_demanda = pesos.shape
+    n_cand = p.n_candidatos
+    raios_s = np.asarray(raios_s, dtype=float)
+
+    # Ganho inicial: uma matriz esparsa candidato x demanda por raio, aplicada a todos os cenários do raio
+    ganho = np.zeros((n_cenarios, n_cand))
+    for raio in np.unique(raios_s):
+        do_raio = raios_s == raio
+        alcanca = p.tempo <= raio
+        # Pares já ordenados por candidato: as linhas saem direto das contagens
+        linhas = np.r_[0, np.cumsum(np.bincount(p.candidato[alcanca], minlength=n_cand))]
+        matriz = csr_matrix((np.ones(linhas[-1]), p.demanda[alcanca], linhas), shape=(n_cand, n_demanda))
+        ganho[do_raio] = (matriz @ pesos[do_raio].T).T
+
+    coberta = np.zeros((n_cenarios, n_demanda), dtype=bool)
+    aberta = np.zeros((n_cenarios, n_cand), dtype=bool)
+    peso_coberto = np.zeros(n_cenarios)
+
+    def abrir(cenarios: np.ndarray, candidatos: np.ndarray):
+        aberta[cenarios, candidatos] = True
+        par, k = _expandir(p.inicio[candidatos], p.inicio[candidatos + 1])
+        s, dem = cenarios[k], p.demanda[par]
+        nova = (p.tempo[par] <= raios_s[s]) & ~coberta[s, dem]
+        chave = np.unique(s[nova] * n_demanda + dem[nova])
+        s, dem = chave // n_demanda, chave % n_demanda
+        coberta[s, dem] = True
+        peso_coberto[:] += np.bincount(s, weights=pesos[s, dem], minlength=n_cenarios)
+
+        # Só os pares da demanda dentro do raio do cenário (contíguos na ordem por demanda)
+        par, k = _expandir(grade.inicio_demanda[dem], grade.fim_demanda(dem, raios_s[s]))
+        ganho[:] -= np.bincount(
+            s[k] * n_cand + grade.candidato_demanda[par],
+            weights=np.repeat(pesos[s, dem], np.bincount(k, minlength=len(dem))),
+            minlength=n_cenarios * n_cand
+        ).reshape(n_cenarios, n_cand)
+
+    if len(grade.fixas):
+        abrir(np.repeat(np.arange(n_cenarios), len(grade.fixas)), np.tile(grade.fixas, n_cenarios))
+
+    cobertura = np.zeros((n_cenarios, max_estacoes + 1))
+    abertas = np.full((n_cenarios, max_estacoes), -1, dtype=np.int64)
+    total = np.maximum(pesos.sum(axis=1), 1e-12)
+    cobertura[:, 0] = peso_coberto / total
+    for passo in range(max_estacoes):
+        disponivel = np.where(aberta, -np.inf, ganho)
+        escolha = disponivel.argmax(axis=1)
+        util = disponivel[np.arange(n_cenarios), escolha] > 1e-12 * total
+        if not util.any():
+            cobertura[:, passo + 1:] = cobertura[:, [passo]]
+            break
+        abrir(np.flatnonzero(util), escolha[util])
+        abertas[util, passo] = escolha[util]
+        cobertura[:, passo + 1] = peso_coberto / total
+    return cobertura, abertas
+
+
+def _avaliar_lote(
+    grade: GradeCenarios,
+    lote: pd.DataFrame,
+    pesos_categorias: Mapping[str, Mapping[str, float]],
+    n_estacoes: int,
+    max_estacoes: int,
+    meta_cobertura: float,
+    custo_estacao: float,
+    frota_total: Optional[float]
+) -> Tuple[pd.DataFrame, np.ndarray]:
+    """Cenários de uma mesma grade avaliados juntos (broadcast no eixo de cenários)"""
+    padrao = pesos_padrao()
+    pesos_cat = np.array([
+        [{**padrao, **pesos_categorias[nome]}.get(cat, 0.0) for cat in grade.categorias]
+        for nome in lote['Pesos']
+    ])
+    demanda = estimar_demanda(
+        grade.celulas,
+        taxas_adocao=lote['Taxa_Adocao'].to_numpy(dtype=float),
+        frota_total=frota_total,
+        atratividade=pesos_cat @ grade.pois_categoria.T
+    )
+    sessoes = demanda.sessoes_dia
+    cobertura, abertas = cobertura_gulosa(
+        grade, sessoes, lote['Raio_Cobertura_s'].to_numpy(dtype=float), max_estacoes
+    )
+
+    total = sessoes.sum(axis=1)
+    na_meta = cobertura >= meta_cobertura
+    estacoes_meta = np.where(na_meta.any(axis=1), na_meta.argmax(axis=1), np.nan)
+    custo_meta = estacoes_meta * custo_estacao
+    orcamento = min(n_estacoes, max_estacoes)
+    # Com toda a demanda alcançável já coberta, o guloso para antes do orçamento
+    estacoes = (abertas[:, :orcamento] >= 0).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sessoes_meta = total * cobertura[np.arange(len(lote)), np.nan_to_num(estacoes_meta).astype(np.int64)]
+        tabela = lote.assign(
+            Candidatos=len(grade.candidatos) - len(grade.fixas),
+            Sessoes_Dia=total,
+            Cobertura_Existentes=cobertura[:, 0],
+            Estacoes=estacoes,
+            Cobertura=cobertura[:, orcamento],
+            Sessoes_Cobertas=total * cobertura[:, orcamento],
+            Custo=estacoes * custo_estacao,
+            Estacoes_Meta=estacoes_meta,
+            Custo_Meta=custo_meta,
+            Custo_por_Sessao_Dia=np.where(sessoes_meta > 0, custo_meta / sessoes_meta, np.nan)
+        )
+    return tabela, cobertura
+
+
+# Grades de cada processo do pool: enviadas uma vez por processo, não a cada lote
+_GRADES_PROCESSO: Dict[float, GradeCenarios] = {}
+
+
+def _iniciar_processo(grades: Dict[float, GradeCenarios]):
+    _GRADES_PROCESSO.update(grades)
+
+
+def _avaliar_lote_processo(tamanho_grid_m: float, *args) -> Tuple[pd.DataFrame, np.ndarray]:
+    return _avaliar_lote(_GRADES_PROCESSO[tamanho_grid_m], *args)
+
+
+# --- VARREDURA ---
+@dataclass
+class ResultadoCenarios:
+    """Tabela comparativa (uma linha por cenário) e curvas de cobertura por número de estações"""
+
+    tabela: pd.DataFrame
+    curvas: np.ndarray          # (n_cenarios, max_estacoes + 1), mesma ordem da tabela
+
+
+@dataclass
+class DadosCenarios:
+    """
+    Entradas compartilhadas pelos cenários, com cache por tamanho de grade
+
+    pois precisa de Lat, Lng, Categoria e Peso (saída de buscar_pois).
+    Sem população, frota_total é a frota cujas viagens são rateadas pelos POIs.
+    """
+
+    pois: pd.DataFrame
+    populacao: Optional[pd.DataFrame] = None
+    fluxos: Optional[FluxosSegmentos] = None
+    eletropostos: object = None
+    frota_total: Optional[float] = None
+    _grades: Dict[float, GradeCenarios] = field(default_factory=dict, repr=False)
+
+    def grade(self, tamanho_grid_m: float, tempo_max_s: float) -> GradeCenarios:
+        """Grade do tamanho, reaproveitada enquanto seus pares alcançarem tempo_max_s"""
+        grade = self._grades.get(tamanho_grid_m)
+        if grade is None or grade.problema.tempo_max_s < tempo_max_s:
+            grade = GradeCenarios.preparar(
+                self.pois, tamanho_grid_m, tempo_max_s, self.populacao, self.fluxos, self.eletropostos
+            )
+            self._grades[tamanho_grid_m] = grade
+        return grade
+
+    def avaliar(
+        self,
+        cenarios: pd.DataFrame,
+        pesos_categorias: Optional[Mapping[str, Mapping[str, float]]] = None,
+        n_estacoes: int = CENARIOS_ESTACOES,
+        max_estacoes: int = CENARIOS_MAX_ESTACOES,
+        meta_cobertura: float = CENARIOS_META_COBERTURA,
+        custo_estacao: float = CENARIOS_CUSTO_ESTACAO,
+        processos: int = CENARIOS_MAX_PROCESSOS,
+        cenarios_por_tarefa: int = CENARIOS_POR_TAREFA
+    ) -> ResultadoCenarios:
+        """
+        Avalia os cenários (saída de grade_cenarios)
+
+        Returns:
+            ResultadoCenarios; na tabela, além dos parâmetros: Sessoes_Dia,
+            Cobertura_Existentes; Estacoes (até `n_estacoes` novas, menos se a
+            demanda alcançável acaba antes), Cobertura, Sessoes_Cobertas e
+            Custo; Estacoes_Meta, Custo_Meta e Custo_por_Sessao_Dia para
+            atingir `meta_cobertura` (NaN se não atingida com max_estacoes)
+        """
+        pesos_categorias = pesos_categorias or {'padrão': pesos_padrao()}
+        desconhecidos = set(cenarios['Pesos']) - set(pesos_categorias)
+        if desconhecidos:
+            raise ValueError(f"Conjuntos de pesos não informados: {sorted(desconhecidos)}")
+        max_estacoes = max(max_estacoes, n_estacoes)
+        cenarios = cenarios.reset_index(drop=True)
+
+        grades, tarefas = {}, []
+        for tamanho, grupo in cenarios.groupby('Tamanho_Grid_m', sort=False):
+            grades[tamanho] = self.grade(tamanho, float(grupo['Raio_Cobertura_s'].max()))
+            for inicio in range(0, len(grupo), cenarios_por_tarefa):
+                lote = grupo.iloc[inicio:inicio + cenarios_por_tarefa]
+                tarefas.append((
+                    tamanho, lote, pesos_categorias, n_estacoes, max_estacoes,
+                    meta_cobertura, custo_estacao, self.frota_total
+                ))
+        print(f"→ Cenários: {len(cenarios)} em {len(tarefas)} lotes ({len(grades)} grades)")
+
+        if processos > 1 and len(tarefas) > 1:
+            # Cada processo recebe as grades (pares incluídos) uma única vez, no início
+            with ProcessPoolExecutor(
+                max_workers=min(processos, len(tarefas)),
+                initializer=_iniciar_processo, initargs=(grades,)
+            ) as executor:
+                resultados = list(executor.map(_avaliar_lote_processo, *zip(*tarefas)))
+        else:
+            resultados = [_avaliar_lote(grades[tarefa[0]], *tarefa[1:]) for tarefa in tarefas]
+
+        tabela = pd.concat([r[0] for r in resultados])
+        ordem = tabela.index.to_numpy()
+        curvas = np.zeros((len(cenarios), max_estacoes + 1))
+        curvas[ordem] = np.concatenate([r[1] for r in resultados])
+        print(f"✓ Cenários: cobertura de {tabela['Cobertura'].min():.0%} a {tabela['Cobertura'].max():.0%} "
+              f"com {min(n_estacoes, max_estacoes)} estações")
+        return ResultadoCenarios(tabela.sort_index(), curvas)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Ponto de entrada da linha de comando"""
+    parser = argparse.ArgumentParser(description="Varredura de cenários de implantação de eletropostos")
+    parser.add_argument('--pois', type=Path, required=True, help="CSV com Lat, Lng, Categoria e Peso")
+    parser.add_argument('--populacao', type=Path, help="CSV com Lat, Lng e Populacao")
+    parser.add_argument('--frota', type=float, help="Frota total (necessária sem --populacao)")
+    parser.add_argument('--taxas', type=float, nargs='+', default=[EV_ADOPTION_RATE])
+    parser.add_argument('--raios', type=float, nargs='+', default=[OTIMIZACAO_TEMPO_COBERTURA_S],
+                        help="Raios de cobertura em segundos")
+    parser.add_argument('--grades', type=float, nargs='+', default=[200.0], help="Tamanhos de grade em metros")
+    parser.add_argument('--pesos', type=Path, help="JSON {conjunto: {categoria: peso}}")
+    parser.add_argument('--estacoes', type=int, default=CENARIOS_ESTACOES)
+    parser.add_argument('--meta', type=float, default=CENARIOS_META_COBERTURA)
+    parser.add_argument('--processos', type=int, default=CENARIOS_MAX_PROCESSOS)
+    parser.add_argument('--saida', type=Path, default=Path('cenarios.csv'))
+    args = parser.parse_args(argv)
+
+    pesos_categorias = json.loads(args.pesos.read_text(encoding='utf-8')) if args.pesos else None
+    dados = DadosCenarios(
+        pois=pd.read_csv(args.pois),
+        populacao=pd.read_csv(args.populacao) if args.populacao else None,
+        frota_total=args.frota
+    )
+    resultado = dados.avaliar(
+        grade_cenarios(args.taxas, args.raios, pesos_categorias, args.grades),
+        pesos_categorias, n_estacoes=args.estacoes, meta_cobertura=args.meta, processos=args.processos
+    )
+    resultado.tabela.to_csv(args.saida, index=False)
+    print(f"✓ {len(resultado.tabela)} cenários gravados em {args.saida}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,314 @@
+"""
+Métricas de rede sobre grafos esparsos de tempos de viagem
+Componentes conexas, vizinhos alcançáveis mais próximos, proximidade e
+acessibilidade por nó e intermediação aproximada por amostragem de origens.
+
+O grafo vem de uma matriz de custos (ex: Distance Matrix, em cache) ou, para
+redes grandes de candidatos, dos k vizinhos em linha reta com um fator de
+desvio. Os caminhos mínimos são calculados em blocos de origens
+(scipy.sparse.csgraph), com memória limitada.
+"""
+
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components, dijkstra
+from scipy.spatial import cKDTree
+from processamento.fluxo_veiculos import acumular_arvore
+from processamento.geodesia import projetar_utm, zona_utm
+from processamento.gravidade import decaimento
+from config.settings import (
+    CONECTIVIDADE_AMOSTRAS,
+    CONECTIVIDADE_ESCALA_S,
+    CONECTIVIDADE_FATOR_DESVIO,
+    CONECTIVIDADE_K_ARESTAS,
+    CONECTIVIDADE_K_VIZINHOS,
+    CONECTIVIDADE_PESO_RANKING,
+    CONECTIVIDADE_TEMPO_MAX_S,
+    GRAVIDADE_VELOCIDADE_REF_KMH
+)
+
+# Tempo mínimo de uma aresta (o csgraph ignora pesos zero)
+_TEMPO_MIN_S = 1e-3
+
+
+@dataclass
+class GrafoTempos:
+    """Grafo dirigido de tempos de viagem (segundos) entre n nós"""
+
+    n: int
+    origem: np.ndarray   # int64
+    destino: np.ndarray  # int64
+    tempo: np.ndarray    # float64
+
+    @classmethod
+    def de_arestas(cls, n: int, origem, destino, tempo) -> 'GrafoTempos':
+        """Grafo a partir de arestas soltas (laços removidos, paralelas reduzidas ao menor tempo)"""
+        origem = np.asarray(origem, dtype=np.int64)
+        destino = np.asarray(destino, dtype=np.int64)
+        tempo = np.asarray(tempo, dtype=float)
+        valida = (origem != destino) & np.isfinite(tempo)
+        origem, destino, tempo = origem[valida], destino[valida], tempo[valida]
+
+        chaves = origem * n + destino
+        ordem = np.lexsort((tempo, chaves))
+        primeira = np.r_[True, chaves[ordem][1:] != chaves[ordem][:-1]]
+        ordem = ordem[primeira]
+        return cls(n, origem[ordem], destino[ordem], np.maximum(tempo[ordem], _TEMPO_MIN_S))
+
+    @classmethod
+    def de_matriz(cls, custos: np.ndarray, tempo_max_s: Optional[float] = None) -> 'GrafoTempos':
+        """
+        Grafo a partir de uma matriz (n, n) de tempos
+
+        NaN (sem rota) não vira aresta; com `tempo_max_s`, só os pares até
+        esse tempo são mantidos (o grafo fica esparso e os caminhos longos
+        passam por nós intermediários).
+        """
+        custos = np.asarray(custos, dtype=float)
+        manter = np.isfinite(custos)
+        if tempo_max_s is not None:
+            manter &= custos <= tempo_max_s
+        origem, destino = np.nonzero(manter)
+        return cls.de_arestas(len(custos), origem, destino, custos[origem, destino])
+
+    @classmethod
+    def de_vizinhos(
+        cls,
+        lats: np.ndarray,
+        lngs: np.ndarray,
+        k: int = CONECTIVIDADE_K_ARESTAS,
+        velocidade_kmh: float = GRAVIDADE_VELOCIDADE_REF_KMH,
+        fator_desvio: float = CONECTIVIDADE_FATOR_DESVIO
+    ) -> 'GrafoTempos':
+        """
+        Grafo dos k vizinhos em linha reta (nos dois sentidos)
+
+        Tempo da aresta = distância UTM · fator_desvio / velocidade. Aproxima
+        a rede viária sem chamadas à API, para milhares de nós.
+        """
+        lats = np.asarray(lats, dtype=float)
+        lngs = np.asarray(lngs, dtype=float)
+        n = len(lats)
+        if n < 2:
+            return cls(n, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0))
+
+        x, y = projetar_utm(lats, lngs, zona_utm(float(lngs.mean())), bool(lats.mean() < 0))
+        distancias, vizinhos = cKDTree(np.column_stack([x, y])).query(np.column_stack([x, y]), k=min(k, n - 1) + 1)
+        origem = np.repeat(np.arange(n), distancias.shape[1])
+        destino = vizinhos.ravel()
+        tempo = distancias.ravel() * fator_desvio / (velocidade_kmh / 3.6)
+        return cls.de_arestas(
+            n,
+            np.concatenate([origem, destino]),
+            np.concatenate([destino, origem]),
+            np.concatenate([tempo, tempo])
+        )
+
+    def matriz(self) -> csr_matrix:
+        """Matriz de adjacência esparsa (n, n)"""
+        return csr_matrix((self.tempo, (self.origem, self.destino)), shape=(self.n, self.n))
+
+
+def _origens_por_bloco(n: int, memoria_max_mb: float) -> int:
+    # Uma matriz float64 (bloco, n) de tempos e algumas temporárias do mesmo tamanho
+    return max(1, int(memoria_max_mb * 1024 * 1024 // (4 * 8 * max(n, 1))))
+
+
+def componentes(grafo: GrafoTempos, conexao: str = 'strong') -> Tuple[int, np.ndarray]:
+    """
+    Componentes conexas
+
+    Args:
+        conexao: 'strong' (ida e volta) ou 'weak' (ignorando o sentido)
+
+    Returns:
+        (número de componentes, rótulo de cada nó)
+    """
+    return connected_components(grafo.matriz(), directed=True, connection=conexao)
+
+
+@dataclass
+class AnaliseRede:
+    """Métricas por nó (arrays alinhados pelos nós do grafo)"""
+
+    componente: np.ndarray         # Rótulo da componente fortemente conexa
+    tamanho_componente: np.ndarray
+    vizinhos: np.ndarray           # (n, k) nós alcançáveis mais próximos (-1 = nenhum)
+    tempos_vizinhos: np.ndarray    # (n, k) tempos até eles (inf = nenhum)
+    alcancaveis: np.ndarray        # Nós alcançáveis dentro do tempo máximo
+    proximidade: np.ndarray        # Proximidade harmônica: Σ 1/t / (n - 1), em 1/s
+    acessibilidade: np.ndarray     # Σ peso_j · f(t_ij) sobre os outros nós
+    intermediacao: np.ndarray      # Fração dos caminhos mínimos que passam pelo nó (estimada)
+
+    def __len__(self) -> int:
+        return len(self.componente)
+
+    def tabela(self) -> pd.DataFrame:
+        """Uma linha por nó"""
+        with np.errstate(invalid='ignore'):
+            tempo_medio = np.where(
+                np.isfinite(self.tempos_vizinhos), self.tempos_vizinhos, np.nan
+            )
+            tempo_medio = np.nanmean(tempo_medio, axis=1) if tempo_medio.shape[1] else np.full(len(self), np.nan)
+        return pd.DataFrame({
+            'Componente': self.componente,
+            'Tamanho_Componente': self.tamanho_componente,
+            'Alcancaveis': self.alcancaveis,
+            'Tempo_Medio_Vizinhos_s': tempo_medio,
+            'Proximidade': self.proximidade,
+            'Acessibilidade': self.acessibilidade,
+            'Intermediacao': self.intermediacao
+        })
+
+
+def intermediacao_aproximada(
+    grafo: GrafoTempos,
+    amostras: int = CONECTIVIDADE_AMOSTRAS,
+    tempo_max_s: Optional[float] = None,
+    semente: int = 0,
+    origens_por_lote: int = 64
+) -> np.ndarray:
+    """
+    Intermediação (betweenness) estimada a partir de origens sorteadas
+
+    Para cada origem, a árvore de caminhos mínimos é percorrida das folhas
+    para a raiz (acumular_arvore): o número de destinos abaixo de um nó é o
+    número de caminhos que passam por ele. A soma sobre as amostras é
+    extrapolada para n origens e normalizada por (n - 1)(n - 2). Empates de
+    tempo não são divididos (um único caminho mínimo por par).
+    """
+    n = grafo.n
+    resultado = np.zeros(n)
+    if n < 3 or len(grafo.tempo) == 0:
+        return resultado
+
+    rng = np.random.default_rng(semente)
+    origens = np.sort(rng.choice(n, size=min(amostras, n), replace=False))
+    matriz = grafo.matriz()
+    destinos = np.ones(n)
+    limite = np.inf if tempo_max_s is None else tempo_max_s
+    for inicio in range(0, len(origens), origens_por_lote):
+        lote = origens[inicio:inicio + origens_por_lote]
+        _, predecessores = dijkstra(matriz, indices=lote, return_predecessors=True, limit=limite)
+        for linha in predecessores:
+            abaixo, _ = acumular_arvore(linha, destinos)
+            # Cada nó alcançado é destino de um caminho: só conta o que passa por ele
+            resultado += np.maximum(abaixo - 1, 0)
+    return resultado * (n / len(origens)) / ((n - 1) * (n - 2))
+
+
+def analisar_rede(
+    grafo: GrafoTempos,
+    pesos: Optional[np.ndarray] = None,
+    k: int = CONECTIVIDADE_K_VIZINHOS,
+    tempo_max_s: float = CONECTIVIDADE_TEMPO_MAX_S,
+    escala_s: float = CONECTIVIDADE_ESCALA_S,
+    amostras: int = CONECTIVIDADE_AMOSTRAS,
+    memoria_max_mb: float = 256.0
+) -> AnaliseRede:
+    """
+    Métricas de todos os nós em uma passada de caminhos mínimos por bloco de origens
+
+    Args:
+        grafo: Grafo de tempos
+        pesos: Massa de cada nó na acessibilidade (padrão: 1)
+        k: Vizinhos alcançáveis por nó
+        tempo_max_s: Alcance da busca; nós mais distantes não contam
+        escala_s: Escala do decaimento exponencial da acessibilidade
+        amostras: Origens sorteadas na intermediação
+        memoria_max_mb: Limite da matriz de tempos de cada bloco
+    """
+    n = grafo.n
+    pesos = np.ones(n) if pesos is None else np.asarray(pesos, dtype=float)
+    k = min(k, max(n - 1, 0))
+
+    n_comp, rotulos = componentes(grafo)
+    tamanho_componente = np.bincount(rotulos, minlength=n_comp)[rotulos]
+
+    vizinhos = np.full((n, k), -1, dtype=np.int64)
+    tempos_vizinhos = np.full((n, k), np.inf)
+    alcancaveis = np.zeros(n, dtype=np.int64)
+    proximidade = np.zeros(n)
+    acessibilidade = np.zeros(n)
+
+    matriz = grafo.matriz()
+    bloco = _origens_por_bloco(n, memoria_max_mb)
+    for inicio in range(0, n, bloco):
+        linhas = np.arange(inicio, min(inicio + bloco, n))
+        tempos = dijkstra(matriz, indices=linhas, limit=tempo_max_s)
+        tempos[np.arange(len(linhas)), linhas] = np.inf
+        alcancado = np.isfinite(tempos)
+
+        alcancaveis[linhas] = alcancado.sum(axis=1)
+        inversos = np.divide(1.0, np.maximum(tempos, 1.0), where=alcancado, out=np.zeros_like(tempos))
+        proximidade[linhas] = inversos.sum(axis=1) / max(n - 1, 1)
+        acessibilidade[linhas] = decaimento(
+            tempos, modelo='exponencial', escala=escala_s, corte=tempo_max_s
+        ) @ pesos
+
+        if k:
+            mais_proximos = np.argpartition(tempos, k - 1, axis=1)[:, :k]
+            t = np.take_along_axis(tempos, mais_proximos, axis=1)
+            ordem = np.argsort(t, axis=1, kind='stable')
+            t = np.take_along_axis(t, ordem, axis=1)
+            tempos_vizinhos[linhas] = t
+            vizinhos[linhas] = np.where(np.isfinite(t), np.take_along_axis(mais_proximos, ordem, axis=1), -1)
+
+    return AnaliseRede(
+        componente=rotulos,
+        tamanho_componente=tamanho_componente,
+        vizinhos=vizinhos,
+        tempos_vizinhos=tempos_vizinhos,
+        alcancaveis=alcancaveis,
+        proximidade=proximidade,
+        acessibilidade=acessibilidade,
+        intermediacao=intermediacao_aproximada(grafo, amostras, tempo_max_s)
+    )
+
+
+def grafo_candidatos(candidatos: pd.DataFrame, rede: bool = False) -> GrafoTempos:
+    """
+    Grafo dos candidatos (colunas Lat_Centroide e Lng_Centroide)
+
+    Com `rede`, os tempos vêm da Distance Matrix (n² elementos, em cache no
+    cliente); sem ela, do grafo de vizinhos em linha reta.
+    """
+    lats = candidatos['Lat_Centroide'].to_numpy(dtype=float)
+    lngs = candidatos['Lng_Centroide'].to_numpy(dtype=float)
+    if not rede:
+        return GrafoTempos.de_vizinhos(lats, lngs)
+
+    from api.distance_matrix import get_distance_matrix_client
+    pontos: List[Tuple[float, float]] = list(zip(lats, lngs))
+    custos = get_distance_matrix_client().matriz_custos(pontos, pontos, campo='duracao_segundos')
+    return GrafoTempos.de_matriz(custos)
+
+
+def _normalizar(valores: np.ndarray) -> np.ndarray:
+    valores = np.nan_to_num(np.asarray(valores, dtype=float))
+    maximo = valores.max() if len(valores) else 0.0
+    return valores / maximo if maximo > 0 else np.zeros_like(valores)
+
+
+def ranquear_candidatos(
+    candidatos: pd.DataFrame,
+    analise: AnaliseRede,
+    coluna_score: str = 'Score_Estimado',
+    peso_conectividade: float = CONECTIVIDADE_PESO_RANKING
+) -> pd.DataFrame:
+    """
+    Acrescenta as métricas de rede aos candidatos e os ordena pelo score final
+
+    Score_Final = (1 - w) · score / max(score) + w · acessibilidade / max(acessibilidade)
+    """
+    resultado = pd.concat([candidatos.reset_index(drop=True), analise.tabela()], axis=1)
+    resultado['Score_Final'] = (
+        (1 - peso_conectividade) * _normalizar(resultado[coluna_score].to_numpy())
+        + peso_conectividade * _normalizar(analise.acessibilidade)
+    )
+    resultado = resultado.sort_values('Score_Final', ascending=False, kind='stable').reset_index(drop=True)
+    resultado['Ranking'] = np.arange(1, len(resultado) + 1)
+    return resultado
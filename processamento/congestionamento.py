@@ -0,0 +1,407 @@
+"""
+Índice de congestionamento por par origem-destino, corredor e célula
+Razão tempo com tráfego / tempo em fluxo livre nos horários de TRAFFIC_PERIODS,
+a partir da Distance Matrix API (blocos concorrentes, com o cache do cliente).
+
+Os horários de partida caem sempre no mesmo dia da semana, então as mesmas
+consultas repetidas na semana reaproveitam o cache em vez de gerar chamadas.
+Cada análise custa corredores x horários elementos: estimar_congestionamento
+dá esse número (e o custo) sem chamar a API, para confirmar antes de executar.
+"""
+
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from api.distance_matrix import DistanceMatrixAPI, get_distance_matrix_client
+from processamento.densidade import SuperficieDensidade
+from processamento.geodesia import GRAUS_POR_METRO, bbox_circulo, haversine
+from config.settings import (
+    CONGESTIONAMENTO_DIA_SEMANA,
+    CONGESTIONAMENTO_ESPACAMENTO_M,
+    CONGESTIONAMENTO_MAX_PARES,
+    CONGESTIONAMENTO_MAX_WORKERS,
+    CONGESTIONAMENTO_TAMANHO_CELULA_M,
+    CONGESTIONAMENTO_USD_POR_MIL,
+    TRAFFIC_PERIODS
+)
+
+# Uma consulta: (índice do horário, índices das origens, índices dos destinos,
+# posição de saída de cada elemento origem x destino, -1 = descartado)
+Consulta = Tuple[int, np.ndarray, np.ndarray, np.ndarray]
+
+
+def horario_partida(hora: int, agora: Optional[datetime] = None) -> datetime:
+    """Próxima partida às `hora`:00 no dia da semana de referência (sempre no futuro)"""
+    agora = agora or datetime.now()
+    dias = (CONGESTIONAMENTO_DIA_SEMANA - agora.weekday()) % 7
+    partida = (agora + timedelta(days=dias)).replace(hour=hora, minute=0, second=0, microsecond=0)
+    if partida <= agora:
+        partida += timedelta(days=7)
+    return partida
+
+
+def _executar_consultas(
+    consultas: List[Consulta],
+    origens: np.ndarray,
+    destinos: np.ndarray,
+    horas: Sequence[int],
+    tamanho_saida: int,
+    modo: str,
+    max_workers: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Executa as consultas em paralelo e espalha os tempos nas posições de saída
+
+    Returns:
+        (duração sem tráfego, duração com tráfego), arrays (H, tamanho_saida) em segundos
+    """
+    cliente = get_distance_matrix_client()
+    partidas = [horario_partida(h) for h in horas]
+    normal = np.full((len(horas), tamanho_saida), np.nan)
+    trafego = np.full((len(horas), tamanho_saida), np.nan)
+
+    def consultar(consulta: Consulta) -> Dict:
+        h, idx_o, idx_d, _ = consulta
+        try:
+            return cliente.calcular_matriz(
+                origens=[tuple(p) for p in origens[idx_o].tolist()],
+                destinos=[tuple(p) for p in destinos[idx_d].tolist()],
+                modo=modo,
+                departure_time=partidas[h]
+            )
+        except Exception as e:
+            print(f"✗ Congestionamento: falha na consulta das {horas[h]}h: {e}")
+            return {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for (h, _, _, saida), resultado in zip(consultas, executor.map(consultar, consultas)):
+            elementos = resultado.get('matriz', [])
+            if not elementos:
+                continue
+            i = np.array([e['origem_idx'] for e in elementos])
+            j = np.array([e['destino_idx'] for e in elementos])
+            posicoes = saida[i, j]
+            validos = posicoes >= 0
+            normal[h, posicoes[validos]] = np.array([e['duracao_segundos'] for e in elementos], dtype=float)[validos]
+            trafego[h, posicoes[validos]] = np.array(
+                [e['duracao_trafego_segundos'] or np.nan for e in elementos], dtype=float
+            )[validos]
+
+    print(f"✓ Congestionamento: {len(consultas)} consultas em {len(horas)} horários")
+    return normal, trafego
+
+
+def _razoes(normal: np.ndarray, trafego: np.ndarray) -> Dict[str, np.ndarray]:
+    """Fluxo livre = menor tempo observado no dia; razão = tráfego / fluxo livre"""
+    livre = np.fmin.reduce(np.concatenate([normal, trafego]), axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        razao = trafego / livre
+    return {'livre_s': livre, 'trafego_s': trafego, 'razao': razao}
+
+
+def matriz_congestionamento(
+    origens: Sequence[Tuple[float, float]],
+    destinos: Sequence[Tuple[float, float]],
+    horas: Sequence[int] = TRAFFIC_PERIODS,
+    modo: str = "driving",
+    max_workers: int = CONGESTIONAMENTO_MAX_WORKERS
+) -> Dict:
+    """
+    Congestionamento de todos os pares origens x destinos
+
+    Returns:
+        Dict com horas, livre_s (O, D), trafego_s (H, O, D) e razao (H, O, D)
+    """
+    origens = np.asarray(origens, dtype=float).reshape(-1, 2)
+    destinos = np.asarray(destinos, dtype=float).reshape(-1, 2)
+    n_o, n_d = len(origens), len(destinos)
+
+    consultas = []
+    for h in range(len(horas)):
+        for bloco_o, bloco_d in DistanceMatrixAPI.blocos(n_o, n_d):
+            idx_o, idx_d = np.arange(n_o)[bloco_o], np.arange(n_d)[bloco_d]
+            consultas.append((h, idx_o, idx_d, idx_o[:, None] * n_d + idx_d[None, :]))
+
+    normal, trafego = _executar_consultas(consultas, origens, destinos, horas, n_o * n_d, modo, max_workers)
+    resultado = _razoes(normal, trafego)
+    return {
+        'horas': list(horas),
+        'livre_s': resultado['livre_s'].reshape(n_o, n_d),
+        'trafego_s': resultado['trafego_s'].reshape(len(horas), n_o, n_d),
+        'razao': resultado['razao'].reshape(len(horas), n_o, n_d)
+    }
+
+
+def pares_congestionamento(
+    origens: Sequence[Tuple[float, float]],
+    destinos: Sequence[Tuple[float, float]],
+    horas: Sequence[int] = TRAFFIC_PERIODS,
+    modo: str = "driving",
+    max_workers: int = CONGESTIONAMENTO_MAX_WORKERS
+) -> Dict:
+    """
+    Congestionamento de pares avulsos (origens[p] -> destinos[p])
+
+    Os pares são agrupados por origem, então só os elementos pedidos são
+    cobrados (nenhum produto cartesiano desnecessário).
+
+    Returns:
+        Dict com horas, livre_s (P,), trafego_s (H, P) e razao (H, P)
+    """
+    origens = np.asarray(origens, dtype=float).reshape(-1, 2)
+    destinos = np.asarray(destinos, dtype=float).reshape(-1, 2)
+    if len(origens) != len(destinos):
+        raise ValueError("origens e destinos devem ter o mesmo número de pares")
+
+    unicas, grupo = np.unique(origens, axis=0, return_inverse=True)
+    grupo = grupo.ravel()
+    ordem = np.argsort(grupo, kind='stable')
+    limites = np.searchsorted(grupo[ordem], np.arange(len(unicas) + 1))
+
+    consultas = []
+    for h in range(len(horas)):
+        for u in range(len(unicas)):
+            pares = ordem[limites[u]:limites[u + 1]]
+            for k in range(0, len(pares), DistanceMatrixAPI.MAX_DESTINOS):
+                lote = pares[k:k + DistanceMatrixAPI.MAX_DESTINOS]
+                consultas.append((h, np.array([lote[0]]), lote, lote[None, :]))
+
+    normal, trafego = _executar_consultas(consultas, origens, destinos, horas, len(origens), modo, max_workers)
+    return {'horas': list(horas), **_razoes(normal, trafego)}
+
+
+def corredores_grade(
+    lat_centro: float,
+    lng_centro: float,
+    raio_m: float,
+    espacamento_m: float = CONGESTIONAMENTO_ESPACAMENTO_M,
+    passos: int = 2
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Corredores curtos leste-oeste e norte-sul sobre uma malha regular de nós
+
+    Cada nó dentro do círculo liga-se ao nó `passos` posições a leste e ao
+    nó `passos` posições ao norte (quando também estão no círculo).
+
+    Returns:
+        (origens (P, 2), destinos (P, 2)) em [lat, lng]
+    """
+    n = int(raio_m // espacamento_m)
+    offsets = np.arange(-n, n + 1) * espacamento_m
+    dy, dx = np.meshgrid(offsets, offsets, indexing='ij')
+    lat_step = GRAUS_POR_METRO
+    lng_step = GRAUS_POR_METRO / np.cos(np.radians(lat_centro))
+
+    def no(di, dj):
+        deslocado_y = dy + di * espacamento_m
+        deslocado_x = dx + dj * espacamento_m
+        dentro = np.hypot(deslocado_y, deslocado_x) <= raio_m
+        return np.stack([lat_centro + deslocado_y * lat_step, lng_centro + deslocado_x * lng_step], axis=-1), dentro
+
+    origem, origem_dentro = no(0, 0)
+    origens, destinos = [], []
+    for di, dj in ((0, passos), (passos, 0)):
+        destino, destino_dentro = no(di, dj)
+        valido = origem_dentro & destino_dentro
+        origens.append(origem[valido])
+        destinos.append(destino[valido])
+    return np.concatenate(origens), np.concatenate(destinos)
+
+
+@dataclass
+class RasterCongestionamento:
+    """
+    Índice de congestionamento por célula e horário
+
+    indice[h, i, j] = Σ tempo com tráfego / Σ tempo em fluxo livre dos
+    corredores que cruzam a célula (i, j) no horário h (NaN sem corredor).
+    Mesma georreferência de SuperficieDensidade.
+    """
+
+    indice: np.ndarray            # (H, ny, nx)
+    cobertura: np.ndarray         # (ny, nx) corredores que cruzam a célula
+    horas: List[int]
+    lat_min: float
+    lng_min: float
+    lat_step: float
+    lng_step: float
+    tamanho_celula_m: float
+
+    def superficie(self, hora: int) -> SuperficieDensidade:
+        """Atraso relativo (índice - 1, sem negativos) no horário, como superfície para o mapa"""
+        valores = np.clip(np.nan_to_num(self.indice[self.horas.index(hora)] - 1.0, nan=0.0), 0.0, None)
+        return SuperficieDensidade(
+            valores, self.lat_min, self.lng_min, self.lat_step, self.lng_step, self.tamanho_celula_m
+        )
+
+    def resumo(self) -> pd.DataFrame:
+        """Índice médio, percentil 90 e máximo por horário (células com corredor)"""
+        valores = self.indice[:, self.cobertura > 0]
+        with warnings.catch_warnings():
+            # Horários sem nenhuma célula com dado ficam NaN
+            warnings.simplefilter('ignore', RuntimeWarning)
+            return pd.DataFrame({
+                'Hora': self.horas,
+                'Índice médio': np.nanmean(valores, axis=1),
+                'Índice P90': np.nanpercentile(valores, 90, axis=1),
+                'Índice máx.': np.nanmax(valores, axis=1, initial=-np.inf, where=np.isfinite(valores))
+            }).replace(-np.inf, np.nan)
+
+
+def raster_congestionamento(
+    origens: np.ndarray,
+    destinos: np.ndarray,
+    livre_s: np.ndarray,
+    trafego_s: np.ndarray,
+    horas: Sequence[int],
+    bbox: Optional[Tuple[float, float, float, float]] = None,
+    tamanho_celula_m: float = CONGESTIONAMENTO_TAMANHO_CELULA_M
+) -> RasterCongestionamento:
+    """
+    Agrega os tempos dos corredores nas células que eles atravessam
+
+    Cada corredor é amostrado em linha reta a cada meia célula; uma célula
+    conta o corredor uma única vez.
+
+    Args:
+        origens, destinos: (P, 2) [lat, lng]
+        livre_s: (P,) tempo em fluxo livre
+        trafego_s: (H, P) tempo com tráfego
+        bbox: (lat_min, lat_max, lng_min, lng_max); padrão: extensão dos corredores
+    """
+    origens = np.asarray(origens, dtype=float).reshape(-1, 2)
+    destinos = np.asarray(destinos, dtype=float).reshape(-1, 2)
+    livre_s = np.asarray(livre_s, dtype=float)
+    trafego_s = np.asarray(trafego_s, dtype=float).reshape(len(horas), -1)
+    if bbox is None:
+        pontos = np.concatenate([origens, destinos])
+        bbox = (pontos[:, 0].min(), pontos[:, 0].max(), pontos[:, 1].min(), pontos[:, 1].max())
+    lat_min, lat_max, lng_min, lng_max = bbox
+
+    lat_step = tamanho_celula_m * GRAUS_POR_METRO
+    lng_step = tamanho_celula_m * GRAUS_POR_METRO / np.cos(np.radians((lat_min + lat_max) / 2))
+    ny = max(1, int(np.ceil((lat_max - lat_min) / lat_step)))
+    nx = max(1, int(np.ceil((lng_max - lng_min) / lng_step)))
+
+    # Amostras ao longo de cada corredor (número variável por corredor)
+    comprimento = haversine(origens[:, 0], origens[:, 1], destinos[:, 0], destinos[:, 1])
+    n_amostras = np.ceil(comprimento / (tamanho_celula_m / 2)).astype(np.int64) + 1
+    par = np.repeat(np.arange(len(origens)), n_amostras)
+    inicio = np.repeat(np.cumsum(n_amostras) - n_amostras, n_amostras)
+    t = (np.arange(len(par)) - inicio) / np.maximum(n_amostras[par] - 1, 1)
+    lats = origens[par, 0] + t * (destinos[par, 0] - origens[par, 0])
+    lngs = origens[par, 1] + t * (destinos[par, 1] - origens[par, 1])
+
+    i = np.floor((lats - lat_min) / lat_step).astype(np.int64)
+    j = np.floor((lngs - lng_min) / lng_step).astype(np.int64)
+    dentro = (i >= 0) & (i < ny) & (j >= 0) & (j < nx)
+    celula = i[dentro] * nx + j[dentro]
+    par = par[dentro]
+
+    # Pares (corredor, célula) distintos
+    chave = np.unique(par * (ny * nx) + celula)
+    par, celula = chave // (ny * nx), chave % (ny * nx)
+    n_celulas = ny * nx
+
+    # Somas por (horário, célula) numa única passada de bincount
+    tempo_trafego = trafego_s[:, par]
+    tempo_livre = np.broadcast_to(livre_s[par], tempo_trafego.shape)
+    valido = np.isfinite(tempo_trafego) & np.isfinite(tempo_livre) & (tempo_livre > 0)
+    indices = (np.arange(len(horas))[:, None] * n_celulas + celula[None, :])[valido]
+    soma_trafego = np.bincount(indices, weights=tempo_trafego[valido], minlength=len(horas) * n_celulas)
+    soma_livre = np.bincount(indices, weights=tempo_livre[valido], minlength=len(horas) * n_celulas)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        indice = np.where(soma_livre > 0, soma_trafego / soma_livre, np.nan)
+
+    return RasterCongestionamento(
+        indice=indice.reshape(len(horas), ny, nx),
+        cobertura=np.bincount(celula, minlength=n_celulas).reshape(ny, nx),
+        horas=list(horas),
+        lat_min=lat_min,
+        lng_min=lng_min,
+        lat_step=lat_step,
+        lng_step=lng_step,
+        tamanho_celula_m=tamanho_celula_m
+    )
+
+
+def planejar_corredores(
+    lat_centro: float,
+    lng_centro: float,
+    raio_m: float,
+    espacamento_m: float = CONGESTIONAMENTO_ESPACAMENTO_M,
+    max_pares: int = CONGESTIONAMENTO_MAX_PARES
+) -> Tuple[np.ndarray, np.ndarray, float]:
+    """
+    Corredores da área, com o espaçamento da malha crescendo até caber em `max_pares`
+
+    Returns:
+        (origens, destinos, espaçamento usado em metros)
+    """
+    origens, destinos = corredores_grade(lat_centro, lng_centro, raio_m, espacamento_m)
+    while len(origens) > max_pares:
+        espacamento_m *= 1.25
+        origens, destinos = corredores_grade(lat_centro, lng_centro, raio_m, espacamento_m)
+    return origens, destinos, espacamento_m
+
+
+def estimar_congestionamento(
+    lat_centro: float,
+    lng_centro: float,
+    raio_m: float,
+    horas: Sequence[int] = TRAFFIC_PERIODS,
+    espacamento_m: float = CONGESTIONAMENTO_ESPACAMENTO_M,
+    max_pares: int = CONGESTIONAMENTO_MAX_PARES
+) -> Dict:
+    """
+    Tamanho da análise de congestionamento, sem chamar a API
+
+    Returns:
+        Dict com corredores, espacamento_m, requisicoes, elementos e custo_usd
+        (preço de tabela, sem descontar o cache do cliente)
+    """
+    origens, _, espacamento_m = planejar_corredores(lat_centro, lng_centro, raio_m, espacamento_m, max_pares)
+    elementos = len(origens) * len(horas)
+    return {
+        'corredores': len(origens),
+        'espacamento_m': espacamento_m,
+        'requisicoes': len(np.unique(origens, axis=0)) * len(horas) if len(origens) else 0,
+        'elementos': elementos,
+        'custo_usd': elementos / 1000 * CONGESTIONAMENTO_USD_POR_MIL
+    }
+
+
+def analisar_congestionamento(
+    lat_centro: float,
+    lng_centro: float,
+    raio_m: float,
+    horas: Sequence[int] = TRAFFIC_PERIODS,
+    espacamento_m: float = CONGESTIONAMENTO_ESPACAMENTO_M,
+    tamanho_celula_m: float = CONGESTIONAMENTO_TAMANHO_CELULA_M,
+    max_pares: int = CONGESTIONAMENTO_MAX_PARES,
+    modo: str = "driving"
+) -> Tuple[Dict, RasterCongestionamento]:
+    """
+    Corredores da área, congestionamento por horário e raster por célula
+
+    O espaçamento da malha cresce até caber em `max_pares` corredores
+    (custo: corredores x horários elementos; ver estimar_congestionamento).
+
+    Returns:
+        (resultado dos pares com origens/destinos, raster)
+    """
+    origens, destinos, espacamento_m = planejar_corredores(lat_centro, lng_centro, raio_m, espacamento_m, max_pares)
+    print(f"→ Congestionamento: {len(origens)} corredores (nós a cada {espacamento_m:.0f} m)")
+
+    resultado = pares_congestionamento(origens, destinos, horas, modo)
+    resultado.update({'origens': origens, 'destinos': destinos, 'espacamento_m': espacamento_m})
+    raster = raster_congestionamento(
+        origens, destinos, resultado['livre_s'], resultado['trafego_s'], horas,
+        bbox=bbox_circulo(lat_centro, lng_centro, raio_m),
+        tamanho_celula_m=tamanho_celula_m
+    )
+    return resultado, raster
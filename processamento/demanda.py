@@ -0,0 +1,322 @@
+"""
+Demanda de recarga de VEs por célula e hora
+Sessões esperadas = taxa de adoção · Σ_fonte probabilidade de recarga · exposição · perfil horário
+
+A exposição de cada célula (veículos por dia) vem de três fontes:
+- residente: frota da célula (informada ou população · veículos por habitante)
+- destino: viagens diárias da frota total rateadas entre as células pela
+  atratividade dos POIs (Σ pesos de CATEGORIAS_POIS)
+- passagem: fluxo de veículos nas vias da célula (FluxosSegmentos)
+
+O modelo é aritmética de arrays (cenário, célula, fonte): várias taxas de
+adoção (globais ou por célula) e probabilidades são avaliadas numa passada,
+e o resultado sai como arrays (.npz) para o otimizador e os painéis.
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Mapping, Optional, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
+from processamento.agregacao import Agregado, IndiceCelulas
+from processamento.fluxo_veiculos import FluxosSegmentos
+from config.settings import (
+    DEMANDA_PROB_RECARGA,
+    DEMANDA_VEICULOS_POR_HABITANTE,
+    DEMANDA_VIAGENS_POR_VEICULO_DIA,
+    EV_ADOPTION_RATE
+)
+
+FONTES = ('residente', 'destino', 'passagem')
+
+# Peso relativo de cada hora (0-23) nas sessões de cada fonte
+_PESOS_HORARIOS = np.array([
+    # residente: recarga perto de casa, no fim do dia
+    [3, 2, 2, 1, 1, 1, 2, 3, 3, 2, 2, 2, 3, 3, 3, 3, 4, 6, 9, 10, 9, 8, 6, 4],
+    # destino: visitas a comércio e serviços, horário comercial
+    [0.5, 0.3, 0.2, 0.2, 0.2, 0.5, 1, 2, 4, 6, 7, 8, 9, 8, 7, 7, 7, 7, 7, 6, 4, 3, 2, 1],
+    # passagem: tráfego, picos da manhã e da tarde
+    [1, 0.5, 0.5, 0.5, 1, 3, 7, 10, 9, 6, 5, 5, 6, 6, 5, 6, 8, 10, 9, 6, 4, 3, 2, 1.5]
+], dtype=float)
+PERFIS_HORARIOS = _PESOS_HORARIOS / _PESOS_HORARIOS.sum(axis=1, keepdims=True)
+
+# Células por bloco no cálculo da hora de pico (limita o array cenário x célula x hora)
+_CELULAS_POR_BLOCO = 65_536
+
+
+# --- CÉLULAS ---
+def fluxo_por_celula(
+    indice: IndiceCelulas,
+    fluxos: FluxosSegmentos,
+    nivel: int = 0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Maior fluxo entre os segmentos que cruzam cada célula
+
+    Os segmentos são amostrados a cada meia célula. Como em volumes_candidatos,
+    fica o máximo e não a soma: uma viagem percorre vários segmentos da mesma célula.
+
+    Returns:
+        (IDs das células ordenados, fluxo)
+    """
+    if len(fluxos) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    ax, ay = indice.projetar(fluxos.lat_a, fluxos.lng_a)
+    bx, by = indice.projetar(fluxos.lat_b, fluxos.lng_b)
+    passo = indice.tamanho_m(nivel) / 2
+    n_amostras = np.ceil(np.hypot(bx - ax, by - ay) / passo).astype(np.int64) + 1
+    segmento = np.repeat(np.arange(len(fluxos)), n_amostras)
+    inicio = np.repeat(np.cumsum(n_amostras) - n_amostras, n_amostras)
+    t = (np.arange(len(segmento)) - inicio) / np.maximum(n_amostras[segmento] - 1, 1)
+    x = ax[segmento] + t * (bx[segmento] - ax[segmento])
+    y = ay[segmento] + t * (by[segmento] - ay[segmento])
+
+    ids, inverso = np.unique(indice.celulas_xy(x, y, nivel), return_inverse=True)
+    volume = np.zeros(len(ids))
+    np.maximum.at(volume, inverso, fluxos.fluxo[segmento])
+    return ids, volume
+
+
+def celulas_demanda(
+    indice: IndiceCelulas,
+    pois: Optional[pd.DataFrame] = None,
+    populacao: Optional[pd.DataFrame] = None,
+    fluxos: Optional[FluxosSegmentos] = None,
+    nivel: int = 0,
+    coluna_populacao: str = 'Populacao',
+    coluna_frota: Optional[str] = None,
+    veiculos_por_habitante: float = DEMANDA_VEICULOS_POR_HABITANTE
+) -> pd.DataFrame:
+    """
+    Entradas do modelo alinhadas por célula (qualquer célula com alguma entrada)
+
+    Args:
+        indice: Índice de células (zona UTM e tamanho base)
+        pois: DataFrame com Lat, Lng e Peso (ex.: buscar_pois)
+        populacao: DataFrame com Lat, Lng e `coluna_populacao` (setores, pontos de
+            endereço...) ou `coluna_frota`, se a frota já é conhecida
+        fluxos: Fluxos de veículos por dia nos segmentos de via
+        nivel: Nível das células
+
+    Returns:
+        DataFrame com cell_id, Lat_Centro, Lng_Centro, Atratividade, Frota e Veiculos_Passagem
+    """
+    fontes = {}
+    if pois is not None and len(pois):
+        agregado = Agregado.de_pontos(
+            indice, pois['Lat'].to_numpy(), pois['Lng'].to_numpy(), pesos=pois['Peso'].to_numpy(), nivel=nivel
+        )
+        fontes['Atratividade'] = (agregado.ids, agregado.soma_peso)
+    if populacao is not None and len(populacao):
+        if coluna_frota:
+            frota = populacao[coluna_frota].to_numpy(dtype=float)
+        else:
+            frota = populacao[coluna_populacao].to_numpy(dtype=float) * veiculos_por_habitante
+        agregado = Agregado.de_pontos(
+            indice, populacao['Lat'].to_numpy(), populacao['Lng'].to_numpy(),
+            valores={'frota': frota}, nivel=nivel
+        )
+        fontes['Frota'] = (agregado.ids, agregado.somas['frota'])
+    if fluxos is not None and len(fluxos):
+        fontes['Veiculos_Passagem'] = fluxo_por_celula(indice, fluxos, nivel)
+
+    ids = np.unique(np.concatenate([ids for ids, _ in fontes.values()])) if fontes else np.zeros(0, dtype=np.int64)
+    lat_c, lng_c = indice.centros(ids, nivel) if len(ids) else (np.zeros(0), np.zeros(0))
+    colunas = {'cell_id': ids, 'Lat_Centro': lat_c, 'Lng_Centro': lng_c}
+    for nome in ('Atratividade', 'Frota', 'Veiculos_Passagem'):
+        valores = np.zeros(len(ids))
+        if nome in fontes:
+            ids_fonte, v = fontes[nome]
+            valores[np.searchsorted(ids, ids_fonte)] = v
+        colunas[nome] = valores
+    return pd.DataFrame(colunas)
+
+
+# --- MODELO ---
+@dataclass
+class DemandaRecarga:
+    """
+    Sessões de recarga por dia de cada cenário, célula e fonte
+
+    componentes[s, c, f] são as sessões/dia do cenário s na célula c vindas
+    da fonte FONTES[f]; o perfil horário de cada fonte distribui o dia em 24 horas.
+    """
+
+    cell_id: np.ndarray
+    lat: np.ndarray
+    lng: np.ndarray
+    taxas: np.ndarray           # (n_cenarios,) ou (n_cenarios, n_celulas)
+    componentes: np.ndarray     # (n_cenarios, n_celulas, n_fontes)
+    perfis: np.ndarray          # (n_fontes, 24)
+
+    @property
+    def n_cenarios(self) -> int:
+        return self.componentes.shape[0]
+
+    @property
+    def sessoes_dia(self) -> np.ndarray:
+        """(n_cenarios, n_celulas)"""
+        return self.componentes.sum(axis=2)
+
+    def por_hora(self, cenario: Optional[int] = None) -> np.ndarray:
+        """Sessões por hora: (n_celulas, 24) de um cenário ou (n_cenarios, n_celulas, 24)"""
+        componentes = self.componentes if cenario is None else self.componentes[cenario]
+        return componentes @ self.perfis
+
+    def pico(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(sessões na hora de pico, hora de pico), ambos (n_cenarios, n_celulas)"""
+        n_celulas = len(self.cell_id)
+        sessoes = np.zeros((self.n_cenarios, n_celulas))
+        hora = np.zeros((self.n_cenarios, n_celulas), dtype=np.int64)
+        for inicio in range(0, n_celulas, _CELULAS_POR_BLOCO):
+            bloco = slice(inicio, inicio + _CELULAS_POR_BLOCO)
+            horas = self.componentes[:, bloco] @ self.perfis
+            hora[:, bloco] = horas.argmax(axis=2)
+            sessoes[:, bloco] = horas.max(axis=2)
+        return sessoes, hora
+
+    def pesos(self, cenario: int = 0) -> np.ndarray:
+        """Sessões/dia por célula, para usar como pesos de demanda no otimizador"""
+        return self.componentes[cenario].sum(axis=1)
+
+    def tabela(self, cenario: int = 0) -> pd.DataFrame:
+        """Uma linha por célula do cenário: sessões/dia (total e por fonte) e hora de pico"""
+        horas = self.por_hora(cenario)
+        colunas = {
+            'cell_id': self.cell_id,
+            'Lat_Centro': self.lat,
+            'Lng_Centro': self.lng,
+            'Sessoes_Dia': self.pesos(cenario)
+        }
+        for f, fonte in enumerate(FONTES):
+            colunas[f'Sessoes_{fonte.capitalize()}'] = self.componentes[cenario, :, f]
+        colunas['Sessoes_Pico'] = horas.max(axis=1) if len(horas) else np.zeros(0)
+        colunas['Hora_Pico'] = horas.argmax(axis=1) if len(horas) else np.zeros(0, dtype=np.int64)
+        return pd.DataFrame(colunas)
+
+    def resumo(self) -> pd.DataFrame:
+        """Uma linha por cenário: taxa de adoção média, sessões/dia, hora e sessões no pico da área"""
+        total_hora = self.componentes.sum(axis=1) @ self.perfis
+        taxas = self.taxas if self.taxas.ndim == 1 else self.taxas.mean(axis=1)
+        return pd.DataFrame({
+            'Taxa_Adocao': taxas,
+            'Sessoes_Dia': self.componentes.sum(axis=(1, 2)),
+            'Hora_Pico': total_hora.argmax(axis=1),
+            'Sessoes_Hora_Pico': total_hora.max(axis=1)
+        })
+
+    @classmethod
+    def carregar(cls, caminho: Path) -> 'DemandaRecarga':
+        """Lê a demanda de um arquivo .npz"""
+        with np.load(caminho) as dados:
+            return cls(
+                cell_id=dados['cell_id'], lat=dados['lat'], lng=dados['lng'],
+                taxas=dados['taxas'], componentes=dados['componentes'], perfis=dados['perfis']
+            )
+
+    def salvar(self, caminho: Path):
+        """Grava a demanda num arquivo .npz (inclui sessoes_dia, pronto para os painéis)"""
+        np.savez_compressed(
+            caminho, cell_id=self.cell_id, lat=self.lat, lng=self.lng, taxas=self.taxas,
+            componentes=self.componentes, perfis=self.perfis, sessoes_dia=self.sessoes_dia
+        )
+
+
+def exposicao(
+    celulas: pd.DataFrame,
+    frota_total: Optional[float] = None,
+    viagens_por_veiculo: float = DEMANDA_VIAGENS_POR_VEICULO_DIA,
+    atratividade: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Veículos por dia expostos em cada célula, por fonte: (n_celulas, n_fontes)
+
+    Args:
+        celulas: Saída de celulas_demanda
+        frota_total: Frota cujas viagens são rateadas pela atratividade
+            (padrão: soma da coluna Frota)
+        viagens_por_veiculo: Viagens diárias de cada veículo
+        atratividade: Substitui a coluna Atratividade; com formato
+            (n_cenarios, n_celulas) (ex.: outros pesos de categoria), o
+            resultado é (n_cenarios, n_celulas, n_fontes)
+    """
+    if atratividade is None:
+        atratividade = celulas['Atratividade'].to_numpy(dtype=float)
+    atratividade = np.asarray(atratividade, dtype=float)
+    frota = celulas['Frota'].to_numpy(dtype=float)
+    if frota_total is None:
+        frota_total = float(frota.sum())
+    soma_atratividade = atratividade.sum(axis=-1, keepdims=True)
+    if (soma_atratividade > 0).any() and frota_total <= 0:
+        raise ValueError("Sem frota para ratear as viagens de destino: informe a população ou frota_total")
+
+    destino = frota_total * viagens_por_veiculo * atratividade / np.where(soma_atratividade > 0, soma_atratividade, 1.0)
+    return np.stack(
+        np.broadcast_arrays(frota, destino, celulas['Veiculos_Passagem'].to_numpy(dtype=float)), axis=-1
+    )
+
+
+def _probabilidades(probabilidades) -> np.ndarray:
+    """Mapeamento {fonte: p} (fontes ausentes usam DEMANDA_PROB_RECARGA) ou array (n_fontes,) / (n_cenarios, n_fontes)"""
+    if isinstance(probabilidades, Mapping):
+        desconhecidas = set(probabilidades) - set(FONTES)
+        if desconhecidas:
+            raise ValueError(f"Fontes desconhecidas: {sorted(desconhecidas)}")
+        probabilidades = {**DEMANDA_PROB_RECARGA, **probabilidades}
+        return np.array([float(probabilidades.get(fonte, 0.0)) for fonte in FONTES])
+    probabilidades = np.asarray(probabilidades, dtype=float)
+    if probabilidades.shape[-1] != len(FONTES):
+        raise ValueError(f"Esperadas {len(FONTES)} probabilidades por cenário ({', '.join(FONTES)})")
+    return probabilidades
+
+
+def estimar_demanda(
+    celulas: pd.DataFrame,
+    taxas_adocao: Union[float, Sequence[float], np.ndarray] = EV_ADOPTION_RATE,
+    probabilidades: Union[Mapping[str, float], np.ndarray, None] = None,
+    perfis: Optional[np.ndarray] = None,
+    frota_total: Optional[float] = None,
+    viagens_por_veiculo: float = DEMANDA_VIAGENS_POR_VEICULO_DIA,
+    atratividade: Optional[np.ndarray] = None
+) -> DemandaRecarga:
+    """
+    Sessões de recarga esperadas por célula para um ou vários cenários
+
+    Args:
+        celulas: Saída de celulas_demanda
+        taxas_adocao: Fração da frota que é VE; escalar, (n_cenarios,) ou
+            (n_cenarios, n_celulas) para adoção diferente por célula
+        probabilidades: Sessões por VE exposto por dia, por fonte; {fonte: p}
+            (as demais do padrão), (n_fontes,) ou (n_cenarios, n_fontes)
+            (padrão: DEMANDA_PROB_RECARGA)
+        perfis: Distribuição horária de cada fonte, (n_fontes, 24) (padrão: PERFIS_HORARIOS)
+        frota_total, viagens_por_veiculo, atratividade: Ver exposicao
+
+    Returns:
+        DemandaRecarga com n_cenarios = o maior entre taxas, probabilidades e atratividade
+    """
+    expo = exposicao(celulas, frota_total, viagens_por_veiculo, atratividade)
+    expo = expo if expo.ndim == 3 else expo[None]
+    taxas = np.atleast_1d(np.asarray(taxas_adocao, dtype=float))
+    if taxas.ndim == 2 and taxas.shape[1] != len(celulas):
+        raise ValueError(f"Taxas por célula com {taxas.shape[1]} colunas para {len(celulas)} células")
+    if taxas.ndim > 2:
+        raise ValueError("taxas_adocao deve ser escalar, (n_cenarios,) ou (n_cenarios, n_celulas)")
+    prob = np.atleast_2d(_probabilidades({} if probabilidades is None else probabilidades))
+    perfis = PERFIS_HORARIOS if perfis is None else np.asarray(perfis, dtype=float)
+    if perfis.shape != (len(FONTES), 24):
+        raise ValueError(f"perfis deve ter formato ({len(FONTES)}, 24)")
+    perfis = perfis / np.maximum(perfis.sum(axis=1, keepdims=True), 1e-12)
+
+    # (cenário, célula, 1) · (cenário, 1, fonte) · (cenário, célula, fonte)
+    taxa_celula = taxas[:, None, None] if taxas.ndim == 1 else taxas[:, :, None]
+    componentes = taxa_celula * prob[:, None, :] * expo
+    n_cenarios = componentes.shape[0]
+    return DemandaRecarga(
+        cell_id=celulas['cell_id'].to_numpy(),
+        lat=celulas['Lat_Centro'].to_numpy(dtype=float),
+        lng=celulas['Lng_Centro'].to_numpy(dtype=float),
+        taxas=np.broadcast_to(taxas, (n_cenarios,) + taxas.shape[1:]).copy(),
+        componentes=componentes,
+        perfis=perfis
+    )
@@ -0,0 +1,257 @@
+"""
+Superfície de atratividade por densidade de kernel (KDE)
+Os pesos dos POIs são rasterizados numa grade fina e convoluídos com um kernel
+de decaimento via FFT; os máximos locais da superfície servem como candidatos.
+"""
+
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from processamento.geodesia import GRAUS_POR_METRO, bbox_circulo, haversine_um_para_muitos
+from processamento.gravidade import decaimento, score_gravitacional
+from config.settings import DENSIDADE_LARGURA_M, DENSIDADE_TAMANHO_CELULA_M, DENSIDADE_TOP_K
+
+KERNELS = ('gaussiano', 'potencia', 'exponencial', 'corte')
+
+
+@dataclass
+class SuperficieDensidade:
+    """
+    Raster de densidade com georreferência
+
+    valores[i, j] é a célula de linha i (sul -> norte) e coluna j (oeste -> leste),
+    com canto sudoeste em (lat_min + i * lat_step, lng_min + j * lng_step).
+    """
+
+    valores: np.ndarray
+    lat_min: float
+    lng_min: float
+    lat_step: float
+    lng_step: float
+    tamanho_celula_m: float
+
+    @property
+    def formato(self) -> Tuple[int, int]:
+        return self.valores.shape
+
+    @property
+    def bounds(self) -> List[List[float]]:
+        """[[lat_min, lng_min], [lat_max, lng_max]] (formato do folium)"""
+        ny, nx = self.valores.shape
+        return [
+            [self.lat_min, self.lng_min],
+            [self.lat_min + ny * self.lat_step, self.lng_min + nx * self.lng_step]
+        ]
+
+    def centros(self, i: np.ndarray, j: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(lats, lngs) dos centros das células (i, j)"""
+        return (
+            self.lat_min + (np.asarray(i) + 0.5) * self.lat_step,
+            self.lng_min + (np.asarray(j) + 0.5) * self.lng_step
+        )
+
+    def maximos_locais(self, k: int = DENSIDADE_TOP_K, distancia_min_m: Optional[float] = None) -> pd.DataFrame:
+        """
+        Os k maiores máximos locais (vizinhança 3 x 3) da superfície
+
+        Args:
+            k: Número de máximos
+            distancia_min_m: Distância mínima entre máximos escolhidos (supressão gulosa)
+
+        Returns:
+            DataFrame com cell_i, cell_j, Lat, Lng e Densidade, do maior para o menor
+        """
+        v = self.valores
+        borda = np.pad(v, 1, mode='constant', constant_values=-np.inf)
+        vizinhanca = np.full(v.shape, -np.inf)
+        for di in (0, 1, 2):
+            for dj in (0, 1, 2):
+                if di == 1 and dj == 1:
+                    continue
+                np.maximum(vizinhanca, borda[di:di + v.shape[0], dj:dj + v.shape[1]], out=vizinhanca)
+        # O limiar descarta os resíduos numéricos da FFT longe dos POIs
+        limiar = v.max() * 1e-6 if v.size else 0.0
+        i, j = np.nonzero((v >= vizinhanca) & (v > limiar))
+        ordem = np.argsort(-v[i, j], kind='stable')
+        i, j = i[ordem], j[ordem]
+        lats, lngs = self.centros(i, j)
+
+        if distancia_min_m:
+            escolhidos: List[int] = []
+            for idx in range(len(i)):
+                if len(escolhidos) >= k:
+                    break
+                if escolhidos and haversine_um_para_muitos(
+                    lats[idx], lngs[idx], lats[escolhidos], lngs[escolhidos]
+                ).min() < distancia_min_m:
+                    continue
+                escolhidos.append(idx)
+            selecao = np.array(escolhidos, dtype=np.int64)
+        else:
+            selecao = np.arange(min(k, len(i)))
+
+        return pd.DataFrame({
+            'cell_i': i[selecao],
+            'cell_j': j[selecao],
+            'Lat': lats[selecao],
+            'Lng': lngs[selecao],
+            'Densidade': v[i[selecao], j[selecao]]
+        })
+
+
+def _tamanho_fft(n: int) -> int:
+    """Menor tamanho >= n da forma 2^a 3^b 5^c (rápido para a FFT)"""
+    melhor = 1 << (n - 1).bit_length()
+    p5 = 1
+    while p5 < melhor:
+        p35 = p5
+        while p35 < melhor:
+            p = p35
+            while p < n:
+                p *= 2
+            melhor = min(melhor, p)
+            p35 *= 3
+        p5 *= 5
+    return melhor
+
+
+def matriz_kernel(
+    tamanho_celula_m: float,
+    kernel: str = 'gaussiano',
+    largura_m: float = DENSIDADE_LARGURA_M,
+    raio_m: Optional[float] = None
+) -> np.ndarray:
+    """
+    Kernel discreto (2r+1, 2r+1) em células
+
+    'gaussiano' usa desvio padrão `largura_m` (raio padrão 3x a largura); os
+    demais usam os decaimentos de processamento.gravidade com escala/distância
+    mínima `largura_m` (raio padrão 5x a largura).
+    """
+    if kernel not in KERNELS:
+        raise ValueError(f"Kernel desconhecido: {kernel} (use {', '.join(KERNELS)})")
+    if raio_m is None:
+        raio_m = (3 if kernel == 'gaussiano' else 5) * largura_m
+    r = max(1, int(np.ceil(raio_m / tamanho_celula_m)))
+    offsets = np.arange(-r, r + 1) * tamanho_celula_m
+    dist = np.hypot(offsets[:, None], offsets[None, :])
+
+    if kernel == 'gaussiano':
+        pesos = np.exp(-0.5 * (dist / largura_m) ** 2)
+        pesos[dist > raio_m] = 0.0
+    else:
+        pesos = decaimento(dist, modelo=kernel, custo_min=largura_m, escala=largura_m, corte=raio_m)
+    return pesos
+
+
+def superficie_kde(
+    lats: np.ndarray,
+    lngs: np.ndarray,
+    pesos: np.ndarray,
+    bbox: Optional[Tuple[float, float, float, float]] = None,
+    tamanho_celula_m: float = DENSIDADE_TAMANHO_CELULA_M,
+    kernel: str = 'gaussiano',
+    largura_m: float = DENSIDADE_LARGURA_M,
+    raio_kernel_m: Optional[float] = None
+) -> SuperficieDensidade:
+    """
+    Rasteriza os pesos e convolui com o kernel (FFT, custo O(P log P) em pixels)
+
+    Args:
+        lats, lngs, pesos: POIs
+        bbox: (lat_min, lat_max, lng_min, lng_max); padrão: extensão dos POIs
+        tamanho_celula_m: Lado do pixel em metros
+        kernel: 'gaussiano', 'potencia', 'exponencial' ou 'corte'
+        largura_m: Largura de banda do kernel
+        raio_kernel_m: Alcance do kernel (padrão conforme o tipo)
+
+    Returns:
+        SuperficieDensidade (valor = Σ peso_i · K(d), mesma unidade dos pesos)
+    """
+    lats = np.asarray(lats, dtype=float)
+    lngs = np.asarray(lngs, dtype=float)
+    pesos = np.asarray(pesos, dtype=float)
+    if bbox is None:
+        if len(lats) == 0:
+            raise ValueError("Sem POIs e sem bbox para definir a superfície")
+        bbox = (lats.min(), lats.max(), lngs.min(), lngs.max())
+    lat_min, lat_max, lng_min, lng_max = bbox
+
+    lat_ref = (lat_min + lat_max) / 2
+    lat_step = tamanho_celula_m * GRAUS_POR_METRO
+    lng_step = tamanho_celula_m * GRAUS_POR_METRO / np.cos(np.radians(lat_ref))
+    ny = max(1, int(np.ceil((lat_max - lat_min) / lat_step)))
+    nx = max(1, int(np.ceil((lng_max - lng_min) / lng_step)))
+
+    # Rasterização: uma passada de bincount sobre os índices lineares
+    i = np.floor((lats - lat_min) / lat_step).astype(np.int64)
+    j = np.floor((lngs - lng_min) / lng_step).astype(np.int64)
+    dentro = (i >= 0) & (i < ny) & (j >= 0) & (j < nx)
+    raster = np.bincount(
+        i[dentro] * nx + j[dentro], weights=pesos[dentro], minlength=ny * nx
+    ).reshape(ny, nx)
+
+    k = matriz_kernel(tamanho_celula_m, kernel, largura_m, raio_kernel_m)
+    r = k.shape[0] // 2
+    fy = _tamanho_fft(ny + 2 * r)
+    fx = _tamanho_fft(nx + 2 * r)
+    convolucao = np.fft.irfft2(
+        np.fft.rfft2(raster, s=(fy, fx)) * np.fft.rfft2(k, s=(fy, fx)), s=(fy, fx)
+    )[r:r + ny, r:r + nx]
+    # Ruído numérico da FFT pode gerar pequenos negativos
+    np.maximum(convolucao, 0.0, out=convolucao)
+
+    return SuperficieDensidade(
+        valores=convolucao,
+        lat_min=float(lat_min),
+        lng_min=float(lng_min),
+        lat_step=float(lat_step),
+        lng_step=float(lng_step),
+        tamanho_celula_m=float(tamanho_celula_m)
+    )
+
+
+def candidatos_kde(
+    lats: np.ndarray,
+    lngs: np.ndarray,
+    pesos: np.ndarray,
+    lat_centro: float,
+    lng_centro: float,
+    raio_m: float,
+    k: int = DENSIDADE_TOP_K,
+    kernel: str = 'gaussiano',
+    largura_m: float = DENSIDADE_LARGURA_M,
+    tamanho_celula_m: float = DENSIDADE_TAMANHO_CELULA_M
+) -> Tuple[pd.DataFrame, SuperficieDensidade]:
+    """
+    Candidatos nos k maiores máximos locais da superfície de densidade
+
+    Alternativa aos centroides de células: as colunas seguem as de
+    processar_grid_e_centroides (Qtd_POIs e Score_Estimado contam os POIs a
+    até `largura_m` do pico).
+    """
+    superficie = superficie_kde(
+        lats, lngs, pesos,
+        bbox=bbox_circulo(lat_centro, lng_centro, raio_m),
+        tamanho_celula_m=tamanho_celula_m,
+        kernel=kernel,
+        largura_m=largura_m
+    )
+    picos = superficie.maximos_locais(k, distancia_min_m=largura_m)
+
+    qtd = score_gravitacional(lats, lngs, np.ones(len(lats)), picos['Lat'], picos['Lng'],
+                              modelo='corte', corte=largura_m)
+    score = score_gravitacional(lats, lngs, pesos, picos['Lat'], picos['Lng'],
+                                modelo='corte', corte=largura_m)
+    candidatos = pd.DataFrame({
+        'cell_i': picos['cell_i'],
+        'cell_j': picos['cell_j'],
+        'Fator': 1,
+        'Lat_Centroide': picos['Lat'],
+        'Lng_Centroide': picos['Lng'],
+        'Qtd_POIs': np.rint(qtd).astype(np.int64),
+        'Score_Estimado': score,
+        'Densidade': picos['Densidade']
+    })
+    return candidatos, superficie
@@ -0,0 +1,531 @@
+"""
+Atribuição de fluxos de veículos e volume de passagem nos candidatos
+A demanda O-D é lida em lotes e agregada por par; as rotas vêm de um grafo
+viário local (caminhos mínimos, tudo-ou-nada ou incremental com BPR) ou das
+geometrias da Directions API (em cache). Os fluxos ficam em arrays por segmento.
+
+Execução (fora do Streamlit):
+    python -m processamento.fluxo_veiculos --demanda od.parquet --grafo dados/grafo.npz \\
+        --candidatos candidatos.csv --saida volumes.csv
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from googlemaps.convert import decode_polyline
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+from processamento.geodesia import haversine, projetar_utm, zona_utm
+from config.settings import (
+    CONGESTIONAMENTO_MAX_WORKERS,
+    FLUXO_BPR_ALFA,
+    FLUXO_BPR_BETA,
+    FLUXO_DIST_MAX_NO_M,
+    FLUXO_INCREMENTOS,
+    FLUXO_MAX_ROTAS_DIRECTIONS,
+    FLUXO_PRECISAO_DIRECTIONS,
+    FLUXO_RAIO_PASSAGEM_M,
+    FLUXO_TAMANHO_LOTE
+)
+
+COLUNAS_DEMANDA = ['origem_lat', 'origem_lng', 'destino_lat', 'destino_lng']
+
+# Vértices das polylines (precisão 1e-5) empacotados num inteiro
+_ESCALA_VERTICE = 100_000
+_LNG_VALORES = 36_000_001
+
+
+# --- DEMANDA ---
+def ler_demanda(caminho: Path, tamanho_lote: int = FLUXO_TAMANHO_LOTE) -> Iterator[pd.DataFrame]:
+    """
+    Lê a tabela O-D (CSV ou Parquet) em lotes
+
+    Colunas: origem_lat, origem_lng, destino_lat, destino_lng e, opcional,
+    viagens (sem ela, cada linha é uma viagem).
+    """
+    caminho = Path(caminho)
+    if caminho.suffix.lower() == '.parquet':
+        arquivo = pq.ParquetFile(caminho)
+        colunas = COLUNAS_DEMANDA + (['viagens'] if 'viagens' in arquivo.schema_arrow.names else [])
+        for lote in arquivo.iter_batches(batch_size=tamanho_lote, columns=colunas):
+            yield lote.to_pandas()
+    else:
+        yield from pd.read_csv(
+            caminho, chunksize=tamanho_lote,
+            usecols=lambda c: c in COLUNAS_DEMANDA or c == 'viagens'
+        )
+
+
+def _viagens(lote: pd.DataFrame) -> np.ndarray:
+    if 'viagens' in lote:
+        return lote['viagens'].to_numpy(dtype=float)
+    return np.ones(len(lote))
+
+
+class _AcumuladorPares:
+    """Soma de viagens por par de chaves inteiras, compactada a cada poucos lotes"""
+
+    def __init__(self, compactar_a_cada: int = 8):
+        self.compactar_a_cada = compactar_a_cada
+        self._chaves: List[np.ndarray] = []
+        self._pesos: List[np.ndarray] = []
+
+    def adicionar(self, chaves: np.ndarray, pesos: np.ndarray):
+        if len(chaves) == 0:
+            return
+        unicas, inverso = np.unique(chaves, axis=0, return_inverse=True)
+        self._chaves.append(unicas)
+        self._pesos.append(np.bincount(inverso.ravel(), weights=pesos, minlength=len(unicas)))
+        if len(self._chaves) >= self.compactar_a_cada:
+            self._compactar()
+
+    def _compactar(self):
+        chaves = np.concatenate(self._chaves)
+        pesos = np.concatenate(self._pesos)
+        unicas, inverso = np.unique(chaves, axis=0, return_inverse=True)
+        self._chaves = [unicas]
+        self._pesos = [np.bincount(inverso.ravel(), weights=pesos, minlength=len(unicas))]
+
+    def resultado(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(chaves (n, 2), viagens (n,))"""
+        if not self._chaves:
+            return np.empty((0, 2), dtype=np.int64), np.empty(0)
+        self._compactar()
+        return self._chaves[0], self._pesos[0]
+
+
+# --- RESULTADO ---
+@dataclass
+class FluxosSegmentos:
+    """Fluxo (viagens nos dois sentidos) em cada segmento de via"""
+
+    lat_a: np.ndarray
+    lng_a: np.ndarray
+    lat_b: np.ndarray
+    lng_b: np.ndarray
+    fluxo: np.ndarray
+    viagens_atribuidas: float
+    viagens_nao_atribuidas: float
+
+    def __len__(self) -> int:
+        return len(self.fluxo)
+
+    def maiores(self, n: int = 20) -> pd.DataFrame:
+        """Os n segmentos com maior fluxo"""
+        ordem = np.argsort(-self.fluxo, kind='stable')[:n]
+        return pd.DataFrame({
+            'Lat_A': self.lat_a[ordem], 'Lng_A': self.lng_a[ordem],
+            'Lat_B': self.lat_b[ordem], 'Lng_B': self.lng_b[ordem],
+            'Fluxo': self.fluxo[ordem]
+        })
+
+
+def volumes_candidatos(
+    fluxos: FluxosSegmentos,
+    lats_cand: np.ndarray,
+    lngs_cand: np.ndarray,
+    raio_m: float = FLUXO_RAIO_PASSAGEM_M
+) -> pd.DataFrame:
+    """
+    Volume de passagem em cada candidato
+
+    Volume_Passagem é o maior fluxo entre os segmentos a até `raio_m` do
+    candidato (a via mais movimentada em frente ao local); somar os segmentos
+    contaria a mesma viagem várias vezes.
+
+    Returns:
+        DataFrame com Volume_Passagem, Segmentos_Proximos e Distancia_Via_m (NaN sem via no raio)
+    """
+    lats_cand = np.asarray(lats_cand, dtype=float)
+    lngs_cand = np.asarray(lngs_cand, dtype=float)
+    volume = np.zeros(len(lats_cand))
+    contagem = np.zeros(len(lats_cand), dtype=np.int64)
+    distancia = np.full(len(lats_cand), np.inf)
+    if len(fluxos) == 0 or len(lats_cand) == 0:
+        return pd.DataFrame({
+            'Volume_Passagem': volume, 'Segmentos_Proximos': contagem, 'Distancia_Via_m': np.nan
+        })
+
+    zona = zona_utm(float(np.mean(lngs_cand)))
+    sul = bool(np.mean(lats_cand) < 0)
+    ax, ay = projetar_utm(fluxos.lat_a, fluxos.lng_a, zona, sul)
+    bx, by = projetar_utm(fluxos.lat_b, fluxos.lng_b, zona, sul)
+    cx, cy = projetar_utm(lats_cand, lngs_cand, zona, sul)
+
+    # Segmentos longos viram amostras a cada raio_m (o índice fica só com pontos)
+    comprimento = np.hypot(bx - ax, by - ay)
+    n_amostras = np.ceil(comprimento / raio_m).astype(np.int64) + 1
+    segmento = np.repeat(np.arange(len(fluxos)), n_amostras)
+    inicio = np.repeat(np.cumsum(n_amostras) - n_amostras, n_amostras)
+    t = (np.arange(len(segmento)) - inicio) / np.maximum(n_amostras[segmento] - 1, 1)
+    amostras = np.column_stack([
+        ax[segmento] + t * (bx[segmento] - ax[segmento]),
+        ay[segmento] + t * (by[segmento] - ay[segmento])
+    ])
+
+    # Pares (candidato, segmento) próximos; a distância exata é ponto-segmento
+    vizinhos = cKDTree(amostras).query_ball_point(np.column_stack([cx, cy]), r=1.5 * raio_m)
+    cand = np.repeat(np.arange(len(cx)), [len(v) for v in vizinhos])
+    seg = segmento[np.concatenate([np.asarray(v, dtype=np.int64) for v in vizinhos])] if len(cand) else cand
+    chave = np.unique(cand * len(fluxos) + seg)
+    cand, seg = chave // len(fluxos), chave % len(fluxos)
+
+    dx, dy = bx[seg] - ax[seg], by[seg] - ay[seg]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        u = np.clip(((cx[cand] - ax[seg]) * dx + (cy[cand] - ay[seg]) * dy) / (dx * dx + dy * dy), 0, 1)
+    u = np.nan_to_num(u)
+    d = np.hypot(ax[seg] + u * dx - cx[cand], ay[seg] + u * dy - cy[cand])
+    perto = d <= raio_m
+    cand, seg, d = cand[perto], seg[perto], d[perto]
+
+    np.maximum.at(volume, cand, fluxos.fluxo[seg])
+    np.minimum.at(distancia, cand, d)
+    contagem += np.bincount(cand, minlength=len(cx))
+    return pd.DataFrame({
+        'Volume_Passagem': volume,
+        'Segmentos_Proximos': contagem,
+        'Distancia_Via_m': np.where(np.isfinite(distancia), distancia, np.nan)
+    })
+
+
+# --- GRAFO VIÁRIO LOCAL ---
+@dataclass
+class GrafoViario:
+    """
+    Grafo dirigido de vias (nós com coordenadas e arestas com custo)
+
+    custo em segundos (ou metros); capacidade em viagens no período da
+    demanda, necessária só na atribuição incremental.
+    """
+
+    lat: np.ndarray
+    lng: np.ndarray
+    origem: np.ndarray
+    destino: np.ndarray
+    custo: np.ndarray
+    capacidade: Optional[np.ndarray] = None
+
+    @property
+    def n_nos(self) -> int:
+        return len(self.lat)
+
+    @classmethod
+    def de_arestas(
+        cls,
+        lat_a: np.ndarray,
+        lng_a: np.ndarray,
+        lat_b: np.ndarray,
+        lng_b: np.ndarray,
+        custo: Optional[np.ndarray] = None,
+        capacidade: Optional[np.ndarray] = None,
+        mao_dupla: bool = True
+    ) -> 'GrafoViario':
+        """
+        Monta o grafo a partir de segmentos (pontas iguais a 1e-5 grau viram o mesmo nó)
+
+        Args:
+            custo: Custo de cada segmento (padrão: comprimento em metros)
+            mao_dupla: Cria também a aresta b -> a
+        """
+        lat_a, lng_a, lat_b, lng_b = (np.asarray(v, dtype=float) for v in (lat_a, lng_a, lat_b, lng_b))
+        if custo is None:
+            custo = haversine(lat_a, lng_a, lat_b, lng_b)
+        custo = np.asarray(custo, dtype=float)
+        capacidade = None if capacidade is None else np.asarray(capacidade, dtype=float)
+
+        chaves = _chave_vertice(np.concatenate([lat_a, lat_b]), np.concatenate([lng_a, lng_b]))
+        unicas, inverso = np.unique(chaves, return_inverse=True)
+        n = len(lat_a)
+        origem, destino = inverso[:n], inverso[n:]
+        if mao_dupla:
+            origem, destino = np.concatenate([origem, destino]), np.concatenate([destino, origem])
+            custo = np.concatenate([custo, custo])
+            capacidade = None if capacidade is None else np.concatenate([capacidade, capacidade])
+
+        # Arestas paralelas: fica a de menor custo; laços são descartados
+        ordem = np.lexsort((custo, destino, origem))
+        origem, destino, custo = origem[ordem], destino[ordem], custo[ordem]
+        primeira = np.ones(len(ordem), dtype=bool)
+        primeira[1:] = (origem[1:] != origem[:-1]) | (destino[1:] != destino[:-1])
+        manter = primeira & (origem != destino)
+        lat, lng = _vertice_coordenadas(unicas)
+        return cls(
+            lat=lat,
+            lng=lng,
+            origem=origem[manter].astype(np.int64),
+            destino=destino[manter].astype(np.int64),
+            custo=np.maximum(custo[manter], 1e-6),
+            capacidade=None if capacidade is None else capacidade[ordem][manter]
+        )
+
+    @classmethod
+    def carregar(cls, caminho: Path) -> 'GrafoViario':
+        """Lê o grafo de um arquivo .npz"""
+        with np.load(caminho) as dados:
+            return cls(
+                lat=dados['lat'], lng=dados['lng'],
+                origem=dados['origem'], destino=dados['destino'], custo=dados['custo'],
+                capacidade=dados['capacidade'] if 'capacidade' in dados else None
+            )
+
+    def salvar(self, caminho: Path):
+        """Grava o grafo num arquivo .npz"""
+        extras = {} if self.capacidade is None else {'capacidade': self.capacidade}
+        np.savez_compressed(
+            caminho, lat=self.lat, lng=self.lng,
+            origem=self.origem, destino=self.destino, custo=self.custo, **extras
+        )
+
+    def nos_proximos(self, lats: np.ndarray, lngs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(nó mais próximo, distância em metros) de cada ponto"""
+        if not hasattr(self, '_indice'):
+            self._zona = zona_utm(float(np.mean(self.lng)))
+            self._sul = bool(np.mean(self.lat) < 0)
+            self._indice = cKDTree(np.column_stack(projetar_utm(self.lat, self.lng, self._zona, self._sul)))
+        x, y = projetar_utm(lats, lngs, self._zona, self._sul)
+        distancia, no = self._indice.query(np.column_stack([x, y]))
+        return no.astype(np.int64), distancia
+
+
+def _chave_vertice(lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    lat_q = np.round(np.asarray(lats) * _ESCALA_VERTICE).astype(np.int64)
+    lng_q = np.round(np.asarray(lngs) * _ESCALA_VERTICE).astype(np.int64)
+    return (lat_q + 90 * _ESCALA_VERTICE) * _LNG_VALORES + (lng_q + 180 * _ESCALA_VERTICE)
+
+
+def _vertice_coordenadas(chaves: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    lat_q, lng_q = np.divmod(chaves, _LNG_VALORES)
+    return (lat_q - 90 * _ESCALA_VERTICE) / _ESCALA_VERTICE, (lng_q - 180 * _ESCALA_VERTICE) / _ESCALA_VERTICE
+
+
+def acumular_arvore(predecessores: np.ndarray, demanda_nos: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    Fluxo que entra em cada nó pela árvore de caminhos mínimos de uma origem
+
+    O fluxo de um nó é a demanda da sua subárvore; os níveis da árvore são
+    percorridos do mais profundo para a raiz, cada um numa operação vetorizada.
+
+    Returns:
+        (fluxo na aresta predecessor[v] -> v para cada nó v, demanda sem caminho)
+    """
+    n = len(predecessores)
+    alcancado = predecessores >= 0
+    sem_caminho = float(demanda_nos[~alcancado & (demanda_nos > 0)].sum())
+
+    # Profundidade por saltos de ponteiro (O(log profundidade) passadas)
+    ancestral = np.where(alcancado, predecessores, np.arange(n))
+    profundidade = alcancado.astype(np.int64)
+    while True:
+        proximo = ancestral[ancestral]
+        if np.array_equal(proximo, ancestral):
+            break
+        profundidade += profundidade[ancestral]
+        ancestral = proximo
+
+    acumulado = np.where(alcancado, demanda_nos, 0.0)
+    nos = np.flatnonzero(alcancado)
+    nos = nos[np.argsort(-profundidade[nos], kind='stable')]
+    limites = np.flatnonzero(np.diff(profundidade[nos])) + 1
+    for nivel in np.split(nos, limites):
+        nivel = nivel[acumulado[nivel] > 0]
+        np.add.at(acumulado, predecessores[nivel], acumulado[nivel])
+    # A origem (predecessor negativo) não tem aresta de entrada
+    return np.where(alcancado, acumulado, 0.0), sem_caminho
+
+
+def atribuir_fluxos_grafo(
+    grafo: GrafoViario,
+    demanda: Iterable[pd.DataFrame],
+    incremental: bool = False,
+    incrementos: Sequence[float] = FLUXO_INCREMENTOS,
+    dist_max_no_m: float = FLUXO_DIST_MAX_NO_M,
+    origens_por_lote: int = 64
+) -> FluxosSegmentos:
+    """
+    Atribuição tudo-ou-nada (ou incremental com atraso BPR) no grafo local
+
+    Args:
+        demanda: Lotes da tabela O-D (ex: ler_demanda(caminho))
+        incremental: Divide a demanda em `incrementos`, recalculando os custos
+            pela função BPR (requer grafo.capacidade) entre as etapas
+        dist_max_no_m: Viagens com ponta mais longe que isso de um nó não são atribuídas
+        origens_por_lote: Origens por chamada do Dijkstra (memória: lote x nós)
+    """
+    if incremental and grafo.capacidade is None:
+        raise ValueError("Atribuição incremental requer capacidade nas arestas")
+
+    # 1. Demanda agregada por par de nós (lotes em streaming)
+    acumulador = _AcumuladorPares()
+    fora_da_rede = 0.0
+    for lote in demanda:
+        viagens = _viagens(lote)
+        no_o, dist_o = grafo.nos_proximos(lote['origem_lat'].to_numpy(), lote['origem_lng'].to_numpy())
+        no_d, dist_d = grafo.nos_proximos(lote['destino_lat'].to_numpy(), lote['destino_lng'].to_numpy())
+        perto = (dist_o <= dist_max_no_m) & (dist_d <= dist_max_no_m)
+        fora_da_rede += float(viagens[~perto].sum())
+        acumulador.adicionar(np.column_stack([no_o[perto], no_d[perto]]), viagens[perto])
+    pares, viagens_par = acumulador.resultado()
+    intrazonais = pares[:, 0] == pares[:, 1]
+    viagens_intrazonais = float(viagens_par[intrazonais].sum())
+    pares, viagens_par = pares[~intrazonais], viagens_par[~intrazonais]
+
+    n = grafo.n_nos
+    chaves_arestas = grafo.origem * n + grafo.destino   # já ordenadas por (origem, destino)
+    fluxo = np.zeros(len(grafo.custo))
+    custo = grafo.custo.copy()
+    sem_caminho = 0.0
+
+    # 2. Uma árvore de caminhos mínimos por origem, em lotes de origens
+    origens, inicio = np.unique(pares[:, 0], return_index=True)
+    fim = np.append(inicio[1:], len(pares))
+    for fracao in (incrementos if incremental else (1.0,)):
+        matriz = csr_matrix((custo, (grafo.origem, grafo.destino)), shape=(n, n))
+        for k0 in range(0, len(origens), origens_por_lote):
+            lote = slice(k0, k0 + origens_por_lote)
+            _, predecessores = dijkstra(matriz, directed=True, indices=origens[lote], return_predecessors=True)
+            for linha, a, b in zip(predecessores, inicio[lote], fim[lote]):
+                demanda_nos = np.bincount(pares[a:b, 1], weights=viagens_par[a:b] * fracao, minlength=n)
+                fluxo_nos, perdido = acumular_arvore(linha, demanda_nos)
+                sem_caminho += perdido
+                v = np.flatnonzero(fluxo_nos > 0)
+                fluxo[np.searchsorted(chaves_arestas, linha[v] * n + v)] += fluxo_nos[v]
+        if incremental:
+            custo = grafo.custo * (1 + FLUXO_BPR_ALFA * (fluxo / grafo.capacidade) ** FLUXO_BPR_BETA)
+        print(f"→ Atribuição: {fracao:.0%} da demanda ({len(origens)} origens)")
+
+    # 3. Arestas dos dois sentidos somadas num segmento
+    a = np.minimum(grafo.origem, grafo.destino)
+    b = np.maximum(grafo.origem, grafo.destino)
+    usados = fluxo > 0
+    segmentos, inverso = np.unique(np.column_stack([a[usados], b[usados]]), axis=0, return_inverse=True)
+    fluxo_segmento = np.bincount(inverso.ravel(), weights=fluxo[usados], minlength=len(segmentos))
+
+    total = float(viagens_par.sum())
+    print(f"✓ Atribuição: {total - sem_caminho:.0f} viagens em {len(segmentos)} segmentos")
+    return FluxosSegmentos(
+        lat_a=grafo.lat[segmentos[:, 0]], lng_a=grafo.lng[segmentos[:, 0]],
+        lat_b=grafo.lat[segmentos[:, 1]], lng_b=grafo.lng[segmentos[:, 1]],
+        fluxo=fluxo_segmento,
+        viagens_atribuidas=total - sem_caminho,
+        viagens_nao_atribuidas=fora_da_rede + viagens_intrazonais + sem_caminho
+    )
+
+
+# --- ROTAS DA DIRECTIONS API ---
+def atribuir_fluxos_directions(
+    demanda: Iterable[pd.DataFrame],
+    precisao: int = FLUXO_PRECISAO_DIRECTIONS,
+    max_rotas: int = FLUXO_MAX_ROTAS_DIRECTIONS,
+    max_workers: int = CONGESTIONAMENTO_MAX_WORKERS
+) -> FluxosSegmentos:
+    """
+    Atribuição tudo-ou-nada sobre as geometrias da Directions API
+
+    As pontas das viagens são arredondadas em `precisao` casas decimais, de
+    modo que viagens próximas compartilham a mesma rota (e o mesmo cache).
+    Só os `max_rotas` pares com mais viagens são consultados.
+    """
+    from api.directions import get_directions_client
+
+    escala = 10 ** precisao
+    acumulador = _AcumuladorPares()
+    for lote in demanda:
+        origem = _chave_vertice(
+            np.round(lote['origem_lat'].to_numpy() * escala) / escala,
+            np.round(lote['origem_lng'].to_numpy() * escala) / escala
+        )
+        destino = _chave_vertice(
+            np.round(lote['destino_lat'].to_numpy() * escala) / escala,
+            np.round(lote['destino_lng'].to_numpy() * escala) / escala
+        )
+        acumulador.adicionar(np.column_stack([origem, destino]), _viagens(lote))
+    pares, viagens_par = acumulador.resultado()
+
+    total = float(viagens_par.sum())
+    ordem = np.argsort(-viagens_par, kind='stable')
+    escolhidos = ordem[:max_rotas]
+    escolhidos = escolhidos[pares[escolhidos, 0] != pares[escolhidos, 1]]
+    if len(pares) > max_rotas:
+        print(f"→ Atribuição: {len(pares)} pares O-D; consultando os {max_rotas} com mais viagens")
+
+    lat_o, lng_o = _vertice_coordenadas(pares[escolhidos, 0])
+    lat_d, lng_d = _vertice_coordenadas(pares[escolhidos, 1])
+    cliente = get_directions_client()
+
+    def rota(k: int) -> np.ndarray:
+        try:
+            resultado = cliente.calcular_rota((lat_o[k], lng_o[k]), (lat_d[k], lng_d[k]))
+        except Exception as e:
+            print(f"✗ Atribuição: falha na rota {k}: {e}")
+            return np.empty(0, dtype=np.int64)
+        if not resultado:
+            return np.empty(0, dtype=np.int64)
+        pontos = decode_polyline(resultado['polyline'])
+        return _chave_vertice([p['lat'] for p in pontos], [p['lng'] for p in pontos])
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        vertices = list(executor.map(rota, range(len(escolhidos))))
+
+    # Segmentos de todas as rotas de uma vez (sem sentido, vértices repetidos removidos)
+    a, b, pesos = [], [], []
+    atribuidas = 0.0
+    for k, v in enumerate(vertices):
+        v = v[np.r_[True, v[1:] != v[:-1]]] if len(v) else v
+        if len(v) < 2:
+            continue
+        a.append(np.minimum(v[:-1], v[1:]))
+        b.append(np.maximum(v[:-1], v[1:]))
+        pesos.append(np.full(len(v) - 1, viagens_par[escolhidos[k]]))
+        atribuidas += float(viagens_par[escolhidos[k]])
+
+    if a:
+        segmentos, inverso = np.unique(
+            np.column_stack([np.concatenate(a), np.concatenate(b)]), axis=0, return_inverse=True
+        )
+        fluxo = np.bincount(inverso.ravel(), weights=np.concatenate(pesos), minlength=len(segmentos))
+    else:
+        segmentos, fluxo = np.empty((0, 2), dtype=np.int64), np.empty(0)
+
+    lat_a, lng_a = _vertice_coordenadas(segmentos[:, 0])
+    lat_b, lng_b = _vertice_coordenadas(segmentos[:, 1])
+    print(f"✓ Atribuição: {atribuidas:.0f} de {total:.0f} viagens em {len(segmentos)} segmentos")
+    return FluxosSegmentos(
+        lat_a=lat_a, lng_a=lng_a, lat_b=lat_b, lng_b=lng_b,
+        fluxo=fluxo,
+        viagens_atribuidas=atribuidas,
+        viagens_nao_atribuidas=total - atribuidas
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Ponto de entrada da linha de comando"""
+    parser = argparse.ArgumentParser(description="Atribuição de fluxos e volume de passagem nos candidatos")
+    parser.add_argument('--demanda', type=Path, required=True, help="Tabela O-D (CSV ou Parquet)")
+    parser.add_argument('--grafo', type=Path, help="Grafo viário .npz (sem ele, usa a Directions API)")
+    parser.add_argument('--incremental', action='store_true', help="Atribuição incremental (BPR)")
+    parser.add_argument('--candidatos', type=Path, required=True, help="CSV com colunas Lat e Lng")
+    parser.add_argument('--raio', type=float, default=FLUXO_RAIO_PASSAGEM_M)
+    parser.add_argument('--saida', type=Path, default=Path('volumes_candidatos.csv'))
+    args = parser.parse_args(argv)
+
+    demanda = ler_demanda(args.demanda)
+    if args.grafo:
+        fluxos = atribuir_fluxos_grafo(GrafoViario.carregar(args.grafo), demanda, incremental=args.incremental)
+    else:
+        fluxos = atribuir_fluxos_directions(demanda)
+
+    candidatos = pd.read_csv(args.candidatos)
+    volumes = volumes_candidatos(fluxos, candidatos['Lat'].to_numpy(), candidatos['Lng'].to_numpy(), args.raio)
+    pd.concat([candidatos, volumes], axis=1).to_csv(args.saida, index=False)
+    print(f"✓ Volumes de {len(candidatos)} candidatos gravados em {args.saida}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,235 @@
+"""
+Funções geodésicas vetorizadas (NumPy)
+Distâncias Haversine, caixas delimitadoras e máscaras de raio compartilhadas pelos módulos
+"""
+
+from typing import Iterator, Tuple
+import numpy as np
+
+RAIO_TERRA_M = 6371000.0                          # Raio médio da Terra em metros
+GRAUS_POR_METRO = 180.0 / (np.pi * RAIO_TERRA_M)  # Arco de 1 m sobre a esfera de RAIO_TERRA_M
+_FOLGA_BBOX = 1.001                               # Margem relativa da caixa (arredondamentos na borda)
+
+
+def haversine(lat1, lng1, lat2, lng2) -> np.ndarray:
+    """
+    Distância Haversine em metros, com broadcasting do NumPy
+
+    Aceita escalares ou arrays (em graus) de formatos compatíveis.
+    """
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    delta_phi = phi2 - phi1
+    delta_lambda = np.radians(np.subtract(lng2, lng1))
+
+    a = np.sin(delta_phi / 2.0) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(delta_lambda / 2.0) ** 2
+    return 2.0 * RAIO_TERRA_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def haversine_um_para_muitos(
+    lat: float,
+    lng: float,
+    lats: np.ndarray,
+    lngs: np.ndarray
+) -> np.ndarray:
+    """Distâncias (m) de um ponto para N pontos -> array (N,)"""
+    return haversine(lat, lng, np.asarray(lats, dtype=float), np.asarray(lngs, dtype=float))
+
+
+def haversine_muitos_para_muitos(
+    lats1: np.ndarray,
+    lngs1: np.ndarray,
+    lats2: np.ndarray,
+    lngs2: np.ndarray
+) -> np.ndarray:
+    """Matriz de distâncias (m) entre N e M pontos -> array (N, M)"""
+    # Senos e cossenos dos meio-ângulos calculados uma vez por ponto; na matriz
+    # sobram apenas produtos (sin((b-a)/2) = sin(b/2)cos(a/2) - cos(b/2)sin(a/2))
+    meio_phi1 = np.radians(np.asarray(lats1, dtype=float))[:, None] / 2.0
+    meio_lam1 = np.radians(np.asarray(lngs1, dtype=float))[:, None] / 2.0
+    meio_phi2 = np.radians(np.asarray(lats2, dtype=float))[None, :] / 2.0
+    meio_lam2 = np.radians(np.asarray(lngs2, dtype=float))[None, :] / 2.0
+
+    sen_dphi = np.sin(meio_phi2) * np.cos(meio_phi1) - np.cos(meio_phi2) * np.sin(meio_phi1)
+    sen_dlam = np.sin(meio_lam2) * np.cos(meio_lam1) - np.cos(meio_lam2) * np.sin(meio_lam1)
+    cos_phi1 = np.cos(2.0 * meio_phi1)
+    cos_phi2 = np.cos(2.0 * meio_phi2)
+
+    a = sen_dphi * sen_dphi
+    a += (cos_phi1 * cos_phi2) * (sen_dlam * sen_dlam)
+    np.clip(a, 0.0, 1.0, out=a)
+    np.sqrt(a, out=a)
+    np.arcsin(a, out=a)
+    a *= 2.0 * RAIO_TERRA_M
+    return a
+
+
+def haversine_em_blocos(
+    lats1: np.ndarray,
+    lngs1: np.ndarray,
+    lats2: np.ndarray,
+    lngs2: np.ndarray,
+    memoria_max_mb: float = 256.0
+) -> Iterator[Tuple[slice, np.ndarray]]:
+    """
+    Matriz de distâncias N x M calculada em blocos de linhas
+
+    Cada bloco respeita o limite de memória (considerando os temporários do
+    cálculo). Gera tuplas (fatia_das_linhas, bloco (n_bloco, M)).
+    """
+    lats1 = np.asarray(lats1, dtype=float)
+    lngs1 = np.asarray(lngs1, dtype=float)
+    lats2 = np.asarray(lats2, dtype=float)
+    lngs2 = np.asarray(lngs2, dtype=float)
+
+    m = max(len(lats2), 1)
+    # ~4 matrizes float64 temporárias vivas por bloco
+    linhas = max(1, int(memoria_max_mb * 1024 * 1024 // (4 * 8 * m)))
+
+    for inicio in range(0, len(lats1), linhas):
+        fatia = slice(inicio, min(inicio + linhas, len(lats1)))
+        yield fatia, haversine_muitos_para_muitos(lats1[fatia], lngs1[fatia], lats2, lngs2)
+
+
+def bbox_circulo(lat: float, lng: float, raio_m: float) -> Tuple[float, float, float, float]:
+    """
+    Caixa delimitadora (lat_min, lat_max, lng_min, lng_max) de um círculo
+
+    Usa a mesma esfera da Haversine: a meia-altura é o arco raio/R e a
+    meia-largura é o maior afastamento em longitude do círculo,
+    asin(sin(raio/R) / cos(lat)), ambos com uma pequena folga. Assim todo
+    ponto a até raio_m (Haversine) está dentro da caixa.
+    """
+    delta = raio_m / RAIO_TERRA_M
+    d_lat = np.degrees(delta) * _FOLGA_BBOX
+    seno = np.sin(min(delta, np.pi / 2)) / max(np.cos(np.radians(lat)), 1e-12)
+    d_lng = 180.0 if seno >= 1.0 else min(np.degrees(np.arcsin(seno)) * _FOLGA_BBOX, 180.0)
+    return lat - d_lat, lat + d_lat, lng - d_lng, lng + d_lng
+
+
+def mascara_bbox(
+    lats: np.ndarray,
+    lngs: np.ndarray,
+    bbox: Tuple[float, float, float, float]
+) -> np.ndarray:
+    """Máscara booleana dos pontos dentro da caixa (lat_min, lat_max, lng_min, lng_max)"""
+    lat_min, lat_max, lng_min, lng_max = bbox
+    lats = np.asarray(lats, dtype=float)
+    lngs = np.asarray(lngs, dtype=float)
+    return (lats >= lat_min) & (lats <= lat_max) & (lngs >= lng_min) & (lngs <= lng_max)
+
+
+def mascara_raio(
+    lat: float,
+    lng: float,
+    lats: np.ndarray,
+    lngs: np.ndarray,
+    raio_m: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pontos dentro de um raio (filtro estrito Haversine com pré-filtro por caixa)
+
+    Returns:
+        (máscara booleana (N,), distâncias em metros (N,); NaN fora da caixa)
+    """
+    lats = np.asarray(lats, dtype=float)
+    lngs = np.asarray(lngs, dtype=float)
+
+    na_caixa = mascara_bbox(lats, lngs, bbox_circulo(lat, lng, raio_m))
+    distancias = np.full(lats.shape, np.nan)
+    distancias[na_caixa] = haversine_um_para_muitos(lat, lng, lats[na_caixa], lngs[na_caixa])
+
+    mascara = np.zeros(lats.shape, dtype=bool)
+    mascara[na_caixa] = distancias[na_caixa] <= raio_m
+    return mascara, distancias
+
+
+# --- PROJEÇÃO UTM (WGS84) ---
+_WGS84_A = 6378137.0
+_WGS84_F = 1 / 298.257223563
+_UTM_K0 = 0.9996
+_UTM_FALSO_LESTE = 500000.0
+_UTM_FALSO_NORTE_SUL = 10000000.0
+
+
+def zona_utm(lng: float) -> int:
+    """Zona UTM (1-60) de uma longitude"""
+    return int(np.clip(np.floor((lng + 180.0) / 6.0) + 1, 1, 60))
+
+
+def _constantes_utm():
+    e2 = _WGS84_F * (2 - _WGS84_F)
+    return e2, e2 / (1 - e2)
+
+
+def projetar_utm(lats, lngs, zona: int, sul: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Coordenadas UTM (x, y) em metros (fórmulas de Snyder, WGS84)
+
+    Precisão milimétrica dentro da zona; fora dela (até alguns graus do
+    meridiano central) a escala continua adequada para agregações locais.
+    """
+    e2, ep2 = _constantes_utm()
+    phi = np.radians(np.asarray(lats, dtype=float))
+    lam = np.radians(np.asarray(lngs, dtype=float))
+    lam0 = np.radians((zona - 1) * 6 - 180 + 3)
+
+    sen, cos, tan = np.sin(phi), np.cos(phi), np.tan(phi)
+    n = _WGS84_A / np.sqrt(1 - e2 * sen ** 2)
+    t = tan ** 2
+    c = ep2 * cos ** 2
+    a = cos * (lam - lam0)
+    m = _WGS84_A * (
+        (1 - e2 / 4 - 3 * e2 ** 2 / 64 - 5 * e2 ** 3 / 256) * phi
+        - (3 * e2 / 8 + 3 * e2 ** 2 / 32 + 45 * e2 ** 3 / 1024) * np.sin(2 * phi)
+        + (15 * e2 ** 2 / 256 + 45 * e2 ** 3 / 1024) * np.sin(4 * phi)
+        - (35 * e2 ** 3 / 3072) * np.sin(6 * phi)
+    )
+
+    x = _UTM_K0 * n * (
+        a + (1 - t + c) * a ** 3 / 6
+        + (5 - 18 * t + t ** 2 + 72 * c - 58 * ep2) * a ** 5 / 120
+    ) + _UTM_FALSO_LESTE
+    y = _UTM_K0 * (m + n * tan * (
+        a ** 2 / 2 + (5 - t + 9 * c + 4 * c ** 2) * a ** 4 / 24
+        + (61 - 58 * t + t ** 2 + 600 * c - 330 * ep2) * a ** 6 / 720
+    ))
+    if sul:
+        y = y + _UTM_FALSO_NORTE_SUL
+    return x, y
+
+
+def desprojetar_utm(x, y, zona: int, sul: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """Inversa de projetar_utm -> (lats, lngs) em graus"""
+    e2, ep2 = _constantes_utm()
+    x = np.asarray(x, dtype=float) - _UTM_FALSO_LESTE
+    y = np.asarray(y, dtype=float) - (_UTM_FALSO_NORTE_SUL if sul else 0.0)
+    lam0 = np.radians((zona - 1) * 6 - 180 + 3)
+
+    m = y / _UTM_K0
+    mu = m / (_WGS84_A * (1 - e2 / 4 - 3 * e2 ** 2 / 64 - 5 * e2 ** 3 / 256))
+    e1 = (1 - np.sqrt(1 - e2)) / (1 + np.sqrt(1 - e2))
+    phi1 = (
+        mu + (3 * e1 / 2 - 27 * e1 ** 3 / 32) * np.sin(2 * mu)
+        + (21 * e1 ** 2 / 16 - 55 * e1 ** 4 / 32) * np.sin(4 * mu)
+        + (151 * e1 ** 3 / 96) * np.sin(6 * mu)
+        + (1097 * e1 ** 4 / 512) * np.sin(8 * mu)
+    )
+
+    sen, cos, tan = np.sin(phi1), np.cos(phi1), np.tan(phi1)
+    c1 = ep2 * cos ** 2
+    t1 = tan ** 2
+    n1 = _WGS84_A / np.sqrt(1 - e2 * sen ** 2)
+    r1 = _WGS84_A * (1 - e2) / (1 - e2 * sen ** 2) ** 1.5
+    d = x / (n1 * _UTM_K0)
+
+    phi = phi1 - (n1 * tan / r1) * (
+        d ** 2 / 2
+        - (5 + 3 * t1 + 10 * c1 - 4 * c1 ** 2 - 9 * ep2) * d ** 4 / 24
+        + (61 + 90 * t1 + 298 * c1 + 45 * t1 ** 2 - 252 * ep2 - 3 * c1 ** 2) * d ** 6 / 720
+    )
+    lam = lam0 + (
+        d - (1 + 2 * t1 + c1) * d ** 3 / 6
+        + (5 - 2 * c1 + 28 * t1 - 3 * c1 ** 2 + 8 * ep2 + 24 * t1 ** 2) * d ** 5 / 120
+    ) / cos
+    return np.degrees(phi), np.degrees(lam)
@@ -0,0 +1,157 @@
+"""
+Grades de candidatos (pirâmide multi-resolução e grade adaptativa)
+Construídas sobre o índice de células de processamento/agregacao: células
+quadradas no plano UTM, com IDs Morton, em que o pai de uma célula é o código
+deslocado 2 bits. Só as células ocupadas existem, então o custo é O(POIs),
+independente da área coberta.
+"""
+
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from processamento.agregacao import Agregado, IndiceCelulas, cantos_celulas, morton_decodificar
+
+
+def tabela_candidatos(agregado: Agregado, fator=1) -> pd.DataFrame:
+    """
+    Uma linha por célula ocupada, com centroide, contagem e score
+
+    O agregado deve ter a soma dos pesos dos POIs no campo 'peso' (o centroide
+    é a média simples das posições). `fator` é o lado da célula em células base.
+    """
+    i, j = morton_decodificar(agregado.ids)
+    lat_c, lng_c = agregado.centroides() if len(agregado) else (np.zeros(0), np.zeros(0))
+    return pd.DataFrame({
+        'cell_id': agregado.ids,
+        'cell_i': i,
+        'cell_j': j,
+        'Fator': fator,
+        'Lat_Centroide': lat_c,
+        'Lng_Centroide': lng_c,
+        'Qtd_POIs': agregado.contagem,
+        'Score_Estimado': agregado.somas['peso']
+    })
+
+
+def agregar_pois(
+    lats: np.ndarray,
+    lngs: np.ndarray,
+    pesos: np.ndarray,
+    tamanho_m: float,
+    indice: Optional[IndiceCelulas] = None
+) -> Agregado:
+    """Agregado dos POIs nas células de `tamanho_m` (índice na zona UTM dos pontos por padrão)"""
+    if indice is None:
+        indice = IndiceCelulas.para_pontos(lats, lngs, tamanho_base_m=tamanho_m)
+    return Agregado.de_pontos(indice, lats, lngs, valores={'peso': np.asarray(pesos, dtype=float)})
+
+
+def grade_candidatos(lats: np.ndarray, lngs: np.ndarray, pesos: np.ndarray, tamanho_m: float = 200) -> pd.DataFrame:
+    """Candidatos de uma grade de resolução única (sem pirâmide; áreas grandes)"""
+    return tabela_candidatos(agregar_pois(lats, lngs, pesos, tamanho_m))
+
+
+def poligonos_celulas(ids: np.ndarray, tamanhos_m, zona: int, sul: bool) -> np.ndarray:
+    """
+    Vértices (n, 4, [lat, lng]) das células, no sentido anti-horário
+
+    `tamanhos_m` é o lado das células: um valor para todas ou um por célula
+    (grade adaptativa: tamanho base x Fator).
+    """
+    lats, lngs = cantos_celulas(ids, tamanhos_m, zona, sul)
+    return np.stack([lats, lngs], axis=-1)
+
+
+class PiramideGrade:
+    """
+    Pirâmide de grades calculada uma vez por conjunto de POIs
+
+    O nível 0 tem células de `tamanho_base_m`; o nível k tem células de
+    tamanho_base_m * 2^k, derivadas do nível anterior com Agregado.subir
+    (O(células), sem revisitar os POIs). Tamanhos múltiplos da base que não
+    são potência de 2 são derivados do nível 0 com Agregado.ampliar e
+    guardados para reuso.
+    """
+
+    def __init__(
+        self,
+        lats: np.ndarray,
+        lngs: np.ndarray,
+        pesos: np.ndarray,
+        tamanho_base_m: float = 100,
+        niveis: int = 4,
+        indice: Optional[IndiceCelulas] = None
+    ):
+        """
+        Args:
+            lats, lngs, pesos: Coordenadas e pesos dos POIs
+            tamanho_base_m: Lado da célula do nível 0
+            niveis: Número de níveis (base * 2^k)
+            indice: Índice de células (padrão: zona UTM da longitude média dos POIs)
+        """
+        if indice is None:
+            indice = IndiceCelulas.para_pontos(lats, lngs, tamanho_base_m=tamanho_base_m)
+        self.indice = indice
+        self.niveis: List[Agregado] = [agregar_pois(lats, lngs, pesos, indice.tamanho_base_m, indice)]
+        for _ in range(1, niveis):
+            self.niveis.append(self.niveis[-1].subir())
+        self._derivados: Dict[int, Agregado] = {}
+
+    @property
+    def tamanho_base_m(self) -> float:
+        return self.indice.tamanho_base_m
+
+    @property
+    def info_grid(self) -> Dict:
+        """Georreferência da grade (para desenhar as células com poligonos_celulas)"""
+        return {
+            'projecao': 'utm', 'zona': self.indice.zona, 'sul': self.indice.sul,
+            'tamanho_base_m': self.tamanho_base_m
+        }
+
+    def _fator(self, tamanho_m: float) -> int:
+        fator = int(round(tamanho_m / self.tamanho_base_m))
+        if fator < 1 or not np.isclose(fator * self.tamanho_base_m, tamanho_m):
+            raise ValueError(f"Tamanho {tamanho_m} m não é múltiplo da base {self.tamanho_base_m} m")
+        return fator
+
+    def nivel(self, tamanho_m: float) -> Agregado:
+        """Agregado das células de um tamanho"""
+        fator = self._fator(tamanho_m)
+        k = fator.bit_length() - 1
+        if fator == 1 << k and k < len(self.niveis):
+            return self.niveis[k]
+        if fator not in self._derivados:
+            self._derivados[fator] = self.niveis[0].ampliar(fator)
+        return self._derivados[fator]
+
+    def candidatos(self, tamanho_m: float) -> pd.DataFrame:
+        """Uma linha por célula ocupada, com centroide, contagem e score"""
+        return tabela_candidatos(self.nivel(tamanho_m), self._fator(tamanho_m))
+
+    def candidatos_adaptativos(self, max_pois_por_celula: int) -> pd.DataFrame:
+        """
+        Grade de resolução mista pela densidade de POIs
+
+        Parte do nível mais grosso e subdivide (nos 4 filhos Morton) as
+        células com mais de `max_pois_por_celula` POIs, até o nível 0.
+        """
+        partes = []
+        dividir: Optional[np.ndarray] = None
+        for k in range(len(self.niveis) - 1, -1, -1):
+            nivel = self.niveis[k]
+            if dividir is None:
+                ativas = np.ones(len(nivel), dtype=bool)
+            else:
+                ativas = np.isin(IndiceCelulas.pais(nivel.ids), dividir)
+
+            finais = ativas if k == 0 else ativas & (nivel.contagem <= max_pois_por_celula)
+            if finais.any():
+                partes.append(tabela_candidatos(nivel.selecionar(finais), 1 << k))
+            dividir = nivel.ids[ativas & ~finais]
+            if len(dividir) == 0:
+                break
+
+        if not partes:
+            return self.candidatos(self.tamanho_base_m)
+        return pd.concat(partes, ignore_index=True)
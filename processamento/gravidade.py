@@ -0,0 +1,170 @@
+"""
+Modelo gravitacional de demanda
+Score de cada candidato = Σ peso_i · f(custo_ij), com decaimento configurável.
+
+O custo pode ser a distância em linha reta (calculada aqui, no plano UTM) ou
+uma matriz de custos de rede (ex: tempos da Distance Matrix API).
+"""
+
+from typing import Optional
+import numpy as np
+import pandas as pd
+from processamento.geodesia import projetar_utm, zona_utm
+from processamento.agregacao import IndiceCelulas, morton_codificar, morton_decodificar
+from config.settings import (
+    GRAVIDADE_BETA,
+    GRAVIDADE_CUSTO_MIN_M,
+    GRAVIDADE_ESCALA_M,
+    GRAVIDADE_MODELO_DECAIMENTO,
+    GRAVIDADE_RAIO_CORTE_M
+)
+
+MODELOS_DECAIMENTO = ('potencia', 'exponencial', 'corte')
+
+
+def decaimento(
+    custos: np.ndarray,
+    modelo: str = GRAVIDADE_MODELO_DECAIMENTO,
+    beta: float = GRAVIDADE_BETA,
+    custo_min: float = GRAVIDADE_CUSTO_MIN_M,
+    escala: float = GRAVIDADE_ESCALA_M,
+    corte: Optional[float] = GRAVIDADE_RAIO_CORTE_M
+) -> np.ndarray:
+    """
+    Fator de atração f(custo) em [0, 1]
+
+    - potencia: (max(c, custo_min) / custo_min) ^ -beta
+    - exponencial: exp(-c / escala)
+    - corte: 1 até o custo de corte
+    Custos acima de `corte` ou NaN (sem rota) valem 0.
+    """
+    custos = np.asarray(custos, dtype=float)
+    if modelo == 'potencia':
+        f = np.maximum(custos, custo_min)
+        f /= custo_min
+        np.power(f, -beta, out=f)
+    elif modelo == 'exponencial':
+        f = custos / -escala
+        np.exp(f, out=f)
+    elif modelo == 'corte':
+        if corte is None:
+            raise ValueError("O modelo 'corte' exige um custo de corte")
+        f = np.ones_like(custos)
+    else:
+        raise ValueError(f"Modelo de decaimento desconhecido: {modelo} (use {', '.join(MODELOS_DECAIMENTO)})")
+
+    if corte is not None:
+        np.copyto(f, 0.0, where=custos > corte)
+    np.copyto(f, 0.0, where=np.isnan(custos))
+    return f
+
+
+def score_por_custos(custos: np.ndarray, pesos: np.ndarray, **parametros) -> np.ndarray:
+    """
+    Score gravitacional a partir de uma matriz de custos pronta
+
+    Args:
+        custos: Matriz (N_pois, M_candidatos), ex: tempos de rede; NaN = sem rota
+        pesos: Pesos dos POIs (N,)
+        **parametros: Parâmetros de `decaimento`
+
+    Returns:
+        Scores (M,)
+    """
+    return np.asarray(pesos, dtype=float) @ decaimento(custos, **parametros)
+
+
+def _linhas_por_bloco(colunas: int, memoria_max_mb: float) -> int:
+    # ~3 matrizes float64 temporárias vivas por bloco (dx, dy e o fator)
+    return max(1, int(memoria_max_mb * 1024 * 1024 // (3 * 8 * max(colunas, 1))))
+
+
+def _score_bloco(x_cand, y_cand, x_pois, y_pois, pesos, parametros, memoria_max_mb) -> np.ndarray:
+    """Scores de candidatos contra um conjunto de POIs, em blocos de linhas"""
+    scores = np.empty(len(x_cand))
+    linhas = _linhas_por_bloco(len(x_pois), memoria_max_mb)
+    for inicio in range(0, len(x_cand), linhas):
+        fatia = slice(inicio, inicio + linhas)
+        dist = x_cand[fatia, None] - x_pois[None, :]
+        dy = y_cand[fatia, None] - y_pois[None, :]
+        dist *= dist
+        dy *= dy
+        dist += dy
+        np.sqrt(dist, out=dist)
+        scores[fatia] = decaimento(dist, **parametros) @ pesos
+    return scores
+
+
+def score_gravitacional(
+    lats_pois: np.ndarray,
+    lngs_pois: np.ndarray,
+    pesos: np.ndarray,
+    lats_cand: np.ndarray,
+    lngs_cand: np.ndarray,
+    modelo: str = GRAVIDADE_MODELO_DECAIMENTO,
+    beta: float = GRAVIDADE_BETA,
+    custo_min: float = GRAVIDADE_CUSTO_MIN_M,
+    escala: float = GRAVIDADE_ESCALA_M,
+    corte: Optional[float] = GRAVIDADE_RAIO_CORTE_M,
+    memoria_max_mb: float = 256.0
+) -> np.ndarray:
+    """
+    Score gravitacional por distância em linha reta
+
+    Os pontos são projetados em UTM. Com `corte`, POIs e candidatos são
+    indexados numa grade de células com metade do corte e cada célula de
+    candidatos só é comparada com os POIs das 5 x 5 células vizinhas; sem corte,
+    a matriz completa é calculada em blocos limitados por `memoria_max_mb`.
+
+    Returns:
+        Scores (M,) na ordem dos candidatos
+    """
+    lats_pois = np.asarray(lats_pois, dtype=float)
+    lngs_pois = np.asarray(lngs_pois, dtype=float)
+    pesos = np.asarray(pesos, dtype=float)
+    lats_cand = np.asarray(lats_cand, dtype=float)
+    lngs_cand = np.asarray(lngs_cand, dtype=float)
+
+    scores = np.zeros(len(lats_cand))
+    if len(lats_pois) == 0 or len(lats_cand) == 0:
+        return scores
+
+    parametros = dict(modelo=modelo, beta=beta, custo_min=custo_min, escala=escala, corte=corte)
+    todas_lngs = np.concatenate([lngs_pois, lngs_cand])
+    zona = zona_utm(float(todas_lngs.mean()))
+    sul = bool(np.concatenate([lats_pois, lats_cand]).mean() < 0)
+    x_pois, y_pois = projetar_utm(lats_pois, lngs_pois, zona, sul)
+    x_cand, y_cand = projetar_utm(lats_cand, lngs_cand, zona, sul)
+
+    if corte is None:
+        return _score_bloco(x_cand, y_cand, x_pois, y_pois, pesos, parametros, memoria_max_mb)
+
+    # Índice espacial: POIs ordenados pelo ID da célula (lado = corte / 2)
+    indice = IndiceCelulas(tamanho_base_m=corte / 2, zona=zona, sul=sul)
+    ids_pois = indice.celulas_xy(x_pois, y_pois)
+    ordem = np.argsort(ids_pois, kind='stable')
+    ids_ordenados = ids_pois[ordem]
+    x_pois, y_pois, pesos = x_pois[ordem], y_pois[ordem], pesos[ordem]
+
+    grupos, celulas = pd.factorize(indice.celulas_xy(x_cand, y_cand))
+    i_cel, j_cel = morton_decodificar(np.asarray(celulas, dtype=np.int64))
+
+    vizinhos_di, vizinhos_dj = np.meshgrid(np.arange(-2, 3), np.arange(-2, 3), indexing='ij')
+    membros = np.argsort(grupos, kind='stable')
+    limites = np.searchsorted(grupos[membros], np.arange(len(celulas) + 1))
+
+    for g in range(len(celulas)):
+        ids_vizinhos = morton_codificar(i_cel[g] + vizinhos_di.ravel(), j_cel[g] + vizinhos_dj.ravel())
+        inicios = np.searchsorted(ids_ordenados, ids_vizinhos, side='left')
+        fins = np.searchsorted(ids_ordenados, ids_vizinhos, side='right')
+        proximos = np.concatenate([np.arange(a, b) for a, b in zip(inicios, fins)])
+        if len(proximos) == 0:
+            continue
+
+        cands = membros[limites[g]:limites[g + 1]]
+        scores[cands] = _score_bloco(
+            x_cand[cands], y_cand[cands],
+            x_pois[proximos], y_pois[proximos], pesos[proximos],
+            parametros, memoria_max_mb
+        )
+    return scores
@@ -0,0 +1,305 @@
+"""
+Isócronas de tempo de viagem (ex.: 5/10/15 min) em torno de eletropostos e candidatos
+Cada local recebe raios em direções fixas; os tempos vêm da Distance Matrix API
+(consultas de 1 local x até 25 pontos, concorrentes e com o cache do cliente).
+
+A primeira rodada amostra anéis nas distâncias estimadas de cada limite; as
+seguintes só bissectam os intervalos do raio em que o tempo cruza um limite
+e que ainda são mais largos que a tolerância, até o orçamento de elementos do
+local. A fronteira de cada raio é interpolada no intervalo do cruzamento, e os
+vértices de todos os raios formam o polígono.
+
+Os ângulos e distâncias são determinísticos e as coordenadas arredondadas,
+então recalcular as mesmas isócronas reaproveita o cache em vez de gerar chamadas.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from api.distance_matrix import DistanceMatrixAPI, get_distance_matrix_client
+from processamento.geodesia import desprojetar_utm, projetar_utm, zona_utm
+from config.settings import (
+    CONECTIVIDADE_FATOR_DESVIO,
+    GRAVIDADE_VELOCIDADE_REF_KMH,
+    ISOCRONAS_MAX_ELEMENTOS,
+    ISOCRONAS_MAX_RODADAS,
+    ISOCRONAS_MAX_WORKERS,
+    ISOCRONAS_RAIOS,
+    ISOCRONAS_TEMPOS_S,
+    ISOCRONAS_TOLERANCIA_M
+)
+
+SENTIDOS = ('chegada', 'saida')
+
+# Anel externo da primeira rodada, em múltiplos da distância estimada do maior limite
+_FATOR_ANEL_EXTERNO = 2.0
+_CASAS_DECIMAIS = 5     # ~1 m: mesmas amostras, mesma chave de cache
+
+
+@dataclass
+class Isocronas:
+    """
+    Fronteiras das isócronas de vários locais
+
+    distancias_m[s, k, r] é a distância, a partir do local s, em que o tempo
+    ao longo do raio r atinge tempos_s[k]. Um raio sem cruzamento até o anel
+    externo fica nesse anel.
+    """
+
+    lats: np.ndarray            # (n_locais,)
+    lngs: np.ndarray
+    tempos_s: np.ndarray        # (n_tempos,)
+    angulos: np.ndarray         # (n_raios,) em radianos, a partir do norte no sentido horário
+    distancias_m: np.ndarray    # (n_locais, n_tempos, n_raios)
+    elementos: np.ndarray       # (n_locais,) elementos da API usados por local
+    zona: int
+    sul: bool
+
+    def aneis(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Polígonos de todas as isócronas
+
+        Returns:
+            (anéis (n_locais * n_tempos, n_raios, 2) de vértices [lat, lng] (abertos,
+            como em geojson_poligonos), local e tempo de cada anel)
+        """
+        n_locais, n_tempos, _ = self.distancias_m.shape
+        x0, y0 = projetar_utm(self.lats, self.lngs, self.zona, self.sul)
+        d = self.distancias_m.reshape(n_locais * n_tempos, -1)
+        local = np.repeat(np.arange(n_locais), n_tempos)
+        x = x0[local][:, None] + d * np.sin(self.angulos)
+        y = y0[local][:, None] + d * np.cos(self.angulos)
+        lat, lng = desprojetar_utm(x, y, self.zona, self.sul)
+        return np.stack([lat, lng], axis=-1), local, np.tile(self.tempos_s, n_locais)
+
+    def tabela(self) -> pd.DataFrame:
+        """Uma linha por isócrona: local, tempo, raio médio, área e elementos usados pelo local"""
+        n_locais, n_tempos, n_raios = self.distancias_m.shape
+        d = self.distancias_m.reshape(n_locais * n_tempos, n_raios)
+        # Área do polígono estrelado: Σ ½ · d_r · d_{r+1} · sen(Δθ)
+        delta = np.diff(np.r_[self.angulos, self.angulos[0] + 2 * np.pi])
+        area = 0.5 * (d * np.roll(d, -1, axis=1) * np.sin(delta)).sum(axis=1)
+        local = np.repeat(np.arange(n_locais), n_tempos)
+        return pd.DataFrame({
+            'Local': local,
+            'Lat': self.lats[local],
+            'Lng': self.lngs[local],
+            'Tempo_s': np.tile(self.tempos_s, n_locais),
+            'Raio_Medio_m': d.mean(axis=1),
+            'Area_km2': area / 1e6,
+            'Elementos': self.elementos[local]
+        })
+
+
+def _consultar(
+    cliente: DistanceMatrixAPI,
+    local: Tuple[float, float],
+    pontos: List[Tuple[float, float]],
+    sentido: str,
+    modo: str,
+    partida: Optional[datetime]
+) -> np.ndarray:
+    """Tempos (s) entre o local e os pontos; NaN sem rota ou em falha"""
+    tempos = np.full(len(pontos), np.nan)
+    campo = 'duracao_trafego_segundos' if partida is not None else 'duracao_segundos'
+    chegada = sentido == 'chegada'
+    try:
+        resultado = cliente.calcular_matriz(
+            origens=pontos if chegada else [local],
+            destinos=[local] if chegada else pontos,
+            modo=modo,
+            departure_time=partida
+        )
+    except Exception as e:
+        print(f"✗ Isócronas: falha na consulta do local {local}: {e}")
+        return tempos
+    for item in resultado.get('matriz', []):
+        valor = item[campo] if item[campo] is not None else item['duracao_segundos']
+        tempos[item['origem_idx'] if chegada else item['destino_idx']] = valor
+    return tempos
+
+
+def _cruzamentos(
+    chave: np.ndarray,
+    distancia: np.ndarray,
+    tempo: np.ndarray,
+    n_grupos: int,
+    tempos_s: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Intervalo do primeiro cruzamento de cada limite em cada raio
+
+    As amostras vêm ordenadas por (chave do raio, distância); o próprio local
+    conta como distância 0 e tempo 0. Sem rota (NaN) conta como acima do limite.
+
+    Returns:
+        (d_abaixo, t_abaixo, d_acima, t_acima), arrays (n_tempos, n_grupos);
+        d_acima é NaN quando o raio não cruza o limite
+    """
+    inicio = np.searchsorted(chave, np.arange(n_grupos))
+    fim = np.searchsorted(chave, np.arange(n_grupos), side='right')
+    posicao = np.arange(len(chave))
+    formato = (len(tempos_s), n_grupos)
+    d_abaixo, t_abaixo = np.zeros(formato), np.zeros(formato)
+    d_acima, t_acima = np.full(formato, np.nan), np.full(formato, np.nan)
+    for k, limite in enumerate(tempos_s):
+        acima = ~(tempo <= limite)
+        # Primeira amostra acima do limite em cada raio (fim do grupo se nenhuma)
+        primeira = np.minimum.reduceat(np.where(acima, posicao, len(chave)), inicio) if len(chave) else inicio
+        primeira = np.minimum(primeira, fim)
+        cruza = primeira < fim
+        anterior = primeira - 1
+        tem_anterior = anterior >= inicio
+        d_abaixo[k] = np.where(tem_anterior, distancia[np.maximum(anterior, 0)], 0.0)
+        t_abaixo[k] = np.where(tem_anterior, tempo[np.maximum(anterior, 0)], 0.0)
+        d_acima[k, cruza] = distancia[primeira[cruza]]
+        t_acima[k, cruza] = tempo[primeira[cruza]]
+    return d_abaixo, t_abaixo, d_acima, t_acima
+
+
+def _fronteira(d_abaixo, t_abaixo, d_acima, t_acima, tempos_s) -> np.ndarray:
+    """Distância do limite por interpolação linear do tempo no intervalo (meio do intervalo sem rota)"""
+    limite = tempos_s[:, None]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fracao = (limite - t_abaixo) / (t_acima - t_abaixo)
+    fracao = np.where(np.isfinite(fracao), np.clip(fracao, 0, 1), 0.5)
+    return np.where(np.isnan(d_acima), d_abaixo, d_abaixo + fracao * (d_acima - d_abaixo))
+
+
+def gerar_isocronas(
+    lats: Sequence[float],
+    lngs: Sequence[float],
+    tempos_s: Sequence[float] = ISOCRONAS_TEMPOS_S,
+    n_raios: int = ISOCRONAS_RAIOS,
+    max_elementos: int = ISOCRONAS_MAX_ELEMENTOS,
+    tolerancia_m: float = ISOCRONAS_TOLERANCIA_M,
+    sentido: str = 'chegada',
+    modo: str = "driving",
+    partida: Optional[datetime] = None,
+    max_workers: int = ISOCRONAS_MAX_WORKERS,
+    max_rodadas: int = ISOCRONAS_MAX_RODADAS
+) -> Isocronas:
+    """
+    Isócronas de vários locais numa mesma execução
+
+    Args:
+        lats, lngs: Locais (eletropostos, candidatos)
+        tempos_s: Limites em segundos
+        n_raios: Direções amostradas por local (vértices de cada polígono)
+        max_elementos: Orçamento de elementos da API por local (todas as
+            isócronas do local compartilham as amostras); a primeira rodada
+            usa n_raios * (len(tempos_s) + 1)
+        tolerancia_m: Intervalos de cruzamento mais estreitos não são refinados
+        sentido: 'chegada' (tempo dos pontos até o local, a área de atração)
+            ou 'saida' (do local até os pontos)
+        partida: Com horário de partida, usa a duração com tráfego
+
+    Returns:
+        Isocronas, com os elementos usados por local
+    """
+    if sentido not in SENTIDOS:
+        raise ValueError(f"Sentido desconhecido: {sentido}")
+    lats = np.asarray(lats, dtype=float)
+    lngs = np.asarray(lngs, dtype=float)
+    tempos_s = np.sort(np.asarray(tempos_s, dtype=float))
+    n_locais, n_tempos = len(lats), len(tempos_s)
+    n_inicial = n_raios * (n_tempos + 1)
+    if max_elementos < n_inicial:
+        raise ValueError(f"max_elementos ({max_elementos}) menor que a amostragem inicial ({n_inicial})")
+
+    angulos = np.arange(n_raios) * 2 * np.pi / n_raios
+    zona = zona_utm(float(np.mean(lngs))) if n_locais else zona_utm(0.0)
+    sul = bool(np.mean(lats) < 0) if n_locais else False
+    if n_locais == 0:
+        return Isocronas(
+            lats, lngs, tempos_s, angulos, np.zeros((0, n_tempos, n_raios)),
+            np.zeros(0, dtype=np.int64), zona, sul
+        )
+    x0, y0 = projetar_utm(lats, lngs, zona, sul)
+    n_grupos = n_locais * n_raios
+
+    # Primeira rodada: anéis nas distâncias estimadas (linha reta · desvio) e um anel externo
+    velocidade = GRAVIDADE_VELOCIDADE_REF_KMH / 3.6 / CONECTIVIDADE_FATOR_DESVIO
+    aneis_m = np.r_[tempos_s * velocidade, _FATOR_ANEL_EXTERNO * tempos_s[-1] * velocidade]
+    grupo_novo = np.repeat(np.arange(n_grupos), len(aneis_m))
+    distancia_nova = np.tile(aneis_m, n_grupos)
+
+    chave = np.zeros(0, dtype=np.int64)
+    distancia = np.zeros(0)
+    tempo = np.zeros(0)
+    elementos = np.zeros(n_locais, dtype=np.int64)
+    cliente = get_distance_matrix_client()
+    locais = [tuple(p) for p in np.round(np.column_stack([lats, lngs]), _CASAS_DECIMAIS).tolist()]
+
+    for _ in range(max_rodadas):
+        if len(grupo_novo) == 0:
+            break
+        local = grupo_novo // n_raios
+        raio = grupo_novo % n_raios
+        lat_p, lng_p = desprojetar_utm(
+            x0[local] + distancia_nova * np.sin(angulos[raio]),
+            y0[local] + distancia_nova * np.cos(angulos[raio]),
+            zona, sul
+        )
+        pontos = np.round(np.column_stack([lat_p, lng_p]), _CASAS_DECIMAIS)
+
+        # Consultas de um local com até MAX_DESTINOS pontos (os pontos já vêm agrupados por local)
+        consultas = []
+        for s in np.unique(local):
+            i0, i1 = np.searchsorted(local, s), np.searchsorted(local, s, side='right')
+            for inicio in range(i0, i1, DistanceMatrixAPI.MAX_DESTINOS):
+                consultas.append((s, np.arange(inicio, min(inicio + DistanceMatrixAPI.MAX_DESTINOS, i1))))
+        tempo_novo = np.full(len(grupo_novo), np.nan)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            resultados = executor.map(
+                lambda c: _consultar(cliente, locais[c[0]], [tuple(p) for p in pontos[c[1]].tolist()],
+                                     sentido, modo, partida),
+                consultas
+            )
+            for (_, idx), tempos in zip(consultas, resultados):
+                tempo_novo[idx] = tempos
+        elementos += np.bincount(local, minlength=n_locais)
+
+        chave = np.concatenate([chave, grupo_novo])
+        distancia = np.concatenate([distancia, distancia_nova])
+        tempo = np.concatenate([tempo, tempo_novo])
+        ordem = np.lexsort((distancia, chave))
+        chave, distancia, tempo = chave[ordem], distancia[ordem], tempo[ordem]
+
+        # Próxima rodada: bissecção dos intervalos de cruzamento ainda largos, os mais largos primeiro
+        d_abaixo, t_abaixo, d_acima, t_acima = _cruzamentos(chave, distancia, tempo, n_grupos, tempos_s)
+        largura = d_acima - d_abaixo
+        refinar = largura > tolerancia_m
+        k_ref, g_ref = np.nonzero(refinar)
+        meio = (d_abaixo + d_acima)[k_ref, g_ref] / 2
+        largura = largura[k_ref, g_ref]
+        # Limites diferentes com o mesmo intervalo geram o mesmo ponto
+        _, unico = np.unique(np.column_stack([g_ref, np.round(meio, 1)]), axis=0, return_index=True)
+        g_ref, meio, largura = g_ref[unico], meio[unico], largura[unico]
+
+        local_ref = g_ref // n_raios
+        ordem = np.lexsort((-largura, local_ref))
+        g_ref, meio, local_ref = g_ref[ordem], meio[ordem], local_ref[ordem]
+        posicao = np.arange(len(g_ref)) - np.searchsorted(local_ref, local_ref)
+        cabe = posicao < (max_elementos - elementos)[local_ref]
+        ordem = np.argsort(g_ref[cabe], kind='stable')
+        grupo_novo, distancia_nova = g_ref[cabe][ordem], meio[cabe][ordem]
+
+    d_abaixo, t_abaixo, d_acima, t_acima = _cruzamentos(chave, distancia, tempo, n_grupos, tempos_s)
+    fronteira = _fronteira(d_abaixo, t_abaixo, d_acima, t_acima, tempos_s)
+    isocronas = Isocronas(
+        lats=lats,
+        lngs=lngs,
+        tempos_s=tempos_s,
+        angulos=angulos,
+        distancias_m=fronteira.reshape(n_tempos, n_locais, n_raios).transpose(1, 0, 2),
+        elementos=elementos,
+        zona=zona,
+        sul=sul
+    )
+    print(f"✓ Isócronas: {n_locais} locais x {n_tempos} limites, {int(elementos.sum())} elementos "
+          f"(até {int(elementos.max())} por local)")
+    return isocronas
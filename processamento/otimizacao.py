@@ -0,0 +1,475 @@
+"""
+Localização de eletropostos: máxima cobertura e p-mediana
+Os candidatos vêm de processar_grid_e_centroides (Lat_Centroide, Lng_Centroide),
+a demanda é um conjunto de pontos com pesos e o custo é um tempo de viagem.
+
+Os pares demanda-candidato são guardados de forma esparsa (só até um tempo
+máximo) e os dois problemas são resolvidos pelo mesmo motor: guloso
+preguiçoso (fila de prioridade com ganhos desatualizados) seguido de busca
+local por trocas avaliadas de uma vez para todos os pares (candidato, aberto).
+Eletropostos existentes entram como instalações fixas, já abertas.
+"""
+
+import heapq
+from dataclasses import dataclass
+from typing import Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+from processamento.geodesia import projetar_utm, zona_utm
+from config.settings import (
+    CONECTIVIDADE_FATOR_DESVIO,
+    GRAVIDADE_VELOCIDADE_REF_KMH,
+    OTIMIZACAO_MAX_TROCAS,
+    OTIMIZACAO_TEMPO_COBERTURA_S,
+    OTIMIZACAO_TEMPO_MAX_S
+)
+
+PROBLEMAS = ('cobertura', 'p-mediana')
+
+
+@dataclass
+class ProblemaLocalizacao:
+    """
+    Pares demanda-candidato alcançáveis, ordenados por candidato
+
+    Os pares de um candidato j ficam em [inicio[j], inicio[j + 1]).
+    Demanda sem nenhum par é considerada não atendível.
+    """
+
+    pesos: np.ndarray       # (n_demanda,)
+    n_candidatos: int
+    demanda: np.ndarray     # int64, índice da demanda de cada par
+    candidato: np.ndarray   # int64, índice do candidato de cada par
+    tempo: np.ndarray       # float64, tempo de viagem do par (s)
+    inicio: np.ndarray      # (n_candidatos + 1,) ponteiros por candidato
+    tempo_max_s: float
+
+    @classmethod
+    def de_pares(cls, pesos, n_candidatos: int, demanda, candidato, tempo, tempo_max_s: float):
+        demanda = np.asarray(demanda, dtype=np.int64)
+        candidato = np.asarray(candidato, dtype=np.int64)
+        tempo = np.asarray(tempo, dtype=float)
+        manter = np.isfinite(tempo) & (tempo <= tempo_max_s)
+        ordem = np.argsort(candidato[manter], kind='stable')
+        demanda, candidato, tempo = demanda[manter][ordem], candidato[manter][ordem], tempo[manter][ordem]
+        return cls(
+            pesos=np.asarray(pesos, dtype=float),
+            n_candidatos=n_candidatos,
+            demanda=demanda,
+            candidato=candidato,
+            tempo=tempo,
+            inicio=np.searchsorted(candidato, np.arange(n_candidatos + 1)),
+            tempo_max_s=tempo_max_s
+        )
+
+    @classmethod
+    def de_matriz(cls, custos: np.ndarray, pesos: np.ndarray, tempo_max_s: float = OTIMIZACAO_TEMPO_MAX_S):
+        """
+        A partir de uma matriz (n_demanda, n_candidatos) de tempos
+
+        Ex: Distance Matrix (matriz_custos, em cache no cliente); NaN = sem rota.
+        """
+        custos = np.asarray(custos, dtype=float)
+        demanda, candidato = np.nonzero(np.isfinite(custos) & (custos <= tempo_max_s))
+        return cls.de_pares(pesos, custos.shape[1], demanda, candidato, custos[demanda, candidato], tempo_max_s)
+
+    @classmethod
+    def de_coordenadas(
+        cls,
+        lats_demanda: np.ndarray,
+        lngs_demanda: np.ndarray,
+        pesos: np.ndarray,
+        lats_cand: np.ndarray,
+        lngs_cand: np.ndarray,
+        tempo_max_s: float = OTIMIZACAO_TEMPO_MAX_S,
+        velocidade_kmh: float = GRAVIDADE_VELOCIDADE_REF_KMH,
+        fator_desvio: float = CONECTIVIDADE_FATOR_DESVIO,
+        candidatos_por_demanda: Optional[int] = None
+    ):
+        """
+        Tempos estimados pela distância em linha reta (UTM) · fator_desvio / velocidade
+
+        Só os pares até tempo_max_s são gerados (cKDTree), então a memória
+        acompanha o número de pares alcançáveis, não n_demanda x n_candidatos.
+        Com `candidatos_por_demanda`, cada demanda guarda só os k candidatos
+        mais próximos (menos memória, mas uma demanda cujos k mais próximos
+        ficam fechados passa a contar como sem atendimento).
+        """
+        lats_demanda = np.asarray(lats_demanda, dtype=float)
+        lngs_demanda = np.asarray(lngs_demanda, dtype=float)
+        lats_cand = np.asarray(lats_cand, dtype=float)
+        lngs_cand = np.asarray(lngs_cand, dtype=float)
+        velocidade = velocidade_kmh / 3.6
+        if len(lats_demanda) == 0 or len(lats_cand) == 0:
+            return cls.de_pares(pesos, len(lats_cand), [], [], [], tempo_max_s)
+
+        todas_lngs = np.concatenate([lngs_demanda, lngs_cand])
+        zona = zona_utm(float(todas_lngs.mean()))
+        sul = bool(np.concatenate([lats_demanda, lats_cand]).mean() < 0)
+        xd, yd = projetar_utm(lats_demanda, lngs_demanda, zona, sul)
+        xc, yc = projetar_utm(lats_cand, lngs_cand, zona, sul)
+        raio = tempo_max_s * velocidade / fator_desvio
+        if candidatos_por_demanda is None:
+            pares = cKDTree(np.column_stack([xd, yd])).sparse_distance_matrix(
+                cKDTree(np.column_stack([xc, yc])), max_distance=raio, output_type='ndarray'
+            )
+            return cls.de_pares(
+                pesos, len(lats_cand), pares['i'], pares['j'],
+                pares['v'] * fator_desvio / velocidade, tempo_max_s
+            )
+
+        distancias, vizinhos = cKDTree(np.column_stack([xc, yc])).query(
+            np.column_stack([xd, yd]),
+            k=min(candidatos_por_demanda, len(lats_cand)),
+            distance_upper_bound=raio
+        )
+        distancias = distancias.reshape(len(xd), -1)
+        vizinhos = vizinhos.reshape(len(xd), -1)
+        existe = np.isfinite(distancias)
+        demanda = np.broadcast_to(np.arange(len(xd))[:, None], existe.shape)[existe]
+        return cls.de_pares(
+            pesos, len(lats_cand), demanda, vizinhos[existe],
+            distancias[existe] * fator_desvio / velocidade, tempo_max_s
+        )
+
+    @property
+    def n_demanda(self) -> int:
+        return len(self.pesos)
+
+    def filtrar(self, manter: np.ndarray) -> 'ProblemaLocalizacao':
+        """Subproblema só com os pares marcados (a ordem por candidato se mantém)"""
+        candidato = self.candidato[manter]
+        return ProblemaLocalizacao(
+            pesos=self.pesos,
+            n_candidatos=self.n_candidatos,
+            demanda=self.demanda[manter],
+            candidato=candidato,
+            tempo=self.tempo[manter],
+            inicio=np.searchsorted(candidato, np.arange(self.n_candidatos + 1)),
+            tempo_max_s=self.tempo_max_s
+        )
+
+
+@dataclass
+class SolucaoLocalizacao:
+    """Instalações abertas e atendimento da demanda"""
+
+    problema: str
+    abertas: np.ndarray       # Índices dos candidatos abertos (fixas primeiro)
+    fixas: np.ndarray         # Índices dos candidatos fixos (existentes)
+    atribuicao: np.ndarray    # Candidato que atende cada demanda (-1 = nenhum alcançável)
+    tempo: np.ndarray         # Tempo até ele (inf = nenhum)
+    objetivo: float           # Demanda coberta (cobertura) ou custo total ponderado (p-mediana)
+    trocas: int               # Trocas aceitas na busca local
+
+    def resumo(self, pesos: np.ndarray, tempo_cobertura_s: float = OTIMIZACAO_TEMPO_COBERTURA_S) -> dict:
+        """Indicadores ponderados pela demanda"""
+        pesos = np.asarray(pesos, dtype=float)
+        total = pesos.sum()
+        atendida = np.isfinite(self.tempo)
+        peso_atendido = pesos[atendida].sum()
+        return {
+            'novas': len(self.abertas) - len(self.fixas),
+            'fixas': len(self.fixas),
+            'cobertura': float(pesos[self.tempo <= tempo_cobertura_s].sum() / total) if total else 0.0,
+            'demanda_alcancavel': float(peso_atendido / total) if total else 0.0,
+            'tempo_medio_s': float(pesos[atendida] @ self.tempo[atendida] / peso_atendido) if peso_atendido else np.nan,
+            'trocas': self.trocas
+        }
+
+    def tabela(self, candidatos: pd.DataFrame, pesos: np.ndarray) -> pd.DataFrame:
+        """Candidatos abertos com a demanda atribuída a cada um"""
+        pesos = np.asarray(pesos, dtype=float)
+        atendida = self.atribuicao >= 0
+        demanda = np.bincount(self.atribuicao[atendida], weights=pesos[atendida], minlength=len(candidatos))
+        tabela = candidatos.iloc[self.abertas].reset_index(drop=True)
+        tabela.insert(0, 'Candidato', self.abertas)
+        tabela['Existente'] = np.isin(self.abertas, self.fixas)
+        tabela['Demanda_Atendida'] = demanda[self.abertas]
+        return tabela
+
+
+# --- MOTOR COMUM ---
+# Cada demanda tem um custo atual (o melhor entre as abertas); abrir j reduz
+# o custo das demandas dos seus pares. Na cobertura, só os pares dentro do
+# raio de cobertura importam: custam 0, e não ter par aberto custa 1. Na
+# p-mediana, o custo é o tempo, e a penalidade é o tempo máximo.
+
+def _custos_pares(
+    problema: ProblemaLocalizacao, tipo: str, tempo_cobertura_s: float
+) -> Tuple[ProblemaLocalizacao, np.ndarray, float]:
+    if tipo == 'cobertura':
+        reduzido = problema.filtrar(problema.tempo <= tempo_cobertura_s)
+        return reduzido, np.zeros(len(reduzido.tempo)), 1.0
+    if tipo == 'p-mediana':
+        return problema, problema.tempo, float(problema.tempo_max_s)
+    raise ValueError(f"Problema desconhecido: {tipo} (use {', '.join(PROBLEMAS)})")
+
+
+def _melhores_pares(demanda, candidato, custo, n_demanda, penalidade, abertas_mask):
+    """Melhor e segundo melhor custo por demanda (e os candidatos de cada um) entre as abertas"""
+    d1 = np.full(n_demanda, penalidade)
+    d2 = np.full(n_demanda, penalidade)
+    f1 = np.full(n_demanda, -1, dtype=np.int64)
+    f2 = np.full(n_demanda, -1, dtype=np.int64)
+    sel = np.flatnonzero(abertas_mask[candidato])
+    if len(sel) == 0:
+        return d1, f1, d2, f2
+
+    dem, cand, c = demanda[sel], candidato[sel], custo[sel]
+    ordem = np.lexsort((c, dem))
+    dem, cand, c = dem[ordem], cand[ordem], c[ordem]
+    primeiro = np.r_[True, dem[1:] != dem[:-1]]
+    d1[dem[primeiro]] = np.minimum(c[primeiro], penalidade)
+    f1[dem[primeiro]] = cand[primeiro]
+    segundo = np.r_[False, primeiro[:-1]] & ~primeiro
+    d2[dem[segundo]] = np.minimum(c[segundo], penalidade)
+    f2[dem[segundo]] = cand[segundo]
+    return d1, f1, d2, f2
+
+
+def _melhores(problema, custo_par, penalidade, abertas_mask):
+    d1, f1, d2, _ = _melhores_pares(
+        problema.demanda, problema.candidato, custo_par, problema.n_demanda, penalidade, abertas_mask
+    )
+    return d1, f1, d2
+
+
+def _intervalos(inicios: np.ndarray, fins: np.ndarray) -> np.ndarray:
+    """Concatenação de arange(inicio, fim) para cada intervalo, sem laço Python"""
+    tamanhos = fins - inicios
+    total = int(tamanhos.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    deslocamento = np.repeat(inicios - np.cumsum(tamanhos) + tamanhos, tamanhos)
+    return deslocamento + np.arange(total)
+
+
+def _guloso_preguicoso(problema, custo_par, penalidade, p, fixas):
+    """
+    Abre p candidatos além das fixas pelo maior ganho marginal
+
+    O ganho de um candidato só diminui à medida que outros abrem
+    (submodularidade), então o ganho guardado na fila é um limite superior:
+    o topo é recalculado e aceito se continuar à frente do seguinte.
+    """
+    abertas = np.zeros(problema.n_candidatos, dtype=bool)
+    abertas[fixas] = True
+    atual = np.full(problema.n_demanda, penalidade)
+    if len(fixas):
+        atual, _, _ = _melhores(problema, custo_par, penalidade, abertas)
+
+    pesos_pares = problema.pesos[problema.demanda]
+    ganhos = np.bincount(
+        problema.candidato,
+        weights=pesos_pares * np.maximum(atual[problema.demanda] - custo_par, 0),
+        minlength=problema.n_candidatos
+    )
+    fila = [(-g, int(j)) for j, g in enumerate(ganhos) if g > 0 and not abertas[j]]
+    heapq.heapify(fila)
+
+    escolhidas = []
+    while fila and len(escolhidas) < p:
+        _, j = heapq.heappop(fila)
+        pares = slice(problema.inicio[j], problema.inicio[j + 1])
+        dem = problema.demanda[pares]
+        reducao = np.maximum(atual[dem] - custo_par[pares], 0)
+        ganho = float(pesos_pares[pares] @ reducao)
+        if ganho <= 0:
+            continue
+        if fila and ganho < -fila[0][0]:
+            heapq.heappush(fila, (-ganho, j))
+            continue
+        escolhidas.append(j)
+        abertas[j] = True
+        atual[dem] -= reducao
+    return abertas, escolhidas
+
+
+class _Trocas:
+    """
+    Avaliação de todas as trocas (entra j, sai r), mantida incrementalmente
+
+    Para cada demanda guardam-se o melhor custo d1 (instalação f1) e o
+    segundo d2 (f2). Ganho de abrir j: Σ w·max(d1 - c_j, 0); perda de
+    fechar r: Σ_{f1 = r} w·(d2 - d1); o termo de interação (demanda de r que
+    j atende) é Σ_{f1 = r} w·(d2 - max(c_j, d1)) sobre os pares com c_j < d2.
+    Cada demanda contribui para essas somas só pelos seus pares; após uma
+    troca, apenas as demandas cujo d1/d2 muda (as que j alcança abaixo de d2
+    e as servidas por r como 1ª ou 2ª opção) são descontadas e somadas de novo.
+    """
+
+    def __init__(self, problema, custo_par, penalidade, abertas, fixas):
+        self.problema = problema
+        self.custo_par = custo_par
+        self.penalidade = penalidade
+        self.abertas = abertas.copy()
+        n_cand = problema.n_candidatos
+
+        # Cada instalação removível ocupa uma coluna; a que entra herda a coluna da que sai
+        removivel = abertas.copy()
+        removivel[fixas] = False
+        self.coluna_candidato = np.flatnonzero(removivel)
+        self.coluna = np.full(n_cand, -1, dtype=np.int64)
+        self.coluna[self.coluna_candidato] = np.arange(len(self.coluna_candidato))
+
+        self.ganho = np.zeros(n_cand)
+        self.perda = np.zeros(n_cand)
+        self.interacao = np.zeros((n_cand, len(self.coluna_candidato)))
+
+        # Índice dos pares por demanda (a ordem dentro de cada demanda não importa)
+        self.por_demanda = np.argsort(problema.demanda)
+        self.inicio_demanda = np.searchsorted(problema.demanda[self.por_demanda], np.arange(problema.n_demanda + 1))
+
+        self.d1, self.f1, self.d2, self.f2 = _melhores_pares(
+            problema.demanda, problema.candidato, custo_par, problema.n_demanda, penalidade, self.abertas
+        )
+        self._contribuir(np.arange(problema.n_demanda), np.arange(len(custo_par)), 1.0)
+
+    def _contribuir(self, demandas, pares, sinal):
+        """Soma (sinal=1) ou desconta (sinal=-1) as contribuições das demandas e dos seus pares"""
+        p = self.problema
+        w, d1, d2, f1 = p.pesos, self.d1, self.d2, self.f1
+
+        servida = f1[demandas] >= 0
+        np.add.at(self.perda, f1[demandas[servida]], sinal * (w * (d2 - d1))[demandas[servida]])
+
+        dem, cand, c = p.demanda[pares], p.candidato[pares], self.custo_par[pares]
+        util = c < d2[dem]
+        dem, cand, c = dem[util], cand[util], c[util]
+        w_par = w[dem]
+        self.ganho += sinal * np.bincount(
+            cand, weights=w_par * np.maximum(d1[dem] - c, 0), minlength=p.n_candidatos
+        )
+        col = np.where(f1[dem] >= 0, self.coluna[np.maximum(f1[dem], 0)], -1)
+        com_coluna = col >= 0
+        n_col = self.interacao.shape[1]
+        if n_col and com_coluna.any():
+            self.interacao += sinal * np.bincount(
+                cand[com_coluna] * n_col + col[com_coluna],
+                weights=(w_par * (d2[dem] - np.maximum(c, d1[dem])))[com_coluna],
+                minlength=self.interacao.size
+            ).reshape(self.interacao.shape)
+
+    def melhor(self) -> Tuple[int, int, float]:
+        """(entra, sai, lucro) da melhor troca"""
+        lucro = self.ganho[:, None] - self.perda[self.coluna_candidato][None, :] + self.interacao
+        lucro[self.abertas] = -np.inf
+        j, col = np.unravel_index(np.argmax(lucro), lucro.shape)
+        return int(j), int(self.coluna_candidato[col]), float(lucro[j, col])
+
+    def trocar(self, entra: int, sai: int):
+        p = self.problema
+        pares_j = slice(p.inicio[entra], p.inicio[entra + 1])
+        afetada = np.zeros(p.n_demanda, dtype=bool)
+        dem_j = p.demanda[pares_j]
+        afetada[dem_j[self.custo_par[pares_j] < self.d2[dem_j]]] = True
+        afetada |= (self.f1 == sai) | (self.f2 == sai)
+        demandas = np.flatnonzero(afetada)
+        pares = self.por_demanda[_intervalos(self.inicio_demanda[demandas], self.inicio_demanda[demandas + 1])]
+
+        self._contribuir(demandas, pares, -1.0)
+        self.abertas[entra] = True
+        self.abertas[sai] = False
+        col = self.coluna[sai]
+        self.coluna[sai] = -1
+        self.coluna[entra] = col
+        self.coluna_candidato[col] = entra
+
+        d1, f1, d2, f2 = _melhores_pares(
+            p.demanda[pares], p.candidato[pares], self.custo_par[pares], p.n_demanda, self.penalidade, self.abertas
+        )
+        self.d1[demandas], self.f1[demandas] = d1[demandas], f1[demandas]
+        self.d2[demandas], self.f2[demandas] = d2[demandas], f2[demandas]
+        self._contribuir(demandas, pares, 1.0)
+
+
+def _busca_local(problema, custo_par, penalidade, abertas, fixas, max_trocas):
+    """Aplica a melhor troca enquanto ela reduzir o custo (até max_trocas)"""
+    if not (abertas & ~np.isin(np.arange(problema.n_candidatos), fixas)).any():
+        return abertas, 0
+    trocas = _Trocas(problema, custo_par, penalidade, abertas, fixas)
+    tolerancia = 1e-9 * max(float(problema.pesos.sum()) * penalidade, 1.0)
+    n = 0
+    while n < max_trocas:
+        entra, sai, lucro = trocas.melhor()
+        if lucro <= tolerancia:
+            break
+        trocas.trocar(entra, sai)
+        n += 1
+    return trocas.abertas, n
+
+
+def otimizar(
+    problema: ProblemaLocalizacao,
+    p: int,
+    tipo: str = 'cobertura',
+    fixas: Optional[Sequence[int]] = None,
+    tempo_cobertura_s: float = OTIMIZACAO_TEMPO_COBERTURA_S,
+    busca_local: bool = True,
+    max_trocas: int = OTIMIZACAO_MAX_TROCAS
+) -> SolucaoLocalizacao:
+    """
+    Escolhe p novos candidatos (além das fixas)
+
+    Args:
+        problema: Pares demanda-candidato
+        p: Número de novas instalações
+        tipo: 'cobertura' (máxima demanda a até tempo_cobertura_s) ou
+              'p-mediana' (mínimo tempo total ponderado; pares além do
+              tempo máximo custam o tempo máximo)
+        fixas: Candidatos já abertos (eletropostos existentes)
+        tempo_cobertura_s: Raio de cobertura em tempo
+        busca_local: Melhorar a solução gulosa por trocas
+        max_trocas: Limite de trocas da busca local
+    """
+    ativo, custo_par, penalidade = _custos_pares(problema, tipo, tempo_cobertura_s)
+    fixas = np.unique(np.asarray(fixas if fixas is not None else [], dtype=np.int64))
+
+    abertas, escolhidas = _guloso_preguicoso(ativo, custo_par, penalidade, p, fixas)
+    print(f"→ Otimização ({tipo}): {len(escolhidas)} candidatos pelo guloso")
+    trocas = 0
+    if busca_local and len(escolhidas):
+        abertas, trocas = _busca_local(ativo, custo_par, penalidade, abertas, fixas, max_trocas)
+
+    # Atendimento final: o mais próximo em tempo entre as abertas
+    tempo, atribuicao, _ = _melhores(problema, problema.tempo, np.inf, abertas)
+
+    d1, _, _ = _melhores(ativo, custo_par, penalidade, abertas)
+    if tipo == 'cobertura':
+        objetivo = float(problema.pesos @ (1 - d1))
+    else:
+        objetivo = float(problema.pesos @ d1)
+
+    novas = abertas.copy()
+    novas[fixas] = False
+    novas = np.flatnonzero(novas)
+    print(f"✓ Otimização ({tipo}): objetivo {objetivo:,.1f} com {len(novas)} novas e {len(fixas)} fixas, {trocas} trocas")
+    return SolucaoLocalizacao(
+        problema=tipo,
+        abertas=np.concatenate([fixas, novas]),
+        fixas=fixas,
+        atribuicao=atribuicao,
+        tempo=tempo,
+        objetivo=objetivo,
+        trocas=trocas
+    )
+
+
+def incluir_existentes(candidatos: pd.DataFrame, eletropostos) -> Tuple[pd.DataFrame, np.ndarray]:
+    """
+    Acrescenta os eletropostos existentes (TabelaPlaces de buscar_eletropostos) como candidatos
+
+    Returns:
+        (candidatos com as linhas dos existentes no final, índices dos existentes)
+    """
+    if not eletropostos:
+        return candidatos.reset_index(drop=True), np.zeros(0, dtype=np.int64)
+    existentes = pd.DataFrame({
+        'Lat_Centroide': np.asarray(eletropostos.lat, dtype=float),
+        'Lng_Centroide': np.asarray(eletropostos.lng, dtype=float),
+        'Nome': eletropostos.nome
+    })
+    todos = pd.concat([candidatos.reset_index(drop=True), existentes], ignore_index=True)
+    return todos, np.arange(len(candidatos), len(todos))
@@ -0,0 +1,585 @@
+"""
+Pirâmide de tiles vetoriais (Mapbox Vector Tiles) para camadas regionais
+Exporta eletropostos, POIs e células da grade para um arquivo MBTiles e serve
+os tiles por um endpoint HTTP local, para os mapas carregarem só o que está visível.
+
+Execução (fora do Streamlit):
+    python -m processamento.tiles_vetoriais exportar --zoom-min 8 --zoom-max 16
+    python -m processamento.tiles_vetoriais servir --porta 8765
+
+O mesmo endpoint serve os arquivos GeoJSON gravados com gravar_camada_geojson
+(em /camadas/{arquivo}), para os visualizadores buscarem as camadas por URL em
+vez de recebê-las embutidas no HTML.
+
+Em cada zoom os pontos são desbastados numa grade de pixels (fica o de maior
+prioridade, com a contagem agrupada) e as geometrias são quantizadas na
+resolução do tile, o que simplifica as células pequenas até sumirem.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import re
+import sqlite3
+import struct
+from contextlib import closing
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from config.settings import (
+    TILES_CAMADAS_DIR,
+    TILES_VETORIAIS_ARQUIVO,
+    TILES_VETORIAIS_PORTA,
+    TILES_ZOOM_MAX,
+    TILES_ZOOM_MIN
+)
+
+EXTENSAO_MVT = 4096
+LAT_MAX_MERCATOR = 85.05112878
+
+_TIPOS_GEOMETRIA = {'ponto': 1, 'linha': 2, 'poligono': 3}
+
+
+@dataclass
+class CamadaVetorial:
+    """
+    Camada a exportar
+
+    coords: 'ponto' -> (n, 2) [lat, lng]; 'linha'/'poligono' -> (n, k, 2).
+    Linhas de tamanhos diferentes podem ser completadas repetindo o último
+    vértice (vértices repetidos são removidos na quantização).
+    """
+
+    nome: str
+    tipo: str
+    coords: np.ndarray
+    propriedades: Dict[str, np.ndarray] = field(default_factory=dict)
+    prioridade: Optional[np.ndarray] = None   # maior = mantido no desbaste
+    zoom_min: int = 0
+    desbaste_px: float = 4.0                  # lado da grade de desbaste (pixels de 256)
+    max_por_tile: int = 5000
+
+    def __len__(self) -> int:
+        return len(self.coords)
+
+
+# --- PROTOBUF (subconjunto usado pelo MVT) ---
+def _varint(n: int) -> bytes:
+    if n < _VARINT_TABELA_MAX:
+        return _VARINTS[n]
+    saida = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            saida.append(byte | 0x80)
+        else:
+            saida.append(byte)
+            return bytes(saida)
+
+
+# Varints de 1-2 bytes pré-calculados (deltas de geometria e índices de tags)
+_VARINT_TABELA_MAX = 1 << 14
+_VARINTS = [bytes([n]) if n < 0x80 else bytes([(n & 0x7F) | 0x80, n >> 7]) for n in range(_VARINT_TABELA_MAX)]
+
+
+def _zigzag(n: int) -> int:
+    return (n << 1) if n >= 0 else ((-n) << 1) - 1
+
+
+def _campo_bytes(numero: int, dados: bytes) -> bytes:
+    return _varint((numero << 3) | 2) + _varint(len(dados)) + dados
+
+
+def _campo_varint(numero: int, valor: int) -> bytes:
+    return _varint(numero << 3) + _varint(valor)
+
+
+def _empacotados(valores: List[int]) -> bytes:
+    return b''.join([_VARINTS[v] if v < _VARINT_TABELA_MAX else _varint(v) for v in valores])
+
+
+def _valor_mvt(valor) -> bytes:
+    """Mensagem Value do MVT"""
+    if isinstance(valor, bool):
+        return _campo_varint(7, int(valor))
+    if isinstance(valor, int):
+        return _campo_varint(6, _zigzag(valor))
+    if isinstance(valor, float):
+        return _varint((3 << 3) | 1) + struct.pack('<d', valor)
+    return _campo_bytes(1, str(valor).encode('utf-8'))
+
+
+def _geometria(tipo: str, vertices: List[List[int]]) -> List[int]:
+    """Comandos de geometria (MoveTo/LineTo/ClosePath) com deltas em zigzag"""
+    if tipo == 'ponto':
+        comandos = [1 | (len(vertices) << 3)]
+    else:
+        comandos = [1 | (1 << 3)]
+    cursor_x = cursor_y = 0
+    for k, (x, y) in enumerate(vertices):
+        if k == 1 and tipo != 'ponto':
+            comandos.append(2 | ((len(vertices) - 1) << 3))
+        dx, dy = x - cursor_x, y - cursor_y
+        comandos.append((dx << 1) if dx >= 0 else ((-dx) << 1) - 1)
+        comandos.append((dy << 1) if dy >= 0 else ((-dy) << 1) - 1)
+        cursor_x, cursor_y = x, y
+    if tipo == 'poligono':
+        comandos.append(7 | (1 << 3))
+    return comandos
+
+
+def codificar_camada(nome: str, tipo: str, geometrias: List[List[List[int]]], propriedades: List[Dict]) -> bytes:
+    """
+    Mensagem Layer do MVT (versão 2) com chaves e valores internados
+
+    Cada geometria é uma lista de vértices [x, y] em coordenadas do tile
+    (um anel externo, sem repetir o primeiro vértice, para polígonos).
+    """
+    chaves: Dict[str, int] = {}
+    valores: Dict[Tuple[type, object], int] = {}
+    feicoes = []
+    for fid, (geom, props) in enumerate(zip(geometrias, propriedades), start=1):
+        tags = []
+        for chave, valor in props.items():
+            if valor is None:
+                continue
+            tags.append(chaves.setdefault(chave, len(chaves)))
+            tags.append(valores.setdefault((type(valor), valor), len(valores)))
+        feicoes.append(_campo_bytes(2, (
+            _campo_varint(1, fid)
+            + _campo_bytes(2, _empacotados(tags))
+            + _campo_varint(3, _TIPOS_GEOMETRIA[tipo])
+            + _campo_bytes(4, _empacotados(_geometria(tipo, geom)))
+        )))
+
+    return (
+        _campo_varint(15, 2)
+        + _campo_bytes(1, nome.encode('utf-8'))
+        + b''.join(feicoes)
+        + b''.join(_campo_bytes(3, c.encode('utf-8')) for c in chaves)
+        + b''.join(_campo_bytes(4, _valor_mvt(v)) for (_, v) in valores)
+        + _campo_varint(5, EXTENSAO_MVT)
+    )
+
+
+# --- PROJEÇÃO E RECORTE ---
+def coordenadas_tile(lats, lngs, zoom: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Coordenadas Web Mercator em unidades de tile no zoom (x para leste, y para sul)"""
+    n = float(1 << zoom)
+    lats = np.clip(np.asarray(lats, dtype=float), -LAT_MAX_MERCATOR, LAT_MAX_MERCATOR)
+    x = (np.asarray(lngs, dtype=float) + 180.0) / 360.0 * n
+    phi = np.radians(lats)
+    y = (1.0 - np.log(np.tan(phi) + 1.0 / np.cos(phi)) / np.pi) / 2.0 * n
+    return x, y
+
+
+def _propriedades_linhas(camada: CamadaVetorial, indices: np.ndarray, extras: Dict[str, np.ndarray]) -> List[Dict]:
+    colunas = {nome: np.asarray(v)[indices].tolist() for nome, v in camada.propriedades.items()}
+    colunas.update({nome: np.asarray(v).tolist() for nome, v in extras.items()})
+    return [dict(zip(colunas, linha)) for linha in zip(*colunas.values())] if colunas else [{}] * len(indices)
+
+
+def _tiles_pontos(camada: CamadaVetorial, zoom: int, zoom_max: int) -> Iterator[Tuple[Tuple[int, int], bytes]]:
+    """Camada de pontos de cada tile no zoom, com desbaste abaixo do zoom máximo"""
+    x, y = coordenadas_tile(camada.coords[:, 0], camada.coords[:, 1], zoom)
+    tx, ty = np.floor(x).astype(np.int64), np.floor(y).astype(np.int64)
+    px = np.round((x - tx) * EXTENSAO_MVT).astype(np.int64)
+    py = np.round((y - ty) * EXTENSAO_MVT).astype(np.int64)
+    prioridade = camada.prioridade if camada.prioridade is not None else np.zeros(len(camada))
+
+    # Desbaste: um ponto (o de maior prioridade) por balde de pixels
+    lado = max(1, int(camada.desbaste_px * EXTENSAO_MVT / 256)) if zoom < zoom_max else 1
+    ordem = np.lexsort((-prioridade, py // lado, px // lado, ty, tx))
+    chave = np.column_stack([tx, ty, px // lado, py // lado])[ordem]
+    novo = np.ones(len(ordem), dtype=bool)
+    novo[1:] = np.any(chave[1:] != chave[:-1], axis=1)
+    escolhidos = ordem[novo]
+    agrupados = np.diff(np.append(np.flatnonzero(novo), len(ordem)))
+
+    # Limite por tile, pelos de maior prioridade
+    ordem_tile = np.lexsort((-prioridade[escolhidos], ty[escolhidos], tx[escolhidos]))
+    escolhidos, agrupados = escolhidos[ordem_tile], agrupados[ordem_tile]
+    chave_tile = np.column_stack([tx[escolhidos], ty[escolhidos]])
+    inicio_tile = np.ones(len(escolhidos), dtype=bool)
+    inicio_tile[1:] = np.any(chave_tile[1:] != chave_tile[:-1], axis=1)
+    limites = np.append(np.flatnonzero(inicio_tile), len(escolhidos))
+
+    for a, b in zip(limites[:-1], limites[1:]):
+        sel = escolhidos[a:min(b, a + camada.max_por_tile)]
+        props = _propriedades_linhas(camada, sel, {'agrupados': agrupados[a:a + len(sel)]})
+        geoms = [[v] for v in np.column_stack([px[sel], py[sel]]).tolist()]
+        yield (int(tx[sel[0]]), int(ty[sel[0]])), codificar_camada(camada.nome, 'ponto', geoms, props)
+
+
+def _tiles_formas(camada: CamadaVetorial, zoom: int) -> Iterator[Tuple[Tuple[int, int], bytes]]:
+    """Linhas/polígonos quantizados em cada tile que sua caixa toca"""
+    coords = np.asarray(camada.coords, dtype=float)
+    x, y = coordenadas_tile(coords[..., 0], coords[..., 1], zoom)
+    tx0, tx1 = np.floor(x.min(axis=1)).astype(np.int64), np.floor(x.max(axis=1)).astype(np.int64)
+    ty0, ty1 = np.floor(y.min(axis=1)).astype(np.int64), np.floor(y.max(axis=1)).astype(np.int64)
+
+    # Uma linha por par (feição, tile tocado)
+    nx, ny = tx1 - tx0 + 1, ty1 - ty0 + 1
+    feicao = np.repeat(np.arange(len(coords)), nx * ny)
+    deslocamento = np.arange(len(feicao)) - np.repeat(np.cumsum(nx * ny) - nx * ny, nx * ny)
+    tile_x = tx0[feicao] + deslocamento % nx[feicao]
+    tile_y = ty0[feicao] + deslocamento // nx[feicao]
+
+    ordem = np.lexsort((tile_y, tile_x))
+    feicao, tile_x, tile_y = feicao[ordem], tile_x[ordem], tile_y[ordem]
+    inicio = np.ones(len(feicao), dtype=bool)
+    inicio[1:] = (tile_x[1:] != tile_x[:-1]) | (tile_y[1:] != tile_y[:-1])
+    limites = np.append(np.flatnonzero(inicio), len(feicao))
+
+    minimo = 4 if camada.tipo == 'poligono' else 2
+    for a, b in zip(limites[:-1], limites[1:]):
+        t_x, t_y = int(tile_x[a]), int(tile_y[a])
+        sel = feicao[a:b]
+        px = np.round((x[sel] - t_x) * EXTENSAO_MVT).astype(np.int64)
+        py = np.round((y[sel] - t_y) * EXTENSAO_MVT).astype(np.int64)
+
+        # Vértices repetidos após a quantização (o primeiro de cada sequência fica)
+        repetido = np.zeros(px.shape, dtype=bool)
+        repetido[:, 1:] = (px[:, 1:] == px[:, :-1]) & (py[:, 1:] == py[:, :-1])
+        distintos = px.shape[1] - repetido.sum(axis=1)
+        if camada.tipo == 'poligono':
+            fechado = (px[:, -1] == px[:, 0]) & (py[:, -1] == py[:, 0]) & (distintos > 1)
+            repetido[:, -1] |= fechado
+            distintos -= fechado
+            # Anel externo com área positiva (fórmula do agrimensor em coordenadas do tile)
+            area = np.sum(px * np.roll(py, -1, axis=1) - np.roll(px, -1, axis=1) * py, axis=1)
+            validos = np.flatnonzero((distintos + 1 >= minimo) & (area != 0))
+        else:
+            area = np.ones(len(sel))
+            validos = np.flatnonzero(distintos >= minimo)
+
+        vertices = np.stack([px[validos], py[validos]], axis=-1).tolist()
+        manter = (~repetido[validos]).tolist()
+        geoms = []
+        for anel, mascara, invertido in zip(vertices, manter, (area[validos] < 0).tolist()):
+            anel = [v for v, m in zip(anel, mascara) if m]
+            geoms.append(anel[::-1] if invertido else anel)
+
+        if geoms:
+            props = _propriedades_linhas(camada, sel[validos], {})
+            yield (t_x, t_y), codificar_camada(camada.nome, camada.tipo, geoms, props)
+
+
+def construir_tiles(
+    camadas: List[CamadaVetorial],
+    zoom_min: int = TILES_ZOOM_MIN,
+    zoom_max: int = TILES_ZOOM_MAX
+) -> Iterator[Tuple[int, int, int, bytes]]:
+    """Gera (z, x, y, tile MVT) para todos os tiles com conteúdo"""
+    for zoom in range(zoom_min, zoom_max + 1):
+        tiles: Dict[Tuple[int, int], List[bytes]] = {}
+        for camada in camadas:
+            if len(camada) == 0 or zoom < camada.zoom_min:
+                continue
+            if camada.tipo == 'ponto':
+                gerador = _tiles_pontos(camada, zoom, zoom_max)
+            else:
+                gerador = _tiles_formas(camada, zoom)
+            for xy, dados in gerador:
+                tiles.setdefault(xy, []).append(_campo_bytes(3, dados))
+        for (x, y), partes in tiles.items():
+            yield zoom, x, y, b''.join(partes)
+
+
+# --- MBTILES ---
+def _tipo_campo(valores) -> str:
+    """Tipo do campo no metadado vector_layers"""
+    tipo = np.asarray(valores).dtype
+    if tipo == bool:
+        return 'Boolean'
+    return 'Number' if np.issubdtype(tipo, np.number) else 'String'
+
+
+def exportar_mbtiles(
+    camadas: List[CamadaVetorial],
+    caminho: Path = TILES_VETORIAIS_ARQUIVO,
+    zoom_min: int = TILES_ZOOM_MIN,
+    zoom_max: int = TILES_ZOOM_MAX,
+    nome: str = 'regiao'
+) -> Dict[int, int]:
+    """
+    Grava a pirâmide num arquivo MBTiles (SQLite, tiles gzip, linhas em TMS)
+
+    Returns:
+        Número de tiles por zoom
+    """
+    caminho = Path(caminho)
+    temporario = caminho.with_suffix('.tmp')
+    temporario.unlink(missing_ok=True)
+
+    lats = np.concatenate([np.asarray(c.coords)[..., 0].ravel() for c in camadas if len(c)] or [np.zeros(1)])
+    lngs = np.concatenate([np.asarray(c.coords)[..., 1].ravel() for c in camadas if len(c)] or [np.zeros(1)])
+    metadados = {
+        'name': nome,
+        'format': 'pbf',
+        'minzoom': str(zoom_min),
+        'maxzoom': str(zoom_max),
+        'bounds': f"{lngs.min():.6f},{lats.min():.6f},{lngs.max():.6f},{lats.max():.6f}",
+        'center': f"{lngs.mean():.6f},{lats.mean():.6f},{zoom_min}",
+        'json': json.dumps({'vector_layers': [
+            {
+                'id': c.nome,
+                'fields': {nome_prop: _tipo_campo(v) for nome_prop, v in c.propriedades.items()},
+                'minzoom': max(zoom_min, c.zoom_min),
+                'maxzoom': zoom_max
+            }
+            for c in camadas
+        ]})
+    }
+
+    por_zoom: Dict[int, int] = {}
+    with closing(sqlite3.connect(str(temporario))) as conn, conn:
+        conn.executescript("""
+            CREATE TABLE metadata (name TEXT, value TEXT);
+            CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB);
+            CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row);
+        """)
+        conn.executemany("INSERT INTO metadata VALUES (?, ?)", metadados.items())
+        for z, x, y, dados in construir_tiles(camadas, zoom_min, zoom_max):
+            conn.execute(
+                "INSERT INTO tiles VALUES (?, ?, ?, ?)",
+                (z, x, (1 << z) - 1 - y, gzip.compress(dados, compresslevel=6))
+            )
+            por_zoom[z] = por_zoom.get(z, 0) + 1
+
+    temporario.replace(caminho)
+    return por_zoom
+
+
+def ler_tile(caminho: Path, z: int, x: int, y: int) -> Optional[bytes]:
+    """Tile (gzip) no esquema XYZ, ou None"""
+    with closing(sqlite3.connect(f"file:{caminho}?mode=ro", uri=True)) as conn:
+        linha = conn.execute(
+            "SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+            (z, x, (1 << z) - 1 - y)
+        ).fetchone()
+    return linha[0] if linha else None
+
+
+# --- ENDPOINT LOCAL ---
+_ROTA_TILE = re.compile(r'^/tiles/(\d+)/(\d+)/(\d+)\.pbf$')
+_ROTA_CAMADA = re.compile(r'^/camadas/([A-Za-z0-9_-]+\.geojson)$')
+
+
+def gravar_camada_geojson(nome: str, dados: Dict, diretorio: Path = TILES_CAMADAS_DIR) -> str:
+    """
+    Grava o GeoJSON de uma camada para ser servido em /camadas/{arquivo}
+
+    O nome do arquivo leva o hash do conteúdo, então a URL muda quando os dados
+    mudam (o navegador pode manter o arquivo em cache sem servir dado velho).
+
+    Returns:
+        Nome do arquivo gravado
+    """
+    corpo = json.dumps(dados, separators=(',', ':')).encode('utf-8')
+    arquivo = f"{nome}-{hashlib.sha1(corpo).hexdigest()[:12]}.geojson"
+    diretorio = Path(diretorio)
+    diretorio.mkdir(parents=True, exist_ok=True)
+    destino = diretorio / arquivo
+    if not destino.exists():
+        temporario = destino.with_suffix('.tmp')
+        temporario.write_bytes(gzip.compress(corpo, compresslevel=6))
+        temporario.replace(destino)
+    return arquivo
+
+
+def servir_tiles(
+    caminho: Path = TILES_VETORIAIS_ARQUIVO,
+    porta: int = TILES_VETORIAIS_PORTA,
+    host: str = '127.0.0.1',
+    camadas_dir: Path = TILES_CAMADAS_DIR
+):
+    """
+    Serve /tiles/{z}/{x}/{y}.pbf e /tiles.json (TileJSON) a partir do MBTiles,
+    e /camadas/{arquivo}.geojson a partir de `camadas_dir`
+
+    Sem o MBTiles, só as camadas GeoJSON são servidas.
+    """
+    caminho = Path(caminho)
+    camadas_dir = Path(camadas_dir)
+    metadados: Optional[Dict[str, str]] = None
+    if caminho.exists():
+        with closing(sqlite3.connect(f"file:{caminho}?mode=ro", uri=True)) as conn:
+            metadados = dict(conn.execute("SELECT name, value FROM metadata").fetchall())
+    else:
+        print(f"⚠ {caminho} não encontrado: servindo só as camadas de {camadas_dir}")
+
+    class TilesHandler(BaseHTTPRequestHandler):
+        def _cabecalhos(self, status: int, tipo: str, extras: Optional[Dict[str, str]] = None):
+            self.send_response(status)
+            self.send_header('Content-Type', tipo)
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Cache-Control', 'public, max-age=3600')
+            for chave, valor in (extras or {}).items():
+                self.send_header(chave, valor)
+            self.end_headers()
+
+        def do_GET(self):
+            rota_caminho = self.path.split('?')[0]
+            camada = _ROTA_CAMADA.match(rota_caminho)
+            if camada:
+                arquivo = camadas_dir / camada.group(1)
+                if not arquivo.is_file():
+                    self._cabecalhos(404, 'text/plain')
+                    return
+                dados = arquivo.read_bytes()
+                self._cabecalhos(200, 'application/geo+json', {
+                    'Content-Encoding': 'gzip',
+                    'Content-Length': str(len(dados))
+                })
+                self.wfile.write(dados)
+                return
+
+            if metadados is None:
+                self._cabecalhos(404, 'text/plain')
+                return
+
+            if rota_caminho == '/tiles.json':
+                base = f"http://{self.headers.get('Host', f'{host}:{porta}')}"
+                corpo = json.dumps({
+                    'tilejson': '3.0.0',
+                    'tiles': [base + '/tiles/{z}/{x}/{y}.pbf'],
+                    'minzoom': int(metadados['minzoom']),
+                    'maxzoom': int(metadados['maxzoom']),
+                    'bounds': [float(v) for v in metadados['bounds'].split(',')],
+                    **json.loads(metadados.get('json', '{}'))
+                }).encode('utf-8')
+                self._cabecalhos(200, 'application/json')
+                self.wfile.write(corpo)
+                return
+
+            rota = _ROTA_TILE.match(rota_caminho)
+            if not rota:
+                self._cabecalhos(404, 'text/plain')
+                return
+            dados = ler_tile(caminho, *(int(v) for v in rota.groups()))
+            if dados is None:
+                self._cabecalhos(204, 'application/x-protobuf')
+                return
+            self._cabecalhos(200, 'application/x-protobuf', {
+                'Content-Encoding': 'gzip',
+                'Content-Length': str(len(dados))
+            })
+            self.wfile.write(dados)
+
+        def log_message(self, formato, *args):
+            pass
+
+    if metadados is not None:
+        print(f"→ Servindo tiles de {caminho} em http://{host}:{porta}/tiles/{{z}}/{{x}}/{{y}}.pbf")
+    print(f"→ Servindo camadas de {camadas_dir} em http://{host}:{porta}/camadas/{{arquivo}}.geojson")
+    ThreadingHTTPServer((host, porta), TilesHandler).serve_forever()
+
+
+# --- CAMADAS A PARTIR DOS REPOSITÓRIOS ---
+def tabelas_regionais() -> Tuple['TabelaPlaces', 'TabelaPlaces', np.ndarray]:
+    """
+    Eletropostos e POIs de toda a região armazenada no repositório de lugares
+
+    Returns:
+        (eletropostos, pois, peso de cada POI pela categoria)
+    """
+    from api.places import PlacesAPINew
+    from api.repositorio_places import get_repositorio_places
+    from api.tabela_places import TabelaPlaces
+    from config.settings import CATEGORIAS_POIS
+
+    repositorio = get_repositorio_places()
+    eletropostos = TabelaPlaces.de_respostas(repositorio.lugares_camada('eletropostos'))
+    pois = TabelaPlaces.concatenar([
+        TabelaPlaces.de_respostas(
+            repositorio.lugares_camada(PlacesAPINew.camada_pois(dados['types'])), categoria=nome
+        )
+        for nome, dados in CATEGORIAS_POIS.items()
+    ])
+    pesos = np.array([CATEGORIAS_POIS[c]['peso'] for c in pois.categorias] + [0.0])[pois.categoria]
+    return eletropostos, pois, pesos
+
+
+def camadas_regionais(tamanho_celula_m: float = 200) -> List[CamadaVetorial]:
+    """Eletropostos, POIs e células da grade a partir do repositório de lugares"""
+    from processamento.grade import agregar_pois, poligonos_celulas, tabela_candidatos
+
+    eletropostos, pois, pesos = tabelas_regionais()
+    camadas = [CamadaVetorial(
+        nome='eletropostos',
+        tipo='ponto',
+        coords=np.column_stack([eletropostos.lat, eletropostos.lng]),
+        propriedades={
+            'nome': np.where(eletropostos.nome == None, '', eletropostos.nome),  # noqa: E711
+            'conectores': eletropostos.conectores_total,
+            'max_kw': np.nan_to_num(eletropostos.max_kw, nan=0.0).astype(float)
+        },
+        prioridade=eletropostos.conectores_total.astype(float),
+        desbaste_px=2.0
+    )]
+
+    camadas.append(CamadaVetorial(
+        nome='pois',
+        tipo='ponto',
+        coords=np.column_stack([pois.lat, pois.lng]),
+        propriedades={
+            'nome': np.where(pois.nome == None, '', pois.nome),  # noqa: E711
+            'categoria': pois.rotulos(pois.categoria, pois.categorias),
+            'peso': pesos
+        },
+        prioridade=pesos
+    ))
+
+    if len(pois):
+        agregado = agregar_pois(pois.lat, pois.lng, pesos, tamanho_celula_m)
+        celulas = tabela_candidatos(agregado)
+        camadas.append(CamadaVetorial(
+            nome='celulas',
+            tipo='poligono',
+            coords=poligonos_celulas(agregado.ids, tamanho_celula_m, agregado.indice.zona, agregado.indice.sul),
+            propriedades={
+                'qtd': celulas['Qtd_POIs'].to_numpy(),
+                'score': np.round(celulas['Score_Estimado'].to_numpy(), 2)
+            },
+            zoom_min=12
+        ))
+    return camadas
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Ponto de entrada da linha de comando"""
+    parser = argparse.ArgumentParser(description="Tiles vetoriais das camadas regionais")
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    exportar = sub.add_parser('exportar', help="Gera o MBTiles a partir dos repositórios")
+    exportar.add_argument('--zoom-min', type=int, default=TILES_ZOOM_MIN)
+    exportar.add_argument('--zoom-max', type=int, default=TILES_ZOOM_MAX)
+    exportar.add_argument('--celula-m', type=float, default=200, help="Lado das células da grade")
+    exportar.add_argument('--arquivo', type=Path, default=TILES_VETORIAIS_ARQUIVO)
+
+    servir = sub.add_parser('servir', help="Serve os tiles num endpoint HTTP local")
+    servir.add_argument('--porta', type=int, default=TILES_VETORIAIS_PORTA)
+    servir.add_argument('--arquivo', type=Path, default=TILES_VETORIAIS_ARQUIVO)
+    servir.add_argument('--camadas', type=Path, default=TILES_CAMADAS_DIR, help="Pasta dos GeoJSON das camadas")
+
+    args = parser.parse_args(argv)
+    if args.comando == 'exportar':
+        camadas = camadas_regionais(args.celula_m)
+        for camada in camadas:
+            print(f"→ Camada {camada.nome}: {len(camada)} feições")
+        por_zoom = exportar_mbtiles(camadas, args.arquivo, args.zoom_min, args.zoom_max)
+        for z, total in sorted(por_zoom.items()):
+            print(f"  zoom {z:>2}: {total} tiles")
+        print(f"✓ Tiles vetoriais gravados em {args.arquivo}")
+    else:
+        servir_tiles(args.arquivo, args.porta, camadas_dir=args.camadas)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
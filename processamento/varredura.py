@@ -0,0 +1,266 @@
+"""
+Varredura regional de eletropostos e POIs
+Percorre os tiles geohash de um polígono e preenche o repositório local de lugares.
+
+Execução (fora do Streamlit):
+    python -m processamento.varredura --camada eletropostos
+    python -m processamento.varredura --camada pois --workers 4 --rps 5
+
+O progresso fica no próprio repositório (cada tile concluído é gravado com a
+data de atualização), então uma execução interrompida por falha ou por cota
+recomeça exatamente nos tiles que faltam.
+"""
+
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, List, Optional, Tuple
+import requests
+from api.places import get_places_client
+from api.repositorio_places import (
+    RepositorioPlaces,
+    get_repositorio_places,
+    geohash_bbox,
+    geohashes_bbox
+)
+from config.settings import (
+    CATEGORIAS_POIS,
+    DADOS_DIR,
+    REGIAO_CAMPINAS_POLIGONO,
+    REPOSITORIO_GEOHASH_PRECISAO,
+    REPOSITORIO_PLACES_TTL_DAYS,
+    VARREDURA_MAX_WORKERS,
+    VARREDURA_REQUISICOES_POR_SEGUNDO
+)
+
+Poligono = List[Tuple[float, float]]
+
+
+class CotaExcedida(Exception):
+    """A Places API recusou a requisição por limite de cota"""
+
+
+class LimitadorTaxa:
+    """Token bucket compartilhado entre threads (requisições por segundo)"""
+
+    def __init__(self, requisicoes_por_segundo: float):
+        self.intervalo = 1.0 / requisicoes_por_segundo if requisicoes_por_segundo > 0 else 0.0
+        self._proximo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        """Bloqueia até a próxima requisição estar liberada"""
+        with self._lock:
+            agora = time.monotonic()
+            espera = self._proximo - agora
+            self._proximo = max(agora, self._proximo) + self.intervalo
+        if espera > 0:
+            time.sleep(espera)
+
+
+# --- GEOMETRIA ---
+def ponto_no_poligono(lat: float, lng: float, poligono: Poligono) -> bool:
+    """Teste ray casting de um ponto contra um polígono (lat, lng)"""
+    dentro = False
+    n = len(poligono)
+    for k in range(n):
+        lat1, lng1 = poligono[k]
+        lat2, lng2 = poligono[(k + 1) % n]
+        if (lat1 > lat) != (lat2 > lat):
+            lng_cruzamento = lng1 + (lat - lat1) * (lng2 - lng1) / (lat2 - lat1)
+            if lng < lng_cruzamento:
+                dentro = not dentro
+    return dentro
+
+
+def tiles_poligono(poligono: Poligono, precisao: int = REPOSITORIO_GEOHASH_PRECISAO) -> List[str]:
+    """Geohashes que intersectam o polígono (centro ou canto dentro, ou vértice no tile)"""
+    lats = [p[0] for p in poligono]
+    lngs = [p[1] for p in poligono]
+
+    tiles = []
+    for gh in geohashes_bbox(min(lats), max(lats), min(lngs), max(lngs), precisao):
+        lat_min, lat_max, lng_min, lng_max = geohash_bbox(gh)
+        pontos_tile = [
+            ((lat_min + lat_max) / 2, (lng_min + lng_max) / 2),
+            (lat_min, lng_min), (lat_min, lng_max),
+            (lat_max, lng_min), (lat_max, lng_max)
+        ]
+        if any(ponto_no_poligono(la, ln, poligono) for la, ln in pontos_tile) or any(
+            lat_min <= la <= lat_max and lng_min <= ln <= lng_max for la, ln in poligono
+        ):
+            tiles.append(gh)
+    return tiles
+
+
+def _formatar_duracao(segundos: float) -> str:
+    """Formata segundos como HH:MM:SS"""
+    segundos = int(max(segundos, 0))
+    return f"{segundos // 3600:02d}:{(segundos % 3600) // 60:02d}:{segundos % 60:02d}"
+
+
+class VarreduraRegional:
+    """Agenda a atualização dos tiles de uma região com concorrência e taxa limitadas"""
+
+    def __init__(
+        self,
+        poligono: Poligono = REGIAO_CAMPINAS_POLIGONO,
+        max_workers: int = VARREDURA_MAX_WORKERS,
+        requisicoes_por_segundo: float = VARREDURA_REQUISICOES_POR_SEGUNDO,
+        ttl_dias: float = REPOSITORIO_PLACES_TTL_DAYS,
+        repositorio: Optional[RepositorioPlaces] = None
+    ):
+        self.poligono = poligono
+        self.max_workers = max_workers
+        self.limitador = LimitadorTaxa(requisicoes_por_segundo)
+        self.ttl_dias = ttl_dias
+        self.repositorio = repositorio or get_repositorio_places()
+        self._parar = threading.Event()
+
+    def _busca_limitada(self, buscar_fn: Callable) -> Callable:
+        """Envolve a função de busca com o limitador e a detecção de cota"""
+        def buscar(lat: float, lng: float, raio: int):
+            if self._parar.is_set():
+                raise CotaExcedida("varredura interrompida")
+            self.limitador.aguardar()
+            try:
+                return buscar_fn(lat, lng, raio)
+            except requests.exceptions.HTTPError as e:
+                resposta = e.response
+                if resposta is not None and (
+                    resposta.status_code == 429 or 'RESOURCE_EXHAUSTED' in resposta.text
+                ):
+                    self._parar.set()
+                    raise CotaExcedida(str(e)) from e
+                raise
+        return buscar
+
+    def _salvar_progresso(self, caminho, estado: Dict):
+        """Grava o estado da varredura em JSON (substituição atômica)"""
+        temporario = caminho.with_suffix('.tmp')
+        temporario.write_text(json.dumps(estado, ensure_ascii=False, indent=2), encoding='utf-8')
+        temporario.replace(caminho)
+
+    def executar(self, camada: str, buscar_fn: Callable) -> Dict:
+        """
+        Varre todos os tiles pendentes de uma camada
+
+        Args:
+            camada: Nome da camada no repositório
+            buscar_fn: Função de busca de um tile (lat, lng, raio) -> lugares
+
+        Returns:
+            Resumo da execução
+        """
+        tiles = tiles_poligono(self.poligono)
+        pendentes = self.repositorio.tiles_expirados(camada, tiles, self.ttl_dias)
+        total = len(pendentes)
+        print(f"→ Varredura ({camada}): {len(tiles)} tiles na região, {total} pendentes")
+
+        caminho_progresso = DADOS_DIR / f"varredura_{camada.replace(':', '_').replace(',', '-')}.json"
+        estado = {
+            'camada': camada,
+            'tiles_regiao': len(tiles),
+            'tiles_pendentes': total,
+            'concluidos': 0,
+            'falhas': 0,
+            'chamadas_api': 0,
+            'interrompido_por': None,
+            'iniciado_em': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+        self._salvar_progresso(caminho_progresso, estado)
+
+        busca = self._busca_limitada(buscar_fn)
+        inicio = time.monotonic()
+        fila = iter(pendentes)
+        em_execucao = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            def agendar():
+                # Mantém no máximo 2x max_workers tiles em voo
+                while not self._parar.is_set() and len(em_execucao) < 2 * self.max_workers:
+                    gh = next(fila, None)
+                    if gh is None:
+                        return
+                    futuro = executor.submit(
+                        self.repositorio.atualizar_tile, camada, gh, busca, self.ttl_dias
+                    )
+                    em_execucao[futuro] = gh
+
+            agendar()
+            while em_execucao:
+                prontos, _ = wait(list(em_execucao), return_when=FIRST_COMPLETED)
+                for futuro in prontos:
+                    gh = em_execucao.pop(futuro)
+                    try:
+                        estado['chamadas_api'] += futuro.result()
+                        estado['concluidos'] += 1
+                    except CotaExcedida as e:
+                        # Guarda a causa original, não as recusas dos tiles em voo
+                        estado['interrompido_por'] = estado['interrompido_por'] or f"cota: {e}"
+                    except Exception as e:
+                        # Só a varredura tolera falhas por tile (o tile continua expirado
+                        # e é retomado); consultas do repositório levantam FalhaAtualizacaoTiles
+                        estado['falhas'] += 1
+                        print(f"✗ Tile {gh}: {e}")
+
+                decorrido = time.monotonic() - inicio
+                taxa = estado['concluidos'] / decorrido if decorrido > 0 else 0.0
+                restantes = total - estado['concluidos'] - estado['falhas']
+                eta = restantes / taxa if taxa > 0 else float('inf')
+                print(
+                    f"  [{estado['concluidos']}/{total}] {taxa:.2f} tiles/s, "
+                    f"{estado['chamadas_api'] / decorrido if decorrido > 0 else 0:.2f} chamadas/s, "
+                    f"ETA {_formatar_duracao(eta) if eta != float('inf') else '--:--:--'}"
+                )
+                self._salvar_progresso(caminho_progresso, estado)
+                agendar()
+
+        estado['duracao_s'] = round(time.monotonic() - inicio, 1)
+        self._salvar_progresso(caminho_progresso, estado)
+
+        if estado['interrompido_por']:
+            print(f"⚠ Varredura ({camada}) interrompida ({estado['interrompido_por']}); execute novamente para retomar")
+        else:
+            print(f"✓ Varredura ({camada}): {estado['concluidos']} tiles, {estado['chamadas_api']} chamadas, {estado['falhas']} falhas")
+        return estado
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Ponto de entrada da linha de comando"""
+    parser = argparse.ArgumentParser(description="Varredura regional de eletropostos e POIs (Places API)")
+    parser.add_argument('--camada', choices=['eletropostos', 'pois', 'todas'], default='todas')
+    parser.add_argument('--workers', type=int, default=VARREDURA_MAX_WORKERS)
+    parser.add_argument('--rps', type=float, default=VARREDURA_REQUISICOES_POR_SEGUNDO,
+                        help="Limite de requisições por segundo")
+    parser.add_argument('--ttl-dias', type=float, default=REPOSITORIO_PLACES_TTL_DAYS,
+                        help="Tiles atualizados há menos tempo que isso são pulados")
+    args = parser.parse_args(argv)
+
+    places_client = get_places_client()
+    camadas = []
+    if args.camada in ('eletropostos', 'todas'):
+        camadas.append(('eletropostos', places_client.buscar_tile_eletropostos))
+    if args.camada in ('pois', 'todas'):
+        for cat_data in CATEGORIAS_POIS.values():
+            camadas.append((
+                places_client.camada_pois(cat_data['types']),
+                places_client.busca_tile_pois(cat_data['types'])
+            ))
+
+    varredura = VarreduraRegional(
+        max_workers=args.workers,
+        requisicoes_por_segundo=args.rps,
+        ttl_dias=args.ttl_dias
+    )
+    for camada, buscar_fn in camadas:
+        estado = varredura.executar(camada, buscar_fn)
+        if estado['interrompido_por']:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -2,13 +2,154 @@
 App de Teste: Integração ArcGIS 3D no Streamlit (Sem Login / Open Source Basemap)
 """
 
+import json
+import numpy as np
 import streamlit as st
 import streamlit.components.v1 as components
+from components.camadas import geojson_pontos
+from config.settings import DEFAULT_CENTER, TILES_VETORIAIS_URL, TILES_ZOOM_MAX, TILES_ZOOM_MIN
+from processamento.grade import grade_candidatos
+from processamento.tiles_vetoriais import gravar_camada_geojson, tabelas_regionais
 
 st.set_page_config(page_title="ArcGIS 3D Eletropostos", layout="wide")
 
 st.title("🌍 Teste de integração ArcGIS 3D")
 
+# Variáveis que podem guiar altura e cor dos cilindros: {rótulo: (campo, unidade)}
+VARIAVEIS_ELETROPOSTOS = {
+    "Potência máxima (kW)": ('max_kw', 'kW'),
+    "Conectores": ('conectores', 'conectores')
+}
+VARIAVEIS_CANDIDATOS = {
+    "Score de demanda": ('score', 'pontos'),
+    "POIs na célula": ('qtd', 'POIs')
+}
+
+
+def faixa(valores: np.ndarray) -> list:
+    """Percentis 5 e 95 dos valores (paradas das variáveis visuais)"""
+    valores = np.asarray(valores, dtype=float)
+    if len(valores) == 0:
+        return [0.0, 1.0]
+    baixo, alto = np.percentile(valores, [5, 95])
+    return [float(baixo), float(max(alto, baixo + 1e-6))]
+
+
+def publicar_camada(nome: str, lats: np.ndarray, lngs: np.ndarray, propriedades: dict) -> dict:
+    """Grava o GeoJSON da camada para o endpoint local e devolve só o resumo (arquivo, total, faixas)"""
+    return {
+        'arquivo': gravar_camada_geojson(nome, geojson_pontos(lats, lngs, propriedades)),
+        'total': len(lats),
+        'faixas': {campo: faixa(valores) for campo, valores in propriedades.items() if campo != 'nome'}
+    }
+
+
+@st.cache_data(ttl=600, show_spinner="Carregando eletropostos e candidatos do repositório...")
+def carregar_camadas(tamanho_celula_m: float) -> dict:
+    """
+    Publica o GeoJSON dos eletropostos e dos candidatos (células da grade dos POIs)
+    da região em TILES_CAMADAS_DIR, servido em /camadas/ pelo endpoint local
+
+    Lido do repositório local de lugares, sem chamadas à API. O HTML recebe só
+    as URLs e as faixas das variáveis visuais; o navegador baixa os dados.
+    """
+    eletropostos, pois, pesos = tabelas_regionais()
+    camadas = {
+        'eletropostos': publicar_camada('eletropostos', eletropostos.lat, eletropostos.lng, {
+            'nome': np.where(eletropostos.nome == None, '', eletropostos.nome),  # noqa: E711
+            'conectores': eletropostos.conectores_total,
+            'max_kw': np.round(np.nan_to_num(eletropostos.max_kw, nan=0.0).astype(float), 1)
+        })
+    }
+    if len(pois):
+        candidatos = grade_candidatos(pois.lat, pois.lng, pesos, tamanho_m=tamanho_celula_m)
+        lats_c, lngs_c = candidatos['Lat_Centroide'].to_numpy(), candidatos['Lng_Centroide'].to_numpy()
+        propriedades_c = {
+            'qtd': candidatos['Qtd_POIs'].to_numpy(),
+            'score': np.round(candidatos['Score_Estimado'].to_numpy().astype(float), 2)
+        }
+    else:
+        lats_c = lngs_c = np.zeros(0)
+        propriedades_c = {'qtd': np.zeros(0, dtype=int), 'score': np.zeros(0)}
+    camadas['candidatos'] = publicar_camada('candidatos', lats_c, lngs_c, propriedades_c)
+
+    # Câmera no centro dos eletropostos (ou no centro padrão)
+    if len(eletropostos.lat):
+        camadas['camera'] = (float(np.median(eletropostos.lat)), float(np.median(eletropostos.lng)))
+    else:
+        camadas['camera'] = (DEFAULT_CENTER['lat'], DEFAULT_CENTER['lng'])
+    return camadas
+
+
+# --- CONTROLES ---
+with st.sidebar:
+    st.header("Camadas 3D")
+    tamanho_celula = st.select_slider("Célula dos candidatos (m)", options=[100, 200, 500, 1000], value=200)
+
+    st.subheader("Eletropostos")
+    altura_eletropostos = st.selectbox("Altura", list(VARIAVEIS_ELETROPOSTOS), index=0, key="altura_eletropostos")
+    cor_eletropostos = st.selectbox("Cor", list(VARIAVEIS_ELETROPOSTOS), index=1, key="cor_eletropostos")
+
+    st.subheader("Candidatos")
+    mostrar_candidatos = st.checkbox("Exibir candidatos", value=True)
+    altura_candidatos = st.selectbox("Altura", list(VARIAVEIS_CANDIDATOS), index=0, key="altura_candidatos")
+    cor_candidatos = st.selectbox("Cor", list(VARIAVEIS_CANDIDATOS), index=1, key="cor_candidatos")
+
+    # Pirâmide exportada por processamento/tiles_vetoriais.py (só os tiles visíveis são baixados)
+    tiles_regionais = st.checkbox(
+        "Camada regional (tiles vetoriais)",
+        value=False,
+        help="Requer `python -m processamento.tiles_vetoriais servir` em execução"
+    )
+
+dados = carregar_camadas(tamanho_celula)
+
+
+def config_camada(chave, titulo, variaveis, altura, cor, tamanho_m, cores, alturas_m, popup):
+    """Parâmetros de uma camada de cilindros (URL do GeoJSON + renderer) para o JavaScript"""
+    campo_altura, _ = variaveis[altura]
+    campo_cor, _ = variaveis[cor]
+    faixas = dados[chave]['faixas']
+    return {
+        'titulo': titulo,
+        'url': f"{TILES_VETORIAIS_URL.rstrip('/')}/camadas/{dados[chave]['arquivo']}",
+        'campos': [{'name': campo, 'type': 'double'} for campo, _ in variaveis.values()],
+        'altura': {'campo': campo_altura, 'faixa': faixas[campo_altura], 'metros': alturas_m},
+        'cor': {'campo': campo_cor, 'faixa': faixas[campo_cor], 'cores': cores},
+        'largura_m': tamanho_m,
+        'popup': popup
+    }
+
+
+camadas_3d = [config_camada(
+    'eletropostos', "Eletropostos", VARIAVEIS_ELETROPOSTOS, altura_eletropostos, cor_eletropostos,
+    tamanho_m=120, cores=["#9ecae1", "#08519c"], alturas_m=[100, 1200],
+    popup={
+        'title': "{nome}",
+        'content': "<b>Potência Máxima:</b> {max_kw} kW<br><b>Conectores:</b> {conectores}"
+    }
+)]
+if mostrar_candidatos:
+    camadas_3d.append(config_camada(
+        'candidatos', "Candidatos", VARIAVEIS_CANDIDATOS, altura_candidatos, cor_candidatos,
+        tamanho_m=tamanho_celula * 0.6, cores=["#fecc5c", "#bd0026"], alturas_m=[50, 800],
+        popup={
+            'title': "Candidato",
+            'content': "<b>Score estimado:</b> {score}<br><b>POIs na célula:</b> {qtd}"
+        }
+    ))
+
+total_eletropostos = dados['eletropostos']['total']
+total_candidatos = dados['candidatos']['total']
+st.caption(
+    f"{total_eletropostos} eletropostos e {total_candidatos} candidatos do repositório local, "
+    f"servidos em {TILES_VETORIAIS_URL} (`python -m processamento.tiles_vetoriais servir`)"
+)
+if total_eletropostos == 0:
+    st.info("Repositório sem eletropostos: execute `python -m processamento.varredura --camada eletropostos`.")
+
+lat_camera, lng_camera = dados['camera']
+
 arcgis_html = """
 <!DOCTYPE html>
 <html>
@@ -25,7 +166,7 @@ arcgis_html = """
       background-color: #121212;
     }
   </style>
-  
+
   <link rel="stylesheet" href="https://js.arcgis.com/4.28/esri/themes/light/main.css">
   <script src="https://js.arcgis.com/4.28/"></script>
 
@@ -33,14 +174,15 @@ arcgis_html = """
     require([
       "esri/Map",
       "esri/views/SceneView",
-      "esri/Graphic",
-      "esri/layers/GraphicsLayer"
-    ], function(Map, SceneView, Graphic, GraphicsLayer) {
+      "esri/layers/GeoJSONLayer",
+      "esri/layers/VectorTileLayer",
+      "esri/widgets/Legend"
+    ], function(Map, SceneView, GeoJSONLayer, VectorTileLayer, Legend) {
 
       // "osm" (OpenStreetMap) público
       const map = new Map({
-        basemap: "osm" 
-        
+        basemap: "osm"
+
       });
 
       const view = new SceneView({
@@ -48,53 +190,96 @@ arcgis_html = """
         map: map,
         camera: {
           position: {
-            x: -46.6333,
-            y: -23.6500, 
-            z: 5000      
+            x: %LNG_CAMERA%,
+            y: %LAT_CAMERA% - 0.1,
+            z: 5000
           },
-          tilt: 60,      
+          tilt: 60,
           heading: 0
         }
       });
 
-      const graphicsLayer = new GraphicsLayer();
-      map.add(graphicsLayer);
-
-      const point = {
-        type: "point",
-        longitude: -46.6333,
-        latitude: -23.5505
-      };
-
-      // Eletroposto em 3D
-      const evSymbol3D = {
-        type: "point-3d",
-        symbolLayers: [{
-          type: "object",
-          width: 150,   
-          height: 400,  
-          depth: 150,   
-          resource: { primitive: "cylinder" },
-          material: { color: [0, 100, 255, 0.8] } // Azul translúcido para que se destaque no mapa claro
-        }]
-      };
-
-      const pointGraphic = new Graphic({
-        geometry: point,
-        symbol: evSymbol3D,
-        attributes: {
-            Name: "Eletroposto Piloto SP",
-            Conectores: 4,
-            Potencia: "150 kW",
-            Distancia: "0 km"
-        },
-        popupTemplate: {
-            title: "{Name}",
-            content: "<b>Potência Máxima:</b> {Potencia}<br><b>Conectores:</b> {Conectores}<br><b>Status:</b> Operacional"
-        }
+      // Camadas regionais servidas localmente (vazio = desativado)
+      const tilesUrl = "%TILES_URL%";
+      if (tilesUrl) {
+        map.add(new VectorTileLayer({
+          title: "Camada regional",
+          style: {
+            version: 8,
+            sources: {
+              regiao: {
+                type: "vector",
+                tiles: [tilesUrl + "/tiles/{z}/{x}/{y}.pbf"],
+                minzoom: %ZOOM_MIN%,
+                maxzoom: %ZOOM_MAX%
+              }
+            },
+            layers: [
+              {
+                id: "celulas", type: "fill", source: "regiao", "source-layer": "celulas",
+                paint: { "fill-color": "#fd8d3c", "fill-opacity": 0.25, "fill-outline-color": "#f03b20" }
+              },
+              {
+                id: "pois", type: "circle", source: "regiao", "source-layer": "pois",
+                paint: { "circle-radius": 3, "circle-color": "#1f77b4", "circle-opacity": 0.7 }
+              },
+              {
+                id: "eletropostos", type: "circle", source: "regiao", "source-layer": "eletropostos",
+                paint: { "circle-radius": 4, "circle-color": "#2ca02c", "circle-stroke-color": "#1a661a", "circle-stroke-width": 1 }
+              }
+            ]
+          }
+        }));
+      }
+
+      // Cilindros guiados por dados: um símbolo por camada, altura e cor por variáveis visuais
+      function renderer(c) {
+        return {
+          type: "simple",
+          symbol: {
+            type: "point-3d",
+            symbolLayers: [{
+              type: "object",
+              width: c.largura_m,
+              depth: c.largura_m,
+              resource: { primitive: "cylinder" },
+              material: { color: c.cor.cores[0] }
+            }]
+          },
+          visualVariables: [
+            {
+              type: "size", axis: "height", field: c.altura.campo,
+              stops: [
+                { value: c.altura.faixa[0], size: c.altura.metros[0] },
+                { value: c.altura.faixa[1], size: c.altura.metros[1] }
+              ]
+            },
+            { type: "size", axis: "width-and-depth", useSymbolValue: true },
+            {
+              type: "color", field: c.cor.campo,
+              stops: [
+                { value: c.cor.faixa[0], color: c.cor.cores[0] },
+                { value: c.cor.faixa[1], color: c.cor.cores[1] }
+              ]
+            }
+          ]
+        };
+      }
+
+      // Só a configuração vem no HTML; cada camada baixa o GeoJSON do endpoint local
+      const CAMADAS = %CAMADAS%;
+      CAMADAS.forEach(function (c) {
+        map.add(new GeoJSONLayer({
+          url: c.url,
+          title: c.titulo,
+          fields: [{ name: "nome", type: "string" }].concat(c.campos),
+          renderer: renderer(c),
+          popupTemplate: c.popup,
+          elevationInfo: { mode: "on-the-ground" }
+        }));
       });
 
-      graphicsLayer.add(pointGraphic);
+      view.ui.add(new Legend({ view: view }), "bottom-right");
     });
   </script>
 </head>
@@ -104,4 +289,14 @@ arcgis_html = """
 </html>
 """
 
+arcgis_html = (
+    arcgis_html
+    .replace("%CAMADAS%", json.dumps(camadas_3d).replace('</', '<\\/'))
+    .replace("%LAT_CAMERA%", f"{lat_camera:.6f}")
+    .replace("%LNG_CAMERA%", f"{lng_camera:.6f}")
+    .replace("%TILES_URL%", TILES_VETORIAIS_URL.rstrip('/') if tiles_regionais else "")
+    .replace("%ZOOM_MIN%", str(TILES_ZOOM_MIN))
+    .replace("%ZOOM_MAX%", str(TILES_ZOOM_MAX))
+)
+
 components.html(arcgis_html, height=700)
@@ -4,10 +4,10 @@ Visualização de dados para planejamento de eletropostos
 """
 
 import streamlit as st
-from config.settings import STREAMLIT_CONFIG
+from config.settings import STREAMLIT_CONFIG, TRAFFIC_PERIODS
 from components.sidebar import render_sidebar
 from components.mapa import render_mapa
-from components.dados import render_dados_eletropostos
+from components.dados import render_conectividade, render_congestionamento, render_dados_eletropostos
 
 # Configuração da página
 st.set_page_config(**STREAMLIT_CONFIG)
@@ -36,32 +36,48 @@ if config['btn_coletar']:
         # Eletropostos
         if config['modulos']['eletropostos']:
             from api.places import get_places_client
+            from api.repositorio_places import FalhaAtualizacaoTiles
             places_client = get_places_client()
             
-            eletropostos = places_client.buscar_eletropostos(
-                location=(config['lat_centro'], config['lng_centro']),
-                radius_meters=config['raio_km'] * 1000
-            )
-            
-            # Salvar em session_state
-            st.session_state['eletropostos'] = eletropostos
-            st.session_state['dados_coletados'] = True
+            try:
+                eletropostos = places_client.buscar_eletropostos(
+                    location=(config['lat_centro'], config['lng_centro']),
+                    radius_meters=config['raio_km'] * 1000
+                )
+            except FalhaAtualizacaoTiles as e:
+                # Resposta incompleta não substitui a coleta anterior
+                st.error(f"Falha na Places API: {e}. Os tiles com falha serão rebuscados na próxima coleta.")
+            else:
+                # Salvar em session_state
+                st.session_state['eletropostos'] = eletropostos
+                st.session_state['dados_coletados'] = True
         
         # Outros módulos (preparar para futuro)
         if config['modulos']['pois']:
             st.session_state['pois'] = []  
         
         if config['modulos']['rotas']:
-            st.session_state['rotas'] = []  
+            # Congestionamento é cobrado por elemento: só roda pelo botão na aba Dados
+            st.session_state.pop('congestionamento', None)
+            st.session_state['dados_coletados'] = True
         
         if config['modulos']['conectividade']:
-            st.session_state['conectividade'] = {}  
+            # Rede entre os eletropostos coletados (vizinhos em linha reta, sem chamadas à API)
+            from processamento.conectividade import GrafoTempos, analisar_rede
+            eletropostos_rede = st.session_state.get('eletropostos')
+            if eletropostos_rede:
+                st.session_state['conectividade'] = analisar_rede(
+                    GrafoTempos.de_vizinhos(eletropostos_rede.lat, eletropostos_rede.lng)
+                )
+                st.session_state['dados_coletados'] = True
 
 # Sistema de abas
 tab_mapa, tab_dados = st.tabs(["Mapa", "Dados"])
 
-# ABA: MAPA
-with tab_mapa:
+# Fragmentos: um clique no mapa ou uma interação na tabela reexecuta só a
+# própria seção; a camada de eletropostos vem do cache (dados_camada_eletropostos)
+@st.fragment
+def secao_mapa(config):
     # Verificar se existem dados coletados
     eletropostos_mapa = st.session_state.get('eletropostos', None)
     
@@ -71,7 +87,8 @@ with tab_mapa:
         lng_centro=config['lng_centro'],
         raio_km=config['raio_km'],
         eletropostos=eletropostos_mapa,
-        tema='claro'  # Mudar para 'escuro' quando quiser
+        tema='claro',  # Mudar para 'escuro' quando quiser
+        tiles_regionais=config['tiles_regionais']
     )
     
     # Processar clique
@@ -86,8 +103,25 @@ with tab_mapa:
     else:
         st.info("Nenhum dado coletado ainda. Configure na sidebar e clique em 'Coletar dados'")
 
-# ABA: DADOS
-with tab_dados:
+def secao_congestionamento(config):
+    """Estimativa de elementos e custo; a análise só roda após confirmação"""
+    from processamento.congestionamento import analisar_congestionamento, estimar_congestionamento
+
+    area = (config['lat_centro'], config['lng_centro'], config['raio_km'] * 1000)
+    estimativa = estimar_congestionamento(*area)
+    st.caption(
+        f"{estimativa['corredores']} corredores (nós a cada {estimativa['espacamento_m']:.0f} m) x "
+        f"{len(TRAFFIC_PERIODS)} horários = {estimativa['elementos']} elementos da Distance Matrix "
+        f"em {estimativa['requisicoes']} requisições, até US$ {estimativa['custo_usd']:.2f} "
+        f"(consultas já em cache não são cobradas)"
+    )
+    if st.button(f"Calcular congestionamento ({estimativa['elementos']} elementos)", key="btn_congestionamento"):
+        with st.spinner("Consultando tempos com tráfego..."):
+            st.session_state['congestionamento'] = analisar_congestionamento(*area)
+    render_congestionamento(st.session_state.get('congestionamento'))
+
+@st.fragment
+def secao_dados(config):
     if st.session_state.get('dados_coletados', False):
         
         # Eletropostos
@@ -103,19 +137,18 @@ with tab_dados:
         
         if config['modulos']['rotas']:
             st.subheader("Análise de rotas")
-            st.info("Módulo em desenvolvimento")
+            secao_congestionamento(config)
         
         if config['modulos']['conectividade']:
             st.subheader("Conectividade")
-            st.info("Módulo em desenvolvimento")
+            render_conectividade(st.session_state.get('conectividade'), st.session_state.get('eletropostos'))
     else:
         st.info("Clique em 'Coletar dados' na sidebar para iniciar")
 
+# ABA: MAPA
+with tab_mapa:
+    secao_mapa(config)
 
-
-
-
-
-
-
-
+# ABA: DADOS
+with tab_dados:
+    secao_dados(config)
@@ -3,123 +3,392 @@ Dashboard Exploratório: Análise de Geradores de Viagem (POIs) e Geração de N
 Estimação de demanda gravitacional baseada em malha (Grid 200x200m).
 """
 
+import hashlib
 import streamlit as st
-import requests
+import numpy as np
 import pandas as pd
 import folium
-import math
 from streamlit_folium import st_folium
-from config.settings import GOOGLE_MAPS_API_KEY  # Importando a chave diretamente
+from api.places import ErroColetaCategorias, get_places_client
+from api.tabela_places import TabelaPlaces
+from api.distance_matrix import get_distance_matrix_client
+from components.camadas import (
+    camada_cluster, camada_poligonos, camada_pontos, camada_tiles_vetoriais, cores_por_valor, geojson_poligonos,
+    geojson_pontos, imagem_superficie, linhas_cluster, medir_mapa
+)
+from processamento.grade import PiramideGrade, poligonos_celulas
+from processamento.conectividade import analisar_rede, grafo_candidatos, ranquear_candidatos
+from processamento.densidade import candidatos_kde
+from processamento.gravidade import MODELOS_DECAIMENTO, score_gravitacional, score_por_custos
+from processamento.isocronas import gerar_isocronas
+from config.settings import (
+    CATEGORIAS_POIS,
+    DENSIDADE_LARGURA_M,
+    DENSIDADE_TOP_K,
+    GRAVIDADE_BETA,
+    GRAVIDADE_MAX_ELEMENTOS_REDE,
+    GRAVIDADE_MODELO_DECAIMENTO,
+    GRAVIDADE_RAIO_CORTE_M,
+    GRAVIDADE_VELOCIDADE_REF_KMH,
+    ISOCRONAS_MAX_ELEMENTOS,
+    ISOCRONAS_TEMPOS_S,
+    PLACES_CACHE_PRECISAO
+)
 
 # --- CONFIGURAÇÃO DA PÁGINA ---
 st.set_page_config(page_title="Geração de Nodos Candidatos EVCS", layout="wide")
 
-# --- CATEGORIAS DE BUSCA (Google Places API Types) ---
-CATEGORIAS_POIS = {
-    "Varejo & Lazer": {
-        "types": ["shopping_mall", "supermarket", "restaurant", "cafe"],
-        "color": "blue",
-        "icon": "shopping-cart",
-        "peso": 3
-    },
-    "Transporte": {
-        "types": ["bus_station", "subway_station", "transit_station"],
-        "color": "red",
-        "icon": "bus",
-        "peso": 2
-    },
-    "Serviços & Saúde": {
-        "types": ["hospital", "bank", "university"],
-        "color": "purple",
-        "icon": "heart", 
-        "peso": 1.5
-    }
-}
-
 # --- FUNÇÕES MATEMÁTICAS E DE COLETA ---
-def buscar_pois(lat, lng, raio):
-    url = "https://places.googleapis.com/v1/places:searchNearby"
-    headers = {
-        'Content-Type': 'application/json',
-        'X-Goog-Api-Key': GOOGLE_MAPS_API_KEY,
-        'X-Goog-FieldMask': 'places.displayName,places.location,places.primaryType'
-    }
-    
-    resultados_totais = []
-    
-    # Obs: A API limita a 20 resultados por requisição sem paginação. 
-    # Em raios grandes (ex: 10km), a amostra será dispersa.
-    for cat_nome, cat_data in CATEGORIAS_POIS.items():
-        payload = {
-            "locationRestriction": {
-                "circle": {"center": {"latitude": lat, "longitude": lng}, "radius": raio}
-            },
-            "includedTypes": cat_data["types"],
-            "maxResultCount": 20 
-        }
-        
-        try:
-            response = requests.post(url, json=payload, headers=headers)
-            if response.status_code == 200:
-                places = response.json().get('places', [])
-                for p in places:
-                    if 'location' in p:
-                        resultados_totais.append({
-                            "Nome": p.get('displayName', {}).get('text', 'Desconhecido'),
-                            "Tipo": p.get('primaryType', 'Desconhecido'),
-                            "Categoria": cat_nome,
-                            "Lat": p['location']['latitude'],
-                            "Lng": p['location']['longitude'],
-                            "Peso": cat_data["peso"]
-                        })
-        except Exception as e:
-            st.error(f"Erro ao buscar {cat_nome}: {e}")
-            
-    return pd.DataFrame(resultados_totais)
-
-def processar_grid_e_centroides(df_pois, lat_centro, lng_centro, raio_m, tamanho_grid_m=200):
+class ErroColetaPOIs(Exception):
+    """Falha em alguma categoria; carrega o resultado parcial (não entra no cache)"""
+    def __init__(self, erros, df_parcial):
+        super().__init__("; ".join(erros))
+        self.erros = erros
+        self.df_parcial = df_parcial
+
+def chave_categorias(categorias=CATEGORIAS_POIS):
+    """Representação hashable das categorias (nome, tipos, peso) para o cache"""
+    return tuple(
+        (nome, tuple(sorted(dados["types"])), dados["peso"])
+        for nome, dados in categorias.items()
+    )
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def buscar_pois(lat, lng, raio, categorias):
+    """
+    Coleta os POIs das categorias em paralelo.
+    
+    Memoizado em (lat, lng, raio, categorias) já quantizados: mudar apenas o
+    tamanho da grade reaproveita os POIs em memória. Uma coleta com falha
+    levanta ErroColetaPOIs, e o st.cache_data não memoiza exceções.
+    """
+    places_client = get_places_client()
+    
+    # Os POIs vêm do repositório local: só os tiles expirados ou nunca buscados
+    # geram chamadas (tiles saturados pelo limite de 20 resultados são subdivididos).
+    # As threads não chamam st.*; os erros são reportados pela thread principal.
+    erros = []
+    try:
+        tabela = places_client.buscar_categorias((lat, lng), raio, [(nome, tipos) for nome, tipos, _ in categorias])
+    except ErroColetaCategorias as e:
+        tabela, erros = e.parcial, e.erros
+    
+    # DataFrame montado direto das colunas da TabelaPlaces (strings como categorias)
+    peso_por_categoria = {nome: peso for nome, _, peso in categorias}
+    pesos = np.array([peso_por_categoria.get(c, 0.0) for c in tabela.categorias] + [0.0])
+    df = pd.DataFrame({
+        "Nome": pd.Series(tabela.nome, dtype=object).fillna('Desconhecido'),
+        "Tipo": pd.Categorical(tabela.rotulos(tabela.tipo, tabela.tipos)),
+        "Categoria": pd.Categorical.from_codes(tabela.categoria, tabela.categorias),
+        "Lat": tabela.lat,
+        "Lng": tabela.lng,
+        "Peso": pesos[tabela.categoria]
+    })
+    
+    if erros:
+        raise ErroColetaPOIs(erros, df)
+    return df
+
+def coletar_pois(lat, lng, raio):
+    """Quantiza os parâmetros, consulta o cache e exibe eventuais erros"""
+    try:
+        return buscar_pois(
+            round(lat, PLACES_CACHE_PRECISAO),
+            round(lng, PLACES_CACHE_PRECISAO),
+            int(raio),
+            chave_categorias()
+        )
+    except ErroColetaPOIs as e:
+        for erro in e.erros:
+            st.error(erro)
+        return e.df_parcial
+
+def construir_piramide(df_pois):
+    """
+    Calcula uma única vez, por conjunto de POIs, a pirâmide de grades UTM (100 m a 800 m).
+    """
+    return PiramideGrade(
+        df_pois['Lat'].to_numpy(), df_pois['Lng'].to_numpy(), df_pois['Peso'].to_numpy(),
+        tamanho_base_m=100, niveis=4
+    )
+
+def processar_grid_e_centroides(df_pois, lat_centro, lng_centro, raio_m, tamanho_grid_m=200,
+                                piramide=None, max_pois_por_celula=None, esparsa=False):
     """
     Cria a grade virtual e calcula os centroides dos POIs para cada célula ativa.
+    
+    Com uma pirâmide já calculada, trocar o tamanho da grade é só uma consulta
+    O(células). Com max_pois_por_celula, a resolução varia pela densidade de POIs.
+    A coluna 'Fator' indica o lado de cada célula em múltiplos da célula base.
+    Com esparsa=True, só a resolução pedida é agregada, sem os níveis da pirâmide (grandes áreas).
     """
     if df_pois.empty:
         return pd.DataFrame(), None
-        
-    # 1 Grau de latitude = ~111.32 km (111320 m)
-    # 1 Grau de longitude = ~111.32 * cos(latitude) km
-    lat_step = tamanho_grid_m / 111320.0
-    lng_step = tamanho_grid_m / (111320.0 * math.cos(math.radians(lat_centro)))
-    
-    # Definir o Bounding Box (Caixa Delimitadora) baseada no raio
-    lat_min = lat_centro - (raio_m / 111320.0)
-    lng_min = lng_centro - (raio_m / (111320.0 * math.cos(math.radians(lat_centro))))
-    
-    # Atribuir cada POI a uma célula da matriz (i, j)
-    df_pois['cell_i'] = ((df_pois['Lat'] - lat_min) / lat_step).astype(int)
-    df_pois['cell_j'] = ((df_pois['Lng'] - lng_min) / lng_step).astype(int)
-    
-    # Agrupar POIs pela célula em que caíram e calcular o centroide
-    candidatos = df_pois.groupby(['cell_i', 'cell_j']).agg(
-        Lat_Centroide=('Lat', 'mean'),
-        Lng_Centroide=('Lng', 'mean'),
-        Qtd_POIs=('Nome', 'count'),
-        Score_Estimado=('Peso', 'sum')
-    ).reset_index()
-    
-    # Retornar também as informações do grid para desenhar no mapa
-    info_grid = {
-        'lat_min': lat_min, 'lng_min': lng_min,
-        'lat_step': lat_step, 'lng_step': lng_step
-    }
-    
-    return candidatos, info_grid
+    
+    if esparsa:
+        grade = PiramideGrade(
+            df_pois['Lat'].to_numpy(), df_pois['Lng'].to_numpy(), df_pois['Peso'].to_numpy(),
+            tamanho_base_m=tamanho_grid_m, niveis=1
+        )
+        return grade.candidatos(tamanho_grid_m), grade.info_grid
+    
+    if piramide is None:
+        piramide = construir_piramide(df_pois)
+    
+    if max_pois_por_celula:
+        candidatos = piramide.candidatos_adaptativos(max_pois_por_celula)
+    else:
+        candidatos = piramide.candidatos(tamanho_grid_m)
+    
+    # Retornar também as informações do grid (célula base) para desenhar no mapa
+    return candidatos, piramide.info_grid
+
+def calcular_score_gravitacional(df_pois, candidatos, parametros, custos_rede=False):
+    """
+    Score gravitacional de cada candidato: Σ peso_i · f(d_ij).
+    
+    Em linha reta, usa todos os POIs. Com custos_rede, a demanda de cada célula
+    (Score_Estimado no centroide) é ligada aos candidatos pelos tempos da
+    Distance Matrix, convertidos em distância equivalente.
+    """
+    if candidatos.empty:
+        return np.zeros(0)
+    
+    if custos_rede:
+        pontos = list(zip(candidatos['Lat_Centroide'], candidatos['Lng_Centroide']))
+        tempos = get_distance_matrix_client().matriz_custos(pontos, pontos, campo='duracao_segundos')
+        custos = tempos * (GRAVIDADE_VELOCIDADE_REF_KMH / 3.6)
+        return score_por_custos(custos, candidatos['Score_Estimado'].to_numpy(), **parametros)
+    
+    return score_gravitacional(
+        df_pois['Lat'].to_numpy(), df_pois['Lng'].to_numpy(), df_pois['Peso'].to_numpy(),
+        candidatos['Lat_Centroide'].to_numpy(), candidatos['Lng_Centroide'].to_numpy(),
+        **parametros
+    )
+
+def gerar_candidatos_kde(df_pois, lat_centro, lng_centro, raio_m, k, largura_m):
+    """
+    Candidatos nos máximos locais da superfície de densidade (KDE via FFT).
+    
+    A superfície vai junto em info_grid para ser sobreposta ao mapa.
+    """
+    if df_pois.empty:
+        return pd.DataFrame(), None
+    candidatos, superficie = candidatos_kde(
+        df_pois['Lat'].to_numpy(), df_pois['Lng'].to_numpy(), df_pois['Peso'].to_numpy(),
+        lat_centro, lng_centro, raio_m, k=k, largura_m=largura_m
+    )
+    return candidatos, {'projecao': 'kde', 'superficie': superficie}
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def calcular_isocronas(locais):
+    """Isócronas dos locais ((lat, lng) arredondados); as consultas também ficam no cache do cliente"""
+    lats, lngs = zip(*locais)
+    return gerar_isocronas(lats, lngs)
+
+def poligonos_candidatos(df_cand, grid):
+    """Vértices (n, 4, [lat, lng]) de cada célula candidata (células UTM de lado base x Fator)"""
+    if grid.get('projecao') == 'kde':
+        # Candidatos pontuais (máximos locais): sem células
+        return None
+    return poligonos_celulas(
+        df_cand['cell_id'].to_numpy(), grid['tamanho_base_m'] * df_cand['Fator'].to_numpy(),
+        grid['zona'], grid['sul']
+    )
+
+def hash_tabela(df, h=None):
+    """Hash do conteúdo de um DataFrame (valores e colunas, sem o índice)"""
+    h = h or hashlib.sha1()
+    h.update(repr(list(df.columns)).encode('utf-8'))
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h
+
+def versao_analise(df_pois, df_cand, grid):
+    """Hash do conteúdo da análise (POIs, candidatos e grade) para o cache do mapa"""
+    h = hashlib.sha1()
+    for df in (df_pois, df_cand):
+        hash_tabela(df, h)
+    for chave, valor in sorted((grid or {}).items()):
+        h.update(chave.encode('utf-8'))
+        h.update(valor.valores.tobytes() if chave == 'superficie' else repr(valor).encode('utf-8'))
+    return h.hexdigest()
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def ranking_rede(chave, _candidatos, rede):
+    """
+    Métricas de rede e ranking final dos candidatos, memoizados pelo hash do
+    conteúdo dos candidatos (`chave`) e pela origem dos tempos (`rede`).
+    
+    Com `rede`, o grafo usa a mesma matriz candidatos x candidatos do score
+    gravitacional, já no cache do cliente; sem ela, o grafo de vizinhos em
+    linha reta, sem chamadas à API.
+    """
+    analise = analisar_rede(
+        grafo_candidatos(_candidatos, rede=rede),
+        pesos=_candidatos['Score_Estimado'].to_numpy()
+    )
+    return ranquear_candidatos(_candidatos, analise, coluna_score='Score_Gravitacional')
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def dados_mapa_pois(versao, _df_pois, _df_cand, _grid, locais_isocronas=None, _isocronas=None):
+    """
+    Camadas da análise serializadas, uma vez por conteúdo (chave: versao e locais_isocronas).
+    
+    Guarda só dados (FeatureCollections, linhas do cluster e a imagem da superfície);
+    o mapa folium é montado a cada execução por construir_mapa_pois.
+    """
+    dados = {}
+    if _grid.get('projecao') == 'kde':
+        superficie = _grid['superficie']
+        dados['superficie'] = {'imagem': imagem_superficie(superficie.valores), 'bounds': superficie.bounds}
+    
+    # Células ativas da grade (cor pelo score gravitacional)
+    poligonos = poligonos_candidatos(_df_cand, _grid)
+    if poligonos is not None:
+        dados['celulas'] = geojson_poligonos(
+            poligonos,
+            {
+                'qtd': _df_cand['Qtd_POIs'].to_numpy(),
+                'score': _df_cand['Score_Estimado'].round(1).to_numpy(),
+                'gravitacional': _df_cand['Score_Gravitacional'].round(1).to_numpy()
+            },
+            cores_por_valor(_df_cand['Score_Gravitacional'].to_numpy())
+        )
+    
+    # Isócronas dos melhores candidatos (maiores primeiro, para as menores ficarem por cima)
+    if _isocronas is not None:
+        aneis, local, tempo = _isocronas.aneis()
+        ordem = np.lexsort((local, -tempo))
+        dados['isocronas'] = geojson_poligonos(
+            aneis[ordem],
+            {'local': local[ordem] + 1, 'minutos': (tempo[ordem] / 60).round(1)},
+            cores_por_valor(-tempo[ordem])
+        )
+    
+    dados['candidatos'] = linhas_cluster(
+        _df_cand['Lat_Centroide'].to_numpy(),
+        _df_cand['Lng_Centroide'].to_numpy(),
+        [
+            _df_cand['Qtd_POIs'].to_numpy(),
+            _df_cand['Score_Estimado'].round(1).to_numpy(),
+            _df_cand['Score_Gravitacional'].round(1).to_numpy()
+        ]
+    )
+    
+    cores_categoria = {nome: d['color'] for nome, d in CATEGORIAS_POIS.items()}
+    dados['pois'] = geojson_pontos(
+        _df_pois['Lat'].to_numpy(),
+        _df_pois['Lng'].to_numpy(),
+        {'nome': _df_pois['Nome'].fillna('').to_numpy(), 'tipo': _df_pois['Tipo'].astype(str).to_numpy()},
+        _df_pois['Categoria'].map(cores_categoria).astype(object).to_numpy()
+    )
+    return dados
+
+def construir_mapa_pois(lat, lng, raio, dados, tiles_regionais=False):
+    """
+    Monta um mapa novo com as camadas de dados_mapa_pois.
+    
+    O objeto folium é criado a cada execução e nunca vai para o cache (é
+    mutável e seria compartilhado entre sessões).
+    """
+    # Criação do Mapa
+    mapa = folium.Map(location=[lat, lng], zoom_start=14, tiles='CartoDB positron')
+    
+    # Desenhar o círculo do limite de busca
+    folium.Circle(
+        [lat, lng],
+        radius=raio,
+        color='gray',
+        fill=False,
+        dash_array='5, 5',
+        weight=2
+    ).add_to(mapa)
+    
+    # Marcação Central (Referência)
+    folium.CircleMarker(
+        [lat, lng], radius=5, color='black', fill=True, popup="Centro da Busca"
+    ).add_to(mapa)
+    
+    # Superfície de densidade (modo KDE)
+    if 'superficie' in dados:
+        folium.raster_layers.ImageOverlay(
+            image=dados['superficie']['imagem'],
+            bounds=dados['superficie']['bounds'],
+            origin='lower',
+            mercator_project=True,
+            name="Densidade de atratividade"
+        ).add_to(mapa)
+    
+    # DESENHAR AS CÉLULAS ATIVAS DA GRADE (uma camada GeoJSON, cor pelo score gravitacional)
+    if 'celulas' in dados:
+        camada_poligonos(
+            dados['celulas'],
+            nome="Células da grade",
+            tooltip={'qtd': 'POIs', 'score': 'Score base', 'gravitacional': 'Score gravitacional'},
+            opacidade=0.25
+        ).add_to(mapa)
+    
+    # ISÓCRONAS dos melhores candidatos
+    if 'isocronas' in dados:
+        camada_poligonos(
+            dados['isocronas'],
+            nome="Isócronas",
+            tooltip={'local': 'Candidato', 'minutos': 'Minutos'},
+            opacidade=0.15
+        ).add_to(mapa)
+    
+    # NODOS CANDIDATOS nos centroides (marcadores agrupados e popups montados no cliente)
+    camada_cluster(
+        dados['candidatos'],
+        callback="""
+        function (row) {
+            var icone = L.AwesomeMarkers.icon({icon: 'wrench', prefix: 'fa', markerColor: 'black'});
+            var marcador = L.marker(new L.LatLng(row[0], row[1]), {icon: icone});
+            marcador.bindTooltip('Nodo candidato otimizado');
+            // Conteúdo montado só quando o popup é aberto
+            marcador.bindPopup(function () {
+                return '<b>CANDIDATO EVCS</b><br>POIs na área: ' + row[2] +
+                       '<br>Score base: ' + row[3] + '<br>Score gravitacional: ' + row[4];
+            });
+            return marcador;
+        }
+        """,
+        nome="Nodos candidatos"
+    ).add_to(mapa)
+    
+    # Adicionando os POIs originais para referência visual (uma camada, cor por categoria)
+    camada_pontos(dados['pois'], nome="POIs", tooltip={'nome': 'POI', 'tipo': 'Tipo'}).add_to(mapa)
+    if tiles_regionais:
+        camada_tiles_vetoriais().add_to(mapa)
+    folium.LayerControl(collapsed=True).add_to(mapa)
+    
+    # Adicionando Legenda Sobreposta
+    legend_html = f'''
+     <div style="position: fixed; 
+                 bottom: 30px; right: 30px; width: 220px; height: 180px; 
+                 border:2px solid grey; z-index:9999; font-size:13px;
+                 background-color:white; opacity: 0.95; padding: 10px;
+                 border-radius: 8px; box-shadow: 2px 2px 5px rgba(0,0,0,0.3);">
+         <b>Convenções do Mapa</b><br>
+         <i class="fa fa-circle" style="color:blue;"></i> Varejo & Lazer<br>
+         <i class="fa fa-circle" style="color:red;"></i> Transporte<br>
+         <i class="fa fa-circle" style="color:purple;"></i> Serviços & Saúde<br>
+         <hr style="margin: 5px 0;">
+         <div style="width:12px; height:12px; background: linear-gradient(90deg, #ffffb2, #bd0026); display:inline-block;"></div> Célula (score gravitacional)<br>
+         <i class="fa fa-wrench fa-1x" style="color:black;"></i> Nodo candidato (Centroide)
+     </div>
+     '''
+    mapa.get_root().html.add_child(folium.Element(legend_html))
+    return mapa
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def medicao_mapa_pois(lat, lng, raio, versao, tiles_regionais, locais_isocronas, _mapa):
+    """Tempo de geração e tamanho do HTML, medidos uma vez por conteúdo do mapa"""
+    return medir_mapa(_mapa)
 
 # --- INICIALIZAR ESTADO DA SESSÃO ---
-if 'dados_pois' not in st.session_state:
-    st.session_state.dados_pois = None
-if 'dados_candidatos' not in st.session_state:
-    st.session_state.dados_candidatos = None
-if 'info_grid' not in st.session_state:
-    st.session_state.info_grid = None
+if 'parametros_analise' not in st.session_state:
+    st.session_state.parametros_analise = None
 if 'analise_ativa' not in st.session_state:
     st.session_state.analise_ativa = False
 
@@ -136,19 +405,148 @@ with st.sidebar:
     # Ajuste de Raio e Tamanho da Grade
     raio = st.slider("Raio de Busca (metros)", min_value=500, max_value=10000, value=2000, step=500)
     tamanho_grid = st.number_input("Tamanho da Grade (metros)", min_value=100, max_value=1000, value=200, step=100)
+    motor_grade = st.radio(
+        "Motor da grade",
+        ["Pirâmide multi-resolução", "Hash esparso (UTM)", "Superfície KDE (máximos locais)"],
+        help="O hash esparso agrega só a resolução escolhida, sem a pirâmide, e escala para áreas grandes; "
+             "a superfície KDE posiciona os candidatos nos picos de densidade"
+    )
+    grade_esparsa = motor_grade == "Hash esparso (UTM)"
+    grade_kde = motor_grade == "Superfície KDE (máximos locais)"
+    grade_adaptativa = motor_grade == "Pirâmide multi-resolução" and st.checkbox(
+        "Grade adaptativa (pela densidade de POIs)", value=False
+    )
+    max_pois_celula = None
+    if grade_adaptativa:
+        max_pois_celula = st.number_input("Máximo de POIs por célula", min_value=1, max_value=100, value=10)
+    if grade_kde:
+        top_k = st.number_input("Número de candidatos (picos)", min_value=1, max_value=200, value=DENSIDADE_TOP_K)
+        largura_kde = st.number_input(
+            "Largura de banda do kernel (metros)", min_value=50, max_value=2000,
+            value=int(DENSIDADE_LARGURA_M), step=50
+        )
+    
+    st.header("Modelo gravitacional")
+    modelo_decaimento = st.selectbox(
+        "Decaimento com a distância", MODELOS_DECAIMENTO,
+        index=MODELOS_DECAIMENTO.index(GRAVIDADE_MODELO_DECAIMENTO)
+    )
+    beta = st.number_input("Expoente β (potência)", min_value=0.5, max_value=4.0, value=GRAVIDADE_BETA, step=0.5)
+    raio_corte = st.number_input(
+        "Raio de corte (metros)", min_value=500, max_value=20000, value=int(GRAVIDADE_RAIO_CORTE_M), step=500
+    )
+    custos_rede = st.checkbox(
+        "Tempos de viagem (Distance Matrix)", value=False,
+        help=f"Consome chamadas da API; limitado a {GRAVIDADE_MAX_ELEMENTOS_REDE} pares candidato-célula"
+    )
+    metricas_rede = st.checkbox(
+        "Métricas de rede dos candidatos", value=False,
+        help="Acessibilidade e intermediação na rede de candidatos entram no ranking"
+    )
+    isocronas = st.checkbox(
+        "Isócronas dos melhores candidatos", value=False,
+        help=f"Tempos de {', '.join(str(t // 60) for t in ISOCRONAS_TEMPOS_S)} min pela Distance Matrix; "
+             f"até {ISOCRONAS_MAX_ELEMENTOS} elementos por candidato"
+    )
+    n_isocronas = st.number_input("Candidatos com isócronas", min_value=1, max_value=20, value=3) if isocronas else 0
+    tiles_regionais = st.checkbox(
+        "Camada regional (tiles vetoriais)", value=False,
+        help="Requer `python -m processamento.tiles_vetoriais servir` em execução"
+    )
     
     if st.button("Gerar malha e candidatos", type="primary", use_container_width=True):
-        with st.spinner("Mapeando POIs e calculando centroides..."):
-            df_pois = buscar_pois(lat, lng, raio)
-            st.session_state.dados_pois = df_pois
-            
-            candidatos, info_grid = processar_grid_e_centroides(df_pois, lat, lng, raio, tamanho_grid)
-            st.session_state.dados_candidatos = candidatos
-            st.session_state.info_grid = info_grid
-            
-            st.session_state.analise_ativa = True
+        st.session_state.parametros_analise = {'lat': lat, 'lng': lng, 'raio': raio}
+        st.session_state.analise_ativa = True
+
+# --- COLETA (MEMOIZADA) E GRADE ---
+# A área analisada é a do último clique; a grade acompanha o valor atual do
+# controle, reaproveitando os POIs do cache sem novas chamadas.
+if st.session_state.analise_ativa:
+    params = st.session_state.parametros_analise
+    lat, lng, raio = params['lat'], params['lng'], params['raio']
+    with st.spinner("Mapeando POIs e calculando centroides..."):
+        df_pois = coletar_pois(lat, lng, raio)
+        
+        # A pirâmide é refeita apenas quando o conjunto de POIs muda (hash do conteúdo)
+        chave_piramide = hash_tabela(df_pois[['Lat', 'Lng', 'Peso']]).hexdigest()
+        if motor_grade == "Pirâmide multi-resolução" and st.session_state.get('chave_piramide') != chave_piramide:
+            st.session_state.piramide = construir_piramide(df_pois) if not df_pois.empty else None
+            st.session_state.chave_piramide = chave_piramide
+        
+        if grade_kde:
+            candidatos, info_grid = gerar_candidatos_kde(df_pois, lat, lng, raio, top_k, largura_kde)
+        else:
+            candidatos, info_grid = processar_grid_e_centroides(
+                df_pois, lat, lng, raio, tamanho_grid,
+                piramide=st.session_state.get('piramide'),
+                max_pois_por_celula=max_pois_celula,
+                esparsa=grade_esparsa
+            )
+        
+        if not candidatos.empty:
+            usar_rede = custos_rede and len(candidatos) ** 2 <= GRAVIDADE_MAX_ELEMENTOS_REDE
+            if custos_rede and not usar_rede:
+                st.warning(
+                    f"{len(candidatos)} candidatos excedem o limite de pares da Distance Matrix; "
+                    "usando distância em linha reta."
+                )
+            candidatos['Score_Gravitacional'] = calcular_score_gravitacional(
+                df_pois, candidatos,
+                dict(modelo=modelo_decaimento, beta=beta, corte=float(raio_corte)),
+                custos_rede=usar_rede
+            )
+            if metricas_rede:
+                # Memoizado pelo conteúdo dos candidatos (inclui o score gravitacional)
+                candidatos = ranking_rede(hash_tabela(candidatos).hexdigest(), candidatos, rede=usar_rede)
+    st.session_state.dados_pois = df_pois
+    st.session_state.dados_candidatos = candidatos
+    st.session_state.info_grid = info_grid
 
 # --- ÁREA PRINCIPAL (MAPA EM TELA CHEIA) ---
+# Fragmentos: interações no mapa ou na tabela reexecutam só a própria seção;
+# as camadas do mapa vêm do cache (dados_mapa_pois)
+@st.fragment
+def secao_mapa(df_pois, df_cand, grid):
+    locais_isocronas, dados_isocronas = None, None
+    if isocronas and not df_cand.empty:
+        melhores = df_cand.sort_values('Ranking') if 'Ranking' in df_cand else df_cand.nlargest(
+            n_isocronas, 'Score_Gravitacional'
+        )
+        locais_isocronas = tuple(
+            (round(a, 5), round(b, 5))
+            for a, b in melhores[['Lat_Centroide', 'Lng_Centroide']].head(n_isocronas).itertuples(index=False)
+        )
+        with st.spinner("Calculando isócronas..."):
+            dados_isocronas = calcular_isocronas(locais_isocronas)
+    
+    versao = versao_analise(df_pois, df_cand, grid)
+    dados = dados_mapa_pois(
+        versao, _df_pois=df_pois, _df_cand=df_cand, _grid=grid,
+        locais_isocronas=locais_isocronas, _isocronas=dados_isocronas
+    )
+    mapa = construir_mapa_pois(lat, lng, raio, dados, tiles_regionais=tiles_regionais)
+    tempo_render, tamanho_html = medicao_mapa_pois(lat, lng, raio, versao, tiles_regionais, locais_isocronas, mapa)
+    
+    # Tamanho da página e tempo de geração do HTML (medidos uma vez por conteúdo)
+    st.caption(
+        f"Mapa: {len(df_cand)} candidatos, {len(df_pois)} POIs · "
+        f"HTML {tamanho_html / 1024 / 1024:.2f} MB gerado em {tempo_render:.2f} s"
+    )
+    
+    # Renderizar o mapa ocupando 100%
+    st_folium(mapa, use_container_width=True, height=850, returned_objects=[], key="mapa_pois")
+
+@st.fragment
+def secao_ranking(df_cand):
+    with st.expander("Ranking dos candidatos (score gravitacional + acessibilidade na rede)"):
+        st.dataframe(
+            df_cand[[
+                'Ranking', 'Lat_Centroide', 'Lng_Centroide', 'Score_Gravitacional',
+                'Acessibilidade', 'Intermediacao', 'Componente', 'Score_Final'
+            ]].head(50).round(4),
+            hide_index=True, width='stretch'
+        )
+
 if st.session_state.analise_ativa:
     df_pois = st.session_state.dados_pois
     df_cand = st.session_state.dados_candidatos
@@ -157,83 +555,9 @@ if st.session_state.analise_ativa:
     if df_pois.empty:
         st.warning("Nenhum POI encontrado nesse raio. Tente aumentar a área de busca.")
     else:
-        # Criação do Mapa
-        mapa = folium.Map(location=[lat, lng], zoom_start=14, tiles='CartoDB positron')
-        
-        # Desenhar o círculo do limite de busca
-        folium.Circle(
-            [lat, lng],
-            radius=raio,
-            color='gray',
-            fill=False,
-            dash_array='5, 5',
-            weight=2
-        ).add_to(mapa)
-        
-        # Marcação Central (Referência)
-        folium.CircleMarker(
-            [lat, lng], radius=5, color='black', fill=True, popup="Centro da Busca"
-        ).add_to(mapa)
-        
-        # DESENHAR AS CÉLULAS ATIVAS DA GRADE
-        for _, row in df_cand.iterrows():
-            i, j = row['cell_i'], row['cell_j']
-            # Calcular bordas exatas deste quadrado
-            c_lat_min = grid['lat_min'] + (i * grid['lat_step'])
-            c_lat_max = c_lat_min + grid['lat_step']
-            c_lng_min = grid['lng_min'] + (j * grid['lng_step'])
-            c_lng_max = c_lng_min + grid['lng_step']
-            
-            # Desenhar o polígono da célula com POIs
-            folium.Rectangle(
-                bounds=[[c_lat_min, c_lng_min], [c_lat_max, c_lng_max]],
-                color='blue',
-                weight=1,
-                fill=True,
-                fillColor='blue',
-                fillOpacity=0.05
-            ).add_to(mapa)
-            
-            # Adicionar NODO CANDIDATO no centroide da célula
-            folium.Marker(
-                [row['Lat_Centroide'], row['Lng_Centroide']],
-                popup=f"<b>CANDIDATO EVCS</b><br>POIs na área: {row['Qtd_POIs']}<br>Score base: {row['Score_Estimado']:.1f}",
-                tooltip="Nodo candidato otimizado",
-                icon=folium.Icon(color='black', icon='wrench', prefix='fa')
-            ).add_to(mapa)
-
-        # Adicionando os POIs originais para referência visual
-        for _, row in df_pois.iterrows():
-            cat_info = CATEGORIAS_POIS[row['Categoria']]
-            folium.CircleMarker(
-                [row['Lat'], row['Lng']],
-                radius=4,
-                color=cat_info['color'],
-                fill=True,
-                fillOpacity=0.8,
-                tooltip=f"{row['Nome']} ({row['Tipo']})"
-            ).add_to(mapa)
-
-        # Adicionando Legenda Sobreposta
-        legend_html = f'''
-         <div style="position: fixed; 
-                     bottom: 30px; right: 30px; width: 220px; height: 180px; 
-                     border:2px solid grey; z-index:9999; font-size:13px;
-                     background-color:white; opacity: 0.95; padding: 10px;
-                     border-radius: 8px; box-shadow: 2px 2px 5px rgba(0,0,0,0.3);">
-             <b>Convenções do Mapa</b><br>
-             <i class="fa fa-circle" style="color:blue;"></i> Varejo & Lazer<br>
-             <i class="fa fa-circle" style="color:red;"></i> Transporte<br>
-             <i class="fa fa-circle" style="color:purple;"></i> Serviços & Saúde<br>
-             <hr style="margin: 5px 0;">
-             <div style="width:12px; height:12px; background-color:lightblue; display:inline-block; border:1px solid blue;"></div> Área de Cobertura<br>
-             <i class="fa fa-wrench fa-1x" style="color:black;"></i> Nodo candidato (Centroide)
-         </div>
-         '''
-        mapa.get_root().html.add_child(folium.Element(legend_html))
-            
-        # Renderizar o mapa ocupando 100%
-        st_folium(mapa, use_container_width=True, height=850, returned_objects=[])
+        secao_mapa(df_pois, df_cand, grid)
+        if 'Ranking' in df_cand:
+            secao_ranking(df_cand)
 
 else:
     st.info("Ajuste os parâmetros na barra lateral e clique em 'Gerar malha e candidatos'.")
\ No newline at end of file
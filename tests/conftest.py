@@ -0,0 +1,11 @@
+"""
+Configuração comum dos testes offline (sem chamadas às APIs do Google)
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# config.settings exige a chave; os testes nunca fazem requisições reais
+os.environ.setdefault('GOOGLE_MAPS_API_KEY', 'chave-de-teste')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
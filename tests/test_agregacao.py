@@ -0,0 +1,160 @@
+"""Testes de processamento/agregacao.py e processamento/grade.py"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from processamento.agregacao import (
+    Agregado,
+    IndiceCelulas,
+    agregar_lotes,
+    juntar,
+    morton_codificar,
+    morton_decodificar
+)
+from processamento.geodesia import projetar_utm
+from processamento.grade import PiramideGrade, poligonos_celulas
+
+
+@pytest.fixture
+def pontos():
+    rng = np.random.default_rng(42)
+    n = 5000
+    return pd.DataFrame({
+        'Lat': rng.normal(-22.9, 0.03, n),
+        'Lng': rng.normal(-47.06, 0.03, n),
+        'Peso': rng.choice([1.5, 2.0, 3.0], n),
+        'Valor': rng.uniform(0, 10, n)
+    })
+
+
+def agrupar_pandas(indice, df, nivel=0):
+    """Referência: mesma célula calculada célula a célula e agrupada com pandas"""
+    x, y = projetar_utm(df['Lat'].to_numpy(), df['Lng'].to_numpy(), indice.zona, indice.sul)
+    tamanho = indice.tamanho_m(nivel)
+    i = np.floor(y / tamanho).astype(np.int64)
+    j = np.floor(x / tamanho).astype(np.int64)
+    ref = df.assign(cell_id=morton_codificar(i, j), px=x * df['Peso'], py=y * df['Peso'])
+    return ref.groupby('cell_id').agg(
+        Qtd=('Lat', 'size'), Peso=('Peso', 'sum'), Valor=('Valor', 'sum'), px=('px', 'sum'), py=('py', 'sum')
+    )
+
+
+def test_morton_ida_e_volta():
+    i = np.array([0, 1, 7, 12345, 2 ** 30])
+    j = np.array([0, 3, 7, 54321, 2 ** 30 - 1])
+    i_v, j_v = morton_decodificar(morton_codificar(i, j))
+    np.testing.assert_array_equal(i_v, i)
+    np.testing.assert_array_equal(j_v, j)
+
+
+@pytest.mark.parametrize('nivel', [0, 2])
+def test_de_pontos_igual_ao_groupby(pontos, nivel):
+    indice = IndiceCelulas.para_pontos(pontos['Lat'], pontos['Lng'], tamanho_base_m=100)
+    agregado = Agregado.de_pontos(
+        indice, pontos['Lat'], pontos['Lng'], valores={'Valor': pontos['Valor']},
+        pesos=pontos['Peso'], nivel=nivel
+    )
+    ref = agrupar_pandas(indice, pontos, nivel)
+
+    np.testing.assert_array_equal(agregado.ids, ref.index.to_numpy())
+    np.testing.assert_array_equal(agregado.contagem, ref['Qtd'])
+    np.testing.assert_allclose(agregado.soma_peso, ref['Peso'])
+    np.testing.assert_allclose(agregado.somas['Valor'], ref['Valor'])
+    np.testing.assert_allclose(agregado.soma_x, ref['px'])
+    np.testing.assert_allclose(agregado.soma_y, ref['py'])
+
+
+def test_subir_igual_a_agregar_no_nivel(pontos):
+    indice = IndiceCelulas.para_pontos(pontos['Lat'], pontos['Lng'], tamanho_base_m=100)
+    base = Agregado.de_pontos(indice, pontos['Lat'], pontos['Lng'], valores={'Valor': pontos['Valor']})
+    direto = Agregado.de_pontos(indice, pontos['Lat'], pontos['Lng'], valores={'Valor': pontos['Valor']}, nivel=3)
+
+    subido = base.subir(3)
+
+    np.testing.assert_array_equal(subido.ids, direto.ids)
+    np.testing.assert_array_equal(subido.contagem, direto.contagem)
+    np.testing.assert_allclose(subido.somas['Valor'], direto.somas['Valor'])
+
+
+def test_ampliar_igual_a_indice_maior(pontos):
+    indice = IndiceCelulas.para_pontos(pontos['Lat'], pontos['Lng'], tamanho_base_m=100)
+    base = Agregado.de_pontos(indice, pontos['Lat'], pontos['Lng'])
+    maior = IndiceCelulas(tamanho_base_m=300, zona=indice.zona, sul=indice.sul)
+
+    ampliado = base.ampliar(3)
+    direto = Agregado.de_pontos(maior, pontos['Lat'], pontos['Lng'])
+
+    assert ampliado.indice == maior
+    np.testing.assert_array_equal(ampliado.ids, direto.ids)
+    np.testing.assert_array_equal(ampliado.contagem, direto.contagem)
+
+
+def test_lotes_e_combinar_independem_da_divisao(pontos):
+    indice = IndiceCelulas.para_pontos(pontos['Lat'], pontos['Lng'], tamanho_base_m=200)
+    lotes = (pontos.iloc[k:k + 700] for k in range(0, len(pontos), 700))
+
+    em_lotes = agregar_lotes(indice, lotes, campos=['Valor'], coluna_peso='Peso', combinar_a_cada=3)
+    inteiro = Agregado.de_pontos(
+        indice, pontos['Lat'], pontos['Lng'], valores={'Valor': pontos['Valor']}, pesos=pontos['Peso']
+    )
+
+    np.testing.assert_array_equal(em_lotes.ids, inteiro.ids)
+    np.testing.assert_array_equal(em_lotes.contagem, inteiro.contagem)
+    np.testing.assert_allclose(em_lotes.somas['Valor'], inteiro.somas['Valor'])
+    np.testing.assert_allclose(em_lotes.soma_x, inteiro.soma_x)
+
+
+def test_juntar_alinha_por_celula(pontos):
+    indice = IndiceCelulas.para_pontos(pontos['Lat'], pontos['Lng'], tamanho_base_m=200)
+    a = Agregado.de_pontos(indice, pontos['Lat'][:3000], pontos['Lng'][:3000])
+    b = Agregado.de_pontos(indice, pontos['Lat'][2000:], pontos['Lng'][2000:])
+
+    tabela = juntar({'a': a, 'b': b})
+
+    assert tabela['a_qtd'].sum() == 3000 and tabela['b_qtd'].sum() == 3000
+    assert set(tabela['cell_id']) == set(a.ids) | set(b.ids)
+    interna = juntar({'a': a, 'b': b}, como='inner')
+    assert ((interna['a_qtd'] > 0) & (interna['b_qtd'] > 0)).all()
+
+
+def test_piramide_adaptativa_particiona_os_pois(pontos):
+    piramide = PiramideGrade(pontos['Lat'], pontos['Lng'], pontos['Peso'], tamanho_base_m=100, niveis=4)
+
+    candidatos = piramide.candidatos_adaptativos(max_pois_por_celula=10)
+
+    assert candidatos['Qtd_POIs'].sum() == len(pontos)
+    np.testing.assert_allclose(candidatos['Score_Estimado'].sum(), pontos['Peso'].sum())
+    grossas = candidatos['Fator'] > 1
+    assert (candidatos.loc[grossas, 'Qtd_POIs'] <= 10).all()
+
+
+@pytest.mark.parametrize('tamanho_m', [100, 200, 300, 800])
+def test_piramide_igual_a_grade_direta(pontos, tamanho_m):
+    piramide = PiramideGrade(pontos['Lat'], pontos['Lng'], pontos['Peso'], tamanho_base_m=100, niveis=4)
+    unica = PiramideGrade(
+        pontos['Lat'], pontos['Lng'], pontos['Peso'], tamanho_base_m=tamanho_m, niveis=1, indice=IndiceCelulas(
+            tamanho_base_m=tamanho_m, zona=piramide.indice.zona, sul=piramide.indice.sul
+        )
+    )
+
+    a = piramide.candidatos(tamanho_m)
+    b = unica.candidatos(tamanho_m)
+
+    np.testing.assert_array_equal(a['Qtd_POIs'], b['Qtd_POIs'])
+    np.testing.assert_allclose(a[['Lat_Centroide', 'Lng_Centroide']], b[['Lat_Centroide', 'Lng_Centroide']])
+    np.testing.assert_allclose(a['Score_Estimado'], b['Score_Estimado'])
+
+
+def test_poligonos_contem_os_centroides(pontos):
+    piramide = PiramideGrade(pontos['Lat'], pontos['Lng'], pontos['Peso'], tamanho_base_m=100, niveis=4)
+    candidatos = piramide.candidatos_adaptativos(max_pois_por_celula=10)
+    info = piramide.info_grid
+
+    poligonos = poligonos_celulas(
+        candidatos['cell_id'], info['tamanho_base_m'] * candidatos['Fator'].to_numpy(), info['zona'], info['sul']
+    )
+
+    lat, lng = candidatos['Lat_Centroide'].to_numpy(), candidatos['Lng_Centroide'].to_numpy()
+    assert poligonos.shape == (len(candidatos), 4, 2)
+    assert (lat >= poligonos[:, :, 0].min(axis=1)).all() and (lat <= poligonos[:, :, 0].max(axis=1)).all()
+    assert (lng >= poligonos[:, :, 1].min(axis=1)).all() and (lng <= poligonos[:, :, 1].max(axis=1)).all()
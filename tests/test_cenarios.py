@@ -0,0 +1,170 @@
+"""Testes de processamento/cenarios.py (guloso vetorizado contra guloso direto, cenário a cenário)"""
+
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+import pytest
+from processamento.agregacao import IndiceCelulas
+from processamento.cenarios import (
+    DadosCenarios,
+    cobertura_gulosa,
+    grade_cenarios,
+    pesos_padrao
+)
+from processamento.demanda import celulas_demanda, estimar_demanda
+from config.settings import CATEGORIAS_POIS
+
+CATEGORIAS = list(CATEGORIAS_POIS)
+PESOS = {
+    'padrão': pesos_padrao(),
+    'transporte': {'Transporte': 6.0},
+    'sem varejo': {'Varejo & Lazer': 0.0, 'Serviços & Saúde': 4.0}
+}
+RAIOS_S = (120.0, 240.0, 360.0)
+CUSTO = 1000.0
+
+
+@dataclass
+class Existentes:
+    """Eletropostos existentes com os campos lidos por incluir_existentes"""
+    lat: np.ndarray
+    lng: np.ndarray
+    nome: np.ndarray
+
+    def __len__(self):
+        return len(self.lat)
+
+
+@pytest.fixture
+def dados():
+    rng = np.random.default_rng(3)
+    n = 400
+    pois = pd.DataFrame({
+        'Lat': rng.normal(-22.9, 0.02, n),
+        'Lng': rng.normal(-47.06, 0.02, n),
+        'Categoria': rng.choice(CATEGORIAS, n)
+    })
+    pois['Peso'] = pois['Categoria'].map(pesos_padrao())
+    populacao = pd.DataFrame({
+        'Lat': rng.normal(-22.9, 0.03, 300),
+        'Lng': rng.normal(-47.06, 0.03, 300),
+        'Populacao': rng.uniform(50, 500, 300)
+    })
+    existentes = Existentes(
+        lat=np.array([-22.9, -22.91]), lng=np.array([-47.06, -47.05]), nome=np.array(['A', 'B'])
+    )
+    return DadosCenarios(pois=pois, populacao=populacao, eletropostos=existentes)
+
+
+def guloso_direto(grade, pesos, raio_s, passos_escolhidos):
+    """
+    Um cenário, com a matriz de alcance densa: confere que cada escolha tem o
+    maior ganho e recalcula a cobertura acumulada
+
+    Segue as escolhas do guloso vetorizado (empates podem cair em outro
+    candidato de mesmo ganho) e devolve a curva de cobertura.
+    """
+    p = grade.problema
+    alcanca = np.zeros((len(pesos), p.n_candidatos), dtype=bool)
+    dentro = p.tempo <= raio_s
+    alcanca[p.demanda[dentro], p.candidato[dentro]] = True
+    total = max(pesos.sum(), 1e-12)
+
+    coberta = alcanca[:, grade.fixas].any(axis=1)
+    aberta = np.zeros(p.n_candidatos, dtype=bool)
+    aberta[grade.fixas] = True
+    curva = [pesos[coberta].sum() / total]
+    for escolha in passos_escolhidos:
+        ganho = np.where(aberta, -np.inf, (pesos * ~coberta) @ alcanca)
+        if escolha < 0:
+            assert ganho.max() <= 1e-12 * total
+            curva.append(curva[-1])
+            continue
+        assert ganho[escolha] == pytest.approx(ganho.max(), rel=1e-9, abs=1e-9 * total)
+        assert ganho[escolha] > 1e-12 * total
+        aberta[escolha] = True
+        coberta |= alcanca[:, escolha]
+        curva.append(pesos[coberta].sum() / total)
+    return np.array(curva)
+
+
+def test_cobertura_gulosa_igual_ao_guloso_direto(dados):
+    grade = dados.grade(200.0, max(RAIOS_S))
+    rng = np.random.default_rng(5)
+    pesos = rng.uniform(0, 10, size=(len(RAIOS_S) * 2, len(grade.celulas)))
+    raios = np.array(RAIOS_S * 2)
+
+    cobertura, abertas = cobertura_gulosa(grade, pesos, raios, max_estacoes=15)
+
+    assert len(grade.fixas) == 2
+    for s in range(len(raios)):
+        esperado = guloso_direto(grade, pesos[s], raios[s], abertas[s])
+        np.testing.assert_allclose(cobertura[s], esperado, rtol=1e-9, atol=1e-12)
+        assert set(abertas[s][abertas[s] >= 0]).isdisjoint(grade.fixas)
+    # Raios maiores cobrem mais com as mesmas estações existentes
+    assert cobertura[0, 0] <= cobertura[1, 0] <= cobertura[2, 0]
+
+
+def sessoes_diretas(dados, grade, taxa, pesos):
+    """Sessões/dia de um cenário a partir dos POIs com os pesos do conjunto"""
+    indice = IndiceCelulas.para_pontos(dados.pois['Lat'], dados.pois['Lng'], tamanho_base_m=grade.tamanho_grid_m)
+    pesos = {**pesos_padrao(), **pesos}
+    pois = dados.pois.assign(Peso=dados.pois['Categoria'].map(pesos))
+    celulas = celulas_demanda(indice, pois, dados.populacao)
+    np.testing.assert_array_equal(celulas['cell_id'], grade.celulas['cell_id'])
+    return estimar_demanda(celulas, taxas_adocao=taxa).sessoes_dia[0]
+
+
+def test_varredura_igual_ao_guloso_direto(dados):
+    cenarios = grade_cenarios((0.01, 0.05), RAIOS_S[:2], PESOS, (200.0, 400.0))
+    n_estacoes, max_estacoes, meta = 5, 10, 0.5
+
+    resultado = dados.avaliar(
+        cenarios, PESOS, n_estacoes=n_estacoes, max_estacoes=max_estacoes,
+        meta_cobertura=meta, custo_estacao=CUSTO, processos=1, cenarios_por_tarefa=5
+    )
+
+    tabela = resultado.tabela
+    assert len(tabela) == len(cenarios) == 24
+    pd.testing.assert_frame_equal(tabela[cenarios.columns], cenarios)
+    for s, linha in tabela.iterrows():
+        grade = dados.grade(linha['Tamanho_Grid_m'], max(RAIOS_S[:2]))
+        sessoes = sessoes_diretas(dados, grade, linha['Taxa_Adocao'], PESOS[linha['Pesos']])
+        _, abertas = cobertura_gulosa(grade, sessoes[None], np.array([linha['Raio_Cobertura_s']]), max_estacoes)
+        curva = guloso_direto(grade, sessoes, linha['Raio_Cobertura_s'], abertas[0])
+
+        np.testing.assert_allclose(resultado.curvas[s], curva, rtol=1e-9, atol=1e-12)
+        assert linha['Sessoes_Dia'] == pytest.approx(sessoes.sum())
+        assert linha['Cobertura_Existentes'] == pytest.approx(curva[0])
+        assert linha['Cobertura'] == pytest.approx(curva[n_estacoes])
+        assert linha['Estacoes'] == (abertas[0, :n_estacoes] >= 0).sum()
+        assert linha['Custo'] == linha['Estacoes'] * CUSTO
+
+        na_meta = np.flatnonzero(curva >= meta)
+        if len(na_meta):
+            assert linha['Estacoes_Meta'] == na_meta[0]
+            assert linha['Custo_Meta'] == na_meta[0] * CUSTO
+            assert linha['Custo_por_Sessao_Dia'] == pytest.approx(
+                na_meta[0] * CUSTO / (sessoes.sum() * curva[na_meta[0]])
+            )
+        else:
+            assert np.isnan(linha['Estacoes_Meta']) and np.isnan(linha['Custo_Meta'])
+    # Com 10 estações, a meta só é atingida com o raio maior
+    assert tabela['Estacoes_Meta'].notna().any() and tabela['Estacoes_Meta'].isna().any()
+
+
+def test_pool_de_processos_igual_a_execucao_direta(dados):
+    cenarios = grade_cenarios((0.01, 0.03), RAIOS_S, PESOS, (200.0, 400.0))
+    parametros = dict(n_estacoes=4, max_estacoes=12, meta_cobertura=0.4, custo_estacao=CUSTO, cenarios_por_tarefa=4)
+
+    direto = dados.avaliar(cenarios, PESOS, processos=1, **parametros)
+    em_pool = dados.avaliar(cenarios, PESOS, processos=3, **parametros)
+
+    pd.testing.assert_frame_equal(em_pool.tabela, direto.tabela)
+    np.testing.assert_array_equal(em_pool.curvas, direto.curvas)
+
+
+def test_pesos_desconhecidos(dados):
+    cenarios = grade_cenarios(pesos_categorias={'outro': {}})
+    with pytest.raises(ValueError):
+        dados.avaliar(cenarios, PESOS, processos=1)
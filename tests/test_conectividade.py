@@ -0,0 +1,127 @@
+"""Testes de processamento/conectividade.py (métricas por bloco contra caminhos mínimos densos)"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.sparse.csgraph import dijkstra
+from processamento.conectividade import (
+    GrafoTempos,
+    analisar_rede,
+    componentes,
+    intermediacao_aproximada,
+    ranquear_candidatos
+)
+
+N = 60
+TEMPO_MAX_S = 150.0
+ESCALA_S = 120.0
+
+
+def grafo_aleatorio(semente):
+    """Matriz de tempos assimétrica, com pares sem rota, reduzida aos pares curtos"""
+    rng = np.random.default_rng(semente)
+    custos = rng.uniform(30, 600, size=(N, N))
+    custos[rng.random(custos.shape) < 0.2] = np.nan
+    return GrafoTempos.de_matriz(custos, tempo_max_s=70.0)
+
+
+def tempos_densos(grafo, tempo_max_s):
+    """Todos os pares de uma vez, sem blocos; além do alcance e a diagonal = inf"""
+    tempos = dijkstra(grafo.matriz())
+    tempos[tempos > tempo_max_s] = np.inf
+    np.fill_diagonal(tempos, np.inf)
+    return tempos
+
+
+def test_de_arestas_remove_lacos_e_paralelas():
+    origem = [0, 0, 0, 1, 1, 2, 2, 3, 0]
+    destino = [1, 1, 0, 2, 2, 3, 0, 3, 1]
+    tempo = [50.0, 20.0, 5.0, np.nan, 40.0, 0.0, 70.0, 10.0, 35.0]
+
+    grafo = GrafoTempos.de_arestas(4, origem, destino, tempo)
+
+    arestas = {(int(a), int(b)): t for a, b, t in zip(grafo.origem, grafo.destino, grafo.tempo)}
+    # Laços e NaN somem; paralelas ficam com o menor tempo; tempo zero vira o mínimo positivo
+    assert arestas.keys() == {(0, 1), (1, 2), (2, 3), (2, 0)}
+    assert arestas[(0, 1)] == 20.0 and arestas[(1, 2)] == 40.0 and arestas[(2, 0)] == 70.0
+    assert 0 < arestas[(2, 3)] < 1e-2
+    assert grafo.matriz().nnz == 4
+
+
+def test_componentes_fortes_e_fracas():
+    # Dois ciclos (0-1-2 e 3-4) ligados só no sentido 2 -> 3; o nó 5 fica isolado
+    grafo = GrafoTempos.de_arestas(
+        6, [0, 1, 2, 3, 4, 2], [1, 2, 0, 4, 3, 3], [10.0, 10.0, 10.0, 10.0, 10.0, 10.0]
+    )
+
+    n_fortes, fortes = componentes(grafo)
+    n_fracas, fracas = componentes(grafo, conexao='weak')
+
+    assert n_fortes == 3 and n_fracas == 2
+    assert len(set(fortes[[0, 1, 2]])) == 1 and len(set(fortes[[3, 4]])) == 1
+    assert fortes[0] != fortes[3] and fortes[5] not in fortes[:5]
+    assert len(set(fracas[:5])) == 1 and fracas[5] != fracas[0]
+
+
+@pytest.mark.parametrize('semente', range(3))
+@pytest.mark.parametrize('memoria_max_mb', [256.0, 0.01])
+def test_analisar_rede_igual_a_dijkstra_denso(semente, memoria_max_mb):
+    grafo = grafo_aleatorio(semente)
+    pesos = np.random.default_rng(semente + 10).uniform(0.5, 3.0, N)
+    k = 4
+
+    analise = analisar_rede(
+        grafo, pesos, k=k, tempo_max_s=TEMPO_MAX_S, escala_s=ESCALA_S, memoria_max_mb=memoria_max_mb
+    )
+
+    tempos = tempos_densos(grafo, TEMPO_MAX_S)
+    alcancado = np.isfinite(tempos)
+    np.testing.assert_array_equal(analise.alcancaveis, alcancado.sum(axis=1))
+    np.testing.assert_allclose(analise.tempos_vizinhos, np.sort(tempos, axis=1)[:, :k])
+    for i in range(N):
+        validos = analise.vizinhos[i] >= 0
+        np.testing.assert_array_equal(validos, np.isfinite(analise.tempos_vizinhos[i]))
+        np.testing.assert_allclose(tempos[i, analise.vizinhos[i, validos]], analise.tempos_vizinhos[i, validos])
+        assert i not in analise.vizinhos[i]
+
+    inversos = np.where(alcancado, 1.0 / np.maximum(tempos, 1.0), 0.0)
+    np.testing.assert_allclose(analise.proximidade, inversos.sum(axis=1) / (N - 1))
+    acessibilidade = np.where(alcancado, np.exp(-tempos / ESCALA_S), 0.0) @ pesos
+    np.testing.assert_allclose(analise.acessibilidade, acessibilidade)
+    # O alcance corta a busca: nenhum nó chega a todos os outros
+    assert (analise.alcancaveis < N - 1).all()
+
+
+def test_intermediacao_no_caminho():
+    # 0 - 1 - 2 - 3 (mão dupla): 1 e 2 estão em 4 dos 12 pares ordenados
+    grafo = GrafoTempos.de_arestas(4, [0, 1, 2, 1, 2, 3], [1, 2, 3, 0, 1, 2], [60.0] * 6)
+
+    intermediacao = intermediacao_aproximada(grafo, amostras=4)
+
+    np.testing.assert_allclose(intermediacao, [0.0, 4 / 6, 4 / 6, 0.0])
+
+
+def test_intermediacao_com_alcance():
+    # Com alcance de 100 s só há caminhos de uma aresta: ninguém fica no meio
+    grafo = GrafoTempos.de_arestas(4, [0, 1, 2, 1, 2, 3], [1, 2, 3, 0, 1, 2], [60.0] * 6)
+    np.testing.assert_array_equal(intermediacao_aproximada(grafo, amostras=4, tempo_max_s=100.0), 0.0)
+
+
+def test_ranquear_ordena_pelo_score_final():
+    grafo = grafo_aleatorio(0)
+    analise = analisar_rede(grafo, k=3, tempo_max_s=TEMPO_MAX_S, escala_s=ESCALA_S)
+    candidatos = pd.DataFrame({
+        'cell_id': np.arange(N) * 7,
+        'Score_Estimado': np.random.default_rng(4).uniform(0, 50, N)
+    }, index=np.arange(N) + 1000)
+
+    ranking = ranquear_candidatos(candidatos, analise, peso_conectividade=0.4)
+
+    assert (np.diff(ranking['Score_Final'].to_numpy()) <= 0).all()
+    np.testing.assert_array_equal(ranking['Ranking'], np.arange(1, N + 1))
+    # Cada candidato continua com as próprias métricas depois de ordenado
+    origem = ranking['cell_id'].to_numpy() // 7
+    np.testing.assert_allclose(ranking['Acessibilidade'], analise.acessibilidade[origem])
+    score = candidatos['Score_Estimado'].to_numpy()[origem]
+    esperado = 0.6 * score / score.max() + 0.4 * analise.acessibilidade[origem] / analise.acessibilidade.max()
+    np.testing.assert_allclose(ranking['Score_Final'], esperado)
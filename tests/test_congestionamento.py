@@ -0,0 +1,65 @@
+"""Testes de processamento/congestionamento.py (cliente da Distance Matrix falso)"""
+
+import threading
+import numpy as np
+import pytest
+from processamento import congestionamento
+from processamento.congestionamento import analisar_congestionamento, estimar_congestionamento
+from processamento.geodesia import haversine
+
+CENTRO = (-22.9056, -47.0608)
+
+
+class ClienteFalso:
+    """Responde em tempo proporcional à distância e conta requisições e elementos"""
+
+    def __init__(self):
+        self.requisicoes = 0
+        self.elementos = 0
+        self._trava = threading.Lock()
+
+    def calcular_matriz(self, origens, destinos, modo, departure_time):
+        with self._trava:
+            self.requisicoes += 1
+            self.elementos += len(origens) * len(destinos)
+        fator = 1.0 + departure_time.hour / 24
+        return {'matriz': [
+            {
+                'origem_idx': i,
+                'destino_idx': j,
+                'duracao_segundos': float(haversine(o[0], o[1], d[0], d[1])) / 10,
+                'duracao_trafego_segundos': float(haversine(o[0], o[1], d[0], d[1])) / 10 * fator
+            }
+            for i, o in enumerate(origens) for j, d in enumerate(destinos)
+        ]}
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    falso = ClienteFalso()
+    monkeypatch.setattr(congestionamento, 'get_distance_matrix_client', lambda: falso)
+    return falso
+
+
+@pytest.mark.parametrize('raio_m', [2000, 5000, 20000])
+def test_estimativa_respeita_max_pares(raio_m):
+    estimativa = estimar_congestionamento(*CENTRO, raio_m, horas=[8, 18], max_pares=40)
+
+    assert 0 < estimativa['corredores'] <= 40
+    assert estimativa['elementos'] == estimativa['corredores'] * 2
+
+
+@pytest.mark.parametrize('raio_m', [2000, 5000])
+def test_analise_consome_o_estimado(cliente, raio_m):
+    horas = [8, 18]
+    estimativa = estimar_congestionamento(*CENTRO, raio_m, horas=horas, max_pares=40)
+
+    resultado, raster = analisar_congestionamento(*CENTRO, raio_m, horas=horas, max_pares=40)
+
+    assert cliente.elementos == estimativa['elementos']
+    assert cliente.requisicoes == estimativa['requisicoes']
+    assert len(resultado['origens']) == estimativa['corredores']
+    # Fluxo livre = tempo sem tráfego: a razão é o fator do horário no cliente falso
+    for h, hora in enumerate(horas):
+        np.testing.assert_allclose(resultado['razao'][h], 1.0 + hora / 24)
+    assert raster.indice.shape[0] == len(horas)
@@ -0,0 +1,127 @@
+"""Testes de processamento/demanda.py (modelo vetorizado contra laço por cenário e célula)"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from processamento.demanda import FONTES, PERFIS_HORARIOS, DemandaRecarga, estimar_demanda
+from config.settings import DEMANDA_PROB_RECARGA, DEMANDA_VIAGENS_POR_VEICULO_DIA
+
+N_CELULAS = 12
+N_CENARIOS = 3
+
+
+@pytest.fixture
+def celulas():
+    rng = np.random.default_rng(8)
+    atratividade = rng.uniform(0, 10, N_CELULAS)
+    atratividade[[2, 7]] = 0.0
+    return pd.DataFrame({
+        'cell_id': np.arange(N_CELULAS, dtype=np.int64) * 4,
+        'Lat_Centro': -22.9 + rng.uniform(-0.05, 0.05, N_CELULAS),
+        'Lng_Centro': -47.06 + rng.uniform(-0.05, 0.05, N_CELULAS),
+        'Atratividade': atratividade,
+        'Frota': rng.uniform(0, 300, N_CELULAS),
+        'Veiculos_Passagem': rng.uniform(0, 5000, N_CELULAS)
+    })
+
+
+def sessoes_em_laco(celulas, taxa, prob, atratividade, frota_total=None):
+    """
+    Referência: cada cenário e célula calculados um a um
+
+    taxa(s, c), prob(s) -> {fonte: p} e atratividade(s) -> (n_celulas,)
+    """
+    frota = celulas['Frota'].to_numpy()
+    passagem = celulas['Veiculos_Passagem'].to_numpy()
+    frota_total = frota.sum() if frota_total is None else frota_total
+    componentes = np.zeros((N_CENARIOS, len(celulas), len(FONTES)))
+    for s in range(N_CENARIOS):
+        atr = atratividade(s)
+        p = prob(s)
+        for c in range(len(celulas)):
+            viagens = frota_total * DEMANDA_VIAGENS_POR_VEICULO_DIA * atr[c] / atr.sum()
+            expostos = {'residente': frota[c], 'destino': viagens, 'passagem': passagem[c]}
+            for f, fonte in enumerate(FONTES):
+                componentes[s, c, f] = taxa(s, c) * p[fonte] * expostos[fonte]
+    return componentes
+
+
+TAXAS = np.array([0.01, 0.02, 0.05])
+
+
+@pytest.mark.parametrize('forma_taxa', ['escalar', 'por_cenario', 'por_celula'])
+@pytest.mark.parametrize('forma_prob', ['padrao', 'mapeamento', 'por_cenario'])
+@pytest.mark.parametrize('por_cenario_atr', [False, True])
+def test_estimar_demanda_igual_ao_laco(celulas, forma_taxa, forma_prob, por_cenario_atr):
+    rng = np.random.default_rng(1)
+    taxas_celula = rng.uniform(0.005, 0.1, (N_CENARIOS, N_CELULAS))
+    probs = rng.uniform(0.01, 0.3, (N_CENARIOS, len(FONTES)))
+    atratividades = rng.uniform(0, 5, (N_CENARIOS, N_CELULAS))
+
+    taxas_adocao, taxa = {
+        'escalar': (0.03, lambda s, c: 0.03),
+        'por_cenario': (TAXAS, lambda s, c: TAXAS[s]),
+        'por_celula': (taxas_celula, lambda s, c: taxas_celula[s, c])
+    }[forma_taxa]
+    probabilidades, prob = {
+        'padrao': (None, lambda s: DEMANDA_PROB_RECARGA),
+        'mapeamento': ({'destino': 0.25}, lambda s: {**DEMANDA_PROB_RECARGA, 'destino': 0.25}),
+        'por_cenario': (probs, lambda s: dict(zip(FONTES, probs[s])))
+    }[forma_prob]
+    if por_cenario_atr:
+        atratividade, atr = atratividades, lambda s: atratividades[s]
+    else:
+        atratividade, atr = None, lambda s: celulas['Atratividade'].to_numpy()
+
+    demanda = estimar_demanda(celulas, taxas_adocao, probabilidades, atratividade=atratividade)
+
+    esperado = sessoes_em_laco(celulas, taxa, prob, atr)
+    # Sem nenhum eixo de cenários, o resultado tem um cenário só (o primeiro do laço)
+    n = N_CENARIOS if (forma_taxa != 'escalar' or forma_prob == 'por_cenario' or por_cenario_atr) else 1
+    assert demanda.n_cenarios == n
+    np.testing.assert_allclose(demanda.componentes, esperado[:n], rtol=1e-12)
+    np.testing.assert_allclose(demanda.sessoes_dia, esperado[:n].sum(axis=2), rtol=1e-12)
+    np.testing.assert_allclose(demanda.por_hora(), esperado[:n] @ PERFIS_HORARIOS, rtol=1e-12)
+    assert demanda.taxas.shape[0] == n
+
+
+def test_frota_total_rateia_as_viagens(celulas):
+    demanda = estimar_demanda(celulas, TAXAS, frota_total=10_000.0)
+
+    esperado = sessoes_em_laco(
+        celulas, lambda s, c: TAXAS[s], lambda s: DEMANDA_PROB_RECARGA,
+        lambda s: celulas['Atratividade'].to_numpy(), frota_total=10_000.0
+    )
+    np.testing.assert_allclose(demanda.componentes, esperado, rtol=1e-12)
+
+
+@pytest.mark.parametrize('frota_total', [None, 0.0])
+def test_sem_frota_nem_populacao(celulas, frota_total):
+    sem_frota = celulas.assign(Frota=0.0)
+    with pytest.raises(ValueError):
+        estimar_demanda(sem_frota, frota_total=frota_total)
+
+
+def test_sem_atratividade_nao_precisa_de_frota(celulas):
+    # Só passagem: nada a ratear, então a falta de frota não é erro
+    demanda = estimar_demanda(celulas.assign(Frota=0.0, Atratividade=0.0))
+    np.testing.assert_array_equal(demanda.componentes[..., :2], 0.0)
+    assert demanda.componentes[..., 2].sum() > 0
+
+
+@pytest.mark.parametrize('taxas', [TAXAS, 'por_celula'])
+def test_salvar_e_carregar(celulas, tmp_path, taxas):
+    if isinstance(taxas, str):
+        taxas = np.random.default_rng(2).uniform(0.01, 0.1, (N_CENARIOS, N_CELULAS))
+    demanda = estimar_demanda(celulas, taxas)
+    caminho = tmp_path / 'demanda.npz'
+
+    demanda.salvar(caminho)
+    lida = DemandaRecarga.carregar(caminho)
+
+    for campo in ('cell_id', 'lat', 'lng', 'taxas', 'componentes', 'perfis'):
+        np.testing.assert_array_equal(getattr(lida, campo), getattr(demanda, campo))
+    with np.load(caminho) as dados:
+        np.testing.assert_array_equal(dados['sessoes_dia'], demanda.sessoes_dia)
+    pd.testing.assert_frame_equal(lida.resumo(), demanda.resumo())
+    pd.testing.assert_frame_equal(lida.tabela(2), demanda.tabela(2))
@@ -0,0 +1,75 @@
+"""Testes de processamento/densidade.py (KDE via FFT contra soma direta do kernel)"""
+
+import numpy as np
+import pytest
+from processamento.densidade import KERNELS, candidatos_kde, matriz_kernel, superficie_kde
+from processamento.geodesia import haversine_muitos_para_muitos
+
+BBOX = (-22.925, -22.895, -47.075, -47.045)
+LARGURA_M = 200.0
+
+
+@pytest.fixture
+def pois():
+    # Parte dos POIs cai fora da bbox: não entra no raster, mas nada quebra nas bordas
+    rng = np.random.default_rng(0)
+    n = 80
+    return rng.uniform(-22.93, -22.89, n), rng.uniform(-47.08, -47.04, n), rng.uniform(0.5, 3.0, n)
+
+
+def soma_direta(superficie, lats, lngs, pesos, kernel):
+    """Cada POI soma o kernel inteiro em volta do seu pixel, um a um"""
+    ny, nx = superficie.formato
+    r = kernel.shape[0] // 2
+    valores = np.zeros((ny + 2 * r, nx + 2 * r))
+    i = np.floor((lats - superficie.lat_min) / superficie.lat_step).astype(np.int64)
+    j = np.floor((lngs - superficie.lng_min) / superficie.lng_step).astype(np.int64)
+    for a, b, w in zip(i, j, pesos):
+        if 0 <= a < ny and 0 <= b < nx:
+            valores[a:a + 2 * r + 1, b:b + 2 * r + 1] += w * kernel
+    return valores[r:r + ny, r:r + nx]
+
+
+@pytest.mark.parametrize('kernel', KERNELS)
+def test_fft_igual_a_soma_direta(pois, kernel):
+    lats, lngs, pesos = pois
+
+    superficie = superficie_kde(lats, lngs, pesos, bbox=BBOX, tamanho_celula_m=50, kernel=kernel, largura_m=LARGURA_M)
+
+    k = matriz_kernel(50, kernel, LARGURA_M)
+    esperado = soma_direta(superficie, lats, lngs, pesos, k)
+    assert superficie.formato == (67, 62)
+    np.testing.assert_allclose(superficie.valores, esperado, rtol=1e-9, atol=1e-9 * esperado.max())
+
+
+def test_gaussiano_proximo_da_distancia_real(pois):
+    # Pixel de 10 m: cada POI se desloca no máximo ~7 m até o centro do seu pixel
+    lats, lngs, pesos = pois
+
+    superficie = superficie_kde(lats, lngs, pesos, bbox=BBOX, tamanho_celula_m=10, largura_m=LARGURA_M)
+
+    ny, nx = superficie.formato
+    lat_c, lng_c = superficie.centros(*np.meshgrid(np.arange(ny), np.arange(nx), indexing='ij'))
+    distancias = haversine_muitos_para_muitos(lat_c.ravel(), lng_c.ravel(), lats, lngs)
+    dentro = (
+        (lats >= BBOX[0]) & (lats < superficie.lat_min + ny * superficie.lat_step)
+        & (lngs >= BBOX[2]) & (lngs < superficie.lng_min + nx * superficie.lng_step)
+    )
+    kernel = np.where(distancias <= 3 * LARGURA_M, np.exp(-0.5 * (distancias / LARGURA_M) ** 2), 0.0)
+    esperado = (kernel @ (pesos * dentro)).reshape(ny, nx)
+    np.testing.assert_allclose(superficie.valores, esperado, atol=0.03 * esperado.max())
+
+
+def test_candidatos_nos_picos(pois):
+    lats, lngs, pesos = pois
+
+    candidatos, superficie = candidatos_kde(lats, lngs, pesos, -22.91, -47.06, 1500, k=5, largura_m=LARGURA_M)
+
+    assert 0 < len(candidatos) <= 5
+    assert candidatos['Densidade'].is_monotonic_decreasing
+    assert candidatos['Densidade'].iloc[0] == pytest.approx(superficie.valores.max())
+    # Picos escolhidos respeitam a distância mínima (a largura de banda)
+    lat, lng = candidatos['Lat_Centroide'].to_numpy(), candidatos['Lng_Centroide'].to_numpy()
+    d = haversine_muitos_para_muitos(lat, lng, lat, lng)
+    np.fill_diagonal(d, np.inf)
+    assert d.min() >= LARGURA_M
@@ -0,0 +1,137 @@
+"""Testes de processamento/fluxo_veiculos.py (tudo-ou-nada contra enumeração de caminhos)"""
+
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+import pytest
+from processamento.fluxo_veiculos import GrafoViario, acumular_arvore, atribuir_fluxos_grafo
+
+LAT0, LNG0, PASSO = -22.9, -47.06, 0.01
+LINHAS, COLUNAS = 3, 4
+
+
+def no(i, j):
+    return round(LAT0 + i * PASSO, 5), round(LNG0 + j * PASSO, 5)
+
+
+def malha(semente):
+    """Malha 3 x 4 de mão dupla, com custos aleatórios (caminhos mínimos únicos)"""
+    rng = np.random.default_rng(semente)
+    segmentos = []
+    for i in range(LINHAS):
+        for j in range(COLUNAS):
+            if j + 1 < COLUNAS:
+                segmentos.append((no(i, j), no(i, j + 1)))
+            if i + 1 < LINHAS:
+                segmentos.append((no(i, j), no(i + 1, j)))
+    custos = rng.uniform(10, 100, size=len(segmentos))
+    return segmentos, custos
+
+
+def caminho_minimo(segmentos, custos, origem, destino):
+    """Enumera todos os caminhos simples (busca em profundidade) e devolve o mais barato"""
+    vizinhos = defaultdict(list)
+    for (a, b), c in zip(segmentos, custos):
+        vizinhos[a].append((b, c))
+        vizinhos[b].append((a, c))
+
+    melhor = (np.inf, None)
+    pilha = [(origem, 0.0, [origem])]
+    while pilha:
+        atual, custo, caminho = pilha.pop()
+        if atual == destino:
+            melhor = min(melhor, (custo, caminho), key=lambda m: m[0])
+            continue
+        for proximo, c in vizinhos[atual]:
+            if proximo not in caminho:
+                pilha.append((proximo, custo + c, caminho + [proximo]))
+    return melhor[1]
+
+
+def fluxos_forca_bruta(segmentos, custos, viagens):
+    fluxo = defaultdict(float)
+    for (origem, destino), n in viagens.items():
+        caminho = caminho_minimo(segmentos, custos, origem, destino)
+        for a, b in zip(caminho[:-1], caminho[1:]):
+            fluxo[frozenset((a, b))] += n
+    return dict(fluxo)
+
+
+def demanda_aleatoria(semente, n_linhas=200):
+    rng = np.random.default_rng(semente + 100)
+    nos = [no(i, j) for i in range(LINHAS) for j in range(COLUNAS)]
+    o = rng.integers(len(nos), size=n_linhas)
+    d = rng.integers(len(nos), size=n_linhas)
+    tabela = pd.DataFrame({
+        'origem_lat': [nos[k][0] for k in o], 'origem_lng': [nos[k][1] for k in o],
+        'destino_lat': [nos[k][0] for k in d], 'destino_lng': [nos[k][1] for k in d],
+        'viagens': rng.integers(1, 5, size=n_linhas).astype(float)
+    })
+    viagens = defaultdict(float)
+    for linha in tabela.itertuples(index=False):
+        par = ((linha.origem_lat, linha.origem_lng), (linha.destino_lat, linha.destino_lng))
+        if par[0] != par[1]:
+            viagens[par] += linha.viagens
+    return tabela, dict(viagens)
+
+
+def fluxos_por_segmento(resultado):
+    return {
+        frozenset(((round(la, 5), round(ga, 5)), (round(lb, 5), round(gb, 5)))): f
+        for la, ga, lb, gb, f in zip(resultado.lat_a, resultado.lng_a, resultado.lat_b, resultado.lng_b, resultado.fluxo)
+    }
+
+
+@pytest.mark.parametrize('semente', range(5))
+@pytest.mark.parametrize('tamanho_lote', [200, 17])
+def test_tudo_ou_nada_igual_forca_bruta(semente, tamanho_lote):
+    segmentos, custos = malha(semente)
+    tabela, viagens = demanda_aleatoria(semente)
+    grafo = GrafoViario.de_arestas(
+        [a[0] for a, _ in segmentos], [a[1] for a, _ in segmentos],
+        [b[0] for _, b in segmentos], [b[1] for _, b in segmentos],
+        custo=custos
+    )
+    lotes = (tabela.iloc[k:k + tamanho_lote] for k in range(0, len(tabela), tamanho_lote))
+
+    resultado = atribuir_fluxos_grafo(grafo, lotes, origens_por_lote=5)
+
+    esperado = fluxos_forca_bruta(segmentos, custos, viagens)
+    obtido = fluxos_por_segmento(resultado)
+    assert obtido.keys() == esperado.keys()
+    for segmento, fluxo in esperado.items():
+        assert obtido[segmento] == pytest.approx(fluxo)
+    assert resultado.viagens_atribuidas == pytest.approx(sum(viagens.values()))
+    # Só as viagens intrazonais ficam de fora
+    assert resultado.viagens_nao_atribuidas == pytest.approx(tabela['viagens'].sum() - sum(viagens.values()))
+
+
+def test_viagens_longe_da_rede_nao_sao_atribuidas():
+    segmentos, custos = malha(0)
+    grafo = GrafoViario.de_arestas(
+        [a[0] for a, _ in segmentos], [a[1] for a, _ in segmentos],
+        [b[0] for _, b in segmentos], [b[1] for _, b in segmentos],
+        custo=custos
+    )
+    origem, destino = no(0, 0), no(2, 3)
+    tabela = pd.DataFrame({
+        'origem_lat': [origem[0], origem[0] + 0.5], 'origem_lng': [origem[1], origem[1]],
+        'destino_lat': [destino[0], destino[0]], 'destino_lng': [destino[1], destino[1]],
+        'viagens': [3.0, 7.0]
+    })
+
+    resultado = atribuir_fluxos_grafo(grafo, [tabela], dist_max_no_m=500)
+
+    assert resultado.viagens_atribuidas == pytest.approx(3.0)
+    assert resultado.viagens_nao_atribuidas == pytest.approx(7.0)
+
+
+def test_acumular_arvore_soma_subarvores():
+    # 0 -> 1 -> 2 -> 3 e 1 -> 4; o nó 5 não é alcançado
+    predecessores = np.array([-9999, 0, 1, 2, 1, -9999])
+    demanda = np.array([0.0, 1.0, 2.0, 3.0, 4.0, 5.0])
+
+    fluxo, sem_caminho = acumular_arvore(predecessores, demanda)
+
+    np.testing.assert_allclose(fluxo, [0.0, 10.0, 5.0, 3.0, 4.0, 0.0])
+    assert sem_caminho == 5.0
@@ -0,0 +1,81 @@
+"""Testes de processamento/geodesia.py"""
+
+import numpy as np
+import pytest
+from processamento.geodesia import (
+    RAIO_TERRA_M,
+    bbox_circulo,
+    desprojetar_utm,
+    haversine,
+    haversine_muitos_para_muitos,
+    mascara_raio,
+    projetar_utm
+)
+
+
+def destino(lat, lng, rumo_graus, distancia_m):
+    """Ponto a uma distância e rumo dados (fórmula direta na esfera da Haversine)"""
+    phi1, lam1 = np.radians(lat), np.radians(lng)
+    theta = np.radians(rumo_graus)
+    delta = distancia_m / RAIO_TERRA_M
+    phi2 = np.arcsin(np.sin(phi1) * np.cos(delta) + np.cos(phi1) * np.sin(delta) * np.cos(theta))
+    lam2 = lam1 + np.arctan2(
+        np.sin(theta) * np.sin(delta) * np.cos(phi1),
+        np.cos(delta) - np.sin(phi1) * np.sin(phi2)
+    )
+    return np.degrees(phi2), np.degrees(lam2)
+
+
+@pytest.mark.parametrize('lat, lng', [(-23.55, -46.63), (-22.9056, -47.0608), (0.0, 0.0), (64.0, -21.9)])
+@pytest.mark.parametrize('raio_m', [50.0, 5000.0, 200_000.0])
+def test_mascara_raio_inclui_pontos_na_borda(lat, lng, raio_m):
+    # Pontos logo dentro do raio nos rumos cardeais, colaterais e intermediários
+    rumos = np.arange(0.0, 360.0, 22.5)
+    lats, lngs = destino(lat, lng, rumos, raio_m - 1.0)
+
+    mascara, distancias = mascara_raio(lat, lng, lats, lngs, raio_m)
+
+    assert mascara.all()
+    np.testing.assert_allclose(distancias, raio_m - 1.0, atol=1e-3)
+
+
+def test_mascara_raio_exclui_pontos_logo_fora():
+    lat, lng, raio_m = -23.55, -46.63, 5000.0
+    lats, lngs = destino(lat, lng, np.arange(0.0, 360.0, 45.0), raio_m + 1.0)
+
+    mascara, _ = mascara_raio(lat, lng, lats, lngs, raio_m)
+
+    assert not mascara.any()
+
+
+def test_bbox_circulo_contem_o_circulo():
+    lat, lng, raio_m = -23.55, -46.63, 5000.0
+    lat_min, lat_max, lng_min, lng_max = bbox_circulo(lat, lng, raio_m)
+    lats, lngs = destino(lat, lng, np.linspace(0.0, 360.0, 721), raio_m)
+
+    assert (lats > lat_min).all() and (lats < lat_max).all()
+    assert (lngs > lng_min).all() and (lngs < lng_max).all()
+    # A folga é pequena: a caixa não passa de 0,2% além do círculo
+    assert lat_max - lat < (lats.max() - lat) * 1.002
+
+
+def test_haversine_muitos_para_muitos_igual_ao_escalar():
+    rng = np.random.default_rng(0)
+    lats1, lngs1 = rng.uniform(-23.2, -22.6, 7), rng.uniform(-47.3, -46.8, 7)
+    lats2, lngs2 = rng.uniform(-23.2, -22.6, 5), rng.uniform(-47.3, -46.8, 5)
+
+    matriz = haversine_muitos_para_muitos(lats1, lngs1, lats2, lngs2)
+
+    esperado = haversine(lats1[:, None], lngs1[:, None], lats2[None, :], lngs2[None, :])
+    np.testing.assert_allclose(matriz, esperado, rtol=1e-9, atol=1e-6)
+
+
+def test_utm_ida_e_volta():
+    lats = np.array([-22.9056, -23.25, -22.45])
+    lngs = np.array([-47.0608, -46.92, -47.55])
+
+    x, y = projetar_utm(lats, lngs, zona=23, sul=True)
+    lats_v, lngs_v = desprojetar_utm(x, y, zona=23, sul=True)
+
+    np.testing.assert_allclose(lats_v, lats, atol=1e-7)
+    np.testing.assert_allclose(lngs_v, lngs, atol=1e-7)
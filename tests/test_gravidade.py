@@ -0,0 +1,55 @@
+"""Testes de processamento/gravidade.py (score em UTM com índice de células contra Haversine em matriz completa)"""
+
+import numpy as np
+import pytest
+from processamento.geodesia import haversine_muitos_para_muitos
+from processamento.gravidade import decaimento, score_gravitacional, score_por_custos
+from config.settings import GRAVIDADE_RAIO_CORTE_M
+
+# Distância UTM contra a esfera da Haversine: até ~0,5% na latitude de Campinas
+RTOL_ESFERA = 0.007
+
+
+@pytest.fixture
+def pontos():
+    rng = np.random.default_rng(0)
+    n_pois, n_cand = 3000, 200
+    return (
+        rng.uniform(-23.0, -22.8, n_pois), rng.uniform(-47.2, -46.95, n_pois), rng.uniform(0.5, 3.0, n_pois),
+        rng.uniform(-23.0, -22.8, n_cand), rng.uniform(-47.2, -46.95, n_cand)
+    )
+
+
+@pytest.mark.parametrize('modelo', ['potencia', 'exponencial'])
+@pytest.mark.parametrize('corte', [None, GRAVIDADE_RAIO_CORTE_M])
+def test_score_igual_a_haversine(pontos, modelo, corte):
+    lats_pois, lngs_pois, pesos, lats_cand, lngs_cand = pontos
+
+    scores = score_gravitacional(lats_pois, lngs_pois, pesos, lats_cand, lngs_cand, modelo=modelo, corte=corte)
+
+    distancias = haversine_muitos_para_muitos(lats_pois, lngs_pois, lats_cand, lngs_cand)
+    esperado = pesos @ decaimento(distancias, modelo=modelo, corte=corte)
+    np.testing.assert_allclose(scores, esperado, rtol=RTOL_ESFERA)
+
+
+@pytest.mark.parametrize('corte', [1000.0, 2000.0, GRAVIDADE_RAIO_CORTE_M])
+def test_corte_so_difere_na_fronteira(pontos, corte):
+    # No degrau, só POIs a menos de 1% do corte podem cair do outro lado
+    lats_pois, lngs_pois, pesos, lats_cand, lngs_cand = pontos
+
+    scores = score_gravitacional(lats_pois, lngs_pois, pesos, lats_cand, lngs_cand, modelo='corte', corte=corte)
+
+    distancias = haversine_muitos_para_muitos(lats_pois, lngs_pois, lats_cand, lngs_cand)
+    esperado = score_por_custos(distancias, pesos, modelo='corte', corte=corte)
+    na_fronteira = (np.abs(distancias - corte) < 0.01 * corte).T @ pesos
+    assert (np.abs(scores - esperado) <= na_fronteira + 1e-9).all()
+    assert esperado.min() > 0
+
+
+def test_memoria_limitada_nao_muda_o_score(pontos):
+    lats_pois, lngs_pois, pesos, lats_cand, lngs_cand = pontos
+
+    inteiro = score_gravitacional(lats_pois, lngs_pois, pesos, lats_cand, lngs_cand, corte=None)
+    em_blocos = score_gravitacional(lats_pois, lngs_pois, pesos, lats_cand, lngs_cand, corte=None, memoria_max_mb=0.1)
+
+    np.testing.assert_allclose(em_blocos, inteiro, rtol=1e-12)
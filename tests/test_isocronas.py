@@ -0,0 +1,97 @@
+"""Testes de processamento/isocronas.py (cliente da Distance Matrix falso)"""
+
+import threading
+from collections import Counter
+import numpy as np
+import pytest
+from api.distance_matrix import DistanceMatrixAPI
+from processamento import isocronas as modulo
+from processamento.geodesia import haversine
+from processamento.isocronas import gerar_isocronas
+
+LATS = [-22.9056, -22.95, -22.87]
+LNGS = [-47.0608, -47.1, -47.02]
+VELOCIDADE_MS = 10.0
+
+
+class ClienteFalso:
+    """Tempo = distância em linha reta / velocidade; conta requisições e elementos por local"""
+
+    def __init__(self, sentido):
+        self.sentido = sentido
+        self.requisicoes = 0
+        self.maior_requisicao = 0
+        self.elementos = Counter()
+        self._trava = threading.Lock()
+
+    def calcular_matriz(self, origens, destinos, modo, departure_time):
+        locais, pontos = (destinos, origens) if self.sentido == 'chegada' else (origens, destinos)
+        assert len(locais) == 1
+        local = locais[0]
+        with self._trava:
+            self.requisicoes += 1
+            self.maior_requisicao = max(self.maior_requisicao, len(pontos))
+            self.elementos[local] += len(pontos)
+        matriz = []
+        for k, ponto in enumerate(pontos):
+            segundos = float(haversine(local[0], local[1], ponto[0], ponto[1])) / VELOCIDADE_MS
+            matriz.append({
+                'origem_idx': k if self.sentido == 'chegada' else 0,
+                'destino_idx': 0 if self.sentido == 'chegada' else k,
+                'duracao_segundos': segundos,
+                'duracao_trafego_segundos': None
+            })
+        return {'matriz': matriz}
+
+
+@pytest.fixture(params=['chegada', 'saida'])
+def cliente(request, monkeypatch):
+    falso = ClienteFalso(request.param)
+    monkeypatch.setattr(modulo, 'get_distance_matrix_client', lambda: falso)
+    return falso
+
+
+@pytest.mark.parametrize('max_elementos', [64, 100, 160])
+def test_orcamento_de_elementos_por_local(cliente, max_elementos):
+    resultado = gerar_isocronas(
+        LATS, LNGS, tempos_s=(300, 600, 900), n_raios=16,
+        max_elementos=max_elementos, sentido=cliente.sentido, tolerancia_m=1.0
+    )
+
+    assert cliente.maior_requisicao <= DistanceMatrixAPI.MAX_DESTINOS
+    assert sum(cliente.elementos.values()) == int(resultado.elementos.sum())
+    assert len(cliente.elementos) == len(LATS)
+    for usados in cliente.elementos.values():
+        assert usados <= max_elementos
+    assert np.all(resultado.elementos <= max_elementos)
+    # Tolerância de 1 m nunca é atingida: o refinamento gasta o orçamento todo
+    np.testing.assert_array_equal(resultado.elementos, max_elementos)
+
+
+def test_orcamento_minimo_faz_so_a_primeira_rodada(cliente):
+    n_raios, tempos_s = 8, (300, 600)
+    n_inicial = n_raios * (len(tempos_s) + 1)
+
+    resultado = gerar_isocronas(
+        LATS, LNGS, tempos_s=tempos_s, n_raios=n_raios, max_elementos=n_inicial, sentido=cliente.sentido
+    )
+
+    np.testing.assert_array_equal(resultado.elementos, n_inicial)
+    # Uma requisição por local (n_inicial <= MAX_DESTINOS)
+    assert cliente.requisicoes == len(LATS)
+
+
+def test_orcamento_menor_que_a_primeira_rodada(cliente):
+    with pytest.raises(ValueError):
+        gerar_isocronas(LATS, LNGS, tempos_s=(300, 600), n_raios=8, max_elementos=23, sentido=cliente.sentido)
+    assert cliente.requisicoes == 0
+
+
+def test_fronteira_na_distancia_do_limite(cliente):
+    tempos_s = (300, 600, 900)
+
+    resultado = gerar_isocronas(LATS, LNGS, tempos_s=tempos_s, n_raios=16, sentido=cliente.sentido)
+
+    # Tempo linear na distância: a interpolação acerta a menos da escala da projeção
+    esperado = np.broadcast_to(np.array(tempos_s)[None, :, None] * VELOCIDADE_MS, resultado.distancias_m.shape)
+    np.testing.assert_allclose(resultado.distancias_m, esperado, rtol=0.01)
@@ -0,0 +1,82 @@
+"""Testes de processamento/otimizacao.py (guloso + trocas contra avaliação direta)"""
+
+import itertools
+import numpy as np
+import pytest
+from processamento.otimizacao import ProblemaLocalizacao, otimizar
+
+TEMPO_MAX_S = 1200.0
+COBERTURA_S = 600.0
+
+
+def instancia(semente, n_demanda=60, n_candidatos=25):
+    """Matriz de tempos aleatória (NaN = sem rota) e pesos da demanda"""
+    rng = np.random.default_rng(semente)
+    custos = rng.uniform(60, 1800, size=(n_demanda, n_candidatos))
+    custos[rng.random(custos.shape) < 0.1] = np.nan
+    pesos = rng.uniform(0.5, 5.0, size=n_demanda)
+    return custos, pesos
+
+
+def objetivo_direto(custos, pesos, abertas, tipo):
+    """Objetivo avaliado na matriz completa, sem o motor esparso"""
+    if len(abertas) == 0:
+        melhor = np.full(len(pesos), np.inf)
+    else:
+        melhor = np.fmin.reduce(custos[:, list(abertas)], axis=1)
+    melhor = np.where(np.isfinite(melhor) & (melhor <= TEMPO_MAX_S), melhor, np.inf)
+    if tipo == 'cobertura':
+        return float(pesos @ (melhor <= COBERTURA_S))
+    return float(pesos @ np.minimum(melhor, TEMPO_MAX_S))
+
+
+def melhora(tipo, novo, atual):
+    tolerancia = 1e-9 * max(abs(atual), 1.0)
+    return novo > atual + tolerancia if tipo == 'cobertura' else novo < atual - tolerancia
+
+
+@pytest.mark.parametrize('tipo', ['cobertura', 'p-mediana'])
+@pytest.mark.parametrize('semente', range(5))
+@pytest.mark.parametrize('fixas', [[], [3, 7]])
+def test_trocas_terminam_em_otimo_local(tipo, semente, fixas):
+    custos, pesos = instancia(semente)
+    problema = ProblemaLocalizacao.de_matriz(custos, pesos, tempo_max_s=TEMPO_MAX_S)
+
+    solucao = otimizar(problema, p=4, tipo=tipo, fixas=fixas, tempo_cobertura_s=COBERTURA_S, max_trocas=10_000)
+
+    abertas = set(solucao.abertas.tolist())
+    assert set(fixas) <= abertas
+    assert len(abertas) == len(fixas) + 4
+    assert solucao.objetivo == pytest.approx(objetivo_direto(custos, pesos, abertas, tipo))
+
+    # Nenhuma troca (sai uma nova, entra uma fechada) melhora o objetivo
+    for sai in abertas - set(fixas):
+        for entra in set(range(custos.shape[1])) - abertas:
+            vizinha = (abertas - {sai}) | {entra}
+            assert not melhora(tipo, objetivo_direto(custos, pesos, vizinha, tipo), solucao.objetivo), (sai, entra)
+
+
+@pytest.mark.parametrize('tipo', ['cobertura', 'p-mediana'])
+def test_trocas_nao_pioram_o_guloso(tipo):
+    custos, pesos = instancia(42)
+    problema = ProblemaLocalizacao.de_matriz(custos, pesos, tempo_max_s=TEMPO_MAX_S)
+
+    guloso = otimizar(problema, p=3, tipo=tipo, tempo_cobertura_s=COBERTURA_S, busca_local=False)
+    local = otimizar(problema, p=3, tipo=tipo, tempo_cobertura_s=COBERTURA_S)
+
+    assert guloso.objetivo == pytest.approx(objetivo_direto(custos, pesos, set(guloso.abertas.tolist()), tipo))
+    assert not melhora(tipo, guloso.objetivo, local.objetivo)
+
+
+def test_instancia_pequena_proxima_do_otimo():
+    custos, pesos = instancia(7, n_demanda=30, n_candidatos=10)
+    problema = ProblemaLocalizacao.de_matriz(custos, pesos, tempo_max_s=TEMPO_MAX_S)
+
+    solucao = otimizar(problema, p=3, tipo='p-mediana', tempo_cobertura_s=COBERTURA_S)
+    otimo = min(
+        objetivo_direto(custos, pesos, set(abertas), 'p-mediana')
+        for abertas in itertools.combinations(range(10), 3)
+    )
+
+    assert otimo <= solucao.objetivo + 1e-6
+    assert solucao.objetivo <= 1.05 * otimo
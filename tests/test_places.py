@@ -0,0 +1,77 @@
+"""Testes da coleta de POIs por categoria em api/places.py (busca falsa, SQLite temporário)"""
+
+import pytest
+from api import places
+from api.places import ErroColetaCategorias, PlacesAPINew
+from api.repositorio_places import RepositorioPlaces
+
+CENTRO = (-22.9056, -47.0608)
+CATEGORIAS = [('Mercados', ('supermarket',)), ('Shoppings', ('shopping_mall',))]
+
+
+@pytest.fixture
+def cliente(tmp_path, monkeypatch):
+    """Cliente sem credenciais: cada categoria busca pelo dicionário `buscas` (tipo -> função)"""
+    repositorio = RepositorioPlaces(tmp_path / 'places.sqlite')
+    monkeypatch.setattr(places, 'get_repositorio_places', lambda: repositorio)
+    falso = PlacesAPINew.__new__(PlacesAPINew)
+    falso.buscas = {}
+    falso.busca_tile_pois = lambda tipos: falso.buscas[tipos[0]]
+    falso.repositorio = repositorio
+    return falso
+
+
+def um_lugar_no_centro(prefixo):
+    """Todo tile devolve o mesmo lugar, no centro da consulta"""
+    def buscar(lat, lng, raio):
+        return [{'id': f'{prefixo}-centro', 'location': {'latitude': CENTRO[0], 'longitude': CENTRO[1]}}]
+    return buscar
+
+
+def fora_do_ar(lat, lng, raio):
+    raise RuntimeError('503 UNAVAILABLE')
+
+
+def test_categoria_com_falha_levanta_com_o_parcial(cliente):
+    cliente.buscas = {'supermarket': um_lugar_no_centro('m'), 'shopping_mall': fora_do_ar}
+
+    with pytest.raises(ErroColetaCategorias) as erro:
+        cliente.buscar_categorias(CENTRO, 2000, CATEGORIAS)
+
+    assert len(erro.value.erros) == 1 and 'Shoppings' in erro.value.erros[0]
+    assert set(erro.value.parcial.categorias) == {'Mercados'}
+    assert list(erro.value.parcial.ids) == ['m-centro']
+
+
+def test_falha_nao_fica_registrada_como_resultado(cliente):
+    tiles = cliente.repositorio.tiles_circulo(CENTRO, 2000)
+    cliente.buscas = {'supermarket': um_lugar_no_centro('m'), 'shopping_mall': fora_do_ar}
+    with pytest.raises(ErroColetaCategorias):
+        cliente.buscar_categorias(CENTRO, 2000, CATEGORIAS)
+
+    # Com a API de volta, a categoria que falhou é buscada de novo e vem completa
+    cliente.buscas['shopping_mall'] = um_lugar_no_centro('s')
+    tabela = cliente.buscar_categorias(CENTRO, 2000, CATEGORIAS)
+
+    camada = PlacesAPINew.camada_pois(['shopping_mall'])
+    assert cliente.repositorio.tiles_expirados(camada, tiles) == []
+    assert set(tabela.categorias) == {'Mercados', 'Shoppings'}
+    assert sorted(tabela.ids) == ['m-centro', 's-centro']
+
+
+def test_cache_do_streamlit_nao_guarda_a_falha(cliente):
+    st = pytest.importorskip('streamlit')
+    chamadas = []
+
+    @st.cache_data(show_spinner=False)
+    def coletar(lat, lng, raio):
+        chamadas.append(1)
+        return len(cliente.buscar_categorias((lat, lng), raio, CATEGORIAS))
+
+    cliente.buscas = {'supermarket': um_lugar_no_centro('m'), 'shopping_mall': fora_do_ar}
+    with pytest.raises(ErroColetaCategorias):
+        coletar(*CENTRO, 2000)
+
+    cliente.buscas['shopping_mall'] = um_lugar_no_centro('s')
+    assert coletar(*CENTRO, 2000) == 2
+    assert len(chamadas) == 2
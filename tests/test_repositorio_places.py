@@ -0,0 +1,138 @@
+"""Testes de api/repositorio_places.py (busca falsa, SQLite temporário)"""
+
+import numpy as np
+import pytest
+from api.repositorio_places import (
+    LIMITE_RESULTADOS_BUSCA,
+    FalhaAtualizacaoTiles,
+    RepositorioPlaces,
+    geohash_bbox,
+    geohash_encode
+)
+
+GEOHASH = geohash_encode(-22.9056, -47.0608, 5)
+
+
+def lugares_no_tile(geohash, n, prefixo='p'):
+    """n lugares espalhados dentro do tile"""
+    lat_min, lat_max, lng_min, lng_max = geohash_bbox(geohash)
+    fracoes = (np.arange(n) + 0.5) / n
+    return [
+        {'id': f'{prefixo}{k}', 'location': {
+            'latitude': lat_min + f * (lat_max - lat_min),
+            'longitude': lng_min + f * (lng_max - lng_min)
+        }}
+        for k, f in enumerate(fracoes)
+    ]
+
+
+@pytest.fixture
+def repositorio(tmp_path):
+    return RepositorioPlaces(tmp_path / 'places.sqlite')
+
+
+def test_falha_da_busca_preserva_o_tile(repositorio):
+    repositorio.atualizar_tile('eletropostos', GEOHASH, lambda lat, lng, raio: lugares_no_tile(GEOHASH, 5))
+
+    def falha(lat, lng, raio):
+        raise RuntimeError('429 RESOURCE_EXHAUSTED')
+
+    resumo = repositorio.atualizar_tiles('eletropostos', [GEOHASH], falha, ttl_dias=0, tolerar_falhas=True)
+
+    assert resumo['tiles_com_falha'] == 1
+    assert len(repositorio.lugares_camada('eletropostos')) == 5
+    # Continua expirado: será rebuscado na próxima consulta
+    assert repositorio.tiles_expirados('eletropostos', [GEOHASH], ttl_dias=0) == [GEOHASH]
+
+
+def test_busca_sem_resposta_nao_marca_tile(repositorio):
+    repositorio.atualizar_tile('eletropostos', GEOHASH, lambda lat, lng, raio: lugares_no_tile(GEOHASH, 3))
+
+    with pytest.raises(ValueError):
+        repositorio.atualizar_tile('eletropostos', GEOHASH, lambda lat, lng, raio: None)
+
+    assert len(repositorio.lugares_camada('eletropostos')) == 3
+
+
+def test_atualizacao_remove_lugares_que_sumiram(repositorio):
+    repositorio.atualizar_tile('eletropostos', GEOHASH, lambda lat, lng, raio: lugares_no_tile(GEOHASH, 4))
+    repositorio.atualizar_tile('eletropostos', GEOHASH, lambda lat, lng, raio: lugares_no_tile(GEOHASH, 2))
+
+    assert sorted(l['id'] for l in repositorio.lugares_camada('eletropostos')) == ['p0', 'p1']
+    assert repositorio.tiles_expirados('eletropostos', [GEOHASH]) == []
+
+
+def test_tile_saturado_e_subdividido(repositorio):
+    todos = lugares_no_tile(GEOHASH, LIMITE_RESULTADOS_BUSCA)
+    chamadas = []
+
+    def buscar(lat, lng, raio):
+        chamadas.append((lat, lng))
+        if len(chamadas) == 1:
+            return todos
+        # Cada filho devolve os lugares que caem nele
+        filho = geohash_encode(lat, lng, len(GEOHASH) + 1)
+        return [l for l in todos if geohash_encode(
+            l['location']['latitude'], l['location']['longitude'], len(filho)
+        ) == filho]
+
+    total = repositorio.atualizar_tile('eletropostos', GEOHASH, buscar)
+
+    assert total == 1 + 32
+    assert len(repositorio.lugares_camada('eletropostos')) == LIMITE_RESULTADOS_BUSCA
+    assert repositorio.tiles_expirados('eletropostos', [GEOHASH]) == []
+
+
+def test_consulta_inclui_lugares_na_borda_do_raio(repositorio):
+    from tests.test_geodesia import destino
+
+    centro = (-23.55, -46.63)
+    lats, lngs = destino(centro[0], centro[1], np.arange(0.0, 360.0, 45.0), 4999.0)
+    lugares = [
+        {'id': f'b{k}', 'location': {'latitude': float(la), 'longitude': float(lo)}}
+        for k, (la, lo) in enumerate(zip(lats, lngs))
+    ]
+    repositorio.salvar_lugares('eletropostos', lugares)
+
+    assert len(repositorio.lugares_circulo('eletropostos', centro, 5000)) == len(lugares)
+
+
+def test_consulta_com_falha_levanta_o_resumo(repositorio):
+    centro = (-22.9056, -47.0608)
+    tiles = repositorio.tiles_circulo(centro, 3000)
+    falhos = set(tiles[:2])
+
+    def buscar(lat, lng, raio):
+        if geohash_encode(lat, lng, len(GEOHASH)) in falhos:
+            raise RuntimeError('503 UNAVAILABLE')
+        return []
+
+    with pytest.raises(FalhaAtualizacaoTiles) as erro:
+        repositorio.consultar_circulo('eletropostos', centro, 3000, buscar)
+
+    assert erro.value.resumo['tiles_com_falha'] == len(falhos)
+    assert erro.value.resumo['tiles_atualizados'] == len(tiles) - len(falhos)
+    assert sorted(repositorio.tiles_expirados('eletropostos', tiles)) == sorted(falhos)
+
+    # Com a API de volta, só os tiles que falharam são rebuscados
+    chamadas = []
+    repositorio.consultar_circulo('eletropostos', centro, 3000, lambda lat, lng, raio: chamadas.append(1) or [])
+    assert len(chamadas) == len(falhos)
+
+
+def test_atualizacao_sem_tolerancia_levanta_depois_de_tentar_todos(repositorio):
+    tiles = [GEOHASH, GEOHASH[:-1] + ('0' if GEOHASH[-1] != '0' else '1')]
+    tentados = []
+
+    def buscar(lat, lng, raio):
+        tentados.append((lat, lng))
+        if len(tentados) == 1:
+            raise RuntimeError('429 RESOURCE_EXHAUSTED')
+        return []
+
+    with pytest.raises(FalhaAtualizacaoTiles) as erro:
+        repositorio.atualizar_tiles('eletropostos', tiles, buscar)
+
+    assert len(tentados) == 2
+    assert erro.value.resumo['tiles_com_falha'] == 1
+    assert len(repositorio.tiles_expirados('eletropostos', tiles)) == 1
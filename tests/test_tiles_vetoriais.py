@@ -0,0 +1,212 @@
+"""Testes de processamento/tiles_vetoriais.py (decodificador MVT independente)"""
+
+import gzip
+import struct
+import numpy as np
+import pytest
+from processamento.agregacao import IndiceCelulas
+from processamento.grade import poligonos_celulas
+from processamento.tiles_vetoriais import (
+    EXTENSAO_MVT,
+    CamadaVetorial,
+    codificar_camada,
+    construir_tiles,
+    coordenadas_tile,
+    exportar_mbtiles,
+    ler_tile
+)
+
+
+# --- DECODIFICADOR PROTOBUF/MVT MÍNIMO ---
+def ler_varint(buf, i):
+    resultado = deslocamento = 0
+    while True:
+        byte = buf[i]
+        i += 1
+        resultado |= (byte & 0x7F) << deslocamento
+        if not byte & 0x80:
+            return resultado, i
+        deslocamento += 7
+
+
+def campos(buf):
+    """(número do campo, valor) de uma mensagem protobuf"""
+    i = 0
+    while i < len(buf):
+        chave, i = ler_varint(buf, i)
+        numero, tipo = chave >> 3, chave & 7
+        if tipo == 0:
+            valor, i = ler_varint(buf, i)
+        elif tipo == 1:
+            valor, i = buf[i:i + 8], i + 8
+        elif tipo == 2:
+            tamanho, i = ler_varint(buf, i)
+            valor, i = buf[i:i + tamanho], i + tamanho
+        elif tipo == 5:
+            valor, i = buf[i:i + 4], i + 4
+        else:
+            raise ValueError(f"tipo de campo {tipo} inesperado")
+        yield numero, valor
+
+
+def empacotados(buf):
+    valores, i = [], 0
+    while i < len(buf):
+        valor, i = ler_varint(buf, i)
+        valores.append(valor)
+    return valores
+
+
+def dezigzag(n):
+    return (n >> 1) ^ -(n & 1)
+
+
+def valor_mvt(buf):
+    for numero, valor in campos(buf):
+        if numero == 1:
+            return valor.decode('utf-8')
+        if numero == 3:
+            return struct.unpack('<d', valor)[0]
+        if numero == 6:
+            return dezigzag(valor)
+        if numero == 7:
+            return bool(valor)
+    raise ValueError("valor sem tipo conhecido")
+
+
+def geometria(comandos):
+    """Partes [(vértices, fechada)] a partir dos comandos MoveTo/LineTo/ClosePath"""
+    partes, x, y, i = [], 0, 0, 0
+    while i < len(comandos):
+        comando, n = comandos[i] & 7, comandos[i] >> 3
+        i += 1
+        if comando == 7:
+            partes[-1][1] = True
+            continue
+        for _ in range(n):
+            x += dezigzag(comandos[i])
+            y += dezigzag(comandos[i + 1])
+            i += 2
+            if comando == 1:
+                partes.append([[], False])
+            partes[-1][0].append((x, y))
+    return partes
+
+
+def decodificar_camada(buf):
+    camada = {'feicoes': []}
+    chaves, valores, feicoes = [], [], []
+    for numero, valor in campos(buf):
+        if numero == 15:
+            camada['versao'] = valor
+        elif numero == 1:
+            camada['nome'] = valor.decode('utf-8')
+        elif numero == 2:
+            feicoes.append(dict(campos(valor)))
+        elif numero == 3:
+            chaves.append(valor.decode('utf-8'))
+        elif numero == 4:
+            valores.append(valor_mvt(valor))
+        elif numero == 5:
+            camada['extensao'] = valor
+    for feicao in feicoes:
+        tags = empacotados(feicao.get(2, b''))
+        camada['feicoes'].append({
+            'tipo': feicao[3],
+            'propriedades': {chaves[k]: valores[v] for k, v in zip(tags[::2], tags[1::2])},
+            'geometria': geometria(empacotados(feicao[4]))
+        })
+    return camada
+
+
+def decodificar_tile(buf):
+    return {c['nome']: c for c in (decodificar_camada(v) for n, v in campos(buf) if n == 3)}
+
+
+def area_agrimensor(vertices):
+    x, y = np.array(vertices, dtype=float).T
+    return float(np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y)) / 2
+
+
+# --- TESTES ---
+def test_camada_ida_e_volta():
+    geoms = [[[10, 20]], [[4095, 0]], [[0, 4095]]]
+    props = [
+        {'nome': 'Posto A', 'conectores': 4, 'max_kw': 150.5, 'rapido': True},
+        {'nome': 'Posto B', 'conectores': -3, 'max_kw': 7.4, 'rapido': False},
+        {'nome': 'Posto A', 'conectores': 123456789, 'max_kw': None, 'rapido': True}
+    ]
+
+    camada = decodificar_camada(codificar_camada('eletropostos', 'ponto', geoms, props))
+
+    assert camada['versao'] == 2 and camada['nome'] == 'eletropostos' and camada['extensao'] == EXTENSAO_MVT
+    for feicao, geom, esperado in zip(camada['feicoes'], geoms, props):
+        assert feicao['tipo'] == 1
+        assert feicao['geometria'] == [[[tuple(geom[0])], False]]
+        assert feicao['propriedades'] == {k: v for k, v in esperado.items() if v is not None}
+
+
+def test_pontos_voltam_ao_lugar():
+    rng = np.random.default_rng(0)
+    lats = -22.9 + rng.uniform(-0.05, 0.05, 300)
+    lngs = -47.06 + rng.uniform(-0.05, 0.05, 300)
+    camada = CamadaVetorial(
+        nome='pois', tipo='ponto', coords=np.column_stack([lats, lngs]),
+        propriedades={'id': np.arange(300)}
+    )
+    zoom = 16
+
+    vistos = {}
+    for z, x, y, dados in construir_tiles([camada], zoom, zoom):
+        for feicao in decodificar_tile(dados)['pois']['feicoes']:
+            (((px, py),), _), = feicao['geometria']
+            vistos[feicao['propriedades']['id']] = (x + px / EXTENSAO_MVT, y + py / EXTENSAO_MVT)
+
+    # No zoom máximo não há desbaste: todos os pontos, a menos de meio pixel do tile
+    assert sorted(vistos) == list(range(300))
+    tx, ty = coordenadas_tile(lats, lngs, zoom)
+    decodificados = np.array([vistos[k] for k in range(300)])
+    np.testing.assert_allclose(decodificados[:, 0], tx, atol=0.5 / EXTENSAO_MVT)
+    np.testing.assert_allclose(decodificados[:, 1], ty, atol=0.5 / EXTENSAO_MVT)
+
+
+@pytest.mark.parametrize('inverter', [False, True])
+def test_aneis_externos_com_area_positiva(inverter):
+    # Células da grade (anti-horárias em lat/lng) nos dois sentidos de entrada
+    rng = np.random.default_rng(1)
+    lats = -22.9 + rng.uniform(-0.1, 0.1, 80)
+    lngs = -47.06 + rng.uniform(-0.1, 0.1, 80)
+    indice = IndiceCelulas.para_pontos(lats, lngs, tamanho_base_m=200)
+    ids = np.unique(indice.celulas(lats, lngs))
+    aneis = poligonos_celulas(ids, 200, indice.zona, indice.sul)
+    if inverter:
+        aneis = aneis[:, ::-1]
+    camada = CamadaVetorial(nome='celulas', tipo='poligono', coords=aneis, propriedades={'id': np.arange(len(ids))})
+
+    total = 0
+    for z, x, y, dados in construir_tiles([camada], 14, 14):
+        for feicao in decodificar_tile(dados)['celulas']['feicoes']:
+            assert feicao['tipo'] == 3
+            (vertices, fechado), = feicao['geometria']
+            assert fechado
+            assert len(vertices) >= 3 and vertices[0] != vertices[-1]
+            assert area_agrimensor(vertices) > 0
+            total += 1
+    assert total >= len(ids)
+
+
+def test_mbtiles_guarda_os_tiles_em_tms(tmp_path):
+    camada = CamadaVetorial(
+        nome='eletropostos', tipo='ponto',
+        coords=np.array([[-22.9056, -47.0608], [-22.95, -47.1]]),
+        propriedades={'nome': np.array(['A', 'B'])}
+    )
+    caminho = tmp_path / 'regiao.mbtiles'
+
+    por_zoom = exportar_mbtiles([camada], caminho, zoom_min=10, zoom_max=12)
+
+    gerados = list(construir_tiles([camada], 10, 12))
+    assert sum(por_zoom.values()) == len(gerados)
+    for z, x, y, dados in gerados:
+        assert gzip.decompress(ler_tile(caminho, z, x, y)) == dados
+    assert ler_tile(caminho, 10, 0, 0) is None